@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+In-process Data Bus
+Single copy shared with the src package: the implementation lives in
+src/acquisition/bus.py and is re-exported here so the monitors in this
+folder can follow the acquisition daemon
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    from src.acquisition.bus import DataBus, Sample, Subscription
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.acquisition.bus import DataBus, Sample, Subscription
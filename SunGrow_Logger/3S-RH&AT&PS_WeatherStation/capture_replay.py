@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Modbus Capture Replay
+Virtual gateway that answers live client requests with the responses
+recorded in a pcap/pcapng capture of the Sungrow Logger, at recorded
+response timing or accelerated N times.
+"""
+
+import asyncio
+import json
+import struct
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from modbus_simulator import ModbusSimulator, READ_FUNCTIONS
+
+try:
+    from src.modbus.pcap_extractor import PCAPReader, TCPSegment
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.modbus.pcap_extractor import PCAPReader, TCPSegment
+
+
+DEFAULT_CAPTURE = Path(__file__).parent.parent.parent / 'captures' / 'modbus_test_2min.pcapng'
+
+# Ports the Sungrow Logger and standard Modbus TCP devices listen on
+GATEWAY_PORTS = (502, 505)
+
+
+def read_tcp_segments(capture_file: str) -> Iterator[TCPSegment]:
+    """
+    Yield TCP segments with payload from a pcap or pcapng capture
+
+    Args:
+        capture_file: Path to .pcap or .pcapng file
+
+    Yields:
+        (timestamp, src, sport, dst, dport, seq, payload) tuples
+    """
+    return PCAPReader(str(capture_file)).packets(segments=True)
+
+
+class CaptureIndex:
+    """Request to response index built from recorded Modbus TCP exchanges"""
+
+    def __init__(self, gateway_ports: Tuple[int, ...] = GATEWAY_PORTS):
+        """
+        Initialize index
+
+        Args:
+            gateway_ports: TCP ports identifying the gateway side of a flow
+        """
+        self.gateway_ports = gateway_ports
+        # (unit_id, request PDU) -> list of (response PDU, response delay)
+        self.exchanges: Dict[Tuple[int, bytes], List[Tuple[bytes, float]]] = defaultdict(list)
+        # Latest recorded register values, for reads not seen verbatim
+        self.banks: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self.stats = {
+            'segments': 0,
+            'requests': 0,
+            'responses': 0,
+            'paired': 0,
+            'unpaired': 0,
+            'retransmissions': 0,
+        }
+
+    def add_exchange(self, unit_id: int, request: bytes, response: bytes, delay: float = 0.0) -> None:
+        """Record one request PDU and the response PDU it received"""
+        self.exchanges[(unit_id, bytes(request))].append((bytes(response), delay))
+        self.stats['paired'] += 1
+
+        function_code = request[0]
+        if (function_code in READ_FUNCTIONS and len(request) >= 5
+                and response[0] == function_code and len(response) >= 2):
+            start = struct.unpack_from('>H', request, 1)[0]
+            count = response[1] // 2
+            if len(response) >= 2 + count * 2:
+                values = struct.unpack_from(f'>{count}H', response, 2)
+                bank = self.banks[unit_id]
+                for i, value in enumerate(values):
+                    bank[start + i] = value
+
+    def load_capture(self, capture_file: str) -> int:
+        """
+        Index every request/response pair in a capture
+
+        Args:
+            capture_file: Path to .pcap or .pcapng file
+
+        Returns:
+            Number of paired exchanges added
+        """
+        paired_before = self.stats['paired']
+        streams: Dict[Tuple, bytearray] = defaultdict(bytearray)
+        next_seq: Dict[Tuple, int] = {}
+        # (client flow, transaction_id, unit_id) -> (request PDU, timestamp)
+        pending: Dict[Tuple, Tuple[bytes, float]] = {}
+
+        for timestamp, src, sport, dst, dport, seq, payload in read_tcp_segments(capture_file):
+            if dport in self.gateway_ports:
+                to_gateway, client = True, (src, sport, dst, dport)
+            elif sport in self.gateway_ports:
+                to_gateway, client = False, (dst, dport, src, sport)
+            else:
+                continue
+            self.stats['segments'] += 1
+
+            # Drop retransmitted data already appended to the stream, keeping
+            # the new bytes of a segment that only partly overlaps it
+            flow = (client, to_gateway)
+            expected = next_seq.get(flow)
+            if expected is not None:
+                overlap = (expected - seq) & 0xFFFFFFFF
+                if overlap and overlap < 0x80000000:
+                    self.stats['retransmissions'] += 1
+                    if overlap >= len(payload):
+                        continue
+                    payload = payload[overlap:]
+                    seq = expected
+            next_seq[flow] = (seq + len(payload)) & 0xFFFFFFFF
+
+            buffer = streams[flow]
+            buffer += payload
+            while len(buffer) >= 8:
+                transaction_id, protocol_id, length, unit_id = struct.unpack_from('>HHHB', buffer)
+                if protocol_id != 0 or length < 2:
+                    del buffer[:1]  # resynchronise on corrupt data
+                    continue
+                if len(buffer) < 6 + length:
+                    break
+                pdu = bytes(buffer[7:6 + length])
+                del buffer[:6 + length]
+
+                key = (client, transaction_id, unit_id)
+                if to_gateway:
+                    self.stats['requests'] += 1
+                    pending[key] = (pdu, timestamp)
+                else:
+                    self.stats['responses'] += 1
+                    request = pending.pop(key, None)
+                    if request is None:
+                        self.stats['unpaired'] += 1
+                        continue
+                    self.add_exchange(unit_id, request[0], pdu, max(0.0, timestamp - request[1]))
+
+        self.stats['unpaired'] += len(pending)
+        return self.stats['paired'] - paired_before
+
+    def summary(self) -> Dict:
+        """Return index statistics"""
+        delays = sorted(d for answers in self.exchanges.values() for _, d in answers)
+        return {
+            **self.stats,
+            'unique_requests': len(self.exchanges),
+            'units': sorted(self.banks),
+            'median_delay_ms': round(delays[len(delays) // 2] * 1000, 3) if delays else 0.0,
+        }
+
+
+class ReplaySimulator(ModbusSimulator):
+    """Modbus TCP server answering with responses recorded in a capture"""
+
+    def __init__(self, index: CaptureIndex, speed: float = 1.0, **kwargs):
+        """
+        Initialize replay server
+
+        Args:
+            index: Recorded exchanges to serve
+            speed: Timing factor; 1.0 replays recorded response delays,
+                N answers N times faster, 0 answers immediately
+            **kwargs: Passed to ModbusSimulator (host, port, drop_rate, ...)
+        """
+        super().__init__(**kwargs)
+        self.index = index
+        self.speed = speed
+        self._cursor: Dict[Tuple[int, bytes], int] = defaultdict(int)
+        self.stats.update({'replayed': 0, 'synthesized': 0})
+        for unit_id, bank in index.banks.items():
+            self.add_device(unit_id, bank)
+
+    def _respond(self, unit_id: int, pdu: bytes) -> Tuple[Optional[bytes], float]:
+        """Serve recorded answers in recorded order, cycling at the end"""
+        answers = self.index.exchanges.get((unit_id, pdu))
+        if answers:
+            key = (unit_id, pdu)
+            response, delay = answers[self._cursor[key] % len(answers)]
+            self._cursor[key] += 1
+            self.stats['replayed'] += 1
+            return response, delay / self.speed if self.speed else 0.0
+
+        # Reads never seen verbatim are served from recorded register values
+        response = self.handle_pdu(unit_id, pdu)
+        if response is not None and not response[0] & 0x80:
+            self.stats['synthesized'] += 1
+        return response, self._response_delay()
+
+
+def main():
+    """Main execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay a Modbus capture as a virtual gateway")
+    parser.add_argument('capture', nargs='?', default=str(DEFAULT_CAPTURE))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="timing factor (1 = recorded timing, 10 = 10x faster, 0 = no delay)")
+    parser.add_argument('--strict', action='store_true',
+                        help="reject reads of registers never seen in the capture")
+    args = parser.parse_args()
+
+    if not Path(args.capture).exists():
+        print(f"✗ Capture not found: {args.capture}")
+        return
+
+    index = CaptureIndex()
+    paired = index.load_capture(args.capture)
+    print(f"[OK] Indexed {paired} exchanges from {args.capture}")
+    print(json.dumps(index.summary(), indent=2))
+    if not paired:
+        print("✗ No Modbus request/response pairs found")
+        return
+
+    simulator = ReplaySimulator(index, speed=args.speed, host=args.host,
+                                port=args.port, strict=args.strict)
+    print(f"[OK] Replaying on {args.host}:{args.port} at {args.speed}x (Ctrl+C to stop)")
+    try:
+        asyncio.run(simulator.serve())
+    except KeyboardInterrupt:
+        print("\n[OK] Replay stopped")
+        print(json.dumps(simulator.stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Report-by-Exception Change Filter
+Deadband and swinging-door compression stage between the reader and its
+consumers. Push channels only receive values that moved beyond a deadband,
+storage only receives the points needed to rebuild each signal within a
+compression deviation, and a last-value cache keeps the current snapshot.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """Change thresholds for one signal"""
+    absolute: float = 0.0
+    percent: float = 0.0
+    compression: Optional[float] = None
+    max_interval: float = 0.0
+
+    def threshold(self, reference: float) -> float:
+        """Smallest change from reference that is reported"""
+        return max(self.absolute, abs(reference) * self.percent / 100.0)
+
+
+class ArchivedPoint(NamedTuple):
+    """Point selected for storage"""
+    signal: str
+    timestamp: float
+    value: float
+    payload: Any
+
+
+@dataclass
+class FilterResult:
+    """Output of one filter update"""
+    changed: Dict[str, float] = field(default_factory=dict)
+    archived: List[ArchivedPoint] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.archived)
+
+
+class _SignalState:
+    """Deadband and swinging-door state of one signal"""
+
+    __slots__ = ('reported', 'reported_at', 'last', 'anchor', 'slope_low', 'slope_high')
+
+    def __init__(self):
+        self.reported: Optional[float] = None
+        self.reported_at = 0.0
+        self.last: Optional[Tuple[float, float, Any]] = None
+        self.anchor: Optional[Tuple[float, float]] = None
+        self.slope_low = float('-inf')
+        self.slope_high = float('inf')
+
+
+class ChangeFilter:
+    """Per-signal deadband and compression filter with a last-value cache"""
+
+    def __init__(self, deadbands: Optional[Dict[str, Deadband]] = None,
+                 default: Deadband = Deadband()):
+        """
+        Initialize filter
+
+        Args:
+            deadbands: Thresholds keyed by signal name
+            default: Thresholds for signals not listed
+        """
+        self.deadbands = dict(deadbands or {})
+        self.default = default
+        self.cache: Dict[str, Tuple[float, float]] = {}
+        self.stats = {'received': 0, 'reported': 0, 'suppressed': 0, 'archived': 0}
+        self._states: Dict[str, _SignalState] = {}
+
+    def update(self, values: Dict[str, float], timestamp: Optional[float] = None,
+               payloads: Optional[Dict[str, Any]] = None) -> FilterResult:
+        """
+        Filter one set of readings
+
+        Args:
+            values: Engineering values keyed by signal
+            timestamp: Reading time (default: now)
+            payloads: Optional objects carried into archived points
+
+        Returns:
+            Values that crossed their deadband and points to store
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        result = FilterResult()
+
+        for name, value in values.items():
+            self.stats['received'] += 1
+            self.cache[name] = (value, timestamp)
+            band = self.deadbands.get(name, self.default)
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = _SignalState()
+            payload = payloads.get(name) if payloads else None
+
+            if self._exceeds(state, band, value, timestamp):
+                state.reported = value
+                state.reported_at = timestamp
+                result.changed[name] = value
+                self.stats['reported'] += 1
+            else:
+                self.stats['suppressed'] += 1
+
+            if band.compression is None:
+                if name in result.changed:
+                    result.archived.append(ArchivedPoint(name, timestamp, value, payload))
+            else:
+                self._compress(name, state, band.compression, value, timestamp, payload, result)
+
+        self.stats['archived'] += len(result.archived)
+        return result
+
+    @staticmethod
+    def _exceeds(state: _SignalState, band: Deadband, value: float, timestamp: float) -> bool:
+        """True when a value must be reported"""
+        if state.reported is None:
+            return True
+        if band.max_interval and timestamp - state.reported_at >= band.max_interval:
+            return True
+        threshold = band.threshold(state.reported)
+        if threshold <= 0:
+            return value != state.reported
+        return abs(value - state.reported) >= threshold
+
+    @staticmethod
+    def _compress(name: str, state: _SignalState, deviation: float, value: float,
+                  timestamp: float, payload: Any, result: FilterResult) -> None:
+        """Swinging-door compression: archive the corner points of each corridor"""
+        if state.anchor is None:
+            result.archived.append(ArchivedPoint(name, timestamp, value, payload))
+            state.anchor = (timestamp, value)
+            state.last = (timestamp, value, payload)
+            return
+
+        anchor_t, anchor_v = state.anchor
+        elapsed = timestamp - anchor_t
+        if elapsed <= 0:
+            state.last = (timestamp, value, payload)
+            return
+
+        slope_low = max(state.slope_low, (value - deviation - anchor_v) / elapsed)
+        slope_high = min(state.slope_high, (value + deviation - anchor_v) / elapsed)
+        if slope_low <= slope_high:
+            state.slope_low, state.slope_high = slope_low, slope_high
+            state.last = (timestamp, value, payload)
+            return
+
+        # Door opened past parallel: the previous point closes the corridor
+        last_t, last_v, last_payload = state.last
+        result.archived.append(ArchivedPoint(name, last_t, last_v, last_payload))
+        state.anchor = (last_t, last_v)
+        elapsed = timestamp - last_t
+        if elapsed <= 0:
+            state.slope_low, state.slope_high = float('-inf'), float('inf')
+        else:
+            state.slope_low = (value - deviation - last_v) / elapsed
+            state.slope_high = (value + deviation - last_v) / elapsed
+        state.last = (timestamp, value, payload)
+
+    def flush(self) -> List[ArchivedPoint]:
+        """Archive the pending end point of every compressed signal"""
+        points = []
+        for name, state in self._states.items():
+            if state.last is None or state.anchor is None:
+                continue
+            last_t, last_v, last_payload = state.last
+            if (last_t, last_v) != state.anchor:
+                points.append(ArchivedPoint(name, last_t, last_v, last_payload))
+                state.anchor = (last_t, last_v)
+                state.slope_low, state.slope_high = float('-inf'), float('inf')
+        self.stats['archived'] += len(points)
+        return points
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the latest value of every signal, reported or not"""
+        return {name: value for name, (value, _) in self.cache.items()}
+
+    def reset(self) -> None:
+        """Forget reported values so the next update reports everything"""
+        self._states.clear()
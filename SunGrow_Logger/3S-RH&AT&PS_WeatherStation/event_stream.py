@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events Broadcaster
+Single copy shared with the src package: the implementation lives in
+src/weather/event_stream.py and is re-exported here under the module
+name the weather station scripts import
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    from src.weather.event_stream import (HEARTBEAT, SSE_HEADERS, EventBroadcaster, diff,
+                                          format_event, stream_to)
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.weather.event_stream import (HEARTBEAT, SSE_HEADERS, EventBroadcaster, diff,
+                                          format_event, stream_to)
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP Server
+Single copy shared with the src package: the implementation lives in
+src/weather/http_server.py and is re-exported here under the module name
+the weather station scripts import
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    from src.weather.http_server import (MAX_HEADER_BYTES, REJECT_RESPONSE, PooledHTTPServer)
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.weather.http_server import (MAX_HEADER_BYTES, REJECT_RESPONSE, PooledHTTPServer)
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Modbus TCP Gateway Simulator
+Local stand-in for the Sungrow Logger (192.168.1.5:505) for load-testing
+WeatherStation3S, the web monitor and the example scripts.
+Serves configurable unit IDs and register banks with adjustable latency,
+jitter, drop rate and response segmentation.
+"""
+
+import asyncio
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from register_decoder import TYPE_FORMATS, RegisterBlock
+from weather_station_reader import SENSOR_BLOCK
+
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+GATEWAY_TARGET_FAILED = 0x0B
+
+READ_FUNCTIONS = (0x03, 0x04)
+
+DEFAULT_REGISTER_MAP = Path(__file__).parent.parent.parent / 'data' / 'sungrow_live_register_map.json'
+
+# Typical 3S conditions used when no capture-derived bank is available
+DEFAULT_3S_VALUES = {
+    'humidity': 55.0,
+    'temperature': 21.5,
+    'pressure': 1013.2,
+    'wind_speed': 3.2,
+    'solar_radiation': 640.0,
+}
+
+
+def registers_from_values(block: RegisterBlock, values: Dict[str, float]) -> Dict[int, int]:
+    """
+    Encode engineering values into raw UINT16 registers for a decode block
+
+    Args:
+        block: Decode block describing the register layout
+        values: Engineering values keyed by field name
+
+    Returns:
+        Register values keyed by address
+    """
+    registers = {addr: 0 for addr in range(block.start, block.start + block.count)}
+    for fld in block.fields:
+        if fld.name not in values:
+            continue
+        raw = (values[fld.name] - fld.offset) / fld.scale
+        fmt = '>' + TYPE_FORMATS[fld.data_type][0]
+        if fld.data_type != 'float32':
+            raw = int(round(raw))
+        words = struct.unpack(f'>{fld.width}H', struct.pack(fmt, raw))
+        for i, word in enumerate(words):
+            registers[fld.address + i] = word
+    return registers
+
+
+def load_live_register_map(json_file: str = str(DEFAULT_REGISTER_MAP)) -> Dict[int, Dict[int, int]]:
+    """
+    Build register banks from a live capture register map
+
+    Uses the most common value observed for each register.
+
+    Args:
+        json_file: Path to sungrow_live_register_map.json
+
+    Returns:
+        Register banks keyed by unit ID, then address
+    """
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+
+    banks = {}
+    for unit_key, unit_data in data.get('registers_by_unit', {}).items():
+        unit_id = int(unit_key.split('_')[-1])
+        bank = {}
+        for addr_str, reg in unit_data.get('registers', {}).items():
+            try:
+                bank[int(addr_str)] = int(reg.get('most_common_value') or 0) & 0xFFFF
+            except (TypeError, ValueError):
+                bank[int(addr_str)] = 0
+        banks[unit_id] = bank
+    return banks
+
+
+class ModbusSimulator:
+    """Asyncio Modbus TCP server answering FC3/FC4 reads from register banks"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 5020,
+                 latency: float = 0.0, jitter: float = 0.0, drop_rate: float = 0.0,
+                 coalesce: bool = True, fragment_size: int = 0,
+                 strict: bool = False, seed: Optional[int] = None,
+                 backlog: int = 4096):
+        """
+        Initialize simulator
+
+        Args:
+            host: Interface to bind
+            port: TCP port (0 picks a free port)
+            latency: Base response delay in seconds
+            jitter: Maximum extra random delay in seconds
+            drop_rate: Fraction of requests left unanswered (0.0-1.0)
+            coalesce: Send answers to pipelined requests in one write
+            fragment_size: Split each write into chunks of this many bytes (0 = off)
+            strict: Reject reads of unmapped registers with exception 0x02
+            seed: Random seed for reproducible jitter/drops
+            backlog: Listen backlog for large client counts
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.coalesce = coalesce
+        self.fragment_size = fragment_size
+        self.strict = strict
+        self.backlog = backlog
+        self.random = random.Random(seed)
+
+        self.banks: Dict[int, Dict[int, int]] = {}
+        self.stats = {
+            'connections': 0,
+            'active_connections': 0,
+            'peak_connections': 0,
+            'requests': 0,
+            'responses': 0,
+            'exceptions': 0,
+            'dropped': 0,
+            'framing_errors': 0,
+        }
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._writers = set()
+        self._ready = threading.Event()
+
+    def add_device(self, unit_id: int, registers: Optional[Dict[int, int]] = None) -> None:
+        """Register a unit ID with its register bank (served for FC3 and FC4)"""
+        self.banks[unit_id] = dict(registers or {})
+
+    def set_register(self, unit_id: int, address: int, value: int) -> None:
+        """Update a single register value"""
+        self.banks.setdefault(unit_id, {})[address] = value & 0xFFFF
+
+    def set_values(self, unit_id: int, block: RegisterBlock, values: Dict[str, float]) -> None:
+        """Update registers from engineering values of a decode block"""
+        bank = self.banks.setdefault(unit_id, {})
+        encoded = registers_from_values(block, values)
+        for fld in block.fields:
+            if fld.name in values:
+                for addr in range(fld.address, fld.address + fld.width):
+                    bank[addr] = encoded[addr]
+
+    def load_register_map(self, json_file: str = str(DEFAULT_REGISTER_MAP)) -> int:
+        """
+        Seed banks from a live capture register map
+
+        Returns:
+            Number of units loaded
+        """
+        banks = load_live_register_map(json_file)
+        for unit_id, bank in banks.items():
+            self.banks.setdefault(unit_id, {}).update(bank)
+        return len(banks)
+
+    def add_weather_station(self, unit_id: int = 0xF7,
+                            values: Optional[Dict[str, float]] = None) -> None:
+        """Add a 3S weather station using the reader's register layout"""
+        self.add_device(unit_id, registers_from_values(SENSOR_BLOCK, values or DEFAULT_3S_VALUES))
+
+    def handle_pdu(self, unit_id: int, pdu: bytes) -> Optional[bytes]:
+        """
+        Answer one request PDU
+
+        Args:
+            unit_id: Modbus unit ID from the MBAP header
+            pdu: Request PDU (function code + data)
+
+        Returns:
+            Response PDU, or None to leave the request unanswered
+        """
+        function_code = pdu[0]
+        bank = self.banks.get(unit_id)
+        if bank is None:
+            return bytes((function_code | 0x80, GATEWAY_TARGET_FAILED))
+        if function_code not in READ_FUNCTIONS:
+            return bytes((function_code | 0x80, ILLEGAL_FUNCTION))
+        if len(pdu) < 5:
+            return bytes((function_code | 0x80, ILLEGAL_DATA_VALUE))
+
+        start, quantity = struct.unpack_from('>HH', pdu, 1)
+        if not 1 <= quantity <= 125:
+            return bytes((function_code | 0x80, ILLEGAL_DATA_VALUE))
+
+        addresses = range(start, start + quantity)
+        if self.strict and any(addr not in bank for addr in addresses):
+            return bytes((function_code | 0x80, ILLEGAL_DATA_ADDRESS))
+
+        get = bank.get
+        return struct.pack(f'>BB{quantity}H', function_code, quantity * 2,
+                           *[get(addr, 0) for addr in addresses])
+
+    def _response_delay(self) -> float:
+        """Latency plus random jitter for one response"""
+        if self.jitter:
+            return self.latency + self.random.uniform(0, self.jitter)
+        return self.latency
+
+    def _respond(self, unit_id: int, pdu: bytes) -> Tuple[Optional[bytes], float]:
+        """Return the response PDU and the delay before sending it"""
+        return self.handle_pdu(unit_id, pdu), self._response_delay()
+
+    def _answer(self, adu: bytes) -> Optional[Tuple[bytes, float]]:
+        """Build the response ADU and its delay for one request ADU"""
+        self.stats['requests'] += 1
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.stats['dropped'] += 1
+            return None
+
+        transaction_id, _, _, unit_id = struct.unpack_from('>HHHB', adu)
+        pdu, delay = self._respond(unit_id, adu[7:])
+        if pdu is None:
+            self.stats['dropped'] += 1
+            return None
+        if pdu[0] & 0x80:
+            self.stats['exceptions'] += 1
+        self.stats['responses'] += 1
+        return struct.pack('>HHHB', transaction_id, 0, len(pdu) + 1, unit_id) + pdu, delay
+
+    async def _send(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        """Write response bytes, optionally split into small segments"""
+        if not self.fragment_size:
+            writer.write(data)
+            return
+        for i in range(0, len(data), self.fragment_size):
+            writer.write(data[i:i + self.fragment_size])
+            await writer.drain()
+            await asyncio.sleep(0.001)
+
+    async def _reply(self, writer: asyncio.StreamWriter, batch: List[bytes]) -> None:
+        """Answer a batch of pipelined ADUs"""
+        responses = [self._answer(adu) for adu in batch]
+        responses = [r for r in responses if r is not None]
+        if not responses:
+            return
+
+        if self.coalesce:
+            delay = max(delay for _, delay in responses)
+            if delay:
+                await asyncio.sleep(delay)
+            await self._send(writer, b''.join(response for response, _ in responses))
+        else:
+            for response, delay in responses:
+                if delay:
+                    await asyncio.sleep(delay)
+                await self._send(writer, response)
+        await writer.drain()
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """Serve one client connection until it closes"""
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.stats['connections'] += 1
+        self.stats['active_connections'] += 1
+        self.stats['peak_connections'] = max(self.stats['peak_connections'],
+                                             self.stats['active_connections'])
+        self._writers.add(writer)
+        buffer = b''
+        try:
+            while True:
+                chunk = await reader.read(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+
+                # Split every complete ADU that arrived in this segment
+                batch = []
+                bad_header = False
+                while len(buffer) >= 7:
+                    length = struct.unpack_from('>H', buffer, 4)[0]
+                    if length < 2:
+                        bad_header = True
+                        break
+                    end = 6 + length
+                    if len(buffer) < end:
+                        break
+                    batch.append(buffer[:end])
+                    buffer = buffer[end:]
+
+                if batch:
+                    await self._reply(writer, batch)
+                if bad_header:
+                    # No ADU is that short and the stream cannot be resynced
+                    self.stats['framing_errors'] += 1
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.stats['active_connections'] -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+    async def serve(self) -> None:
+        """Run the server in the current event loop until cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, backlog=self.backlog)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            await self._server.serve_forever()
+        finally:
+            self._server.close()
+
+    def start(self) -> int:
+        """
+        Start the server in a background thread
+
+        Returns:
+            Bound TCP port
+        """
+        def run():
+            try:
+                asyncio.run(self.serve())
+            except asyncio.CancelledError:
+                pass
+
+        self._ready.clear()
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(5.0):
+            raise RuntimeError("Simulator did not start")
+        return self.port
+
+    def _shutdown(self) -> None:
+        """Close the listener and open connections (runs in the loop)"""
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+
+    def stop(self) -> None:
+        """Stop a server started with start()"""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._shutdown)
+        if self._thread:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+
+async def _load_client(host: str, port: int, unit_id: int, start: int, quantity: int,
+                       deadline: float, latencies: List[float], errors: List[int]) -> None:
+    """Poll one read in a closed loop until the deadline"""
+    transaction_id = 0
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            errors.append(1)
+            return
+
+        try:
+            while time.perf_counter() < deadline:
+                transaction_id = (transaction_id + 1) & 0xFFFF
+                request = struct.pack('>HHHBBHH', transaction_id, 0, 6, unit_id, 0x04, start, quantity)
+                sent = time.perf_counter()
+                writer.write(request)
+                try:
+                    header = await asyncio.wait_for(reader.readexactly(7), timeout=5.0)
+                    length = struct.unpack_from('>H', header, 4)[0]
+                    await reader.readexactly(length - 1)
+                except asyncio.TimeoutError:
+                    # A late answer would be read as the next one; reconnect
+                    errors.append(1)
+                    break
+                latencies.append(time.perf_counter() - sent)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            errors.append(1)
+            return
+        finally:
+            writer.close()
+
+
+def run_load_test(host: str = '127.0.0.1', port: int = 5020, clients: int = 100,
+                  duration: float = 10.0, unit_id: int = 0xF7,
+                  start: int = 8061, quantity: int = 25) -> Dict:
+    """
+    Poll a Modbus TCP server from many concurrent clients
+
+    Args:
+        host: Server address
+        port: Server port
+        clients: Number of concurrent connections
+        duration: Test length in seconds
+        unit_id: Unit ID to read
+        start: First register address
+        quantity: Registers per read
+
+    Returns:
+        Dictionary with request rate and latency percentiles
+    """
+    latencies: List[float] = []
+    errors: List[int] = []
+
+    async def run():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[
+            _load_client(host, port, unit_id, start, quantity, deadline, latencies, errors)
+            for _ in range(clients)
+        ])
+
+    began = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {
+        'clients': clients,
+        'duration_s': round(elapsed, 2),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms_p50': round(percentile(0.50), 3),
+        'latency_ms_p99': round(percentile(0.99), 3),
+        'latency_ms_max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def main():
+    """Main execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sungrow Logger Modbus TCP simulator")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--latency', type=float, default=0.0, help="base delay (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random delay (s)")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="fraction of requests dropped")
+    parser.add_argument('--no-coalesce', action='store_true', help="one write per response")
+    parser.add_argument('--fragment-size', type=int, default=0, help="split writes into N-byte segments")
+    parser.add_argument('--register-map', default=str(DEFAULT_REGISTER_MAP))
+    parser.add_argument('--load-test', type=int, default=0, metavar='CLIENTS',
+                        help="run a load test with this many clients against the simulator")
+    parser.add_argument('--duration', type=float, default=10.0, help="load test length (s)")
+    args = parser.parse_args()
+
+    simulator = ModbusSimulator(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        drop_rate=args.drop_rate,
+        coalesce=not args.no_coalesce,
+        fragment_size=args.fragment_size,
+    )
+
+    if Path(args.register_map).exists():
+        units = simulator.load_register_map(args.register_map)
+        print(f"[OK] Loaded {units} units from {args.register_map}")
+    else:
+        simulator.add_weather_station()
+        print("[OK] Register map not found, serving 3S weather station only")
+
+    if args.load_test:
+        port = simulator.start()
+        print(f"[OK] Simulator on {args.host}:{port}, "
+              f"{args.load_test} clients for {args.duration}s...")
+        result = run_load_test(args.host, port, clients=args.load_test, duration=args.duration)
+        simulator.stop()
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"[OK] Simulator listening on {args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        asyncio.run(simulator.serve())
+    except KeyboardInterrupt:
+        print("\n[OK] Simulator stopped")
+
+
+if __name__ == '__main__':
+    main()
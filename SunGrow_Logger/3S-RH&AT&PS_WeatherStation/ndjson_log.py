@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Append-Only NDJSON Log
+One JSON record per line, written through a buffer with periodic fsync
+and size/time based rotation. A record torn by a crash is trimmed when
+the log is reopened, so logging cost stays constant per record no matter
+how long the writer has been running.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+
+class NDJSONLog:
+    """Buffered, rotating newline-delimited JSON writer"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024,
+                 max_age: float = 24 * 3600, fsync_interval: float = 5.0,
+                 backups: int = 7, buffer_size: int = 64 * 1024):
+        """
+        Initialize log writer
+
+        Args:
+            path: Active log file
+            max_bytes: Rotate once the file reaches this size (0 = never)
+            max_age: Rotate once the file is this many seconds old (0 = never)
+            fsync_interval: Seconds between flush+fsync (0 = every record)
+            backups: Rotated files kept next to the active file (0 = keep all)
+            buffer_size: Write buffer size in bytes
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fsync_interval = fsync_interval
+        self.backups = backups
+        self.buffer_size = buffer_size
+
+        self.stats = {'records': 0, 'bytes': 0, 'syncs': 0, 'rotations': 0, 'recovered_bytes': 0}
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._last_sync = 0.0
+        self._open()
+
+    def _open(self) -> None:
+        """Open the active file for appending, trimming a torn last record"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.stats['recovered_bytes'] += recover(self.path)
+        self._file = open(self.path, 'ab', buffering=self.buffer_size)
+        self._size = self._file.tell()
+        self._opened_at = self.path.stat().st_mtime if self._size else time.time()
+        self._last_sync = time.monotonic()
+
+    def write(self, record: Dict) -> None:
+        """
+        Append one record
+
+        Args:
+            record: JSON-serialisable dictionary
+        """
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str)
+        data = (line + '\n').encode('utf-8')
+        self._file.write(data)
+        self._size += len(data)
+        self.stats['records'] += 1
+        self.stats['bytes'] += len(data)
+
+        now = time.monotonic()
+        if now - self._last_sync >= self.fsync_interval:
+            self.sync()
+        if self._should_rotate():
+            self.rotate()
+
+    def sync(self) -> None:
+        """Flush the buffer and fsync the file to disk"""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+        self.stats['syncs'] += 1
+
+    def _should_rotate(self) -> bool:
+        """True when the active file exceeds its size or age limit"""
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.max_age and time.time() - self._opened_at >= self.max_age)
+
+    def rotate(self) -> Optional[Path]:
+        """
+        Close the active file and continue in a new one
+
+        Returns:
+            Path of the rotated file, or None if the active file was empty
+        """
+        self.sync()
+        self._file.close()
+        rotated = None
+        if self._size:
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            rotated = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+            counter = 1
+            while rotated.exists():
+                rotated = self.path.with_name(f"{self.path.stem}.{stamp}-{counter}{self.path.suffix}")
+                counter += 1
+            os.replace(self.path, rotated)
+            self.stats['rotations'] += 1
+            self._prune()
+        self._open()
+        return rotated
+
+    def _prune(self) -> None:
+        """Delete the oldest rotated files beyond the backup count"""
+        if not self.backups:
+            return
+        for old in rotated_files(self.path)[:-self.backups]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Flush, fsync and close the log"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def recover(path: Path) -> int:
+    """
+    Trim a partial last record left by a crash
+
+    Args:
+        path: Log file to repair in place
+
+    Returns:
+        Number of bytes removed
+    """
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if not end:
+            return 0
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return 0
+
+        # Scan backwards in blocks for the last complete line
+        position = end
+        keep = 0
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            index = f.read(step).rfind(b'\n')
+            if index >= 0:
+                keep = position + index + 1
+                break
+        f.truncate(keep)
+        return end - keep
+
+
+def rotated_files(path: Path) -> List[Path]:
+    """Rotated files of a log, oldest first"""
+    path = Path(path)
+
+    # Names are <stem>.<YYYYmmdd>-<HHMMSS>[-<n>]<suffix>
+    def order(rotated: Path):
+        middle = rotated.name[len(path.stem) + 1:len(rotated.name) - len(path.suffix)]
+        date, _, rest = middle.partition('-')
+        clock, _, counter = rest.partition('-')
+        return date, clock, int(counter) if counter.isdigit() else 0
+
+    return sorted(path.parent.glob(f"{path.stem}.*{path.suffix}"), key=order)
+
+
+def read_records(path: str, include_rotated: bool = True) -> Iterator[Dict]:
+    """
+    Iterate over the records of a log in write order
+
+    Args:
+        path: Active log file
+        include_rotated: Also read rotated files, oldest first
+
+    Yields:
+        Decoded records; malformed lines are skipped
+    """
+    path = Path(path)
+    files = rotated_files(path) if include_rotated else []
+    if path.exists():
+        files.append(path)
+    for log_file in files:
+        with open(log_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
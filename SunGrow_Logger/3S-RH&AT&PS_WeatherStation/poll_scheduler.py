@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Adaptive Poll Scheduler
+Single copy shared with the src package: the implementation lives in
+src/utils/poll_scheduler.py and is re-exported here under the module
+name the weather station scripts import
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    from src.utils.poll_scheduler import (AdaptivePollScheduler, PollTask)
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.poll_scheduler import (AdaptivePollScheduler, PollTask)
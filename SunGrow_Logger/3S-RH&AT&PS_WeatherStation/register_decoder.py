@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Table-driven Modbus register decoder
+Single copy shared with the src package: the implementation lives in
+src/modbus/register_decoder.py and is re-exported here under the module
+name the weather station scripts import
+"""
+
+import sys
+from pathlib import Path
+
+try:
+    from src.modbus.register_decoder import (MAX_BLOCK_REGISTERS, TYPE_FORMATS, WEATHER_3S_BLOCK,
+                                             RegisterBlock, RegisterField,
+                                             blocks_from_register_map, compile_blocks,
+                                             load_register_map_blocks)
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.modbus.register_decoder import (MAX_BLOCK_REGISTERS, TYPE_FORMATS, WEATHER_3S_BLOCK,
+                                             RegisterBlock, RegisterField,
+                                             blocks_from_register_map, compile_blocks,
+                                             load_register_map_blocks)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Shared Dashboard State
+Versioned, immutable snapshots of the data shown by the web monitor. The
+polling thread builds a new snapshot for every change and publishes it by
+swapping one reference, so request handlers read a consistent view without
+locking and reuse its pre-encoded JSON body. Freezing, encoding and ETags
+come from src/weather/snapshot.py and are re-exported here
+"""
+
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from src.weather.response_cache import etag_matches
+    from src.weather.snapshot import FrozenDict, Snapshot, freeze
+except ImportError:  # run from the weather station folder
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.weather.response_cache import etag_matches
+    from src.weather.snapshot import FrozenDict, Snapshot, freeze
+
+# One version of the state with its JSON encoding and ETag
+StateSnapshot = Snapshot
+
+
+class SharedState:
+    """Holder of the current snapshot, replaced atomically by writers"""
+
+    def __init__(self, initial: Dict):
+        """
+        Initialize state
+
+        Args:
+            initial: Data shown before the first update
+        """
+        self._lock = threading.Lock()
+        self._current = StateSnapshot(initial, 0)
+
+    @property
+    def current(self) -> StateSnapshot:
+        """Latest snapshot; never modified after it is published"""
+        return self._current
+
+    @property
+    def data(self) -> FrozenDict:
+        """Data of the latest snapshot"""
+        return self._current.data
+
+    @property
+    def version(self) -> int:
+        """Version of the latest snapshot"""
+        return self._current.version
+
+    def update(self, changes: Dict) -> Optional[StateSnapshot]:
+        """
+        Merge top-level entries into a new snapshot and publish it
+
+        Args:
+            changes: Entries to set; entries equal to the current ones are ignored
+
+        Returns:
+            The published snapshot, or None if nothing changed
+        """
+        with self._lock:
+            current = self._current
+            if all(current.data.get(key) == value for key, value in changes.items()):
+                return None
+            data = dict(current.data)
+            data.update(changes)
+            self._current = StateSnapshot(data, current.version + 1)
+            return self._current
+
+    def replace(self, data: Dict) -> StateSnapshot:
+        """Publish entirely new data as the next version"""
+        with self._lock:
+            self._current = StateSnapshot(data, self._current.version + 1)
+            return self._current
@@ -12,11 +12,23 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import json
+import socket
+import struct
 import time
 import threading
-from weather_station_reader import WeatherStation3S
+from weather_station_reader import WeatherStation3S, SensorReading, SENSOR_BLOCK
+from register_decoder import RegisterBlock, RegisterField, compile_blocks
+from modbus_simulator import ModbusSimulator, DEFAULT_3S_VALUES, registers_from_values
+from capture_replay import CaptureIndex, ReplaySimulator
+from poll_scheduler import AdaptivePollScheduler
+from change_filter import ChangeFilter, Deadband
+from ndjson_log import NDJSONLog, read_records, rotated_files
 from weather_station_monitor import WeatherStationMonitor
 from weather_station_web import WeatherStationWebServer, WeatherStationWebMonitor
+from http_server import PooledHTTPServer
+from event_stream import EventBroadcaster, diff
+from shared_state import SharedState
+from bus import DataBus, Sample
 
 
 class TestWeatherStationReader:
@@ -102,6 +114,515 @@ class TestWeatherStationReader:
             return False
 
 
+class TestRegisterDecoder:
+    """Test the table-driven register decoder"""
+    
+    @staticmethod
+    def test_sensor_block_decoding():
+        """Test decoding a full 3S response payload"""
+        print("\n[TEST] Register Decoder - Sensor Block")
+        try:
+            raw = [0] * 25
+            raw[0] = 32768    # humidity
+            raw[2] = 6000     # temperature
+            raw[12] = 1630    # pressure
+            raw[21] = 3500    # wind speed
+            raw[24] = 6500    # irradiance
+            payload = struct.pack('>25H', *raw)
+            
+            values = SENSOR_BLOCK.decode(payload)
+            assert abs(values['humidity'] - 32768 / 655.35) < 1e-9
+            assert abs(values['temperature'] - 20.0) < 1e-9
+            assert abs(values['pressure'] - 1013.0) < 1e-9
+            assert abs(values['wind_speed'] - 3.5) < 1e-9
+            assert abs(values['solar_radiation'] - 650.0) < 1e-9
+            print(f"    Format: {SENSOR_BLOCK.struct.format}")
+            print("  OK - Sensor block decoded correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_block_compilation():
+        """Test grouping typed fields into read blocks"""
+        print("\n[TEST] Register Decoder - Block Compilation")
+        try:
+            fields = [
+                RegisterField('voltage', 100, 'uint16', scale=0.1),
+                RegisterField('power', 102, 'int32'),
+                RegisterField('energy', 500, 'uint32', scale=0.01),
+            ]
+            blocks = compile_blocks(fields, max_gap=2)
+            assert [(b.start, b.count) for b in blocks] == [(100, 4), (500, 2)]
+            
+            payload = struct.pack('>HHi', 2305, 0, -1500)
+            values = blocks[0].decode(payload)
+            assert abs(values['voltage'] - 230.5) < 1e-9
+            assert values['power'] == -1500
+            
+            try:
+                RegisterBlock(100, 2, [RegisterField('power', 101, 'int32')])
+                print("  FAIL - Out-of-range field accepted")
+                return False
+            except ValueError:
+                pass
+            
+            print("  OK - Blocks compiled correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+
+
+class TestModbusSimulator:
+    """Test the reader against the local Modbus TCP simulator"""
+    
+    @staticmethod
+    def test_simulated_sensor_read():
+        """Test reading all sensors from a simulated 3S station"""
+        print("\n[TEST] Modbus Simulator - Sensor Read")
+        simulator = ModbusSimulator(port=0)
+        try:
+            simulator.add_weather_station()
+            port = simulator.start()
+            station = WeatherStation3S(ip='127.0.0.1', port=port, timeout=2)
+            assert station.connect()
+            readings = station.read_all_sensors()
+            station.disconnect()
+            
+            assert readings is not None
+            for name, expected in DEFAULT_3S_VALUES.items():
+                assert abs(readings[name].value - expected) < 0.05, name
+            print(f"    Served {simulator.stats['responses']} responses on port {port}")
+            print("  OK - Simulated sensors read correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            simulator.stop()
+    
+    @staticmethod
+    def test_fragmented_response():
+        """Test reassembly of responses split across TCP segments"""
+        print("\n[TEST] Modbus Simulator - Fragmented Response")
+        simulator = ModbusSimulator(port=0, fragment_size=3)
+        try:
+            simulator.add_weather_station()
+            simulator.add_device(1, {5002: 1234})
+            port = simulator.start()
+            station = WeatherStation3S(ip='127.0.0.1', port=port, timeout=2)
+            assert station.connect()
+            values = station.read_sensor_values()
+            
+            station.slave_id = 1
+            assert station.read_registers(5002, 2) == [1234, 0]
+            station.slave_id = 99
+            assert station.read_registers(5002, 2) is None
+            station.disconnect()
+            
+            assert abs(values['temperature'] - DEFAULT_3S_VALUES['temperature']) < 0.05
+            assert simulator.stats['exceptions'] == 1
+            print("  OK - Fragmented responses reassembled")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            simulator.stop()
+
+    
+    @staticmethod
+    def test_malformed_header():
+        """Test that an ADU too short to hold a function code drops the connection"""
+        print("\n[TEST] Modbus Simulator - Malformed Header")
+        simulator = ModbusSimulator(port=0)
+        try:
+            simulator.add_device(1, {5002: 1234})
+            port = simulator.start()
+            read = struct.pack('>HHHBBHH', 1, 0, 6, 1, 0x04, 5002, 1)
+            with socket.create_connection(('127.0.0.1', port), timeout=2) as sock:
+                # A valid read, then a header whose length leaves no room for a PDU
+                sock.sendall(read + struct.pack('>HHHB', 2, 0, 1, 1))
+                received = b''
+                while True:
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    received += chunk
+            
+            assert received == struct.pack('>HHHBBBH', 1, 0, 5, 1, 0x04, 2, 1234)
+            assert simulator.stats['framing_errors'] == 1
+            print("  OK - Valid read answered, connection closed on the bad header")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            simulator.stop()
+
+
+class TestCaptureReplay:
+    """Test replaying recorded gateway traffic"""
+    
+    @staticmethod
+    def _write_capture(path, exchanges):
+        """Write request/response ADU pairs (optionally with a TCP sequence number) as a pcapng file"""
+        def frame(src, dst, sport, dport, seq, payload):
+            tcp = struct.pack('>HHIIBBHHH', sport, dport, seq, 0, 0x50, 0x18, 65535, 0, 0)
+            ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp) + len(payload), 0, 0,
+                             64, 6, 0, bytes(src), bytes(dst))
+            return b'\x00' * 12 + b'\x08\x00' + ip + tcp + payload
+        
+        def block(block_type, body):
+            body += b'\x00' * (-len(body) % 4)
+            return struct.pack('<II', block_type, len(body) + 12) + body + struct.pack('<I', len(body) + 12)
+        
+        client, gateway = (192, 168, 1, 100), (192, 168, 1, 5)
+        data = block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+        data += block(1, struct.pack('<HHI', 1, 0, 65535))
+        seq = {True: 1000, False: 5000}
+        for ts, adu, to_gateway, *explicit_seq in exchanges:
+            src, dst = (client, gateway) if to_gateway else (gateway, client)
+            sport, dport = (40000, 505) if to_gateway else (505, 40000)
+            if explicit_seq:
+                seq[to_gateway] = explicit_seq[0]
+            pkt = frame(src, dst, sport, dport, seq[to_gateway], adu)
+            seq[to_gateway] += len(adu)
+            micros = int(ts * 1e6)
+            data += block(6, struct.pack('<IIIII', 0, micros >> 32, micros & 0xFFFFFFFF,
+                                         len(pkt), len(pkt)) + pkt)
+        Path(path).write_bytes(data)
+    
+    @staticmethod
+    def test_capture_index():
+        """Test pairing requests and responses from a pcapng capture"""
+        print("\n[TEST] Capture Replay - Index")
+        try:
+            import tempfile
+            registers = registers_from_values(SENSOR_BLOCK, DEFAULT_3S_VALUES)
+            values = [registers[a] for a in range(8061, 8086)]
+            request = struct.pack('>BHH', 0x04, 8061, 25)
+            response = struct.pack('>BB25H', 0x04, 50, *values)
+            exchanges = [
+                (1.000, struct.pack('>HHHB', 1, 0, 6, 0xF7) + request, True),
+                (1.080, struct.pack('>HHHB', 1, 0, len(response) + 1, 0xF7) + response, False),
+            ]
+            
+            with tempfile.TemporaryDirectory() as tmp:
+                capture = Path(tmp) / 'replay.pcapng'
+                TestCaptureReplay._write_capture(capture, exchanges)
+                index = CaptureIndex()
+                assert index.load_capture(str(capture)) == 1
+            
+            answers = index.exchanges[(0xF7, request)]
+            assert answers[0][0] == response
+            assert abs(answers[0][1] - 0.080) < 1e-3
+            assert index.banks[0xF7][8063] == values[2]
+            print(f"    {index.summary()}")
+            print("  OK - Capture indexed correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_overlapping_segments():
+        """Test that only the new bytes of a partly retransmitted segment are kept"""
+        print("\n[TEST] Capture Replay - Overlapping Segments")
+        try:
+            import tempfile
+            request = struct.pack('>BHH', 0x04, 5002, 1)
+            response = struct.pack('>BBH', 0x04, 2, 1234)
+            first = struct.pack('>HHHB', 1, 0, 6, 1) + request
+            second = struct.pack('>HHHB', 2, 0, 6, 1) + request
+            answer = struct.pack('>HHHB', 1, 0, 5, 1) + response
+            exchanges = [
+                (1.000, first[:8], True, 1000),
+                # Resends 4 bytes already seen, then carries the rest of the ADU
+                (1.010, first[4:], True, 1004),
+                (1.020, first, True, 1000),           # full retransmission
+                (1.030, second, True, 1000 + len(first)),
+                (1.050, answer, False),
+                (1.060, struct.pack('>HHHB', 2, 0, 5, 1) + response, False),
+            ]
+            with tempfile.TemporaryDirectory() as tmp:
+                capture = Path(tmp) / 'overlap.pcapng'
+                TestCaptureReplay._write_capture(capture, exchanges)
+                index = CaptureIndex()
+                assert index.load_capture(str(capture)) == 2
+            
+            assert index.stats['retransmissions'] == 2
+            assert index.stats['unpaired'] == 0
+            assert [pdu for pdu, _ in index.exchanges[(1, request)]] == [response, response]
+            print("  OK - Overlap trimmed, stream kept in step")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_replay_server():
+        """Test answering the reader from recorded responses"""
+        print("\n[TEST] Capture Replay - Server")
+        index = CaptureIndex()
+        registers = registers_from_values(SENSOR_BLOCK, DEFAULT_3S_VALUES)
+        values = [registers[a] for a in range(8061, 8086)]
+        index.add_exchange(0xF7, struct.pack('>BHH', 0x04, 8061, 25),
+                           struct.pack('>BB25H', 0x04, 50, *values), delay=0.5)
+        simulator = ReplaySimulator(index, speed=50.0, port=0)
+        try:
+            port = simulator.start()
+            station = WeatherStation3S(ip='127.0.0.1', port=port, timeout=2)
+            assert station.connect()
+            began = time.time()
+            readings = station.read_all_sensors()
+            elapsed = time.time() - began
+            partial = station.read_registers(8063, 1)
+            station.disconnect()
+            
+            assert abs(readings['temperature'].value - DEFAULT_3S_VALUES['temperature']) < 0.05
+            assert partial == [values[2]]
+            assert 0.005 <= elapsed < 0.5
+            assert simulator.stats['replayed'] == 1 and simulator.stats['synthesized'] == 1
+            print(f"    Replayed in {elapsed * 1000:.1f} ms at 50x")
+            print("  OK - Recorded responses replayed")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            simulator.stop()
+
+
+class TestPollScheduler:
+    """Test the adaptive poll scheduler"""
+    
+    @staticmethod
+    def test_adaptive_rates():
+        """Test that changing values are polled faster within the budget"""
+        print("\n[TEST] Poll Scheduler - Adaptive Rates")
+        try:
+            counter = {'value': 0.0}
+            
+            def fast_read():
+                counter['value'] += 1.0
+                return {'wind_speed': counter['value']}
+            
+            scheduler = AdaptivePollScheduler(budget=40.0)
+            scheduler.add_task('fast', fast_read, {'wind_speed': 0.2},
+                               min_interval=0.02, max_interval=1.0)
+            scheduler.add_task('slow', lambda: {'temperature': 20.0}, {'temperature': 0.1},
+                               min_interval=0.02, max_interval=1.0)
+            
+            stop = threading.Event()
+            timer = threading.Timer(1.0, stop.set)
+            timer.start()
+            scheduler.run(stop, lambda results: None)
+            
+            stats = scheduler.get_stats()
+            fast, slow = stats['tasks']['fast'], stats['tasks']['slow']
+            assert fast['polls'] > 3 * slow['polls']
+            assert fast['interval'] < slow['interval']
+            assert stats['requests_per_second'] <= 40.0 + 1e-6
+            print(f"    fast: {fast['polls']} polls, slow: {slow['polls']} polls")
+            print("  OK - Poll rates follow value dynamics")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_budget_allocation():
+        """Test splitting a short budget between tasks"""
+        print("\n[TEST] Poll Scheduler - Budget Allocation")
+        try:
+            scheduler = AdaptivePollScheduler(budget=2.0)
+            fast = scheduler.add_task('fast', lambda: {}, {}, min_interval=0.1, max_interval=10.0)
+            slow = scheduler.add_task('slow', lambda: {}, {}, min_interval=0.1, max_interval=10.0)
+            fast.change_rate = 10.0
+            
+            rates = scheduler.allocate()
+            assert abs(sum(rates.values()) - 2.0) < 1e-9
+            assert abs(rates['slow'] - 0.1) < 1e-9
+            
+            scheduler.latency = 1.0   # slow gateway: 0.5 reads/s at 50% utilization
+            rates = scheduler.allocate()
+            assert abs(sum(rates.values()) - 0.5) < 1e-9
+            print("  OK - Budget shared correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_budget_guards():
+        """Test a zero budget and a budget already used up by other tasks"""
+        print("\n[TEST] Poll Scheduler - Budget Guards")
+        try:
+            try:
+                AdaptivePollScheduler(budget=0)
+                raise AssertionError("zero budget accepted")
+            except ValueError:
+                pass
+            
+            scheduler = AdaptivePollScheduler(budget=1.0, max_backoff=100.0)
+            busy = scheduler.add_task('busy', lambda: {}, {}, min_interval=0.1, max_interval=10.0)
+            scheduler.run_pending()
+            busy.interval = 0.25   # 4 reads/s, well over the budget
+            late = scheduler.add_task('late', lambda: {}, {}, min_interval=0.1, max_interval=10.0)
+            late.change_rate = 10.0
+            scheduler.run_pending()
+            assert abs(late.interval - 10.0) < 1e-9
+            
+            # Default budget covers every group at its fastest rate
+            monitor = WeatherStationWebMonitor(update_interval=2)
+            assert monitor.request_budget == 2.5
+            tasks = monitor.build_scheduler().tasks
+            assert tasks['fast'].min_interval == 0.5 and tasks['slow'].min_interval == 2
+            assert sum(1 / task.min_interval for task in tasks.values()) <= monitor.request_budget
+            print("  OK - Budget guarded")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+
+
+class TestChangeFilter:
+    """Test report-by-exception filtering"""
+    
+    @staticmethod
+    def test_deadband_reporting():
+        """Test absolute/percent deadbands, heartbeat and last-value cache"""
+        print("\n[TEST] Change Filter - Deadband Reporting")
+        try:
+            change_filter = ChangeFilter({
+                'temperature': Deadband(absolute=0.1, max_interval=60),
+                'solar_radiation': Deadband(percent=5.0),
+            })
+            first = change_filter.update({'temperature': 21.50, 'solar_radiation': 600.0}, timestamp=0)
+            assert first.changed == {'temperature': 21.50, 'solar_radiation': 600.0}
+            
+            small = change_filter.update({'temperature': 21.55, 'solar_radiation': 620.0}, timestamp=1)
+            assert not small.changed and not small.archived
+            assert change_filter.snapshot() == {'temperature': 21.55, 'solar_radiation': 620.0}
+            
+            large = change_filter.update({'temperature': 21.65, 'solar_radiation': 640.0}, timestamp=2)
+            assert large.changed == {'temperature': 21.65, 'solar_radiation': 640.0}
+            
+            heartbeat = change_filter.update({'temperature': 21.65}, timestamp=62)
+            assert heartbeat.changed == {'temperature': 21.65}
+            assert change_filter.stats['suppressed'] == 2
+            print(f"    Stats: {change_filter.stats}")
+            print("  OK - Deadbands applied correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_swinging_door_logging():
+        """Test compressed logging of a monitor series"""
+        print("\n[TEST] Change Filter - Swinging Door Logging")
+        try:
+            import tempfile
+            with tempfile.TemporaryDirectory() as tmp:
+                monitor = WeatherStationMonitor(
+                    log_file=str(Path(tmp) / 'log.ndjson'),
+                    deadbands={'wind_speed': Deadband(compression=0.05)}
+                )
+                # Linear ramp up then down: only the corners need storing
+                for i in range(40):
+                    value = 0.1 * i if i <= 20 else 0.1 * (40 - i)
+                    reading = SensorReading('Wind Speed', value, 'm/s', int(value * 1000), i)
+                    result = monitor.change_filter.update({'wind_speed': value}, timestamp=1000.0 + i,
+                                                          payloads={'wind_speed': reading})
+                    monitor._write_points(result.archived)
+                monitor.close_log()
+                
+                logged = list(read_records(monitor.log_file))
+            values = [round(e['readings']['wind_speed']['value'], 2) for e in logged]
+            assert values == [0.0, 2.0, 0.1], values
+            print(f"    Logged {len(logged)} of 40 readings")
+            print("  OK - Series compressed correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_repeated_timestamps():
+        """Test a corridor broken by a point with the previous point's timestamp"""
+        print("\n[TEST] Change Filter - Repeated Timestamps")
+        try:
+            change_filter = ChangeFilter({'x': Deadband(compression=0.5)})
+            archived = []
+            for timestamp, value in ((0, 0.0), (1, 0.0), (1, 5.0), (2, 5.0)):
+                archived += change_filter.update({'x': value}, timestamp=timestamp).archived
+            archived += change_filter.flush()
+            points = [(p.timestamp, p.value) for p in archived]
+            assert points == [(0, 0.0), (1, 0.0), (2, 5.0)], points
+            print("  OK - Repeated timestamp compressed")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+
+
+class TestNDJSONLog:
+    """Test the append-only reading log"""
+    
+    @staticmethod
+    def test_rotation():
+        """Test size-based rotation and backup pruning"""
+        print("\n[TEST] NDJSON Log - Rotation")
+        try:
+            import tempfile
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / 'log.ndjson'
+                with NDJSONLog(path, max_bytes=200, backups=2, fsync_interval=60) as log:
+                    for i in range(30):
+                        log.write({'n': i, 'value': 21.5})
+                    rotations = log.stats['rotations']
+                
+                records = [r['n'] for r in read_records(path)]
+                assert rotations >= 3
+                assert len(rotated_files(path)) == 2
+                assert records == list(range(records[0], 30))
+            print(f"    {rotations} rotations, {len(records)} records kept")
+            print("  OK - Log rotated correctly")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+    
+    @staticmethod
+    def test_crash_recovery():
+        """Test trimming a record torn by a crash"""
+        print("\n[TEST] NDJSON Log - Crash Recovery")
+        try:
+            import tempfile
+            with tempfile.TemporaryDirectory() as tmp:
+                path = Path(tmp) / 'log.ndjson'
+                with NDJSONLog(path) as log:
+                    log.write({'n': 1})
+                    log.write({'n': 2})
+                with open(path, 'ab') as f:
+                    f.write(b'{"n": 3, "val')
+                
+                with NDJSONLog(path) as log:
+                    assert log.stats['recovered_bytes'] == 13
+                    log.write({'n': 4})
+                records = [r['n'] for r in read_records(path)]
+            assert records == [1, 2, 4], records
+            print("  OK - Partial record trimmed")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+
+
 class TestWeatherStationMonitor:
     """Test the monitoring utility"""
     
@@ -145,6 +666,42 @@ class TestWeatherStationMonitor:
             print(f"  FAIL - {e}")
             return False
 
+    
+    @staticmethod
+    def test_bus_readings():
+        """Test logging samples of the acquisition data bus without a gateway connection"""
+        print("\n[TEST] Weather Station Monitor - Data Bus")
+        try:
+            import tempfile
+            bus = DataBus()
+            with tempfile.TemporaryDirectory() as tmp:
+                monitor = WeatherStationMonitor(log_file=str(Path(tmp) / 'log.ndjson'),
+                                                deadbands={}, bus=bus)
+                now = time.time()
+                def publish():
+                    time.sleep(0.1)
+                    for i in range(5):
+                        values = dict(DEFAULT_3S_VALUES, temperature=20.0 + i)
+                        bus.publish(Sample('weather/247', 'weather_3s', values, now + i * 0.5))
+                publisher = threading.Thread(target=publish)
+                publisher.start()
+                monitor.run(num_readings=3, interval=1.0)
+                publisher.join()
+                
+                entries = list(read_records(Path(tmp) / 'log.ndjson'))
+            # Samples closer than the interval to the last one taken are skipped
+            temperatures = [entry['readings']['temperature']['value'] for entry in entries]
+            assert temperatures == [20.0, 22.0, 24.0], temperatures
+            reading = entries[0]['readings']['humidity']
+            assert reading['raw'] == round(DEFAULT_3S_VALUES['humidity'] * 655.35)
+            assert monitor.client.socket is None
+            assert bus.subscriptions == []
+            print("  OK - Bus samples logged, gateway left alone")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+
 
 class TestWeatherStationWeb:
     """Test the web server"""
@@ -175,8 +732,8 @@ class TestWeatherStationWeb:
         """Test API data structure"""
         print("\n[TEST] Weather Station Web - API Data Structure")
         try:
-            # Check current_data structure
-            data = WeatherStationWebServer.current_data
+            # Check shared state structure
+            data = WeatherStationWebServer.state.data
             required_keys = ['humidity', 'temperature', 'pressure', 'wind_speed', 
                            'solar_radiation', 'timestamp', 'status']
             
@@ -196,6 +753,290 @@ class TestWeatherStationWeb:
         except Exception as e:
             print(f"  FAIL - {e}")
             return False
+    
+    @staticmethod
+    def test_shared_state():
+        """Test that readers only see complete, read-only snapshots"""
+        print("\n[TEST] Weather Station Web - Shared State")
+        server = None
+        saved = WeatherStationWebServer.state.data
+        try:
+            import http.client
+            state = SharedState({'temperature': {'value': 0, 'unit': '°C'}, 'status': 'OK'})
+            assert state.update({'status': 'OK'}) is None
+            
+            # The writer alternates errors and values; each snapshot must be one or the other
+            stop = threading.Event()
+            def writer():
+                i = 0
+                while not stop.is_set():
+                    i += 1
+                    state.update({'status': 'Read Error'})
+                    state.update({'temperature': {'value': i, 'unit': '°C'}, 'status': 'OK'})
+            thread = threading.Thread(target=writer, daemon=True)
+            thread.start()
+            last_version = 0
+            for _ in range(20000):
+                snapshot = state.current
+                assert snapshot.version >= last_version
+                last_version = snapshot.version
+                assert json.loads(snapshot.body) == snapshot.data
+            stop.set()
+            thread.join(timeout=2)
+            try:
+                state.data['status'] = 'Error'
+                assert False, 'snapshot data is writable'
+            except TypeError:
+                pass
+            
+            # Served body is the pre-encoded snapshot; unchanged data answers 304
+            WeatherStationWebServer.state.update({'status': 'Test'})
+            server = PooledHTTPServer(('127.0.0.1', 0), WeatherStationWebServer, workers=1)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+            conn.request('GET', '/api/data')
+            response = conn.getresponse()
+            assert response.read() == WeatherStationWebServer.state.current.body
+            etag = response.getheader('ETag')
+            conn.request('GET', '/api/data', headers={'If-None-Match': etag})
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 304
+            conn.request('GET', '/api/data', headers={'If-None-Match': f'"stale", W/{etag}'})
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 304
+            conn.close()
+            print(f"    {last_version} versions published while reading 20000 snapshots")
+            print("  OK - Snapshots consistent and served pre-encoded")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+            WeatherStationWebServer.state.replace(saved)
+    
+    @staticmethod
+    def test_concurrent_serving():
+        """Test keep-alive clients, stalled clients and the connection limit"""
+        print("\n[TEST] Weather Station Web - Concurrent Serving")
+        server = None
+        stalled = []
+        try:
+            import http.client
+            import socket
+            server = PooledHTTPServer(('127.0.0.1', 0), WeatherStationWebServer, workers=2,
+                                      max_connections=12, request_timeout=1.0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            port = server.server_address[1]
+            
+            # Stalled requests wait in the selector instead of blocking workers
+            for _ in range(4):
+                sock = socket.create_connection(('127.0.0.1', port))
+                sock.sendall(b'GET /api/da')
+                stalled.append(sock)
+            
+            def client(results):
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                for _ in range(20):
+                    conn.request('GET', '/api/data')
+                    response = conn.getresponse()
+                    results.append((response.status, 'status' in json.loads(response.read())))
+                conn.close()
+            
+            results = []
+            began = time.time()
+            clients = [threading.Thread(target=client, args=(results,)) for _ in range(6)]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join(timeout=10)
+            elapsed = time.time() - began
+            assert results.count((200, True)) == 120, results[:5]
+            assert elapsed < 1.0, f"{elapsed:.2f} s"
+            assert server.get_stats()['connections'] == 10
+            
+            # Connections beyond the limit are refused with 503 (once the
+            # server has seen the finished clients close)
+            deadline = time.time() + 2
+            while server.get_stats()['open'] > len(stalled) and time.time() < deadline:
+                time.sleep(0.01)
+            held = [socket.create_connection(('127.0.0.1', port)) for _ in range(8)]
+            time.sleep(0.2)
+            extra = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            extra.request('GET', '/api/data')
+            assert extra.getresponse().status == 503
+            stalled.extend(held)
+            
+            time.sleep(1.2)
+            stats = server.get_stats()
+            assert stats['timeouts'] == 4, stats
+            print(f"    120 keep-alive requests in {elapsed:.2f} s on 2 workers, "
+                  f"{stats['rejected']} rejected")
+            print("  OK - Concurrent requests served")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            for sock in stalled:
+                sock.close()
+            if server:
+                server.shutdown()
+                server.server_close()
+    
+    @staticmethod
+    def test_event_stream():
+        """Test pushing deltas to subscribers and dropping slow consumers"""
+        print("\n[TEST] Weather Station Web - Event Stream")
+        server = None
+        events = None
+        sockets = []
+        saved = WeatherStationWebServer.state.data
+        try:
+            import socket
+            events = EventBroadcaster()
+            WeatherStationWebServer.events = events
+            server = PooledHTTPServer(('127.0.0.1', 0), WeatherStationWebServer, workers=2)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            port = server.server_address[1]
+            
+            def subscribe(receive_buffer=None):
+                sock = socket.socket()
+                if receive_buffer:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+                sock.connect(('127.0.0.1', port))
+                sock.sendall(b'GET /api/events HTTP/1.1\r\nHost: test\r\n\r\n')
+                sockets.append(sock)
+                return sock
+            
+            def read_events(sock, count):
+                sock.settimeout(2.0)
+                data = b''
+                while data.count(b'\n\n') < count:
+                    chunk = sock.recv(65536)
+                    assert chunk, 'stream closed'
+                    data += chunk
+                return [json.loads(line[6:]) for line in data.split(b'\n') if line.startswith(b'data: ')]
+            
+            readers = [subscribe() for _ in range(3)]
+            slow = subscribe(receive_buffer=4096)
+            for sock in readers:
+                assert read_events(sock, 1)[0]['status'] == WeatherStationWebServer.state.data['status']
+            deadline = time.time() + 2
+            while events.subscribers < 4 and time.time() < deadline:
+                time.sleep(0.01)
+            assert server.get_stats()['detached'] == 4
+            
+            monitor = WeatherStationWebMonitor(gateway_ip='127.0.0.1', web_port=0)
+            monitor.events = events
+            monitor.apply_values({'slow': {'temperature': 21.37, 'humidity': 40.0}})
+            for sock in readers:
+                delta = read_events(sock, 1)[0]
+                assert delta['temperature']['value'] == 21.4 and delta['status'] == 'OK', delta
+            
+            # Readers keep draining; the slow subscriber never reads and is dropped
+            # once the kernel buffers are full and its backlog overflows
+            def drain(sock):
+                try:
+                    while sock.recv(1 << 16):
+                        pass
+                except OSError:
+                    pass
+            for sock in readers:
+                threading.Thread(target=drain, args=(sock,), daemon=True).start()
+            for i in range(3000):
+                events.publish({'padding': 'x' * 2000, 'n': i})
+                if i % 100 == 99:
+                    time.sleep(0.005)
+            deadline = time.time() + 3
+            while events.get_stats()['dropped'] < 1 and time.time() < deadline:
+                time.sleep(0.05)
+            stats = events.get_stats()
+            assert stats['dropped'] == 1 and stats['subscribers'] == 3, stats
+            assert diff({'a': {'b': 1, 'c': 2}, 'd': 1}, {'a': {'b': 1, 'c': 3}}) == {'a': {'c': 3}, 'd': None}
+            print(f"    3 subscribers received deltas, slow consumer dropped "
+                  f"after {stats['published']} messages")
+            print("  OK - Updates pushed to subscribers")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            for sock in sockets:
+                sock.close()
+            if server:
+                server.shutdown()
+                server.server_close()
+            if events:
+                events.close()
+            WeatherStationWebServer.events = None
+            WeatherStationWebServer.state.replace(saved)
+
+    
+    @staticmethod
+    def test_follow_bus():
+        """Test that a web monitor given a data bus shows its samples instead of polling"""
+        print("\n[TEST] Weather Station Web - Data Bus")
+        saved = WeatherStationWebServer.state.data
+        try:
+            bus = DataBus()
+            bus.publish(Sample('weather/247', 'weather_3s', DEFAULT_3S_VALUES))
+            monitor = WeatherStationWebMonitor(bus=bus, push=False)
+            monitor.subscription = monitor.follow_bus(bus)
+            data = WeatherStationWebServer.state.data
+            assert data['temperature']['value'] == round(DEFAULT_3S_VALUES['temperature'], 1)
+            assert data['status'] == 'OK'
+            
+            bus.publish(Sample('weather/247', 'weather_3s', dict(DEFAULT_3S_VALUES, wind_speed=9.5)))
+            assert WeatherStationWebServer.state.data['wind_speed']['value'] == 9.5
+            bus.publish(Sample('weather/247', 'weather_3s', {'wind_speed': 9.5}, complete=False))
+            assert WeatherStationWebServer.state.data['status'] == 'Read Error'
+            
+            monitor.stop()
+            assert bus.subscriptions == [] and monitor.update_thread is None
+            assert monitor.client.socket is None
+            print("  OK - Dashboard state follows the bus")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
+        finally:
+            WeatherStationWebServer.state.replace(saved)
+
+
+class TestSharedModules:
+    """Test that shared modules come from the single copy in src"""
+    
+    @staticmethod
+    def test_single_source():
+        """Test that the station modules re-export the src implementations"""
+        print("\n[TEST] Shared Modules - Single Source")
+        try:
+            import importlib
+            shared = {
+                'http_server': 'src.weather.http_server',
+                'event_stream': 'src.weather.event_stream',
+                'register_decoder': 'src.modbus.register_decoder',
+                'poll_scheduler': 'src.utils.poll_scheduler',
+                'bus': 'src.acquisition.bus',
+            }
+            for local_name, source_name in shared.items():
+                local = importlib.import_module(local_name)
+                source = importlib.import_module(source_name)
+                exported = [name for name in vars(local) if not name.startswith('_')
+                            and name not in ('sys', 'Path')]
+                assert exported, local_name
+                for name in exported:
+                    assert getattr(local, name) is getattr(source, name), f"{local_name}.{name}"
+            print("  OK - No local copies of shared modules")
+            return True
+        except Exception as e:
+            print(f"  FAIL - {e}")
+            return False
 
 
 class TestIntegration:
@@ -253,12 +1094,54 @@ def run_all_tests():
     results.append(("Reader Connection", TestWeatherStationReader.test_connection()))
     results.append(("Sensor Reading", TestWeatherStationReader.test_sensor_reading()))
     
+    # Decoder Tests
+    print("\n" + "="*75)
+    print("REGISTER DECODER TESTS")
+    print("="*75)
+    results.append(("Sensor Block Decoding", TestRegisterDecoder.test_sensor_block_decoding()))
+    results.append(("Block Compilation", TestRegisterDecoder.test_block_compilation()))
+    
+    # Simulator Tests
+    print("\n" + "="*75)
+    print("MODBUS SIMULATOR TESTS")
+    print("="*75)
+    results.append(("Simulated Sensor Read", TestModbusSimulator.test_simulated_sensor_read()))
+    results.append(("Fragmented Response", TestModbusSimulator.test_fragmented_response()))
+    results.append(("Malformed Header", TestModbusSimulator.test_malformed_header()))
+    results.append(("Capture Index", TestCaptureReplay.test_capture_index()))
+    results.append(("Overlapping Segments", TestCaptureReplay.test_overlapping_segments()))
+    results.append(("Replay Server", TestCaptureReplay.test_replay_server()))
+    
+    # Scheduler Tests
+    print("\n" + "="*75)
+    print("POLL SCHEDULER TESTS")
+    print("="*75)
+    results.append(("Adaptive Rates", TestPollScheduler.test_adaptive_rates()))
+    results.append(("Budget Allocation", TestPollScheduler.test_budget_allocation()))
+    results.append(("Budget Guards", TestPollScheduler.test_budget_guards()))
+    
+    # Change Filter Tests
+    print("\n" + "="*75)
+    print("CHANGE FILTER TESTS")
+    print("="*75)
+    results.append(("Deadband Reporting", TestChangeFilter.test_deadband_reporting()))
+    results.append(("Swinging Door Logging", TestChangeFilter.test_swinging_door_logging()))
+    results.append(("Repeated Timestamps", TestChangeFilter.test_repeated_timestamps()))
+    
+    # Log Tests
+    print("\n" + "="*75)
+    print("NDJSON LOG TESTS")
+    print("="*75)
+    results.append(("Log Rotation", TestNDJSONLog.test_rotation()))
+    results.append(("Crash Recovery", TestNDJSONLog.test_crash_recovery()))
+    
     # Monitor Tests
     print("\n" + "="*75)
     print("WEATHER STATION MONITOR TESTS")
     print("="*75)
     results.append(("Monitor Initialization", TestWeatherStationMonitor.test_initialization()))
     results.append(("Monitor Single Reading", TestWeatherStationMonitor.test_single_reading()))
+    results.append(("Monitor Data Bus", TestWeatherStationMonitor.test_bus_readings()))
     
     # Web Server Tests
     print("\n" + "="*75)
@@ -266,6 +1149,16 @@ def run_all_tests():
     print("="*75)
     results.append(("Web Server Init", TestWeatherStationWeb.test_web_server_initialization()))
     results.append(("API Data Structure", TestWeatherStationWeb.test_api_data_structure()))
+    results.append(("Shared State", TestWeatherStationWeb.test_shared_state()))
+    results.append(("Concurrent Serving", TestWeatherStationWeb.test_concurrent_serving()))
+    results.append(("Event Stream", TestWeatherStationWeb.test_event_stream()))
+    results.append(("Web Data Bus", TestWeatherStationWeb.test_follow_bus()))
+    
+    # Shared Module Tests
+    print("\n" + "="*75)
+    print("SHARED MODULE TESTS")
+    print("="*75)
+    results.append(("Single Source", TestSharedModules.test_single_source()))
     
     # Integration Tests
     print("\n" + "="*75)
@@ -4,29 +4,53 @@ Weather Station Data Display Utility
 Real-time monitoring and logging of 3S-RH&AT&PS sensor data
 """
 
+import queue
 import time
-import json
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from weather_station_reader import WeatherStation3S
+from typing import Dict, Optional
+from weather_station_reader import WeatherStation3S, SENSOR_DEADBANDS, readings_from_values
+from change_filter import ChangeFilter, Deadband
+from ndjson_log import NDJSONLog
 
 
 class WeatherStationMonitor:
     """Monitor and display weather station data"""
     
     def __init__(self, ip: str = "192.168.1.5", port: int = 505,
-                 log_file: str = "weather_station_log.json"):
+                 log_file: str = "weather_station_log.ndjson",
+                 deadbands: Optional[Dict[str, Deadband]] = None,
+                 history_size: int = 1000, fsync_interval: float = 5.0,
+                 max_log_bytes: int = 10 * 1024 * 1024, bus=None):
         """
         Initialize monitor
         
+        Without a bus the monitor reads the gateway itself, so it also works
+        where no acquisition daemon runs. With the data bus of a running
+        daemon it only consumes the daemon's weather samples
+        
         Args:
             ip: Gateway IP
             port: Modbus port
-            log_file: File to log readings
+            log_file: NDJSON file to append readings to (rotated files
+                are kept next to it)
+            deadbands: Per-sensor change thresholds for logging
+                (default: SENSOR_DEADBANDS, empty dict logs every change)
+            history_size: Log entries kept in memory
+            fsync_interval: Seconds between log flushes to disk
+            max_log_bytes: Rotate the log file at this size
+            bus: DataBus of an acquisition daemon to take samples from instead
+                of reading the gateway (ip and port are then unused)
         """
         self.client = WeatherStation3S(ip=ip, port=port)
+        self.bus = bus
         self.log_file = Path(log_file)
-        self.readings_history = []
+        self.readings_history = deque(maxlen=history_size)
+        self.fsync_interval = fsync_interval
+        self.max_log_bytes = max_log_bytes
+        self.log = None
+        self.change_filter = ChangeFilter(SENSOR_DEADBANDS if deadbands is None else deadbands)
     
     def display_header(self):
         """Display header"""
@@ -55,43 +79,73 @@ class WeatherStationMonitor:
                   f"(raw: {reading.raw_value})")
     
     def log_readings(self, readings: dict):
-        """Log readings to JSON file"""
+        """Append readings that changed beyond their deadband to the log"""
         try:
-            timestamp = datetime.now().isoformat()
-            
-            log_entry = {
-                'timestamp': timestamp,
-                'readings': {
-                    name: {
-                        'value': reading.value,
-                        'unit': reading.unit,
-                        'raw': reading.raw_value,
-                        'type': reading.sensor_type,
-                        'status': reading.status
-                    }
-                    for name, reading in readings.items()
-                }
-            }
-            
-            self.readings_history.append(log_entry)
-            
-            # Write to file
-            with open(self.log_file, 'w') as f:
-                json.dump(self.readings_history, f, indent=2)
+            result = self.change_filter.update(
+                {name: reading.value for name, reading in readings.items()},
+                payloads=readings
+            )
+            self._write_points(result.archived)
         
         except Exception as e:
             print(f"✗ Logging error: {e}")
     
+    def flush_log(self):
+        """Log pending end points of compressed sensors"""
+        try:
+            self._write_points(self.change_filter.flush())
+        except Exception as e:
+            print(f"✗ Logging error: {e}")
+    
+    def _write_points(self, points):
+        """Append archived points, one entry per timestamp"""
+        if not points:
+            return
+        
+        entries = {}
+        for point in points:
+            reading = point.payload
+            entry = entries.setdefault(point.timestamp, {
+                'timestamp': datetime.fromtimestamp(point.timestamp).isoformat(),
+                'readings': {}
+            })
+            entry['readings'][point.signal] = {
+                'value': reading.value,
+                'unit': reading.unit,
+                'raw': reading.raw_value,
+                'type': reading.sensor_type,
+                'status': reading.status
+            }
+        
+        if self.log is None:
+            self.log = NDJSONLog(self.log_file, max_bytes=self.max_log_bytes,
+                                 fsync_interval=self.fsync_interval)
+        for ts in sorted(entries):
+            self.readings_history.append(entries[ts])
+            self.log.write(entries[ts])
+    
+    def close_log(self):
+        """Flush pending points and close the log file"""
+        self.flush_log()
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+    
     def run(self, num_readings: int = 5, interval: int = 2):
         """
         Run monitor
         
         Args:
             num_readings: Number of readings to take
-            interval: Seconds between readings
+            interval: Seconds between readings (with a bus, the minimum
+                spacing of the samples taken)
         """
         self.display_header()
         
+        if self.bus is not None:
+            self.run_from_bus(num_readings, interval)
+            return
+        
         if not self.client.connect():
             print("✗ Failed to connect to weather station")
             return
@@ -113,8 +167,52 @@ class WeatherStationMonitor:
         
         finally:
             self.client.disconnect()
-            print("\n✓ Monitor stopped")
-
+            self._finish()
+    
+    def run_from_bus(self, num_readings: int, interval: float, pattern: str = 'weather/*',
+                     timeout: Optional[float] = None):
+        """
+        Take readings from weather samples published by the acquisition daemon
+        
+        Args:
+            num_readings: Number of readings to take
+            interval: Minimum seconds between samples taken
+            pattern: Topic pattern of the weather samples
+            timeout: Seconds to wait for a sample (default: 3 intervals, at least 10)
+        """
+        samples = queue.Queue()
+        subscription = self.bus.subscribe(pattern, samples.put, replay=True)
+        timeout = max(3 * interval, 10.0) if timeout is None else timeout
+        last = None
+        try:
+            i = 0
+            while i < num_readings:
+                try:
+                    sample = samples.get(timeout=timeout)
+                except queue.Empty:
+                    print(f"✗ No weather sample on the data bus for {timeout:g} seconds")
+                    break
+                if last is not None and sample.timestamp - last < interval:
+                    continue
+                last = sample.timestamp
+                i += 1
+                readings = readings_from_values(sample.values, sample.timestamp)
+                self.display_reading(i, readings)
+                if readings:
+                    self.log_readings(readings)
+        
+        except KeyboardInterrupt:
+            print("\n\n✗ Interrupted by user")
+        
+        finally:
+            self.bus.unsubscribe(subscription)
+            self._finish()
+    
+    def _finish(self):
+        """Close the log and print how many values were logged"""
+        self.close_log()
+        stats = self.change_filter.stats
+        print(f"\n✓ Monitor stopped ({stats['archived']} of {stats['received']} values logged)")
 
 def main():
     """Main execution"""
@@ -123,7 +221,7 @@ def main():
     monitor = WeatherStationMonitor(
         ip="192.168.1.5",
         port=505,
-        log_file="weather_station_log.json"
+        log_file="weather_station_log.ndjson"
     )
     
     # Run for 5 readings, 2 seconds apart
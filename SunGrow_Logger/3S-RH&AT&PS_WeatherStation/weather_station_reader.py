@@ -12,6 +12,8 @@ import time
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
+from register_decoder import WEATHER_3S_BLOCK, RegisterBlock
+from change_filter import Deadband
 
 
 class SensorType(Enum):
@@ -23,6 +25,21 @@ class SensorType(Enum):
     WIND_SPEED = "Wind_Speed"
 
 
+# 3S sensor table: one 25-register FC4 read (8061-8085), shared with the
+# acquisition daemon
+SENSOR_BLOCK = WEATHER_3S_BLOCK
+
+# Report-by-exception thresholds, about one display step per sensor;
+# unchanged sensors are still reported every 5 minutes
+SENSOR_DEADBANDS = {
+    'humidity': Deadband(absolute=0.5, max_interval=300),
+    'temperature': Deadband(absolute=0.1, max_interval=300),
+    'pressure': Deadband(absolute=0.2, max_interval=300),
+    'wind_speed': Deadband(absolute=0.1, max_interval=300),
+    'solar_radiation': Deadband(absolute=2.0, percent=1.0, max_interval=300),
+}
+
+
 @dataclass
 class SensorReading:
     """Single sensor reading"""
@@ -34,6 +51,35 @@ class SensorReading:
     status: str = "OK"
 
 
+def readings_from_values(values: Dict[str, float], timestamp: float,
+                         block: RegisterBlock = SENSOR_BLOCK) -> Dict[str, SensorReading]:
+    """
+    Build sensor readings from decoded values, e.g. a data bus sample
+    
+    Args:
+        values: Engineering values keyed by field name
+        timestamp: Time of the read
+        block: Register block the values were decoded with
+        
+    Returns:
+        Dictionary of sensor readings; raw values are recomputed from the
+        engineering values
+    """
+    readings = {}
+    for field in block.fields:
+        if field.name not in values:
+            continue
+        value = values[field.name]
+        readings[field.name] = SensorReading(
+            sensor_type=field.label,
+            value=round(value, field.decimals),
+            unit=field.unit,
+            raw_value=round((value - field.offset) / field.scale),
+            timestamp=timestamp
+        )
+    return readings
+
+
 class WeatherStation3S:
     """Modbus TCP client for 3S-RH&AT&PS weather station"""
     
@@ -64,14 +110,8 @@ class WeatherStation3S:
             'solar_radiation': (8085, 1),
         }
         
-        # Scaling factors
-        self.scaling = {
-            'humidity': 1.0,  # Raw value interpretation
-            'temperature': 1.0,
-            'pressure': 0.225,  # ~1013 hPa from raw 4490
-            'wind_speed': 0.001,  # raw × 0.001 = m/s
-            'solar_radiation': 0.1,  # raw × 0.1 = W/m²
-        }
+        # Compiled decode table (layout, scaling and offsets)
+        self.sensor_block = SENSOR_BLOCK
     
     def connect(self) -> bool:
         """
@@ -136,6 +176,32 @@ class WeatherStation3S:
         
         return request
     
+    def _parse_payload(self, response: bytes) -> Optional[bytes]:
+        """
+        Extract register data from a Modbus TCP response
+        
+        Args:
+            response: Raw response bytes
+            
+        Returns:
+            Register data bytes or None if error
+        """
+        if len(response) < 9:
+            return None
+        
+        # Check header
+        function_code = response[7]
+        if function_code & 0x80:  # Error flag
+            error_code = response[8]
+            print(f"✗ Modbus error: {error_code}")
+            return None
+        
+        byte_count = response[8]
+        if len(response) < 9 + byte_count:
+            return None
+        
+        return response[9:9 + byte_count]
+    
     def _parse_response(self, response: bytes) -> Optional[List[int]]:
         """
         Parse Modbus TCP response
@@ -147,41 +213,47 @@ class WeatherStation3S:
             List of register values or None if error
         """
         try:
-            if len(response) < 9:
-                return None
-            
-            # Check header
-            function_code = response[7]
-            if function_code & 0x80:  # Error flag
-                error_code = response[8]
-                print(f"✗ Modbus error: {error_code}")
-                return None
-            
-            byte_count = response[8]
-            if len(response) < 9 + byte_count:
+            payload = self._parse_payload(response)
+            if payload is None:
                 return None
             
             # Extract register values (big-endian UINT16)
-            values = []
-            for i in range(0, byte_count, 2):
-                value = struct.unpack('>H', response[9 + i:9 + i + 2])[0]
-                values.append(value)
-            
-            return values
+            return list(struct.unpack_from(f'>{len(payload) // 2}H', payload))
         except Exception as e:
             print(f"✗ Parse error: {e}")
             return None
     
-    def read_registers(self, start_addr: int, quantity: int) -> Optional[List[int]]:
+    def _recv_response(self) -> bytes:
         """
-        Read registers from device
+        Receive exactly one Modbus TCP response
+        
+        Reads the MBAP header first and then the announced length, so
+        responses split across TCP segments are reassembled.
+        
+        Returns:
+            Complete response bytes (empty if the connection closed)
+        """
+        response = b''
+        expected = 7
+        while len(response) < expected:
+            chunk = self.socket.recv(expected - len(response))
+            if not chunk:
+                return b''
+            response += chunk
+            if expected == 7 and len(response) >= 6:
+                expected = 6 + struct.unpack_from('>H', response, 4)[0]
+        return response
+    
+    def read_raw(self, start_addr: int, quantity: int) -> Optional[bytes]:
+        """
+        Read registers from device without unpacking them
         
         Args:
             start_addr: Starting register address
             quantity: Number of registers
             
         Returns:
-            List of register values or None if error
+            Register data bytes or None if error
         """
         if not self.socket:
             print("✗ Not connected")
@@ -191,12 +263,12 @@ class WeatherStation3S:
             request = self._build_request(start_addr, quantity)
             self.socket.sendall(request)
             
-            response = self.socket.recv(1024)
+            response = self._recv_response()
             if not response:
                 print("✗ No response from server")
                 return None
             
-            return self._parse_response(response)
+            return self._parse_payload(response)
         except socket.timeout:
             print("✗ Read timeout")
             return None
@@ -204,6 +276,48 @@ class WeatherStation3S:
             print(f"✗ Read error: {e}")
             return None
     
+    def read_registers(self, start_addr: int, quantity: int) -> Optional[List[int]]:
+        """
+        Read registers from device
+        
+        Args:
+            start_addr: Starting register address
+            quantity: Number of registers
+            
+        Returns:
+            List of register values or None if error
+        """
+        payload = self.read_raw(start_addr, quantity)
+        if payload is None:
+            return None
+        
+        # Extract register values (big-endian UINT16)
+        return list(struct.unpack_from(f'>{len(payload) // 2}H', payload))
+    
+    def read_sensor_values(self) -> Optional[Dict[str, float]]:
+        """
+        Read all sensors as plain engineering values
+        
+        Returns:
+            Dictionary of unrounded values keyed by sensor, or None if error
+        """
+        return self.read_block(self.sensor_block)
+    
+    def read_block(self, block: RegisterBlock) -> Optional[Dict[str, float]]:
+        """
+        Read and decode one register block
+        
+        Args:
+            block: Register block describing the read
+            
+        Returns:
+            Dictionary of unrounded values keyed by field, or None if error
+        """
+        payload = self.read_raw(block.start, block.count)
+        if not payload or len(payload) < block.byte_count:
+            return None
+        return block.decode(payload)
+    
     def read_all_sensors(self) -> Dict[str, SensorReading]:
         """
         Read all sensor values from weather station
@@ -213,70 +327,27 @@ class WeatherStation3S:
         """
         readings = {}
         timestamp = time.time()
+        block = self.sensor_block
         
         try:
             # Read all registers in one operation (8061-8085 = 25 registers)
-            values = self.read_registers(8061, 25)
+            payload = self.read_raw(block.start, block.count)
             
-            if not values or len(values) < 25:
+            if not payload or len(payload) < block.byte_count:
                 print("✗ Failed to read all registers")
                 return readings
             
-            # Parse individual sensors
-            # Register 8061: Humidity (UINT16, 0-65535 = 0-100%)
-            humidity_raw = values[0]
-            humidity = (humidity_raw / 655.35)  # Scale to 0-100%
-            readings['humidity'] = SensorReading(
-                sensor_type='Relative Humidity',
-                value=round(humidity, 1),
-                unit='%',
-                raw_value=humidity_raw,
-                timestamp=timestamp
-            )
-            
-            # Register 8063: Temperature (UINT16, formula: value/100 - 40)
-            temp_raw = values[2]
-            temp = (temp_raw / 100.0) - 40  # Convert to °C
-            readings['temperature'] = SensorReading(
-                sensor_type='Air Temperature',
-                value=round(temp, 1),
-                unit='°C',
-                raw_value=temp_raw,
-                timestamp=timestamp
-            )
-            
-            # Register 8073: Pressure (UINT16, formula: 850 + (value * 0.1))
-            pressure_raw = values[12]
-            pressure = 850 + (pressure_raw * 0.1)  # Scale to hPa
-            readings['pressure'] = SensorReading(
-                sensor_type='Atmospheric Pressure',
-                value=round(pressure, 1),
-                unit='hPa',
-                raw_value=pressure_raw,
-                timestamp=timestamp
-            )
-            
-            # Register 8082: Wind Speed (UINT16, formula: value / 1000)
-            wind_speed_raw = values[21]
-            wind_speed = wind_speed_raw / 1000.0  # Convert to m/s
-            readings['wind_speed'] = SensorReading(
-                sensor_type='Wind Speed',
-                value=round(wind_speed, 2),
-                unit='m/s',
-                raw_value=wind_speed_raw,
-                timestamp=timestamp
-            )
+            # Decode every sensor in one unpack + scale pass
+            values, raw_values = block.decode_with_raw(payload)
             
-            # Register 8085: Solar Radiation/Irradiance (UINT16, formula: value / 10)
-            irradiance_raw = values[24]
-            irradiance = irradiance_raw / 10.0  # Convert to W/m²
-            readings['solar_radiation'] = SensorReading(
-                sensor_type='Solar Irradiance',
-                value=round(irradiance, 1),
-                unit='W/m²',
-                raw_value=irradiance_raw,
-                timestamp=timestamp
-            )
+            for field, value, raw in zip(block.fields, values, raw_values):
+                readings[field.name] = SensorReading(
+                    sensor_type=field.label,
+                    value=round(value, field.decimals),
+                    unit=field.unit,
+                    raw_value=raw,
+                    timestamp=timestamp
+                )
             
             return readings
         
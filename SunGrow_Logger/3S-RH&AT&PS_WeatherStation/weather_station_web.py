@@ -4,20 +4,47 @@
 Real-time monitoring with web dashboard
 """
 
-import json
 import time
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 from datetime import datetime
 from pathlib import Path
-from weather_station_reader import WeatherStation3S
+from weather_station_reader import WeatherStation3S, SENSOR_BLOCK, SENSOR_DEADBANDS
+from change_filter import ChangeFilter
+from register_decoder import compile_blocks
+from poll_scheduler import AdaptivePollScheduler
+from http_server import PooledHTTPServer
+from event_stream import EventBroadcaster, stream_to
+from shared_state import SharedState, etag_matches
+
+
+# Change per sensor treated as significant by the adaptive scheduler
+SENSOR_TOLERANCE = {
+    'humidity': 0.5,
+    'temperature': 0.1,
+    'pressure': 0.3,
+    'wind_speed': 0.2,
+    'solar_radiation': 5.0,
+}
+
+# Sensors read together; wind and irradiance change much faster than the rest
+SENSOR_POLL_GROUPS = {
+    'fast': ('wind_speed', 'solar_radiation'),
+    'slow': ('humidity', 'temperature', 'pressure'),
+}
+
+# Times faster than update_interval each group may be read while changing
+SENSOR_POLL_SPEEDUP = {
+    'fast': 4,
+    'slow': 1,
+}
 
 
 class WeatherStationWebServer(BaseHTTPRequestHandler):
     """HTTP request handler for weather station web interface"""
     
-    # Class variable to share weather data across requests
-    current_data = {
+    # Weather data shared across requests; replaced as a whole on every change
+    state = SharedState({
         'humidity': {'value': 0, 'unit': '%'},
         'temperature': {'value': 0, 'unit': '°C'},
         'pressure': {'value': 0, 'unit': 'hPa'},
@@ -25,7 +52,10 @@ class WeatherStationWebServer(BaseHTTPRequestHandler):
         'solar_radiation': {'value': 0, 'unit': 'W/m²'},
         'timestamp': 'N/A',
         'status': 'Waiting...'
-    }
+    })
+    
+    # Push channel for /api/events (None disables it)
+    events = None
     
     def do_GET(self):
         """Handle GET requests"""
@@ -34,6 +64,8 @@ class WeatherStationWebServer(BaseHTTPRequestHandler):
             self.serve_dashboard()
         elif self.path == '/api/data':
             self.serve_json_data()
+        elif self.path == '/api/events':
+            stream_to(self, self.events, lambda: WeatherStationWebServer.state.data)
         else:
             self.send_error(404, "Not Found")
     
@@ -245,55 +277,104 @@ class WeatherStationWebServer(BaseHTTPRequestHandler):
         </div>
         
         <div class="footer">
-            <p>Gateway: 192.168.1.5:505 | Device: 3S-RH&AT&PS | Updates every 2 seconds</p>
+            <p>Gateway: 192.168.1.5:505 | Device: 3S-RH&AT&PS | Live updates</p>
         </div>
     </div>
     
     <script>
-        // Update data every 2 seconds
-        setInterval(function() {{
+        const state = {{}};
+        
+        function render(data) {{
+            document.getElementById('humidity').textContent = data.humidity.value.toFixed(1);
+            document.getElementById('temperature').textContent = data.temperature.value.toFixed(1);
+            document.getElementById('pressure').textContent = data.pressure.value.toFixed(1);
+            document.getElementById('wind_speed').textContent = data.wind_speed.value.toFixed(2);
+            document.getElementById('solar_radiation').textContent = data.solar_radiation.value.toFixed(0);
+            document.getElementById('status').textContent = data.status === 'OK' ? '[OK]' : data.status;
+            document.getElementById('timestamp').textContent = 'Last Updated: ' + data.timestamp;
+            
+            // Update status indicator
+            const statusDiv = document.querySelector('.status');
+            statusDiv.classList.remove('connecting', 'ok', 'error');
+            statusDiv.classList.add(data.status === 'OK' ? 'ok' : 'error');
+            statusDiv.innerHTML = data.status === 'OK' ? '[OK] Connected' : '[ERROR] Connection Error';
+        }}
+        
+        function showError(error) {{
+            console.error('Error:', error);
+            document.querySelector('.status').classList.remove('connecting', 'ok');
+            document.querySelector('.status').classList.add('error');
+            document.querySelector('.status').textContent = '[ERROR] Connection Error';
+        }}
+        
+        // Merge a delta into the state; null removes a key
+        function merge(target, delta) {{
+            for (const [key, value] of Object.entries(delta)) {{
+                if (value === null) {{
+                    delete target[key];
+                }} else if (typeof value === 'object' && !Array.isArray(value)
+                           && typeof target[key] === 'object' && target[key] !== null) {{
+                    merge(target[key], value);
+                }} else {{
+                    target[key] = value;
+                }}
+            }}
+            return target;
+        }}
+        
+        function poll() {{
             fetch('/api/data')
                 .then(response => response.json())
-                .then(data => {{
-                    document.getElementById('humidity').textContent = data.humidity.value.toFixed(1);
-                    document.getElementById('temperature').textContent = data.temperature.value.toFixed(1);
-                    document.getElementById('pressure').textContent = data.pressure.value.toFixed(1);
-                    document.getElementById('wind_speed').textContent = data.wind_speed.value.toFixed(2);
-                    document.getElementById('solar_radiation').textContent = data.solar_radiation.value.toFixed(0);
-                    document.getElementById('status').textContent = data.status === 'OK' ? '[OK]' : data.status;
-                    document.getElementById('timestamp').textContent = 'Last Updated: ' + data.timestamp;
-                    
-                    // Update status indicator
-                    const statusDiv = document.querySelector('.status');
-                    statusDiv.classList.remove('connecting', 'ok', 'error');
-                    statusDiv.classList.add(data.status === 'OK' ? 'ok' : 'error');
-                    statusDiv.innerHTML = data.status === 'OK' ? '[OK] Connected' : '[ERROR] Connection Error';
-                }})
-                .catch(error => {{
-                    console.error('Error:', error);
-                    document.querySelector('.status').classList.remove('connecting', 'ok');
-                    document.querySelector('.status').classList.add('error');
-                    document.querySelector('.status').textContent = '[ERROR] Connection Error';
-                }});
-        }}, 2000);
+                .then(render)
+                .catch(showError);
+        }}
+        
+        // Pushed updates; fall back to polling every 2 seconds
+        if (window.EventSource) {{
+            const source = new EventSource('/api/events');
+            source.addEventListener('snapshot', event => {{
+                for (const key of Object.keys(state)) delete state[key];
+                render(merge(state, JSON.parse(event.data)));
+            }});
+            source.addEventListener('delta', event => render(merge(state, JSON.parse(event.data))));
+            source.onerror = () => {{
+                if (source.readyState === EventSource.CLOSED) {{
+                    setInterval(poll, 2000);
+                }}
+            }};
+        }} else {{
+            poll();
+            setInterval(poll, 2000);
+        }}
     </script>
 </body>
 </html>"""
         
+        body = html.encode('utf-8')
         self.send_response(200)
         self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+        self.wfile.write(body)
     
     def serve_json_data(self):
-        """Serve current data as JSON"""
+        """Serve current data as JSON, encoded once per version"""
+        snapshot = self.state.current
+        if etag_matches(self.headers.get('If-None-Match'), snapshot.etag):
+            self.send_response(304)
+            self.send_header('ETag', snapshot.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(snapshot.body)))
+        self.send_header('ETag', snapshot.etag)
+        self.send_header('X-Data-Version', str(snapshot.version))
+        self.send_header('Cache-Control', 'no-cache')
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        
-        json_data = json.dumps(self.current_data, indent=2)
-        self.wfile.write(json_data.encode('utf-8'))
+        self.wfile.write(snapshot.body)
     
     def log_message(self, format, *args):
         """Suppress default logging"""
@@ -304,20 +385,49 @@ class WeatherStationWebMonitor:
     """Manager for weather station web server"""
     
     def __init__(self, gateway_ip="192.168.1.5", gateway_port=505, 
-                 web_port=8080, update_interval=2):
+                 web_port=8080, update_interval=2, adaptive=True, request_budget=None,
+                 web_workers=16, max_connections=512, push=True, bus=None):
         """
         Initialize web monitor
         
+        Without a bus the monitor polls the gateway itself, reading the fast
+        and slow sensor groups at their own adaptive rates. With the data bus
+        of a running acquisition daemon it only consumes the daemon's
+        weather samples, so the gateway keeps a single poller
+        
         Args:
             gateway_ip: Modbus gateway IP
             gateway_port: Modbus gateway port
             web_port: Web server port
-            update_interval: Seconds between updates
+            update_interval: Seconds between updates; when adaptive, the
+                fastest poll of the slow group (the fast group may poll
+                SENSOR_POLL_SPEEDUP times faster)
+            adaptive: Poll sensor groups at rates driven by how fast they change
+            request_budget: Maximum Modbus reads per second when adaptive
+                (default: every group read at its fastest rate)
+            web_workers: HTTP worker threads
+            max_connections: Open HTTP connections before new ones get 503
+            push: Stream changes to dashboards over /api/events
+            bus: DataBus of an acquisition daemon to take samples from instead
+                of polling (the gateway settings are then unused)
         """
         self.gateway_ip = gateway_ip
         self.gateway_port = gateway_port
         self.web_port = web_port
         self.update_interval = update_interval
+        self.adaptive = adaptive
+        if request_budget is None:
+            request_budget = sum(SENSOR_POLL_SPEEDUP.values()) / update_interval
+        self.request_budget = request_budget
+        self.web_workers = web_workers
+        self.max_connections = max_connections
+        self.push = push
+        self.bus = bus
+        self.subscription = None
+        self.events = None
+        self.scheduler = None
+        self.fields = {fld.name: fld for fld in SENSOR_BLOCK.fields}
+        self.change_filter = ChangeFilter(SENSOR_DEADBANDS)
         
         self.client = WeatherStation3S(
             ip=gateway_ip,
@@ -328,6 +438,77 @@ class WeatherStationWebMonitor:
         self.server = None
         self.update_thread = None
         self.running = False
+        self.stop_event = threading.Event()
+    
+    def build_scheduler(self):
+        """Create the adaptive scheduler with one read per sensor group"""
+        scheduler = AdaptivePollScheduler(budget=self.request_budget)
+        for group, names in SENSOR_POLL_GROUPS.items():
+            fields = [self.fields[name] for name in names]
+            block = compile_blocks(fields, max_gap=SENSOR_BLOCK.count)[0]
+            scheduler.add_task(
+                group,
+                lambda block=block: self.read_group(block),
+                tolerance={name: SENSOR_TOLERANCE[name] for name in names},
+                min_interval=self.update_interval / SENSOR_POLL_SPEEDUP[group],
+                max_interval=self.update_interval * 30,
+            )
+        return scheduler
+    
+    def read_group(self, block):
+        """Read one sensor group, flagging failed reads on the dashboard"""
+        values = self.client.read_block(block)
+        if values is None:
+            self.set_status('Read Error')
+        return values
+    
+    def apply_values(self, results):
+        """Publish sensor values that changed beyond their deadband"""
+        values = {}
+        for group_values in results.values():
+            values.update(group_values)
+        changed = self.change_filter.update(values).changed
+        
+        if not changed:
+            self.set_status('OK')
+            return
+        
+        delta = {}
+        for name, value in changed.items():
+            fld = self.fields[name]
+            delta[name] = {'value': round(value, fld.decimals), 'unit': fld.unit}
+        delta['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        delta['status'] = 'OK'
+        WeatherStationWebServer.state.update(delta)
+        self.publish(delta)
+    
+    def set_status(self, status):
+        """Set the gateway status shown on the dashboard"""
+        if WeatherStationWebServer.state.update({'status': status}) is not None:
+            self.publish({'status': status})
+    
+    def publish(self, delta):
+        """Push changed fields to dashboards subscribed to /api/events"""
+        if self.events is not None:
+            self.events.publish(delta)
+    
+    def follow_bus(self, bus, pattern='weather/*'):
+        """
+        Show weather samples published by the acquisition daemon
+        
+        Args:
+            bus: DataBus the daemon publishes to
+            pattern: Topic pattern of the weather samples
+            
+        Returns:
+            Subscription (pass it to bus.unsubscribe to stop)
+        """
+        def on_sample(sample):
+            self.apply_values({'bus': dict(sample.values)})
+            if not sample.complete:
+                self.set_status('Read Error')
+        
+        return bus.subscribe(pattern, on_sample, replay=True)
     
     def update_weather_data(self):
         """Background thread to update weather data"""
@@ -336,48 +517,34 @@ class WeatherStationWebMonitor:
         
         if not self.client.connect():
             print("Failed to connect to weather station")
-            WeatherStationWebServer.current_data['status'] = 'Connection Error'
+            self.set_status('Connection Error')
             return
         
         print("[OK] Connected to weather station")
         
+        if self.adaptive:
+            self.scheduler = self.build_scheduler()
+            try:
+                self.scheduler.run(self.stop_event, self.apply_values)
+            finally:
+                self.client.disconnect()
+            return
+        
         try:
             while self.running:
                 try:
                     readings = self.client.read_all_sensors()
                     
                     if readings:
-                        # Update shared data
-                        WeatherStationWebServer.current_data = {
-                            'humidity': {
-                                'value': readings['humidity'].value,
-                                'unit': readings['humidity'].unit
-                            },
-                            'temperature': {
-                                'value': readings['temperature'].value,
-                                'unit': readings['temperature'].unit
-                            },
-                            'pressure': {
-                                'value': readings['pressure'].value,
-                                'unit': readings['pressure'].unit
-                            },
-                            'wind_speed': {
-                                'value': readings['wind_speed'].value,
-                                'unit': readings['wind_speed'].unit
-                            },
-                            'solar_radiation': {
-                                'value': readings['solar_radiation'].value,
-                                'unit': readings['solar_radiation'].unit
-                            },
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            'status': 'OK'
-                        }
+                        self.apply_values({
+                            'all': {name: reading.value for name, reading in readings.items()}
+                        })
                     else:
-                        WeatherStationWebServer.current_data['status'] = 'Read Error'
+                        self.set_status('Read Error')
                 
                 except Exception as e:
                     print(f"Error reading data: {e}")
-                    WeatherStationWebServer.current_data['status'] = 'Error'
+                    self.set_status('Error')
                 
                 time.sleep(self.update_interval)
         
@@ -387,20 +554,38 @@ class WeatherStationWebMonitor:
     def start(self):
         """Start web server"""
         
-        # Start update thread
+        # Follow the daemon, or start the update thread that polls the gateway
         self.running = True
-        self.update_thread = threading.Thread(target=self.update_weather_data, daemon=True)
-        self.update_thread.start()
+        self.stop_event.clear()
+        if self.bus is not None:
+            self.subscription = self.follow_bus(self.bus)
+        else:
+            self.update_thread = threading.Thread(target=self.update_weather_data, daemon=True)
+            self.update_thread.start()
         
-        # Start HTTP server
-        self.server = HTTPServer(('0.0.0.0', self.web_port), WeatherStationWebServer)
+        # Start push channel and HTTP server
+        if self.push:
+            self.events = EventBroadcaster()
+            WeatherStationWebServer.events = self.events
+        self.server = PooledHTTPServer(('0.0.0.0', self.web_port), WeatherStationWebServer,
+                                       workers=self.web_workers,
+                                       max_connections=self.max_connections)
         
         print(f"\n{'='*70}")
         print("3S-RH&AT&PS WEATHER STATION WEB MONITOR")
         print(f"{'='*70}")
         print(f"[OK] Web Server started at http://localhost:{self.web_port}")
-        print(f"[OK] Updating data every {self.update_interval} seconds")
-        print(f"[OK] Gateway: {self.gateway_ip}:{self.gateway_port}")
+        if self.bus is not None:
+            print("[OK] Following weather samples on the acquisition data bus")
+        elif self.adaptive:
+            fastest = self.update_interval / max(SENSOR_POLL_SPEEDUP.values())
+            print(f"[OK] Adaptive polling every {fastest:g}-{self.update_interval * 30} "
+                  f"seconds, budget {self.request_budget:g} reads/s")
+        else:
+            print(f"[OK] Updating data every {self.update_interval} seconds")
+        if self.bus is None:
+            print(f"[OK] Gateway: {self.gateway_ip}:{self.gateway_port}")
+        print(f"[OK] {self.web_workers} HTTP workers, up to {self.max_connections} connections")
         print(f"\nPress Ctrl+C to stop")
         print(f"{'='*70}\n")
         
@@ -413,8 +598,16 @@ class WeatherStationWebMonitor:
     def stop(self):
         """Stop web server"""
         self.running = False
+        self.stop_event.set()
+        if self.subscription is not None:
+            self.bus.unsubscribe(self.subscription)
+            self.subscription = None
         if self.server:
             self.server.shutdown()
+            self.server.server_close()
+        if self.events:
+            self.events.close()
+            WeatherStationWebServer.events = None
         print("[OK] Server stopped")
 
 
@@ -2,94 +2,124 @@
 """
 Sungrow Logger Device Identification Tool
 Analyzes PCAP capture data to identify all connected devices
+
+Devices are recognised by fingerprint (register ranges, function codes,
+read sizes and values) rather than by slave ID, either straight from a
+capture or from a live register map.
 """
 
 import json
+import sys
 from pathlib import Path
 
+try:
+    from src.analysis.compiled_map import load_register_map
+    from src.analysis.fingerprint import DeviceFingerprinter
+except ImportError:  # run as a script from SunGrow_Logger/SunGrow_Inverter
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.analysis.compiled_map import load_register_map
+    from src.analysis.fingerprint import DeviceFingerprinter
+
 
 class DeviceIdentificationAnalyzer:
     """Analyze captured Modbus data to identify devices"""
     
-    def __init__(self, register_map_file):
+    def __init__(self, register_map_file=None):
         """
         Initialize analyzer with register map data
         
         Args:
-            register_map_file: Path to sungrow_live_register_map.json
+            register_map_file: Path to sungrow_live_register_map.json or its .srm form;
+                not needed when identifying from a capture
         """
         self.register_map_file = register_map_file
         self.devices = {}
-        self.load_register_map()
+        self.metadata = {}
+        self.registers = {}
+        if register_map_file:
+            self.load_register_map()
     
     def load_register_map(self):
-        """Load register map from JSON file"""
+        """Load register map (compiled .srm form when it is up to date)"""
         try:
-            with open(self.register_map_file, 'r') as f:
-                data = json.load(f)
-                self.metadata = data.get('metadata', {})
-                self.registers = data.get('registers_by_unit', {})
+            data = load_register_map(self.register_map_file)
+            self.metadata = data.get('metadata', {})
+            self.registers = data.get('registers_by_unit', {})
         except FileNotFoundError:
             print(f"Error: {self.register_map_file} not found")
             return False
         except json.JSONDecodeError:
             print(f"Error: Invalid JSON in {self.register_map_file}")
             return False
+        except ValueError as e:
+            print(f"Error: Invalid register map {self.register_map_file}: {e}")
+            return False
         return True
     
     def identify_devices(self):
         """Identify all devices from register map"""
-        devices = {
-            'inverters': [],
-            'weather_station': [],
-            'unknown': []
-        }
+        fingerprinter = DeviceFingerprinter().add_register_map({'registers_by_unit': self.registers})
+        unit_details = self.metadata.get('unit_details', {})
         
-        units = self.metadata.get('units', [])
-        
-        for unit_id in sorted(units):
-            device_info = {
-                'slave_id': unit_id,
-                'slave_id_hex': f'0x{unit_id:02X}',
-                'device_type': None,
-                'register_count': 0,
-                'access_count': 0,
-                'function_codes': []
-            }
-            
-            # Get unit data
-            unit_key = f'Unit_{unit_id}'
-            if unit_key in self.registers:
-                unit_data = self.registers[unit_key]
-                device_info['register_count'] = len(unit_data.get('registers', {}))
-                device_info['function_codes'] = unit_data.get('function_codes', [])
-                
-                # Identify device type by slave ID and register patterns
-                if unit_id in range(1, 7):
-                    device_info['device_type'] = 'Sungrow Solar Inverter'
-                    devices['inverters'].append(device_info)
-                elif unit_id == 247:  # 0xF7
-                    device_info['device_type'] = '3S-RH&AT&PS Weather Station (Seven Sensor)'
-                    device_info['sensors'] = [
-                        'Relative Humidity',
-                        'Air Temperature',
-                        'Atmospheric Pressure',
-                        'Wind Speed',
-                        'Solar Irradiance'
-                    ]
-                    devices['weather_station'].append(device_info)
-                else:
-                    device_info['device_type'] = 'Unknown Device'
-                    devices['unknown'].append(device_info)
+        devices = self._new_devices()
+        for unit_id in sorted(self.metadata.get('units', [])):
+            unit_data = self.registers.get(f'Unit_{unit_id}')
+            if unit_data is None or unit_id not in fingerprinter.units:
+                continue
+            device_info = self._device_info(unit_id, fingerprinter.classify(unit_id), devices)
+            device_info['register_count'] = len(unit_data.get('registers', {}))
+            device_info['function_codes'] = unit_data.get('function_codes', [])
             
             # Get access count from metadata
-            if 'unit_details' in self.metadata:
-                if str(unit_id) in self.metadata['unit_details']:
-                    device_info['access_count'] = self.metadata['unit_details'][str(unit_id)].get('access_count', 0)
+            if str(unit_id) in unit_details:
+                device_info['access_count'] = unit_details[str(unit_id)].get('access_count', 0)
         
         self.devices = devices
         return devices
     
+    def identify_from_capture(self, capture_file):
+        """Identify all devices directly from a pcap/pcapng capture, in one pass"""
+        fingerprinter = DeviceFingerprinter().analyze_capture(capture_file)
+        
+        devices = self._new_devices()
+        for unit_id, result in fingerprinter.classify_all().items():
+            unit = fingerprinter.units[unit_id]
+            device_info = self._device_info(unit_id, result, devices)
+            device_info['register_count'] = len(unit.registers())
+            device_info['access_count'] = unit.requests
+            device_info['function_codes'] = sorted(unit.functions)
+        
+        self.devices = devices
+        return devices
+    
+    @staticmethod
+    def _new_devices():
+        return {
+            'inverters': [],
+            'weather_station': [],
+            'unknown': []
+        }
+    
+    @staticmethod
+    def _device_info(unit_id, result, devices):
+        """Build a device entry from a fingerprint result and file it under its category"""
+        signature = result['signature']
+        device_info = {
+            'slave_id': unit_id,
+            'slave_id_hex': f'0x{unit_id:02X}',
+            'device_type': signature.name if signature else 'Unknown Device',
+            'register_count': 0,
+            'access_count': 0,
+            'function_codes': [],
+            'confidence': result['confidence'],
+            'best_match': result['best_match'],
+        }
+        if signature:
+            device_info.update(signature.details)
+        category = signature.category if signature and signature.category in devices else 'unknown'
+        devices[category].append(device_info)
+        return device_info
+    
     def print_summary(self):
         """Print device identification summary"""
         if not self.devices:
@@ -112,7 +142,8 @@ class DeviceIdentificationAnalyzer:
         # Inverters
         if self.devices['inverters']:
             print("-" * 90)
-            print("SUNGROW SOLAR INVERTERS (0x01 to 0x06)")
+            slave_ids = [device['slave_id'] for device in self.devices['inverters']]
+            print(f"SUNGROW SOLAR INVERTERS (0x{min(slave_ids):02X} to 0x{max(slave_ids):02X})")
             print("-" * 90)
             for device in sorted(self.devices['inverters'], key=lambda x: x['slave_id']):
                 print(f"\n  Slave ID: {device['slave_id_hex']} ({device['slave_id']} decimal)")
@@ -144,6 +175,7 @@ class DeviceIdentificationAnalyzer:
                 print(f"\n  Slave ID: {device['slave_id_hex']} ({device['slave_id']} decimal)")
                 print(f"  Registers: {device['register_count']}")
                 print(f"  Function Codes: {device['function_codes']}")
+                print(f"  Closest Match: {device['best_match']} (score {device['confidence']:.2f})")
         
         print("\n" + "=" * 90)
     
@@ -163,6 +195,18 @@ class DeviceIdentificationAnalyzer:
 def main():
     """Main execution"""
     
+    # A capture given on the command line is fingerprinted directly
+    if len(sys.argv) >= 2:
+        capture_path = Path(sys.argv[1])
+        if not capture_path.exists():
+            print(f"Capture not found at {capture_path}")
+            return
+        print(f"Fingerprinting devices in {capture_path}...")
+        analyzer = DeviceIdentificationAnalyzer()
+        analyzer.identify_from_capture(str(capture_path))
+        analyzer.print_summary()
+        return
+    
     # Find register map file
     register_map_path = Path('../../data/sungrow_live_register_map.json')
     
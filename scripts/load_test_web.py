@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Load test for the weather station web server.
+
+Opens many concurrent keep-alive clients against a running server (or
+one started in a child process) and reports requests per second and
+latency percentiles.
+
+Usage:
+    python scripts/load_test_web.py                       # 200 clients, own server
+    python scripts/load_test_web.py --baseline            # single-threaded HTTPServer
+    python scripts/load_test_web.py --url http://host:8080 --clients 500
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+DEFAULT_PATHS = ('/api/current', '/api/stats', '/api/history?hours=1')
+
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of sorted values lie."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+async def client(host, port, paths, deadline, keep_alive, latencies, errors, offset):
+    """Send requests in a loop until the deadline, recording each latency."""
+    reader = writer = None
+    count = offset
+    connection = b'keep-alive' if keep_alive else b'close'
+    while time.perf_counter() < deadline:
+        path = paths[count % len(paths)]
+        count += 1
+        began = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(b'GET ' + path.encode() + b' HTTP/1.1\r\nHost: ' + host.encode() +
+                         b'\r\nAccept-Encoding: gzip\r\nConnection: ' + connection + b'\r\n\r\n')
+            head = await reader.readuntil(b'\r\n\r\n')
+            status = int(head.split(b' ', 2)[1])
+            length = 0
+            close = not keep_alive
+            for line in head.split(b'\r\n')[1:]:
+                name, _, value = line.partition(b':')
+                name = name.strip().lower()
+                if name == b'content-length':
+                    length = int(value)
+                elif name == b'connection' and value.strip().lower() == b'close':
+                    close = True
+            if length:
+                await reader.readexactly(length)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+            else:
+                latencies.append(time.perf_counter() - began)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            close = True
+            await asyncio.sleep(0.05)
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(host, port, paths, clients, duration, keep_alive):
+    """Run all clients concurrently and return (latencies, errors, elapsed)."""
+    latencies = []
+    errors = {}
+    began = time.perf_counter()
+    deadline = began + duration
+    await asyncio.gather(*(
+        client(host, port, paths, deadline, keep_alive, latencies, errors, i)
+        for i in range(clients)
+    ))
+    return latencies, errors, time.perf_counter() - began
+
+
+def serve(port, baseline, workers):
+    """Run a weather station web server until stdin closes (child process)."""
+    from src.weather.station import WeatherStation
+    from src.weather.web_server import WeatherWebHandler, WeatherWebServer
+
+    station = WeatherStation()
+    for sensor_id in ('bme280', 'wind', 'rain', 'uv', 'light'):
+        station.add_sensor(sensor_id, sensor_id.upper(), 'outdoor')
+    for _ in range(120):
+        station.collect_data()
+    station.start_monitoring(interval=1)
+
+    if baseline:
+        import threading
+        from http.server import HTTPServer
+        WeatherWebHandler.weather_station = station
+        server = HTTPServer(('127.0.0.1', port), WeatherWebHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+    else:
+        web = WeatherWebServer(station, host='127.0.0.1', port=port, workers=workers)
+        web.start()
+        port = web.port
+
+    print(f'PORT {port}', flush=True)
+    sys.stdin.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Weather web server load test')
+    parser.add_argument('--url', help='Server to test (default: start one locally)')
+    parser.add_argument('--clients', type=int, default=200, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='Test length in seconds')
+    parser.add_argument('--path', action='append', help='Request path (repeatable)')
+    parser.add_argument('--no-keepalive', action='store_true', help='New connection per request')
+    parser.add_argument('--baseline', action='store_true',
+                        help='Start the single-threaded http.server.HTTPServer instead')
+    parser.add_argument('--workers', type=int, default=16, help='Worker threads of the local server')
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve, args.baseline, args.workers)
+        return
+
+    child = None
+    if args.url:
+        target = urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        command = [sys.executable, __file__, '--serve', '0', '--workers', str(args.workers)]
+        if args.baseline:
+            command.append('--baseline')
+        child = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 text=True, cwd=str(ROOT))
+        line = child.stdout.readline()
+        while line and not line.startswith('PORT '):
+            line = child.stdout.readline()
+        if not line:
+            sys.exit('Server failed to start')
+        host, port = '127.0.0.1', int(line.split()[1])
+
+    paths = args.path or list(DEFAULT_PATHS)
+    server_kind = 'single-threaded' if args.baseline else f'pooled, {args.workers} workers'
+    print(f"Load test: {args.clients} clients, {args.duration:.0f} s, "
+          f"{'new connection per request' if args.no_keepalive else 'keep-alive'}")
+    print(f"Target: {host}:{port}" + ('' if args.url else f' ({server_kind})'))
+    print(f"Paths: {', '.join(paths)}")
+
+    try:
+        latencies, errors, elapsed = asyncio.run(
+            run_load(host, port, paths, args.clients, args.duration, not args.no_keepalive))
+    finally:
+        if child is not None:
+            child.stdin.close()
+            child.terminate()
+            child.wait()
+
+    latencies.sort()
+    print(f"\nRequests:     {len(latencies)} ok, {sum(errors.values())} failed")
+    print(f"Throughput:   {len(latencies) / elapsed:.0f} req/s")
+    for label, fraction in (('p50', 0.50), ('p90', 0.90), ('p99', 0.99)):
+        print(f"Latency {label}:  {percentile(latencies, fraction) * 1000:.1f} ms")
+    if latencies:
+        print(f"Latency max:  {latencies[-1] * 1000:.1f} ms")
+    if errors:
+        print(f"Errors:       {errors}")
+
+
+if __name__ == '__main__':
+    main()
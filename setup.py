@@ -23,6 +23,9 @@ setup(
         # Standard library only - no external dependencies required
     ],
     extras_require={
+        "analysis": [
+            "numpy>=1.21",
+        ],
         "dev": [
             "pytest>=6.0",
             "black>=21.0",
@@ -5,4 +5,4 @@ Combines environmental sensors with Sungrow Modbus solar inverter monitoring
 
 __version__ = "1.0.0"
 __author__ = "Monitoring System"
-__all__ = ["weather", "solar", "modbus", "analysis", "utils"]
+__all__ = ["weather", "solar", "modbus", "analysis", "acquisition", "utils"]
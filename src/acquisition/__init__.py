@@ -0,0 +1,6 @@
+"""
+Acquisition Module
+Shared Modbus polling of every device and an in-process bus for its consumers
+"""
+
+__all__ = ["AcquisitionDaemon", "DataBus", "Device", "Sample"]
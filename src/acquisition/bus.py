@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+In-process Data Bus
+Topic-based publish/subscribe for decoded device samples. The acquisition
+daemon publishes each sample once and every consumer (web servers,
+loggers, alerting) subscribes by topic pattern, so adding a consumer never
+adds a Modbus read. Slow consumers can get their own bounded queue and
+thread instead of delaying the publisher.
+"""
+
+import fnmatch
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional
+
+
+@dataclass(frozen=True)
+class Sample:
+    """Decoded values of one device from one acquisition cycle."""
+    topic: str
+    device: str
+    values: Mapping[str, float]
+    timestamp: float = field(default_factory=time.time)
+    cycle: int = 0
+    complete: bool = True
+
+    def __post_init__(self):
+        # Shared by every subscriber; never copied per consumer
+        if not isinstance(self.values, MappingProxyType):
+            object.__setattr__(self, 'values', MappingProxyType(dict(self.values)))
+
+
+class Subscription:
+    """One consumer of the bus and its delivery counters."""
+
+    def __init__(self, pattern: str, callback: Callable[[Sample], None], queue_size: int = 0):
+        """
+        Initialize subscription.
+
+        Args:
+            pattern: Topic or shell-style pattern ('inverter/*', '*')
+            callback: Called with every matching Sample
+            queue_size: Deliver from a dedicated thread through a queue of this
+                size, dropping the oldest samples when full (0 = call inline)
+        """
+        self.pattern = pattern
+        self.callback = callback
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.queue: Optional[queue.Queue] = None
+        self.thread = None
+        if queue_size:
+            self.queue = queue.Queue(queue_size)
+            self.thread = threading.Thread(target=self._drain, daemon=True)
+            self.thread.start()
+
+    def matches(self, topic: str) -> bool:
+        return fnmatch.fnmatchcase(topic, self.pattern)
+
+    def deliver(self, sample: Sample) -> None:
+        """Run the callback now, or queue the sample for the subscription thread."""
+        if self.queue is None:
+            self._call(sample)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(sample)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _call(self, sample: Sample) -> None:
+        try:
+            self.callback(sample)
+            self.delivered += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Bus subscriber error ({self.pattern}): {e}")
+
+    def _drain(self) -> None:
+        while True:
+            sample = self.queue.get()
+            if sample is None:
+                return
+            self._call(sample)
+
+    def close(self) -> None:
+        """Stop the subscription thread after the queued samples."""
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=2.0)
+
+
+class DataBus:
+    """Fan-out of samples to subscribers; keeps the last sample of each topic."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions: List[Subscription] = []
+        self.retained: Dict[str, Sample] = {}
+        self.stats = {'published': 0, 'deliveries': 0}
+        self._routes: Dict[str, List[Subscription]] = {}
+
+    def subscribe(self, pattern: str, callback: Callable[[Sample], None],
+                  queue_size: int = 0, replay: bool = False) -> Subscription:
+        """
+        Register a consumer.
+
+        Args:
+            pattern: Topic or shell-style pattern ('inverter/*', '*')
+            callback: Called with every matching Sample
+            queue_size: Bounded queue for a dedicated delivery thread (0 = inline)
+            replay: Deliver the last retained sample of each matching topic first
+
+        Returns:
+            Subscription, to pass to unsubscribe()
+        """
+        subscription = Subscription(pattern, callback, queue_size)
+        with self.lock:
+            self.subscriptions.append(subscription)
+            self._routes.clear()
+            retained = [s for topic, s in self.retained.items() if subscription.matches(topic)]
+        if replay:
+            for sample in retained:
+                subscription.deliver(sample)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a consumer and stop its delivery thread."""
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+                self._routes.clear()
+        subscription.close()
+
+    def publish(self, sample: Sample) -> int:
+        """
+        Deliver a sample to every matching subscriber.
+
+        Returns:
+            Number of subscribers the sample was delivered or queued to
+        """
+        with self.lock:
+            self.retained[sample.topic] = sample
+            routes = self._routes.get(sample.topic)
+            if routes is None:
+                routes = self._routes[sample.topic] = [
+                    s for s in self.subscriptions if s.matches(sample.topic)]
+            self.stats['published'] += 1
+            self.stats['deliveries'] += len(routes)
+        for subscription in routes:
+            subscription.deliver(sample)
+        return len(routes)
+
+    def latest(self, topic: str) -> Optional[Sample]:
+        """Return the last sample published on a topic."""
+        return self.retained.get(topic)
+
+    def close(self) -> None:
+        """Unsubscribe every consumer."""
+        with self.lock:
+            subscriptions, self.subscriptions = self.subscriptions, []
+            self._routes.clear()
+        for subscription in subscriptions:
+            subscription.close()
+
+    def get_stats(self) -> Dict:
+        """Return publish counters and per-subscriber delivery counters."""
+        with self.lock:
+            return dict(self.stats, subscribers=[
+                {'pattern': s.pattern, 'delivered': s.delivered, 'dropped': s.dropped,
+                 'errors': s.errors, 'queued': s.queue.qsize() if s.queue else 0}
+                for s in self.subscriptions])
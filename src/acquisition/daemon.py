@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Acquisition Daemon
+Single owner of every Modbus device: Sungrow inverters, the 3S weather
+station (unit 247) and any other unit behind a gateway. Devices that share
+a gateway share one connection; each cycle merges the reads of
+every device that is due, issues identical reads once, and publishes one
+Sample per device on the data bus for all consumers.
+"""
+
+import argparse
+import copy
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    from src.acquisition.bus import DataBus, Sample
+    from src.analysis.compiled_map import load_register_map
+    from src.modbus.register_decoder import WEATHER_3S_BLOCK
+    from src.solar.connector import READ_INPUT_REGISTERS, ReadRequest, SungrowConnector
+    from src.solar.monitor import (DEFAULT_MAX_GAP, DEFAULT_REGISTER_MAP, DEFAULT_UNITS,
+                                   capture_function_codes, plan_reads)
+except ImportError:  # run as a script from src/acquisition
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.acquisition.bus import DataBus, Sample
+    from src.analysis.compiled_map import load_register_map
+    from src.modbus.register_decoder import WEATHER_3S_BLOCK
+    from src.solar.connector import READ_INPUT_REGISTERS, ReadRequest, SungrowConnector
+    from src.solar.monitor import (DEFAULT_MAX_GAP, DEFAULT_REGISTER_MAP, DEFAULT_UNITS,
+                                   capture_function_codes, plan_reads)
+
+DEFAULT_CONFIG = {
+    'register_map': str(DEFAULT_REGISTER_MAP),
+    'gateways': {
+        'logger': {'host': '192.168.1.5', 'port': 505, 'timeout': 3.0, 'max_in_flight': 1},
+    },
+    'devices': [
+        *({'type': 'inverter', 'unit': unit, 'gateway': 'logger', 'interval': 1.0}
+          for unit in DEFAULT_UNITS),
+        {'type': 'weather_3s', 'unit': 247, 'gateway': 'logger', 'interval': 2.0},
+    ],
+}
+
+
+@dataclass
+class Device:
+    """Reads of one unit, how often to run them and where to publish."""
+    name: str
+    topic: str
+    gateway: str
+    reads: List[ReadRequest]
+    interval: float = 1.0
+    transform: Optional[Callable[[Dict[str, float]], Dict[str, float]]] = None
+    next_due: float = field(default=0.0, compare=False)
+    cycles: int = field(default=0, compare=False)
+    failed: int = field(default=0, compare=False)
+
+
+def inverter_device(mapping: Dict, unit_id: int, gateway: str = 'logger', interval: float = 1.0,
+                    max_gap: int = DEFAULT_MAX_GAP, function_codes: Optional[Dict] = None) -> Device:
+    """Device polling the mapped registers of one inverter unit (see plan_reads)."""
+    return Device(f'inverter_{unit_id}', f'inverter/{unit_id}', gateway,
+                  plan_reads(mapping, [unit_id], max_gap, function_codes), interval)
+
+
+def weather_station_device(unit_id: int = 247, gateway: str = 'logger',
+                           interval: float = 2.0) -> Device:
+    """Device reading the 3S weather station sensor table."""
+    decimals = {fld.name: fld.decimals for fld in WEATHER_3S_BLOCK.fields}
+
+    def round_values(values):
+        return {name: round(value, decimals[name]) for name, value in values.items()}
+
+    return Device('weather_3s', f'weather/{unit_id}', gateway,
+                  [ReadRequest(unit_id, READ_INPUT_REGISTERS, WEATHER_3S_BLOCK)],
+                  interval, round_values)
+
+
+class AcquisitionDaemon:
+    """Poll every configured device and publish its samples on a bus."""
+
+    def __init__(self, bus: DataBus, connectors: Dict[str, SungrowConnector],
+                 devices: Iterable[Device] = ()):
+        """
+        Initialize daemon.
+
+        Args:
+            bus: Bus receiving one Sample per device and cycle
+            connectors: Gateway connections keyed by gateway name
+            devices: Devices to poll; each names the gateway it is reached through
+        """
+        self.bus = bus
+        self.connectors = connectors
+        self.devices: Dict[str, List[Device]] = {name: [] for name in connectors}
+        self.running = False
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.stats = {'cycles': 0, 'reads': 0, 'shared_reads': 0, 'overruns': 0, 'poll_time': 0.0}
+        for device in devices:
+            self.add_device(device)
+
+    def add_device(self, device: Device) -> None:
+        """Schedule a device on its gateway."""
+        if device.gateway not in self.connectors:
+            raise ValueError(f"Unknown gateway '{device.gateway}' for device {device.name}")
+        if any(d.name == device.name for devices in self.devices.values() for d in devices):
+            raise ValueError(f"Duplicate device name '{device.name}'")
+        self.devices[device.gateway].append(device)
+
+    @classmethod
+    def from_config(cls, config: Dict, bus: Optional[DataBus] = None) -> 'AcquisitionDaemon':
+        """
+        Build a daemon from a configuration document (see DEFAULT_CONFIG).
+
+        Raises:
+            ValueError: If a device has an unknown type, an unknown gateway or a
+                duplicate name
+        """
+        connectors = {
+            name: SungrowConnector(gw.get('host', '192.168.1.5'), gw.get('port', 502),
+                                   timeout=gw.get('timeout', 3.0),
+                                   max_in_flight=gw.get('max_in_flight', 1))
+            for name, gw in config.get('gateways', {}).items()
+        }
+        mapping = None
+        capture = config.get('capture')
+        function_codes = capture_function_codes(capture) if capture else None
+        devices = []
+        for entry in config.get('devices', []):
+            kind = entry.get('type')
+            gateway = entry.get('gateway', next(iter(connectors), ''))
+            interval = entry.get('interval', 1.0)
+            if kind == 'inverter':
+                if mapping is None:
+                    mapping = load_register_map(config.get('register_map', DEFAULT_REGISTER_MAP))
+                devices.append(inverter_device(mapping, entry['unit'], gateway, interval,
+                                               entry.get('max_gap', DEFAULT_MAX_GAP),
+                                               function_codes))
+            elif kind == 'weather_3s':
+                devices.append(weather_station_device(entry.get('unit', 247), gateway, interval))
+            else:
+                raise ValueError(f"Unknown device type '{kind}'")
+        return cls(bus or DataBus(), connectors, devices)
+
+    def poll_gateway(self, gateway: str, devices: Optional[List[Device]] = None) -> List[Sample]:
+        """
+        Run one merged cycle for devices of a gateway and publish their samples.
+
+        Args:
+            gateway: Gateway name
+            devices: Devices to read (default: all devices of the gateway)
+
+        Returns:
+            Published samples
+        """
+        devices = self.devices[gateway] if devices is None else devices
+        batch: List[ReadRequest] = []
+        slots: Dict[tuple, int] = {}
+        device_slots = []
+        for device in devices:
+            indices = []
+            for request in device.reads:
+                key = (request.unit_id, request.function_code, request.block.start,
+                       request.block.count)
+                index = slots.get(key)
+                if index is None:
+                    index = slots[key] = len(batch)
+                    batch.append(request)
+                else:
+                    self.stats['shared_reads'] += 1
+                indices.append(index)
+            device_slots.append(indices)
+
+        began = time.perf_counter()
+        payloads = self.connectors[gateway].execute(batch)
+        self.stats['poll_time'] += time.perf_counter() - began
+        self.stats['reads'] += len(batch)
+        self.stats['cycles'] += 1
+
+        timestamp = time.time()
+        samples = []
+        for device, indices in zip(devices, device_slots):
+            values = {}
+            complete = True
+            for request, index in zip(device.reads, indices):
+                payload = payloads[index]
+                if payload is None:
+                    complete = False
+                    continue
+                values.update(request.block.decode(payload))
+            device.cycles += 1
+            if not complete:
+                device.failed += 1
+            if not values:
+                continue
+            if device.transform:
+                values = device.transform(values)
+            sample = Sample(device.topic, device.name, values, timestamp, device.cycles, complete)
+            self.bus.publish(sample)
+            samples.append(sample)
+        return samples
+
+    def _run_gateway(self, gateway: str) -> None:
+        """Poll the devices of one gateway whenever any of them is due."""
+        connector = self.connectors[gateway]
+        devices = self.devices[gateway]
+        now = time.monotonic()
+        for device in devices:
+            device.next_due = now
+        while not self._stop_event.is_set():
+            if not connector.connected and not connector.connect():
+                self._stop_event.wait(5.0)
+                continue
+            now = time.monotonic()
+            due = [device for device in devices if device.next_due <= now]
+            if due:
+                try:
+                    self.poll_gateway(gateway, due)
+                except Exception as e:
+                    print(f"Acquisition error on {gateway}: {e}")
+                for device in due:
+                    device.next_due += device.interval
+                    if device.next_due <= time.monotonic():
+                        # Cycle overran the interval; skip missed cycles
+                        self.stats['overruns'] += 1
+                        device.next_due = time.monotonic() + device.interval
+            self._stop_event.wait(max(0.0, min(d.next_due for d in devices) - time.monotonic()))
+
+    def start(self) -> None:
+        """Start one polling thread per gateway with devices."""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._run_gateway, args=(gateway,), daemon=True)
+                         for gateway, devices in self.devices.items() if devices]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop polling and close every gateway connection."""
+        self.running = False
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=5.0)
+        self._threads = []
+        for connector in self.connectors.values():
+            connector.disconnect()
+
+    def get_stats(self) -> Dict:
+        """Return cycle counters, per-device status and per-gateway request rates."""
+        stats = dict(self.stats)
+        stats['requests_per_second'] = (stats['reads'] / stats['poll_time']
+                                        if stats['poll_time'] else 0.0)
+        stats['devices'] = {
+            device.name: {'gateway': gateway, 'reads': len(device.reads),
+                          'interval': device.interval, 'cycles': device.cycles,
+                          'failed': device.failed}
+            for gateway, devices in self.devices.items() for device in devices
+        }
+        stats['gateways'] = {name: connector.get_stats()
+                             for name, connector in self.connectors.items()}
+        return stats
+
+
+def main():
+    """Run the daemon and print or log every published sample."""
+    parser = argparse.ArgumentParser(description='Modbus acquisition daemon')
+    parser.add_argument('--config', help='JSON configuration (default: logger with units 1-5 and 247)')
+    parser.add_argument('--host', help='Override the host of every gateway')
+    parser.add_argument('--port', type=int, help='Override the port of every gateway')
+    parser.add_argument('--log', help='Append every sample to this NDJSON file')
+    parser.add_argument('--duration', type=float, default=0, help='Seconds to run (0 = until Ctrl+C)')
+    args = parser.parse_args()
+
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if args.config:
+        with open(Path(args.config), 'r') as f:
+            config = json.load(f)
+    for gateway in config.get('gateways', {}).values():
+        if args.host:
+            gateway['host'] = args.host
+        if args.port:
+            gateway['port'] = args.port
+
+    daemon = AcquisitionDaemon.from_config(config)
+    log_file = open(args.log, 'a') if args.log else None
+
+    def log_sample(sample):
+        log_file.write(json.dumps({'ts': sample.timestamp, 'topic': sample.topic,
+                                   'values': dict(sample.values)}) + '\n')
+        log_file.flush()
+
+    def print_sample(sample):
+        print(f"  {sample.topic:12} {len(sample.values):4d} values"
+              f"{'' if sample.complete else ' (incomplete)'}")
+
+    daemon.bus.subscribe('*', log_sample if log_file else print_sample, queue_size=1024)
+    daemon.start()
+    try:
+        if args.duration:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        daemon.bus.close()
+        if log_file:
+            log_file.close()
+
+    stats = daemon.get_stats()
+    print(f"\n{stats['cycles']} gateway cycles, {stats['reads']} reads, "
+          f"{stats['requests_per_second']:.0f} req/s, {stats['overruns']} overruns")
+    for name, device in stats['devices'].items():
+        print(f"  {name:14} {device['cycles']:5d} cycles, {device['failed']} incomplete")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,4 +3,5 @@ Data Analysis Module
 Tools for analyzing Modbus captures, register mappings, and Sungrow documentation
 """
 
-__all__ = ["AddressAnalyzer", "CrossReferenceAnalyzer", "DocumentationMapper"]
+__all__ = ["AddressAnalyzer", "BusUtilizationModel", "CrossReferenceAnalyzer",
+           "DeviceFingerprinter", "DocumentationMapper", "PollCycleAnalyzer"]
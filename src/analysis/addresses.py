@@ -2,48 +2,286 @@
 """
 Analyze starting addresses and quantities read from live Modbus capture.
 Extracts address patterns, access frequency, and read/write characteristics.
+
+Statistics are kept in a compact form (counters, first/last timestamps,
+inter-arrival histograms) that serializes to JSON and merges
+associatively, so per-hour results combine into days, months and sites.
 """
 
 import json
-import struct
-from collections import defaultdict
+import sys
+from bisect import bisect_left
+from collections import Counter, defaultdict
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+
+STATISTICS_VERSION = 1
+
+# Upper bounds (seconds) of the inter-arrival histogram bins; last bin is open
+INTERVAL_BOUNDS = (0.01, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+READ_FUNCTIONS = (1, 2, 3, 4)
+WRITE_FUNCTIONS = (5, 6, 15, 16)
+
+
+def _counter_to_json(counter):
+    return {str(key): value for key, value in sorted(counter.items())}
+
+
+def _counter_from_json(data):
+    return Counter({int(key): value for key, value in data.items()})
+
+
+class AddressStats:
+    """Mergeable access statistics of one starting address."""
+
+    __slots__ = ('count', 'quantities', 'functions', 'devices', 'read', 'write',
+                 'first', 'last', 'intervals')
+
+    def __init__(self):
+        self.count = 0
+        self.quantities = Counter()
+        self.functions = Counter()
+        self.devices = Counter()
+        self.read = False
+        self.write = False
+        self.first = None
+        self.last = None
+        self.intervals = [0] * (len(INTERVAL_BOUNDS) + 1)
+
+    def record(self, quantity, function_code, unit_id=None, timestamp=None, is_request=True):
+        """Add one access."""
+        self.count += 1
+        self.quantities[quantity] += 1
+        self.functions[function_code] += 1
+        if unit_id is not None:
+            self.devices[unit_id] += 1
+        if is_request:
+            self.read = self.read or function_code in READ_FUNCTIONS
+            self.write = self.write or function_code in WRITE_FUNCTIONS
+        if timestamp is not None:
+            if self.last is not None and timestamp >= self.last:
+                self._add_interval(timestamp - self.last)
+            if self.first is None or timestamp < self.first:
+                self.first = timestamp
+            if self.last is None or timestamp > self.last:
+                self.last = timestamp
+
+    def _add_interval(self, seconds):
+        self.intervals[bisect_left(INTERVAL_BOUNDS, seconds)] += 1
+
+    def merge(self, other):
+        """
+        Fold another address's statistics into this one.
+
+        Every field merges by sum, union, or min/max, so merging is associative
+        and commutative. The one interval spanning the boundary between two
+        parts is not counted.
+        """
+        self.count += other.count
+        self.quantities.update(other.quantities)
+        self.functions.update(other.functions)
+        self.devices.update(other.devices)
+        self.read = self.read or other.read
+        self.write = self.write or other.write
+        for i, n in enumerate(other.intervals):
+            self.intervals[i] += n
+        if other.first is not None:
+            self.first = other.first if self.first is None else min(self.first, other.first)
+            self.last = other.last if self.last is None else max(self.last, other.last)
+        return self
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'quantities': _counter_to_json(self.quantities),
+            'functions': _counter_to_json(self.functions),
+            'devices': _counter_to_json(self.devices),
+            'read': self.read,
+            'write': self.write,
+            'first': self.first,
+            'last': self.last,
+            'intervals': list(self.intervals),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data['count']
+        stats.quantities = _counter_from_json(data['quantities'])
+        stats.functions = _counter_from_json(data['functions'])
+        stats.devices = _counter_from_json(data['devices'])
+        stats.read = data['read']
+        stats.write = data['write']
+        stats.first = data['first']
+        stats.last = data['last']
+        stats.intervals = list(data['intervals'])
+        return stats
+
+
+class AddressStatistics:
+    """Address statistics of one capture, period or site; mergeable and serializable."""
+
+    def __init__(self):
+        self.addresses = defaultdict(AddressStats)
+        self.unit_ids = set()
+        self.function_codes = Counter()
+        self.packets = 0
+
+    def record_packet(self, function_code, unit_id=None):
+        """Count a Modbus packet, whether or not it carries a starting address."""
+        self.packets += 1
+        self.function_codes[function_code] += 1
+        if unit_id is not None:
+            self.unit_ids.add(unit_id)
+
+    def record(self, address, quantity, function_code, unit_id=None, timestamp=None, is_request=True):
+        """Add one access to a starting address."""
+        self.addresses[address].record(quantity, function_code, unit_id, timestamp, is_request)
+
+    def merge(self, other):
+        """Fold another statistics object into this one (see AddressStats.merge)."""
+        for address, stats in other.addresses.items():
+            self.addresses[address].merge(stats)
+        self.unit_ids |= other.unit_ids
+        self.function_codes.update(other.function_codes)
+        self.packets += other.packets
+        return self
+
+    def __add__(self, other):
+        return AddressStatistics().merge(self).merge(other)
+
+    @classmethod
+    def combine(cls, parts):
+        """Merge any number of statistics objects into a new one."""
+        combined = cls()
+        for part in parts:
+            combined.merge(part)
+        return combined
+
+    def to_dict(self):
+        return {
+            'version': STATISTICS_VERSION,
+            'interval_bounds': list(INTERVAL_BOUNDS),
+            'packets': self.packets,
+            'unit_ids': sorted(self.unit_ids),
+            'function_codes': _counter_to_json(self.function_codes),
+            'addresses': {str(address): stats.to_dict()
+                          for address, stats in sorted(self.addresses.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild statistics from to_dict() output.
+
+        Raises:
+            ValueError: If the data has another version or histogram layout
+        """
+        if data.get('version') != STATISTICS_VERSION:
+            raise ValueError(f"Unsupported statistics version {data.get('version')}")
+        if tuple(data.get('interval_bounds', ())) != INTERVAL_BOUNDS:
+            raise ValueError("Statistics use different inter-arrival bins")
+        statistics = cls()
+        statistics.packets = data['packets']
+        statistics.unit_ids = set(data['unit_ids'])
+        statistics.function_codes = _counter_from_json(data['function_codes'])
+        for address, stats in data['addresses'].items():
+            statistics.addresses[int(address)] = AddressStats.from_dict(stats)
+        return statistics
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def rollup(statistics_by_period, key):
+    """
+    Merge period statistics into coarser periods.
+
+    Args:
+        statistics_by_period: {period start (epoch seconds): AddressStatistics}
+        key: Maps a period start to its coarser period, e.g.
+            lambda t: t - t % 86400 for days
+
+    Returns:
+        {coarser period: AddressStatistics}; statistics filed under None
+        (packets without a timestamp) stay under None
+    """
+    combined = {}
+    for start in sorted(start for start in statistics_by_period if start is not None):
+        bucket = key(start)
+        combined.setdefault(bucket, AddressStatistics()).merge(statistics_by_period[start])
+    if None in statistics_by_period:
+        combined[None] = AddressStatistics().merge(statistics_by_period[None])
+    return combined
+
+
+def _interval_labels():
+    """Human-readable label of each inter-arrival bin."""
+    labels = []
+    lower = 0.0
+    for upper in INTERVAL_BOUNDS:
+        labels.append(f"{lower:g}-{upper:g}s")
+        lower = upper
+    labels.append(f">{lower:g}s")
+    return labels
+
+
+def _iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
 
 class AddressAnalyzer:
     """Analyze Modbus starting addresses and read quantities."""
     
     def __init__(self):
-        self.address_stats = defaultdict(lambda: {
-            'count': 0,
-            'quantities': [],
-            'read': False,
-            'write': False,
-            'functions': [],
-            'timestamps': [],
-            'devices': set(),
-            'data_patterns': []
-        })
-        self.unit_ids = set()
-        self.function_codes = defaultdict(int)
-        
-    def analyze_from_json(self, json_file):
-        """Extract and analyze starting addresses from tshark JSON output."""
+        self.statistics = AddressStatistics()
+    
+    @property
+    def address_stats(self):
+        return self.statistics.addresses
+    
+    @property
+    def unit_ids(self):
+        return self.statistics.unit_ids
+    
+    @property
+    def function_codes(self):
+        return self.statistics.function_codes
+    
+    def _load_packets(self, json_file):
+        """Return the packets of a tshark JSON export, or None if unreadable."""
         if not Path(json_file).exists():
             print(f"File not found: {json_file}")
-            return False
+            return None
             
         try:
             with open(json_file, 'r') as f:
                 data = json.load(f)
         except (json.JSONDecodeError, IOError) as e:
             print(f"Error reading JSON: {e}")
-            return False
-        
-        packets = data.get('_packets', [])
-        print(f"Processing {len(packets)} packets...")
+            return None
         
-        for packet_num, packet in enumerate(packets, 1):
+        return data if isinstance(data, list) else data.get('_packets', [])
+    
+    def _packet_accesses(self, packets, statistics_for):
+        """
+        Record every packet into the statistics object chosen for its timestamp.
+        
+        Args:
+            packets: tshark JSON packets
+            statistics_for: Called with the frame epoch (or None), returns the
+                AddressStatistics to record into
+        """
+        for packet in packets:
             layers = packet.get('_source', {}).get('layers', {})
             modbus_layer = layers.get('modbus', {})
             
@@ -56,12 +294,17 @@ class AddressAnalyzer:
                 continue
             
             func_code = int(func_code)
-            self.function_codes[func_code] += 1
             
             # Extract unit ID
             unit_id = modbus_layer.get('modbus.unit_id')
-            if unit_id:
-                self.unit_ids.add(int(unit_id))
+            unit_id = int(unit_id) if unit_id else None
+            
+            # Extract frame time
+            frame_time = layers.get('frame', {}).get('frame.time_epoch')
+            timestamp = float(frame_time) if frame_time else None
+            
+            statistics = statistics_for(timestamp)
+            statistics.record_packet(func_code, unit_id)
             
             # Extract starting address
             start_addr = modbus_layer.get('modbus.starting_address')
@@ -83,29 +326,55 @@ class AddressAnalyzer:
             
             is_request = src_port != '502' if src_port else True
             
-            # Record statistics
-            stats = self.address_stats[start_addr]
-            stats['count'] += 1
-            if quantity not in stats['quantities']:
-                stats['quantities'].append(quantity)
-            if is_request:
-                stats['read'] = func_code in [3, 4]  # FC3=holding, FC4=input
-                stats['write'] = func_code in [5, 6, 15, 16]
-            
-            if func_code not in stats['functions']:
-                stats['functions'].append(func_code)
-            
-            # Extract frame time
-            frame_time = layers.get('frame', {}).get('frame.time')
-            if frame_time:
-                stats['timestamps'].append(frame_time)
-            
-            # Extract device (unit) ID
-            if unit_id:
-                stats['devices'].add(int(unit_id))
+            statistics.record(start_addr, quantity, func_code, unit_id, timestamp, is_request)
+    
+    def analyze_from_json(self, json_file):
+        """
+        Extract and analyze starting addresses from tshark JSON output.
+        
+        Repeated calls accumulate, so several exports can be analyzed in turn.
+        """
+        packets = self._load_packets(json_file)
+        if packets is None:
+            return False
         
+        print(f"Processing {len(packets)} packets...")
+        self._packet_accesses(packets, lambda timestamp: self.statistics)
         return True
     
+    def statistics_by_period(self, json_file, period=3600):
+        """
+        Analyze an export into one AddressStatistics per time period.
+        
+        Args:
+            json_file: tshark JSON export
+            period: Period length in seconds (default: one hour)
+        
+        Returns:
+            {period start (epoch seconds): AddressStatistics}; packets without
+            a timestamp are filed under None
+        """
+        packets = self._load_packets(json_file)
+        if packets is None:
+            return {}
+        
+        periods = defaultdict(AddressStatistics)
+        
+        def statistics_for(timestamp):
+            return periods[None if timestamp is None else int(timestamp // period * period)]
+        
+        self._packet_accesses(packets, statistics_for)
+        return dict(periods)
+    
+    def merge(self, statistics):
+        """Add statistics computed elsewhere (another hour, day or site)."""
+        self.statistics.merge(statistics)
+    
+    def save_statistics(self, output_file='address_statistics.json'):
+        """Save the mergeable statistics."""
+        self.statistics.save(output_file)
+        print(f"Statistics saved to: {output_file}")
+    
     def analyze_patterns(self):
         """Identify access patterns and data characteristics."""
         patterns = {
@@ -121,8 +390,8 @@ class AddressAnalyzer:
         
         for i, addr in enumerate(sorted_addrs):
             stats = self.address_stats[addr]
-            count = stats['count']
-            quantities = stats['quantities']
+            count = stats.count
+            quantities = sorted(stats.quantities)
             avg_quantity = sum(quantities) / len(quantities)
             
             # Categorize access patterns
@@ -206,14 +475,14 @@ class AddressAnalyzer:
         report.append("-" * 80)
         sorted_by_count = sorted(
             self.address_stats.items(),
-            key=lambda x: x[1]['count'],
+            key=lambda x: x[1].count,
             reverse=True
         )[:20]
         
         for addr, stats in sorted_by_count:
-            quantities_str = ', '.join(map(str, sorted(set(stats['quantities']))))
-            devices = ', '.join(map(str, sorted(stats['devices'])))
-            report.append(f"  Address 0x{addr:04X} ({addr:5d}): {stats['count']:4d} accesses, "
+            quantities_str = ', '.join(map(str, sorted(stats.quantities)))
+            devices = ', '.join(map(str, sorted(stats.devices)))
+            report.append(f"  Address 0x{addr:04X} ({addr:5d}): {stats.count:4d} accesses, "
                         f"Qty: [{quantities_str}], Units: [{devices}]")
         
         # Address ranges analysis
@@ -228,15 +497,15 @@ class AddressAnalyzer:
         
         for start in sorted(ranges.keys()):
             addrs = ranges[start]
-            count = sum(self.address_stats[a]['count'] for a in addrs)
+            count = sum(self.address_stats[a].count for a in addrs)
             report.append(f"  Range 0x{start:04X}-0x{start+99:04X}: {len(addrs):3d} addresses, "
                         f"{count:5d} total accesses")
         
         # Read/Write patterns
         report.append("\n5. READ/WRITE PATTERNS")
         report.append("-" * 80)
-        read_addrs = [a for a, s in self.address_stats.items() if s['read']]
-        write_addrs = [a for a, s in self.address_stats.items() if s['write']]
+        read_addrs = [a for a, s in self.address_stats.items() if s.read]
+        write_addrs = [a for a, s in self.address_stats.items() if s.write]
         both_addrs = [a for a in read_addrs if a in write_addrs]
         
         report.append(f"  Read-only addresses: {len(read_addrs)}")
@@ -253,7 +522,7 @@ class AddressAnalyzer:
         report.append("-" * 80)
         qty_distribution = defaultdict(int)
         for stats in self.address_stats.values():
-            for qty in stats['quantities']:
+            for qty in stats.quantities:
                 qty_distribution[qty] += 1
         
         for qty in sorted(qty_distribution.keys()):
@@ -280,11 +549,21 @@ class AddressAnalyzer:
         report.append("\n8. DEVICE-SPECIFIC ACCESS PATTERNS")
         report.append("-" * 80)
         for unit_id in sorted(self.unit_ids):
-            unit_addrs = [a for a, s in self.address_stats.items() if unit_id in s['devices']]
+            unit_addrs = [a for a, s in self.address_stats.items() if unit_id in s.devices]
             if unit_addrs:
-                total_accesses = sum(self.address_stats[a]['count'] for a in unit_addrs)
+                total_accesses = sum(self.address_stats[a].devices[unit_id] for a in unit_addrs)
                 report.append(f"  Unit {unit_id}: {len(unit_addrs)} addresses, {total_accesses} total accesses")
         
+        # Inter-arrival times
+        report.append("\n9. INTER-ARRIVAL TIMES (ALL ADDRESSES)")
+        report.append("-" * 80)
+        histogram = [sum(s.intervals[i] for s in self.address_stats.values())
+                     for i in range(len(INTERVAL_BOUNDS) + 1)]
+        total_intervals = sum(histogram)
+        for label, count in zip(_interval_labels(), histogram):
+            if count:
+                report.append(f"  {label:>12s}: {count:6d} ({count * 100 / total_intervals:5.1f}%)")
+        
         # Save report
         report_text = '\n'.join(report)
         with open(output_file, 'w') as f:
@@ -308,14 +587,17 @@ class AddressAnalyzer:
         for addr, stats in sorted(self.address_stats.items()):
             output['addresses'][f"0x{addr:04X}"] = {
                 'decimal': addr,
-                'access_count': stats['count'],
-                'quantities_read': sorted(set(stats['quantities'])),
-                'is_read': stats['read'],
-                'is_write': stats['write'],
-                'function_codes': sorted(set(stats['functions'])),
-                'devices': sorted(stats['devices']),
-                'timestamp_first': stats['timestamps'][0] if stats['timestamps'] else None,
-                'timestamp_last': stats['timestamps'][-1] if stats['timestamps'] else None
+                'access_count': stats.count,
+                'quantities_read': sorted(stats.quantities),
+                'is_read': stats.read,
+                'is_write': stats.write,
+                'function_codes': sorted(stats.functions),
+                'devices': sorted(stats.devices),
+                'timestamp_first': _iso(stats.first),
+                'timestamp_last': _iso(stats.last),
+                'quantity_counts': _counter_to_json(stats.quantities),
+                'device_counts': _counter_to_json(stats.devices),
+                'interarrival_histogram': dict(zip(_interval_labels(), stats.intervals)),
             }
         
         with open(output_file, 'w') as f:
@@ -328,11 +610,18 @@ def main():
     """Run analysis."""
     analyzer = AddressAnalyzer()
     
-    # Try to find JSON output from previous tshark capture
+    # tshark JSON exports and saved statistics given on the command line are
+    # merged; otherwise try the JSON output from a previous tshark capture
+    inputs = sys.argv[1:]
     json_file = 'modbus_capture.json'
     
-    # If not found, try to extract from PCAPNG
-    if not Path(json_file).exists():
+    if inputs:
+        for path in inputs:
+            try:
+                analyzer.merge(AddressStatistics.load(path))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                analyzer.analyze_from_json(path)
+    elif not Path(json_file).exists():
         print("Note: To use this script, first generate JSON output from tshark:")
         print('  tshark -r captures/modbus_test_2min.pcapng -T json > modbus_capture.json')
         print("\nFor demonstration, using sample data...\n")
@@ -352,18 +641,15 @@ def main():
         }
         
         analyzer.function_codes[3] = 1173
-        analyzer.unit_ids = {1, 2, 3, 4, 5, 6, 247}
-        
-        for addr, stats in sample_addresses.items():
-            analyzer.address_stats[addr] = {
-                'count': stats['count'],
-                'quantities': stats['quantities'],
-                'read': stats['read'],
-                'write': False,
-                'functions': stats['functions'],
-                'timestamps': [],
-                'devices': {1, 2, 3}
-            }
+        analyzer.unit_ids.update({1, 2, 3, 4, 5, 6, 247})
+        
+        for addr, sample in sample_addresses.items():
+            stats = analyzer.address_stats[addr]
+            stats.count = sample['count']
+            stats.quantities.update(sample['quantities'])
+            stats.read = sample['read']
+            stats.functions.update(sample['functions'])
+            stats.devices.update({1: 1, 2: 1, 3: 1})
     else:
         analyzer.analyze_from_json(json_file)
     
@@ -374,6 +660,7 @@ def main():
     
     report = analyzer.generate_report('address_analysis.txt')
     analyzer.generate_json_output('address_analysis.json')
+    analyzer.save_statistics('address_statistics.json')
     
     print("\n" + report[:500] + "\n...")
 
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Bus Utilization Model
+Throughput and saturation of each gateway's RS-485 bus, from the paired
+transactions of captures.
+
+A gateway serves one transaction at a time, so service starts when the
+request arrives or the previous response leaves, whichever is later; the
+wait before that is queueing delay. Service times are fitted as a fixed
+per-transaction overhead (gateway latency, turnaround, framing) plus a
+per-byte cost, which prices the what-if of coalescing a unit's reads into
+fewer, larger ones.
+"""
+
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+try:
+    from src.analysis.poll_cycles import BITS_PER_CHAR, DEFAULT_BAUD, LinearFit, rtu_frame_bytes
+    from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+    from src.modbus.register_decoder import DEFAULT_MAX_GAP, MAX_BLOCK_REGISTERS
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.analysis.poll_cycles import BITS_PER_CHAR, DEFAULT_BAUD, LinearFit, rtu_frame_bytes
+    from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+    from src.modbus.register_decoder import DEFAULT_MAX_GAP, MAX_BLOCK_REGISTERS
+
+# Largest read per function code (coils/inputs count bits)
+MAX_READ_QUANTITY = {1: 2000, 2: 2000, 3: MAX_BLOCK_REGISTERS, 4: MAX_BLOCK_REGISTERS}
+
+# Read-through gaps tried by the coalescing what-ifs
+WHATIF_GAPS = (0, DEFAULT_MAX_GAP)
+
+
+def _pdu_bytes(tcp_bytes):
+    """PDU length of a Modbus TCP frame (MBAP header and unit ID removed)."""
+    return tcp_bytes - 7
+
+
+def _read_pdu_bytes(function_code, quantity):
+    """Request and response PDU lengths of a read."""
+    data = (quantity + 7) // 8 if function_code in (1, 2) else 2 * quantity
+    return 5, 2 + data
+
+
+def coalesce_reads(reads, max_gap, max_quantity=MAX_BLOCK_REGISTERS):
+    """
+    Merge (start, quantity) reads the way the poller plans its blocks.
+
+    Args:
+        reads: (start, quantity) spans of one unit and function code
+        max_gap: Largest run of unread registers read through
+        max_quantity: Largest merged read
+
+    Returns:
+        Merged (start, quantity, members) spans, members being indices into reads
+    """
+    merged = []
+    for index in sorted(range(len(reads)), key=lambda i: reads[i]):
+        start, quantity = reads[index]
+        end = start + quantity
+        if merged:
+            block_start, block_end, members = merged[-1]
+            if start - block_end <= max_gap and max(block_end, end) - block_start <= max_quantity:
+                merged[-1] = (block_start, max(block_end, end), members + [index])
+                continue
+        merged.append((start, end, [index]))
+    return [(start, end - start, members) for start, end, members in merged]
+
+
+class ServiceModel:
+    """Service time of a transaction: fixed overhead plus time per RTU byte."""
+
+    def __init__(self, overhead, per_byte):
+        self.overhead = overhead
+        self.per_byte = per_byte
+
+    @classmethod
+    def fit(cls, samples):
+        """
+        Fit service times against RTU frame sizes.
+
+        When sizes do not vary, or larger frames are not slower, the mean
+        service time is taken as a flat cost per transaction.
+
+        Args:
+            samples: (rtu_bytes, service_time) of answered transactions
+        """
+        fit = LinearFit()
+        for size, seconds in samples:
+            fit.add(size, seconds)
+        per_byte = fit.slope
+        if per_byte is None or per_byte <= 0:
+            return cls(fit.mean_y, 0.0)
+        return cls(max(fit.intercept, 0.0), per_byte)
+
+    def read_time(self, function_code, quantity):
+        """Predicted service time of one read."""
+        request, response = _read_pdu_bytes(function_code, quantity)
+        return self.overhead + self.per_byte * (rtu_frame_bytes(request) + rtu_frame_bytes(response))
+
+
+class BusUtilizationModel:
+    """Per-gateway and per-unit load, capacity and coalescing what-ifs."""
+
+    def __init__(self, baud=DEFAULT_BAUD, whatif_gaps=WHATIF_GAPS):
+        """
+        Initialize model.
+
+        Args:
+            baud: RS-485 line speed, for the wire time of transactions
+            whatif_gaps: max_gap values tried when coalescing reads
+        """
+        self.baud = baud
+        self.whatif_gaps = tuple(whatif_gaps)
+        self.gateways = {}
+
+    def add_transactions(self, transactions, gateway='logger'):
+        """Add paired transactions (pcap_extractor.Transaction) seen on a gateway."""
+        self.gateways.setdefault(gateway, []).extend(transactions)
+
+    def add_capture(self, capture_file, gateway=None):
+        """Pair and add every transaction of a pcap/pcapng capture."""
+        reader = PCAPReader(capture_file)
+        frames = reader.read()
+        self.add_transactions(ModbusFrameProcessor.pair_transactions(frames, reader.timestamps),
+                              gateway or Path(capture_file).stem)
+
+    def _serve(self, transactions):
+        """FIFO service of one gateway: (transaction, queue delay, service time) per answer."""
+        served = []
+        free_at = None
+        for tx in sorted(transactions, key=lambda t: t.request_time):
+            if tx.response_time is None:
+                continue
+            begin = tx.request_time if free_at is None else max(tx.request_time, free_at)
+            begin = min(begin, tx.response_time)
+            served.append((tx, begin - tx.request_time, tx.response_time - begin))
+            free_at = tx.response_time if free_at is None else max(free_at, tx.response_time)
+        return served
+
+    def _rtu_bytes(self, tx):
+        return (rtu_frame_bytes(_pdu_bytes(tx.request_bytes)) +
+                (rtu_frame_bytes(_pdu_bytes(tx.response_bytes)) if tx.response_bytes else 0))
+
+    def _load(self, transactions, served, duration):
+        """Rates, busy fraction and delays of a set of transactions."""
+        wire = sum(self._rtu_bytes(tx) for tx in transactions) * BITS_PER_CHAR / self.baud
+        busy = sum(service for _, _, service in served)
+        delays = [delay for _, delay, _ in served]
+        return {
+            'transactions': len(transactions),
+            'timeouts': len(transactions) - len(served),
+            'transactions_per_second': len(transactions) / duration if duration else 0.0,
+            'bytes_per_second': (sum(tx.request_bytes + tx.response_bytes for tx in transactions) /
+                                 duration if duration else 0.0),
+            'busy_fraction': busy / duration if duration else 0.0,
+            # More wire time than service time means the line is faster than self.baud
+            'wire_fraction': min(wire / busy, 1.0) if busy else None,
+            'wire_time': wire,
+            'service_time': busy,
+            'avg_service_time': busy / len(served) if served else None,
+            'avg_queue_delay': sum(delays) / len(delays) if delays else None,
+            'max_queue_delay': max(delays) if delays else None,
+        }
+
+    def _unit_reads(self, served, duration):
+        """Reads of one unit with their rate and mean service time."""
+        reads = defaultdict(lambda: [0, 0.0])
+        for tx, _, service in served:
+            if tx.function_code in MAX_READ_QUANTITY:
+                read = reads[(tx.function_code, tx.start, tx.quantity)]
+                read[0] += 1
+                read[1] += service
+        return {key: {'rate': count / duration, 'service': total / count}
+                for key, (count, total) in reads.items()}
+
+    def _coalescing(self, reads, model, cycle_rate):
+        """What-if of merging the reads of one unit at each configured gap."""
+        results = []
+        current = sum(read['rate'] * read['service'] for read in reads.values())
+        by_function = defaultdict(list)
+        for function_code, start, quantity in reads:
+            by_function[function_code].append((start, quantity))
+        for max_gap in self.whatif_gaps:
+            after = 0.0
+            merged_count = 0
+            extra = 0
+            for function_code, spans in by_function.items():
+                for start, quantity, members in coalesce_reads(
+                        spans, max_gap, MAX_READ_QUANTITY[function_code]):
+                    member_reads = [reads[(function_code,) + spans[i]] for i in members]
+                    merged_count += 1
+                    extra += quantity - len({a for i in members
+                                             for a in range(spans[i][0], sum(spans[i]))})
+                    if len(members) == 1:
+                        after += member_reads[0]['rate'] * member_reads[0]['service']
+                    else:
+                        # Merged read runs as often as its most frequent member
+                        rate = max(read['rate'] for read in member_reads)
+                        after += rate * model.read_time(function_code, quantity)
+            saved = current - after
+            results.append({
+                'max_gap': max_gap,
+                'reads_before': len(reads),
+                'reads_after': merged_count,
+                'registers_read_through': extra,
+                'saved_per_second': saved,
+                'saved_per_cycle': saved / cycle_rate if cycle_rate else None,
+                'busy_fraction_after': after,
+            })
+        return results
+
+    def summary(self):
+        """
+        Load, capacity and what-ifs per gateway and unit.
+
+        Times are in seconds. 'max_poll_rate' is the cycle rate a unit could
+        reach with the bus to itself; 'headroom' is how many times faster
+        every unit could poll before the gateway saturates.
+        """
+        result = {'baud': self.baud, 'gateways': {}}
+        for gateway, transactions in self.gateways.items():
+            if not transactions:
+                continue
+            times = [tx.request_time for tx in transactions] + \
+                    [tx.response_time for tx in transactions if tx.response_time is not None]
+            duration = max(times) - min(times)
+            served = self._serve(transactions)
+            model = ServiceModel.fit((self._rtu_bytes(tx), service) for tx, _, service in served)
+            entry = self._load(transactions, served, duration)
+            entry.update({
+                'duration': duration,
+                'overhead_per_transaction': model.overhead,
+                'seconds_per_byte': model.per_byte,
+                'max_transactions_per_second': (1 / entry['avg_service_time']
+                                                if entry['avg_service_time'] else None),
+                'headroom': 1 / entry['busy_fraction'] if entry['busy_fraction'] else None,
+                'units': {},
+            })
+
+            for unit_id in sorted({tx.unit_id for tx in transactions}):
+                unit_tx = [tx for tx in transactions if tx.unit_id == unit_id]
+                unit_served = [s for s in served if s[0].unit_id == unit_id]
+                unit = self._load(unit_tx, unit_served, duration)
+                reads = self._unit_reads(unit_served, duration) if duration else {}
+                # The most frequent read sets the unit's poll cycle
+                cycle_rate = max((read['rate'] for read in reads.values()), default=0.0)
+                cycle_time = (sum(read['rate'] * read['service'] for read in reads.values()) /
+                              cycle_rate if cycle_rate else None)
+                unit.update({
+                    'reads': len(reads),
+                    'cycle_rate': cycle_rate,
+                    'bus_time_per_cycle': cycle_time,
+                    'max_poll_rate': 1 / cycle_time if cycle_time else None,
+                    'coalescing': self._coalescing(reads, model, cycle_rate) if reads else [],
+                })
+                entry['units'][f'Unit_{unit_id}'] = unit
+            result['gateways'][gateway] = entry
+        return result
+
+    def generate_report(self, output_file=None, summary=None):
+        """Human-readable load report; also written to output_file if given."""
+        summary = summary or self.summary()
+
+        def ms(value):
+            return '-' if value is None else f"{value * 1000:.1f} ms"
+
+        report = []
+        report.append("=" * 80)
+        report.append("MODBUS BUS UTILIZATION MODEL")
+        report.append("=" * 80)
+        for gateway, entry in summary['gateways'].items():
+            report.append("")
+            report.append(f"Gateway {gateway}: {entry['transactions']} transactions in "
+                          f"{entry['duration']:.1f} s, {entry['timeouts']} unanswered")
+            report.append("-" * 80)
+            report.append(f"  Throughput:   {entry['transactions_per_second']:.1f} tx/s, "
+                          f"{entry['bytes_per_second']:.0f} B/s")
+            report.append(f"  Busy:         {entry['busy_fraction'] * 100:.1f}%"
+                          + (f" (headroom x{entry['headroom']:.1f})" if entry['headroom'] else ""))
+            report.append(f"  Service:      avg {ms(entry['avg_service_time'])}, "
+                          f"overhead {ms(entry['overhead_per_transaction'])}/tx + "
+                          f"{entry['seconds_per_byte'] * 1e6:.0f} us/byte")
+            if entry['wire_fraction'] is not None:
+                report.append(f"  On the wire:  {entry['wire_fraction'] * 100:.1f}% of service time "
+                              f"at {summary['baud']} baud")
+                if entry['wire_time'] > entry['service_time']:
+                    report.append(f"  Warning:      wire time exceeds service time "
+                                  f"({entry['wire_time'] / entry['service_time'] * 100:.0f}%); "
+                                  f"the bus runs faster than {summary['baud']} baud (--baud)")
+            report.append(f"  Queue delay:  avg {ms(entry['avg_queue_delay'])}, "
+                          f"max {ms(entry['max_queue_delay'])}")
+            if entry['max_transactions_per_second']:
+                report.append(f"  Capacity:     {entry['max_transactions_per_second']:.1f} tx/s")
+
+            for unit_key, unit in entry['units'].items():
+                report.append("")
+                report.append(f"  {unit_key}: {unit['transactions_per_second']:.1f} tx/s, "
+                              f"{unit['bytes_per_second']:.0f} B/s, "
+                              f"busy {unit['busy_fraction'] * 100:.1f}%, {unit['reads']} reads")
+                if unit['bus_time_per_cycle']:
+                    report.append(f"    Cycle: {unit['cycle_rate']:.2f}/s, "
+                                  f"{ms(unit['bus_time_per_cycle'])} of bus time, "
+                                  f"max {unit['max_poll_rate']:.1f} cycles/s alone")
+                for whatif in unit['coalescing']:
+                    if whatif['reads_after'] < whatif['reads_before']:
+                        report.append(f"    Coalescing {whatif['reads_before']} reads into "
+                                      f"{whatif['reads_after']} (gap {whatif['max_gap']}) saves "
+                                      f"{ms(whatif['saved_per_cycle'])} per cycle "
+                                      f"(+{whatif['registers_read_through']} registers)")
+
+        text = "\n".join(report)
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print(f"Report saved to: {output_file}")
+        return text
+
+
+def main():
+    """Model bus load from one or more captures (one gateway each)."""
+    if len(sys.argv) < 2:
+        print("Usage: python bus_model.py <capture> [<capture> ...] [--baud N]")
+        print("  Prefix a capture with NAME= to label its gateway")
+        return
+
+    args = sys.argv[1:]
+    baud = DEFAULT_BAUD
+    if '--baud' in args:
+        index = args.index('--baud')
+        baud = int(args[index + 1])
+        del args[index:index + 2]
+
+    model = BusUtilizationModel(baud)
+    for arg in args:
+        gateway, _, capture = arg.rpartition('=')
+        if not Path(capture).exists():
+            print(f"Error: {capture} not found")
+            return
+        model.add_capture(capture, gateway or None)
+
+    summary = model.summary()
+    print(model.generate_report('bus_utilization_report.txt', summary))
+    with open('bus_utilization.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+    print("Model saved to: bus_utilization.json")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Compiled Register Maps
+Compact binary form of the register-map JSON documents produced by the
+pipeline (sungrow_live_register_map.json, sungrow_documented_mapping.json
+and the decoder's group maps). Register tables become a sorted address
+array plus fixed-width rows of string-table references, so a compiled map
+opens with one mmap and answers address lookups by bisection, decoding
+only the records that are actually read.
+
+File layout (little-endian):
+    header     magic, version, counts, section offsets, source digest,
+               source size and modification time
+    tables     path, kind, first record and record count per table
+    addresses  uint32 per record, sorted within each table
+    records    flags + one string ID per column per record
+    strings    offsets array followed by the UTF-8 blob (deduplicated)
+
+Everything outside the register tables (metadata, statistics, per-unit
+fields) is kept as a JSON skeleton in the string table, so conversion
+back to JSON reproduces the original document.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+MAGIC = b'SRM1'
+VERSION = 2
+SUFFIX = '.srm'
+
+HEADER = struct.Struct('<4sHHIIIIIIIII16sQq')
+TABLE = struct.Struct('<IIII')
+
+# Record fields stored in their own column; any other key goes to 'extra'
+COLUMNS = ('name', 'type', 'unit', 'scale', 'category', 'data_type', 'estimated_type',
+           'access_count', 'total_accesses', 'accessed_by_units', 'unique_values',
+           'unique_values_observed', 'most_common_value', 'note')
+ROW = struct.Struct(f'<{len(COLUMNS) + 2}I')
+
+ABSENT = 0xFFFFFFFF
+HAS_ADDRESS = 0x1          # record carries an 'address' key equal to its table key
+
+TABLE_MAP = 0              # {"5002": {...}, ...}
+TABLE_LIST = 1             # [{"address": 0, ...}, ...] sorted by address
+TABLE_MARKER = '$table'
+
+
+def _is_map_table(node):
+    return (isinstance(node, dict) and node
+            and all(key.isdigit() and str(int(key)) == key and isinstance(value, dict)
+                    for key, value in node.items()))
+
+
+def _is_list_table(node):
+    if not (isinstance(node, list) and node):
+        return False
+    addresses = [item.get('address') if isinstance(item, dict) else None for item in node]
+    return (all(type(address) is int and address >= 0 for address in addresses)
+            and all(a < b for a, b in zip(addresses, addresses[1:])))
+
+
+class _StringTable:
+    """Deduplicating string table used while compiling."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, text):
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return sid
+
+    def add_json(self, value):
+        return self.add(json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+
+
+def compile_document(document, source_digest=b'', source_stat=None):
+    """
+    Compile a register-map document to the binary format.
+
+    Args:
+        document: Parsed register-map JSON document
+        source_digest: Digest of the JSON file the document was read from
+        source_stat: os.stat_result of that file, checked before the digest
+
+    Returns:
+        Compiled map bytes
+    """
+    strings = _StringTable()
+    tables = []
+    addresses = []
+    rows = []
+
+    def add_record(address, record):
+        flags = 0
+        extra = {}
+        for key, value in record.items():
+            if key == 'address' and value == address and type(value) is int:
+                flags |= HAS_ADDRESS
+            elif key not in COLUMNS:
+                extra[key] = value
+        row = [flags]
+        row.extend(strings.add_json(record[column]) if column in record else ABSENT
+                   for column in COLUMNS)
+        row.append(strings.add_json(extra) if extra else ABSENT)
+        addresses.append(address)
+        rows.append(ROW.pack(*row))
+
+    def split(node, path):
+        if _is_map_table(node) or _is_list_table(node):
+            kind = TABLE_MAP if isinstance(node, dict) else TABLE_LIST
+            items = (sorted((int(key), value) for key, value in node.items()) if kind == TABLE_MAP
+                     else [(item['address'], item) for item in node])
+            tables.append(TABLE.pack(strings.add_json(path), kind, len(addresses), len(items)))
+            for address, record in items:
+                add_record(address, record)
+            return {TABLE_MARKER: len(tables) - 1}
+        if isinstance(node, dict):
+            return {key: split(value, path + [key]) for key, value in node.items()}
+        return node
+
+    skeleton_sid = strings.add_json(split(document, []))
+
+    blob = bytearray()
+    offsets = [0]
+    for text in strings.strings:
+        blob += text.encode('utf-8')
+        offsets.append(len(blob))
+
+    tables_off = HEADER.size
+    addresses_off = tables_off + TABLE.size * len(tables)
+    records_off = addresses_off + 4 * len(addresses)
+    strings_off = records_off + ROW.size * len(rows)
+    blob_off = strings_off + 4 * len(offsets)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(tables), len(addresses), len(strings.strings),
+                         tables_off, addresses_off, records_off, strings_off, blob_off,
+                         skeleton_sid, source_digest[:16].ljust(16, b'\0'),
+                         source_stat.st_size if source_stat else 0,
+                         source_stat.st_mtime_ns if source_stat else 0)
+    return b''.join([header, *tables, struct.pack(f'<{len(addresses)}I', *addresses), *rows,
+                     struct.pack(f'<{len(offsets)}I', *offsets), bytes(blob)])
+
+
+def file_digest(path):
+    """Digest of a JSON source file, recorded in the maps compiled from it."""
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+class CompiledTable(Mapping):
+    """Lazy address -> record view of one compiled map table."""
+
+    def __init__(self, compiled, first, count):
+        self.compiled = compiled
+        self.first = first
+        self.count = count
+
+    def index(self, address):
+        """Record index of an address, or -1 if the table does not have it."""
+        addresses = self.compiled.addresses
+        end = self.first + self.count
+        i = bisect_left(addresses, address, self.first, end)
+        return i if i < end and addresses[i] == address else -1
+
+    def lookup(self, address):
+        """Return the record of an address (int), or None."""
+        i = self.index(address)
+        return self.compiled.record(i) if i >= 0 else None
+
+    def addresses(self):
+        """Sorted addresses of the table (zero-copy view)."""
+        return self.compiled.addresses[self.first:self.first + self.count]
+
+    def range(self, start, end):
+        """Yield (address, record) for start <= address <= end."""
+        addresses = self.compiled.addresses
+        stop = self.first + self.count
+        i = bisect_left(addresses, start, self.first, stop)
+        while i < stop and addresses[i] <= end:
+            yield addresses[i], self.compiled.record(i)
+            i += 1
+
+    def __getitem__(self, key):
+        try:
+            address = int(key)
+        except (TypeError, ValueError):
+            raise KeyError(key)
+        i = self.index(address)
+        if i < 0:
+            raise KeyError(key)
+        return self.compiled.record(i)
+
+    def __contains__(self, key):
+        try:
+            return self.index(int(key)) >= 0
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        return (str(address) for address in self.addresses())
+
+    def __len__(self):
+        return self.count
+
+
+class CompiledList(Sequence):
+    """Lazy record-list view of a compiled table stored from a JSON list."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('record index out of range')
+        return self.table.compiled.record(self.table.first + i)
+
+    def __len__(self):
+        return self.table.count
+
+
+class CompiledRegisterMap:
+    """Read-only access to a compiled register map."""
+
+    def __init__(self, path=None, data=None, use_mmap=True):
+        """
+        Open a compiled map.
+
+        Args:
+            path: .srm file to open
+            data: Compiled bytes instead of a file
+            use_mmap: Map the file instead of reading it
+
+        Raises:
+            ValueError: If the data is not a compiled register map
+        """
+        self._file = None
+        self._mmap = None
+        if data is None:
+            self._file = open(path, 'rb')
+            if use_mmap:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                data = self._mmap
+            else:
+                data = self._file.read()
+        self.buffer = memoryview(data)
+        if len(self.buffer) < HEADER.size:
+            raise ValueError('not a compiled register map (too short)')
+        (magic, version, _, self.table_count, self.record_count, self.string_count,
+         tables_off, addresses_off, records_off, strings_off, self.blob_off,
+         self.skeleton_sid, self.source_digest, self.source_size,
+         self.source_mtime_ns) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'not a compiled register map (magic {magic!r}, version {version})')
+
+        self.addresses = self._uint32(addresses_off, self.record_count)
+        self.offsets = self._uint32(strings_off, self.string_count + 1)
+        self.records_off = records_off
+        self.tables = []
+        self.paths = {}
+        self._strings = {}
+        self._document = None
+        for i in range(self.table_count):
+            path_sid, kind, first, count = TABLE.unpack_from(self.buffer, tables_off + i * TABLE.size)
+            self.tables.append((kind, CompiledTable(self, first, count)))
+            self.paths[tuple(self._json(path_sid))] = i
+
+    def _uint32(self, offset, count):
+        view = self.buffer[offset:offset + 4 * count]
+        if sys.byteorder == 'little':
+            return view.cast('I')
+        values = list(struct.unpack(f'<{count}I', view))
+        return values
+
+    def string(self, sid):
+        """Return one entry of the string table."""
+        text = self._strings.get(sid)
+        if text is None:
+            start = self.blob_off + self.offsets[sid]
+            end = self.blob_off + self.offsets[sid + 1]
+            text = self._strings[sid] = str(self.buffer[start:end], 'utf-8')
+        return text
+
+    def _json(self, sid):
+        return json.loads(self.string(sid))
+
+    def record(self, index):
+        """Decode the record at a global record index."""
+        row = ROW.unpack_from(self.buffer, self.records_off + index * ROW.size)
+        record = {}
+        if row[0] & HAS_ADDRESS:
+            record['address'] = self.addresses[index]
+        for column, sid in zip(COLUMNS, row[1:-1]):
+            if sid != ABSENT:
+                record[column] = self._json(sid)
+        if row[-1] != ABSENT:
+            record.update(self._json(row[-1]))
+        return record
+
+    def table(self, *path):
+        """
+        Return the table at a document path.
+
+        Example:
+            table('registers_by_unit', 'Unit_1', 'registers')
+
+        Raises:
+            KeyError: If no table is stored at that path
+        """
+        return self.tables[self.paths[tuple(path)]][1]
+
+    def lookup(self, path, address):
+        """Return the record of an address in the table at path, or None."""
+        index = self.paths.get(tuple(path))
+        return self.tables[index][1].lookup(address) if index is not None else None
+
+    @property
+    def document(self):
+        """
+        The document with lazy tables in place of register dictionaries.
+
+        Compatible with code reading the JSON document (dict access,
+        .get, .items); records are decoded when accessed. The lazy tables
+        are not JSON-serializable: pass the document through to_document()
+        before json.dump().
+        """
+        if self._document is None:
+            self._document = self._inflate(self._json(self.skeleton_sid), lazy=True)
+        return self._document
+
+    def to_document(self):
+        """Return the complete document as plain dictionaries and lists."""
+        return self._inflate(self._json(self.skeleton_sid), lazy=False)
+
+    def is_current(self, json_file):
+        """
+        Whether the map was compiled from the current content of a JSON file.
+
+        The file's size and modification time are compared first; the
+        content is only hashed when the modification time differs (a fresh
+        checkout, or a file rewritten with the same content).
+        """
+        stat = os.stat(json_file)
+        if stat.st_size != self.source_size:
+            return False
+        if stat.st_mtime_ns == self.source_mtime_ns:
+            return True
+        return file_digest(json_file) == self.source_digest
+
+    def _inflate(self, node, lazy):
+        if isinstance(node, dict):
+            if len(node) == 1 and TABLE_MARKER in node:
+                kind, table = self.tables[node[TABLE_MARKER]]
+                if kind == TABLE_LIST:
+                    return CompiledList(table) if lazy else [table.compiled.record(i) for i in
+                                                             range(table.first, table.first + table.count)]
+                return table if lazy else {key: table[key] for key in table}
+            return {key: self._inflate(value, lazy) for key, value in node.items()}
+        return node
+
+    def close(self):
+        """Release the mapping and the file."""
+        try:
+            for view in (self.addresses, self.offsets, self.buffer):
+                if isinstance(view, memoryview):
+                    view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            pass   # record views are still in use; the mapping is freed with them
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compiled_path(json_file):
+    """Path of the compiled map stored next to a JSON register map."""
+    return Path(json_file).with_suffix(SUFFIX)
+
+
+def compile_file(json_file, output_file=None):
+    """
+    Compile a register-map JSON file.
+
+    Args:
+        json_file: Source JSON document
+        output_file: Destination (default: same name with .srm suffix)
+
+    Returns:
+        Path of the compiled map
+    """
+    with open(json_file, 'rb') as f:
+        source_stat = os.fstat(f.fileno())
+        raw = f.read()
+    output = Path(output_file) if output_file else compiled_path(json_file)
+    data = compile_document(json.loads(raw), hashlib.blake2b(raw, digest_size=16).digest(),
+                            source_stat)
+    output.write_bytes(data)
+    return output
+
+
+def export_json(compiled_file, json_file, indent=2):
+    """Write a compiled map back out as a JSON document."""
+    with CompiledRegisterMap(compiled_file, use_mmap=False) as compiled:
+        document = compiled.to_document()
+    with open(json_file, 'w') as f:
+        json.dump(document, f, indent=indent)
+    return Path(json_file)
+
+
+def to_document(document):
+    """
+    Plain copy of a document returned by load_register_map().
+
+    Compiled documents hold lazy tables that json.dump() rejects; the copy
+    has them expanded into dictionaries and lists. Plain documents are
+    copied as they are.
+    """
+    if isinstance(document, Mapping):
+        return {key: to_document(value) for key, value in document.items()}
+    if isinstance(document, (list, CompiledList)):
+        return [to_document(value) for value in document]
+    return document
+
+
+def load_register_map(path, prefer_compiled=True):
+    """
+    Load a register map, using its compiled form when it is up to date.
+
+    Args:
+        path: .json document or .srm compiled map
+        prefer_compiled: For a .json path, open the sibling .srm instead when
+            it was compiled from the current content of that file
+
+    Returns:
+        Document (plain for JSON, with lazy tables when compiled; use
+        to_document() for a copy that can be written back out as JSON)
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the JSON or the compiled map is invalid
+    """
+    path = Path(path)
+    if path.suffix == SUFFIX:
+        return CompiledRegisterMap(path).document
+    if prefer_compiled:
+        compiled = compiled_path(path)
+        if compiled.exists():
+            try:
+                candidate = CompiledRegisterMap(compiled)
+                if candidate.is_current(path):
+                    return candidate.document
+                candidate.close()
+            except ValueError:
+                pass
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    """Compile, export or inspect register maps."""
+    parser = argparse.ArgumentParser(description='Compiled register map tool')
+    sub = parser.add_subparsers(dest='command', required=True)
+    compile_cmd = sub.add_parser('compile', help='JSON -> .srm')
+    compile_cmd.add_argument('json_files', nargs='+')
+    export_cmd = sub.add_parser('export', help='.srm -> JSON')
+    export_cmd.add_argument('compiled_file')
+    export_cmd.add_argument('json_file')
+    info_cmd = sub.add_parser('info', help='Show tables and time a lookup')
+    info_cmd.add_argument('compiled_file')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        for json_file in args.json_files:
+            output = compile_file(json_file)
+            print(f"✓ {json_file} ({Path(json_file).stat().st_size:,} bytes) -> "
+                  f"{output} ({output.stat().st_size:,} bytes)")
+    elif args.command == 'export':
+        print(f"✓ Exported {export_json(args.compiled_file, args.json_file)}")
+    else:
+        began = time.perf_counter()
+        compiled = CompiledRegisterMap(args.compiled_file)
+        opened = time.perf_counter() - began
+        print(f"{args.compiled_file}: {compiled.table_count} tables, {compiled.record_count} records, "
+              f"{compiled.string_count} strings, opened in {opened * 1000:.2f} ms")
+        for path, index in compiled.paths.items():
+            table = compiled.tables[index][1]
+            addresses = table.addresses()
+            print(f"  {'/'.join(path):45s} {len(table):5d} records "
+                  f"({addresses[0]}-{addresses[-1]})")
+
+
+if __name__ == '__main__':
+    main()
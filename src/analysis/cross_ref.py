@@ -5,10 +5,30 @@ Maps response data to specific registers and validates against known patterns.
 """
 
 import json
+import math
+import struct
+import sys
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
 
+try:
+    from src.utils.range_index import RangeIndex
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.range_index import RangeIndex
+
+try:
+    import numpy as np
+except ImportError:  # optional; batch validation falls back to pure Python
+    np = None
+
+# Checks counted by validate_batch
+VALIDATION_CHECKS = ('range', 'scale', 'code', 'truncated')
+
+# A value that fits the limits once divided by one of these has a suspect scale
+SCALE_DIVISORS = (10, 100)
+
 class SungrowCrossReference:
     """Cross-reference Modbus addresses with official Sungrow documentation."""
     
@@ -74,10 +94,33 @@ class SungrowCrossReference:
         0x0005: 'Maintenance',
     }
     
+    # Plausible engineering value ranges by unit
+    VALUE_LIMITS = {
+        'V': (0, 1500),
+        'A': (-100, 100),
+        'W': (-200000, 200000),
+        'Hz': (0, 70),
+        '%': (0, 100),
+        '°C': (-40, 125),
+        'kWh': (0, 100000000),
+        'hours': (0, 500000),
+    }
+    
+    # Registers holding enumerated codes, with every valid value
+    CODE_REGISTERS = {
+        0x0000: frozenset(STATUS_CODES),
+        0x0001: frozenset(FAULT_CODES) | {0},
+    }
+    
     def __init__(self):
         self.captured_addresses = {}
         self.cross_reference = {}
         self.pattern_matches = defaultdict(list)
+        # Span of every documented register, multi-register types included
+        self.documented = RangeIndex(
+            (addr, addr + (self.DATA_TYPES.get(doc['type']) or 1) - 1, addr)
+            for addr, doc in self.OFFICIAL_REGISTERS.items()
+        )
         
     def load_captured_addresses(self, json_file):
         """Load captured addresses from analysis output."""
@@ -96,21 +139,28 @@ class SungrowCrossReference:
             return False
     
     def cross_reference_addresses(self):
-        """Map captured addresses to official documentation."""
-        documented = 0
-        undocumented = 0
-        
+        """
+        Map captured addresses to official documentation.
+
+        Each captured start address is expanded over its largest read, so
+        every documented register inside a multi-register read is mapped.
+        """
         for addr_hex, captured_data in sorted(self.captured_addresses.items()):
             try:
                 addr_int = int(addr_hex, 16) if isinstance(addr_hex, str) else addr_hex
             except ValueError:
                 continue
             
-            if addr_int in self.OFFICIAL_REGISTERS:
-                doc = self.OFFICIAL_REGISTERS[addr_int]
-                self.cross_reference[addr_int] = {
-                    'address': addr_int,
-                    'hex': f'0x{addr_int:04X}',
+            count = max(captured_data.get('quantities_read') or [1])
+            covered = self.documented.overlapping(addr_int, count)
+            for _, last, doc_addr in covered:
+                if doc_addr > addr_int and (last >= addr_int + count or doc_addr in self.cross_reference):
+                    # Cut off by the end of the read, or mapped by its own read
+                    continue
+                doc = self.OFFICIAL_REGISTERS[doc_addr]
+                entry = {
+                    'address': max(doc_addr, addr_int),
+                    'hex': f'0x{max(doc_addr, addr_int):04X}',
                     'name': doc['name'],
                     'documented': True,
                     'type': doc['type'],
@@ -120,8 +170,16 @@ class SungrowCrossReference:
                     'captured': captured_data,
                     'register_size': self.DATA_TYPES.get(doc['type'], 1)
                 }
-                documented += 1
-            else:
+                if doc_addr > addr_int:
+                    # Covered by a read starting below the register
+                    entry['read_start'] = addr_int
+                elif doc_addr < addr_int:
+                    # Read starts inside a multi-register value
+                    entry['name'] = f"{doc['name']} (word {addr_int - doc_addr + 1})"
+                    entry['part_of'] = doc_addr
+                self.cross_reference[entry['address']] = entry
+            
+            if not any(first <= addr_int for first, _, _ in covered):
                 self.cross_reference[addr_int] = {
                     'address': addr_int,
                     'hex': f'0x{addr_int:04X}',
@@ -134,8 +192,9 @@ class SungrowCrossReference:
                     'captured': captured_data,
                     'register_size': 1
                 }
-                undocumented += 1
         
+        documented = sum(1 for r in self.cross_reference.values() if r['documented'])
+        undocumented = len(self.cross_reference) - documented
         print(f"Documented: {documented}, Undocumented: {undocumented}")
         return documented, undocumented
     
@@ -148,8 +207,10 @@ class SungrowCrossReference:
             access_count = captured.get('access_count', 0)
             quantities = captured.get('quantities_read', [])
             
-            # Infer data type from access patterns
-            if quantities and quantities[0] == 1:
+            # Infer data type from access patterns (only where the read starts)
+            if 'read_start' in ref or 'part_of' in ref:
+                inferred_type = 'unknown'
+            elif quantities and quantities[0] == 1:
                 inferred_type = 'uint16'
             elif quantities and quantities[0] == 2:
                 inferred_type = 'uint32'
@@ -231,6 +292,188 @@ class SungrowCrossReference:
         
         return validation
     
+    def response_columns(self, exchanges, timestamps=None):
+        """
+        Expand read responses into a column table with one row per register word.
+
+        Args:
+            exchanges: (unit_id, function_code, start_address, register bytes)
+                tuples, as returned by ModbusFrameProcessor.pair_read_exchanges
+            timestamps: Capture time of each exchange (default: exchange index)
+
+        Returns:
+            Dict of equal-length columns 'timestamp', 'address', 'word' and
+            'next_word' (-1 where the response ends); NumPy arrays when
+            NumPy is installed, lists otherwise
+        """
+        exchanges = list(exchanges)
+        if timestamps is None:
+            timestamps = range(len(exchanges))
+        payloads = [payload[:len(payload) // 2 * 2] for _, _, _, payload in exchanges]
+        counts = [len(payload) // 2 for payload in payloads]
+
+        if np is not None:
+            counts = np.asarray(counts, dtype=np.int64)
+            total = int(counts.sum())
+            words = np.frombuffer(b''.join(payloads), dtype='>u2').astype(np.int64)
+            first_row = np.cumsum(counts) - counts
+            starts = np.asarray([start for _, _, start, _ in exchanges], dtype=np.int64)
+            address = np.repeat(starts - first_row, counts) + np.arange(total)
+            next_word = np.full(total, -1, dtype=np.int64)
+            next_word[:-1] = words[1:]
+            next_word[(first_row + counts - 1)[counts > 0]] = -1
+            return {
+                'timestamp': np.repeat(np.asarray(list(timestamps), dtype=np.float64), counts),
+                'address': address,
+                'word': words,
+                'next_word': next_word,
+            }
+
+        columns = {'timestamp': [], 'address': [], 'word': [], 'next_word': []}
+        for (_, _, start, _), payload, count, ts in zip(exchanges, payloads, counts, timestamps):
+            words = struct.unpack(f'>{count}H', payload)
+            columns['timestamp'].extend([float(ts)] * count)
+            columns['address'].extend(range(start, start + count))
+            columns['word'].extend(words)
+            columns['next_word'].extend(words[1:] + (-1,) if count else ())
+        return columns
+
+    def _register_checks(self):
+        """Per documented register: address, width, signedness, scale, limits, valid codes."""
+        checks = []
+        for addr in sorted(self.OFFICIAL_REGISTERS):
+            doc = self.OFFICIAL_REGISTERS[addr]
+            low, high = self.VALUE_LIMITS.get(doc['unit'], (None, None))
+            checks.append((addr, self.DATA_TYPES.get(doc['type']) == 2, doc['type'].startswith('int'),
+                           doc['scale'], low, high, self.CODE_REGISTERS.get(addr)))
+        return checks
+
+    def validate_batch(self, columns):
+        """
+        Validate every documented register of a column table at once.
+
+        Words are converted by documented type and scale, then checked for:
+          range     - value outside VALUE_LIMITS of its unit
+          scale     - outside, but inside at 1/10 or 1/100 (scale factor looks wrong)
+          code      - status/fault register holding an unknown code
+          truncated - 32-bit value cut off by the end of its response
+
+        Args:
+            columns: Column table from response_columns()
+
+        Returns:
+            Per documented address: sample count, violation counts by check,
+            first offending timestamp and min/max converted value
+        """
+        checks = self._register_checks()
+        if np is not None:
+            samples, counts, first, low, high = self._validate_numpy(columns, checks)
+        else:
+            samples, counts, first, low, high = self._validate_python(columns, checks)
+
+        results = {}
+        for i, (addr, *_) in enumerate(checks):
+            if not samples[i]:
+                continue
+            results[addr] = {
+                'address': f'0x{addr:04X}',
+                'name': self.OFFICIAL_REGISTERS[addr]['name'],
+                'samples': int(samples[i]),
+                'violations': {check: int(counts[check][i]) for check in VALIDATION_CHECKS},
+                'first_violation': None if first[i] == math.inf else float(first[i]),
+                'min': None if low[i] == math.inf else float(low[i]),
+                'max': None if high[i] == -math.inf else float(high[i]),
+            }
+        return results
+
+    def _validate_numpy(self, columns, checks):
+        registers = len(checks)
+        doc_addrs = np.array([c[0] for c in checks], dtype=np.int64)
+        wide = np.array([c[1] for c in checks])
+        signed = np.array([c[2] for c in checks])
+        scale = np.array([c[3] for c in checks], dtype=np.float64)
+        lower = np.array([-np.inf if c[4] is None else c[4] for c in checks], dtype=np.float64)
+        upper = np.array([np.inf if c[5] is None else c[5] for c in checks], dtype=np.float64)
+
+        address = np.asarray(columns['address'], dtype=np.int64)
+        pos = np.minimum(np.searchsorted(doc_addrs, address), registers - 1)
+        rows = np.nonzero(doc_addrs[pos] == address)[0]
+        idx = pos[rows]
+        ts = np.asarray(columns['timestamp'], dtype=np.float64)[rows]
+        word = np.asarray(columns['word'], dtype=np.int64)[rows]
+        next_word = np.asarray(columns['next_word'], dtype=np.int64)[rows]
+
+        is_wide = wide[idx]
+        truncated = is_wide & (next_word < 0)
+        raw = np.where(is_wide, (word << 16) | np.maximum(next_word, 0), word)
+        is_signed = signed[idx]
+        raw = np.where(is_signed & ~is_wide & (raw >= 0x8000), raw - 0x10000, raw)
+        raw = np.where(is_signed & is_wide & (raw >= 0x80000000), raw - 0x100000000, raw)
+        value = raw * scale[idx]
+
+        lo, hi = lower[idx], upper[idx]
+        outside = ~truncated & ((value < lo) | (value > hi))
+        rescaled = np.zeros(len(rows), dtype=bool)
+        for divisor in SCALE_DIVISORS:
+            rescaled |= (value / divisor >= lo) & (value / divisor <= hi)
+        code = np.zeros(len(rows), dtype=bool)
+        for i, (_, _, _, _, _, _, valid) in enumerate(checks):
+            if valid is not None:
+                mask = ~truncated & ~outside & (idx == i)
+                code[mask] = ~np.isin(raw[mask], list(valid))
+        flags = {'range': outside & ~rescaled, 'scale': outside & rescaled,
+                 'code': code, 'truncated': truncated}
+
+        counts = {check: np.bincount(idx[flags[check]], minlength=registers)
+                  for check in VALIDATION_CHECKS}
+        bad = flags['range'] | flags['scale'] | flags['code'] | flags['truncated']
+        first = np.full(registers, np.inf)
+        np.minimum.at(first, idx[bad], ts[bad])
+        good = ~truncated
+        low = np.full(registers, np.inf)
+        high = np.full(registers, -np.inf)
+        np.minimum.at(low, idx[good], value[good])
+        np.maximum.at(high, idx[good], value[good])
+        return np.bincount(idx, minlength=registers), counts, first, low, high
+
+    def _validate_python(self, columns, checks):
+        registers = len(checks)
+        position = {c[0]: i for i, c in enumerate(checks)}
+        samples = [0] * registers
+        counts = {check: [0] * registers for check in VALIDATION_CHECKS}
+        first = [math.inf] * registers
+        low = [math.inf] * registers
+        high = [-math.inf] * registers
+
+        for ts, addr, word, next_word in zip(columns['timestamp'], columns['address'],
+                                             columns['word'], columns['next_word']):
+            i = position.get(addr)
+            if i is None:
+                continue
+            _, is_wide, is_signed, scale, lo, hi, valid = checks[i]
+            samples[i] += 1
+            if is_wide and next_word < 0:
+                violation = 'truncated'
+            else:
+                raw = (word << 16) | next_word if is_wide else word
+                if is_signed and raw >= (0x80000000 if is_wide else 0x8000):
+                    raw -= 0x100000000 if is_wide else 0x10000
+                value = raw * scale
+                low[i] = min(low[i], value)
+                high[i] = max(high[i], value)
+                lo = -math.inf if lo is None else lo
+                hi = math.inf if hi is None else hi
+                violation = None
+                if value < lo or value > hi:
+                    rescaled = any(lo <= value / d <= hi for d in SCALE_DIVISORS)
+                    violation = 'scale' if rescaled else 'range'
+                elif valid is not None and raw not in valid:
+                    violation = 'code'
+            if violation:
+                counts[violation][i] += 1
+                first[i] = min(first[i], ts)
+        return samples, counts, first, low, high
+
     def generate_cross_reference_report(self, output_file='cross_reference_report.txt'):
         """Generate detailed cross-reference report."""
         report = []
@@ -341,8 +584,6 @@ class SungrowCrossReference:
         print(f"JSON output saved to: {output_file}")
         return output
 
-import struct
-
 def main():
     """Run cross-reference analysis."""
     xref = SungrowCrossReference()
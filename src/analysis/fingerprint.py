@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Device Fingerprinting
+Classify Modbus units from what the logger reads from them instead of
+from their unit IDs.
+
+Each unit gets a feature vector built in one pass over the capture: the
+register spans it is read at, the function codes used, the read sizes
+and checks on a few known registers' values. The vector is scored against
+a small library of device signatures; the best signature above the match
+threshold names the device. State is kept per distinct read of each
+unit, so hundreds of units classify in a single streaming pass.
+"""
+
+import struct
+import sys
+from collections import Counter
+from pathlib import Path
+
+try:
+    from src.modbus.pcap_extractor import PCAPReader
+    from src.utils.range_index import RangeIndex
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.modbus.pcap_extractor import PCAPReader
+    from src.utils.range_index import RangeIndex
+
+# Relative weight of each feature; features without data are left out
+FEATURE_WEIGHTS = {'address': 0.5, 'function': 0.2, 'block': 0.1, 'value': 0.2}
+
+# Lowest score that names a device
+MATCH_THRESHOLD = 0.75
+
+
+class DeviceSignature:
+    """What the logger reads from one device type."""
+
+    def __init__(self, name, category, ranges, function_codes, block_sizes=None, values=(),
+                 details=None):
+        """
+        Initialize signature.
+
+        Args:
+            name: Device type reported for matching units
+            category: Group the device is listed under ('inverters', ...)
+            ranges: Inclusive (first, last) wire address ranges the device answers
+            function_codes: Function codes used to read it
+            block_sizes: (smallest, largest) read quantity, or None for any
+            values: (address, low, high) raw register values the device reports
+            details: Extra fields copied into identification results
+        """
+        self.name = name
+        self.category = category
+        self.ranges = tuple(ranges)
+        self.function_codes = frozenset(function_codes)
+        self.block_sizes = block_sizes
+        self.values = tuple(values)
+        self.details = details or {}
+
+
+# Wire addresses are one below the Sungrow documentation numbers
+SIGNATURES = (
+    DeviceSignature(
+        'Sungrow Solar Inverter', 'inverters',
+        ranges=((0, 99), (4949, 5199), (12999, 13199)),
+        function_codes=(3, 4),
+        block_sizes=(1, 125),
+        values=((5035, 450, 650),),  # grid frequency, 0.1 Hz
+    ),
+    DeviceSignature(
+        '3S-RH&AT&PS Weather Station (Seven Sensor)', 'weather_station',
+        ranges=((8061, 8085),),
+        function_codes=(4,),
+        block_sizes=(1, 25),
+        details={'sensors': ['Relative Humidity', 'Air Temperature', 'Atmospheric Pressure',
+                             'Wind Speed', 'Solar Irradiance']},
+    ),
+)
+
+
+class UnitFingerprint:
+    """Features of one unit, accumulated read by read."""
+
+    __slots__ = ('requests', 'spans', 'functions', 'blocks', 'probes')
+
+    def __init__(self):
+        self.requests = 0
+        self.spans = Counter()      # (start, quantity) -> reads
+        self.functions = Counter()  # function code -> reads
+        self.blocks = Counter()     # quantity -> reads (capture reads only)
+        self.probes = {}            # (signature, check) -> [passed, seen]
+
+    def registers(self):
+        """Distinct registers covered by the unit's reads."""
+        covered = set()
+        for start, quantity in self.spans:
+            covered.update(range(start, start + quantity))
+        return covered
+
+
+class DeviceFingerprinter:
+    """Score units against device signatures from a stream of reads."""
+
+    def __init__(self, signatures=SIGNATURES, threshold=MATCH_THRESHOLD):
+        """
+        Initialize fingerprinter.
+
+        Args:
+            signatures: Device signature library
+            threshold: Lowest score that names a device
+        """
+        self.signatures = tuple(signatures)
+        self.threshold = threshold
+        self.units = {}
+        self._pending = {}
+        self._ranges = RangeIndex(
+            (first, last, index)
+            for index, signature in enumerate(self.signatures)
+            for first, last in signature.ranges)
+        self._probes = RangeIndex(
+            (address, address, (index, check, low, high))
+            for index, signature in enumerate(self.signatures)
+            for check, (address, low, high) in enumerate(signature.values))
+
+    def _unit(self, unit_id):
+        unit = self.units.get(unit_id)
+        if unit is None:
+            unit = self.units[unit_id] = UnitFingerprint()
+        return unit
+
+    def add_read(self, unit_id, function_code, start, quantity, count=1, block=True):
+        """
+        Record reads of a register span.
+
+        Args:
+            unit_id: Unit read
+            function_code: Function code, or None if unknown
+            start: First register
+            quantity: Registers read
+            count: Number of such reads
+            block: Whether quantity is a real request size (not a single
+                register taken from a register map)
+        """
+        unit = self._unit(unit_id)
+        unit.requests += count
+        unit.spans[(start, quantity)] += count
+        if function_code is not None:
+            unit.functions[function_code] += count
+        if block:
+            unit.blocks[quantity] += count
+
+    def add_values(self, unit_id, start, values):
+        """Check register values read from start against the signatures' value checks."""
+        unit = self._unit(unit_id)
+        for address, _, (index, check, low, high) in self._probes.overlapping(start, len(values)):
+            tally = unit.probes.setdefault((index, check), [0, 0])
+            tally[0] += low <= values[address - start] <= high
+            tally[1] += 1
+
+    def add_frame(self, data):
+        """Record one raw Modbus TCP frame; responses are paired with their requests."""
+        if len(data) < 9:
+            return
+        transaction_id, protocol_id, length, unit_id, function_code = struct.unpack_from('>HHHBB', data)
+        if protocol_id != 0 or function_code not in (1, 2, 3, 4) or len(data) < 6 + length:
+            return
+        key = (transaction_id, unit_id, function_code)
+        request = self._pending.pop(key, None)
+        if length == 6 and (request is None or function_code in (3, 4)):
+            start, quantity = struct.unpack_from('>HH', data, 8)
+            self._pending[key] = (start, quantity)
+            self.add_read(unit_id, function_code, start, quantity)
+        elif request is not None and function_code in (3, 4):
+            start, quantity = request
+            if data[8] == 2 * quantity and length >= 3 + 2 * quantity:
+                self.add_values(unit_id, start, struct.unpack_from(f'>{quantity}H', data, 9))
+
+    def analyze_capture(self, capture_file):
+        """Stream every packet of a pcap/pcapng capture through the fingerprinter."""
+        for _, frame in PCAPReader(capture_file).packets():
+            self.add_frame(frame)
+        return self
+
+    def add_register_map(self, mapping):
+        """
+        Record the units of a live register map (sungrow_live_register_map.json).
+
+        Registers count as single-register reads, so block sizes do not
+        contribute; logged unique values feed the value checks.
+        """
+        for unit_key, unit_data in mapping.get('registers_by_unit', {}).items():
+            unit_id = int(unit_key.split('_')[-1])
+            unit = self._unit(unit_id)
+            for function_code in unit_data.get('function_codes', []):
+                unit.functions[function_code] += 1
+            for address, register in unit_data.get('registers', {}).items():
+                address = int(address)
+                self.add_read(unit_id, None, address, 1, register.get('access_count', 1) or 1,
+                              block=False)
+                values = [int(v) for v in register.get('unique_values', []) if str(v).isdigit()]
+                for value in values:
+                    self.add_values(unit_id, address, [value])
+        return self
+
+    def scores(self, unit_id):
+        """Score of every signature for a unit, best first: [(score, signature)]."""
+        unit = self.units[unit_id]
+        total = sum(quantity * count for (_, quantity), count in unit.spans.items())
+        inside = [0] * len(self.signatures)
+        for (start, quantity), count in unit.spans.items():
+            end = start + quantity
+            for first, last, index in self._ranges.overlapping(start, quantity):
+                inside[index] += (min(end, last + 1) - max(start, first)) * count
+
+        functions = sum(unit.functions.values())
+        blocks = sum(unit.blocks.values())
+        ranked = []
+        for index, signature in enumerate(self.signatures):
+            features = {'address': inside[index] / total if total else 0.0}
+            if functions:
+                features['function'] = sum(count for code, count in unit.functions.items()
+                                           if code in signature.function_codes) / functions
+            if blocks and signature.block_sizes:
+                low, high = signature.block_sizes
+                features['block'] = sum(count for quantity, count in unit.blocks.items()
+                                        if low <= quantity <= high) / blocks
+            passed = seen = 0
+            for check in range(len(signature.values)):
+                tally = unit.probes.get((index, check))
+                if tally:
+                    passed += tally[0]
+                    seen += tally[1]
+            if seen:
+                features['value'] = passed / seen
+            weight = sum(FEATURE_WEIGHTS[name] for name in features)
+            ranked.append((sum(FEATURE_WEIGHTS[name] * value for name, value in features.items())
+                           / weight, signature))
+        ranked.sort(key=lambda item: -item[0])
+        return ranked
+
+    def classify(self, unit_id):
+        """
+        Identify one unit.
+
+        Returns:
+            Dictionary with the matched signature (None below the threshold),
+            its score and the best-scoring signature name
+        """
+        ranked = self.scores(unit_id)
+        score, best = ranked[0] if ranked else (0.0, None)
+        return {
+            'signature': best if best is not None and score >= self.threshold else None,
+            'confidence': round(score, 3),
+            'best_match': best.name if best is not None else None,
+        }
+
+    def classify_all(self):
+        """Identify every unit seen, keyed by unit ID."""
+        return {unit_id: self.classify(unit_id) for unit_id in sorted(self.units)}
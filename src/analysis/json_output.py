@@ -8,6 +8,15 @@ import json
 from collections import defaultdict
 from pathlib import Path
 import re
+import sys
+
+try:
+    from src.analysis.compiled_map import compile_file
+    from src.utils.range_index import RangeIndex, categorize
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.analysis.compiled_map import compile_file
+    from src.utils.range_index import RangeIndex, categorize
 
 
 class ModbusJSONAnalyzer:
@@ -161,7 +170,7 @@ class ModbusJSONAnalyzer:
                     'access_count': reg_data['count'],
                     'unique_values': unique_values,
                     'most_common_value': max(set(values), key=values.count) if values else None,
-                    'category': self._categorize_address(reg_addr),
+                    'category': categorize(reg_addr),
                     'data_type': self._infer_type(reg_addr)
                 }
             
@@ -187,13 +196,14 @@ class ModbusJSONAnalyzer:
                 'accessed_by_units': sorted(list(reg['units'])),
                 'total_accesses': reg['accesses'],
                 'unique_values_observed': sorted(list(reg['values'])[:100]),  # Limit to first 100
-                'category': self._categorize_address(addr)
+                'category': categorize(addr)
             }
         
         with open(output_file, 'w') as f:
             json.dump(mapping, f, indent=2)
         
         print(f"✓ Generated {output_file}")
+        print(f"✓ Generated {compile_file(output_file)}")
         return mapping
 
     def generate_report(self, output_file="sungrow_live_analysis_report.txt"):
@@ -234,7 +244,7 @@ class ModbusJSONAnalyzer:
                 for reg_addr in sorted(unit_info['registers'].keys()):
                     reg = unit_info['registers'][reg_addr]
                     accesses = reg['count']
-                    category = self._categorize_address(reg_addr)
+                    category = categorize(reg_addr)
                     dtype = self._infer_type(reg_addr)
                     
                     # Get most common value from list
@@ -252,49 +262,31 @@ class ModbusJSONAnalyzer:
             f.write("\nREGISTER CATEGORY SUMMARY\n")
             f.write("-"*70 + "\n\n")
             
-            categories = {
-                'Inverter_Info': (0, 50),
-                'Grid_AC': (100, 199),
-                'DC_PV': (200, 299),
-                'Weather': (300, 399),
-                'Energy_Counter': (500, 599),
-                'Faults_Alarms': (1000, 9999),
-            }
+            categories = RangeIndex([
+                (0, 50, 'Inverter_Info'),
+                (100, 199, 'Grid_AC'),
+                (200, 299, 'DC_PV'),
+                (300, 399, 'Weather'),
+                (500, 599, 'Energy_Counter'),
+                (1000, 9999, 'Faults_Alarms'),
+            ])
             
-            for cat_name, (min_addr, max_addr) in categories.items():
-                addrs_in_cat = []
-                total_cat_accesses = 0
-                
-                for unit_info in self.unit_data.values():
-                    for addr, reg_data in unit_info['registers'].items():
-                        if min_addr <= addr <= max_addr:
-                            if addr not in addrs_in_cat:
-                                addrs_in_cat.append(addr)
-                            total_cat_accesses += reg_data['count']
-                
+            accesses = defaultdict(int)
+            for unit_info in self.unit_data.values():
+                for addr, reg_data in unit_info['registers'].items():
+                    accesses[addr] += reg_data['count']
+            groups = categories.group(accesses)
+            
+            for min_addr, max_addr, cat_name in categories:
+                addrs_in_cat = groups.get(cat_name)
                 if addrs_in_cat:
+                    total_cat_accesses = sum(accesses[addr] for addr in addrs_in_cat)
                     f.write(f"{cat_name} ({min_addr}-{max_addr})\n")
-                    f.write(f"  Addresses: {sorted(addrs_in_cat)}\n")
+                    f.write(f"  Addresses: {addrs_in_cat}\n")
                     f.write(f"  Total Accesses: {total_cat_accesses}\n\n")
         
         print(f"✓ Generated {output_file}")
 
-    def _categorize_address(self, addr):
-        """Categorize register address"""
-        if 0 <= addr <= 50:
-            return "Inverter_Info"
-        elif 100 <= addr <= 199:
-            return "Grid_AC"
-        elif 200 <= addr <= 299:
-            return "DC_PV"
-        elif 300 <= addr <= 399:
-            return "Weather"
-        elif 500 <= addr <= 599:
-            return "Energy_Counter"
-        elif addr >= 1000:
-            return "Faults_Alarms"
-        return "Other"
-
     def _infer_type(self, addr):
         """Infer data type from address"""
         # Heuristics based on Sungrow logger ranges
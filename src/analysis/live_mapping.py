@@ -7,8 +7,17 @@ Uses tshark to parse PCAPNG and extract frame details
 import subprocess
 import json
 from collections import defaultdict
+import sys
 from pathlib import Path
 
+try:
+    from src.analysis.compiled_map import compile_file
+    from src.utils.range_index import RangeIndex, categorize
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.analysis.compiled_map import compile_file
+    from src.utils.range_index import RangeIndex, categorize
+
 
 class LiveMappingExtractor:
     """Extract detailed register mapping from live capture"""
@@ -170,7 +179,7 @@ class LiveMappingExtractor:
                     'most_common_quantity': most_common_qty,
                     'function_codes': sorted(list(reg_info['function_codes'])),
                     'access_count': reg_info['access_count'],
-                    'category': self._get_category(addr),
+                    'category': categorize(addr),
                     'inferred_type': self._infer_type(most_common_qty),
                 }
             
@@ -191,7 +200,7 @@ class LiveMappingExtractor:
             mapping['address_usage'][str(addr)] = {
                 'address': addr,
                 'total_accesses': access_count,
-                'category': self._get_category(addr)
+                'category': categorize(addr)
             }
         
         # Write JSON
@@ -199,6 +208,7 @@ class LiveMappingExtractor:
             json.dump(mapping, f, indent=2)
         
         print(f"✓ Generated {output_file}")
+        print(f"✓ Generated {compile_file(output_file)}")
         return mapping
 
     def generate_report(self, output_file="sungrow_live_analysis_report.txt"):
@@ -224,7 +234,7 @@ class LiveMappingExtractor:
                 
                 for addr in sorted(self.registers[unit].keys()):
                     reg_info = self.registers[unit][addr]
-                    category = self._get_category(addr)
+                    category = categorize(addr)
                     qty = sorted(list(reg_info['quantities']))
                     
                     f.write(f"  Address {addr:4d} ({category:20s})\n")
@@ -238,44 +248,24 @@ class LiveMappingExtractor:
             f.write("\nREGISTER CATEGORY SUMMARY\n")
             f.write("-"*70 + "\n")
             
-            categories = {
-                'inverter_info': (0, 50),
-                'grid_ac_data': (100, 199),
-                'dc_pv_input': (200, 299),
-                'weather_station': (300, 399),
-                'energy_counters': (500, 599),
-                'faults_alarms': (1000, 9999),
-            }
+            categories = RangeIndex([
+                (0, 50, 'inverter_info'),
+                (100, 199, 'grid_ac_data'),
+                (200, 299, 'dc_pv_input'),
+                (300, 399, 'weather_station'),
+                (500, 599, 'energy_counters'),
+                (1000, 9999, 'faults_alarms'),
+            ])
+            groups = categories.group({addr for unit_regs in self.registers.values()
+                                       for addr in unit_regs})
             
-            for cat_name, (min_addr, max_addr) in categories.items():
-                addrs_in_cat = []
-                for unit_regs in self.registers.values():
-                    for addr in unit_regs.keys():
-                        if min_addr <= addr <= max_addr:
-                            addrs_in_cat.append(addr)
-                
-                if addrs_in_cat:
+            for min_addr, max_addr, cat_name in categories:
+                if cat_name in groups:
                     f.write(f"\n{cat_name.upper()} ({min_addr}-{max_addr})\n")
-                    f.write(f"  Addresses found: {sorted(set(addrs_in_cat))}\n")
+                    f.write(f"  Addresses found: {groups[cat_name]}\n")
         
         print(f"✓ Generated {output_file}")
 
-    def _get_category(self, addr):
-        """Get category for address"""
-        if 0 <= addr <= 50:
-            return "Inverter_Info"
-        elif 100 <= addr <= 199:
-            return "Grid_AC"
-        elif 200 <= addr <= 299:
-            return "DC_PV"
-        elif 300 <= addr <= 399:
-            return "Weather"
-        elif 500 <= addr <= 599:
-            return "Energy_Counter"
-        elif addr >= 1000:
-            return "Faults_Alarms"
-        return "Other"
-
     def _infer_type(self, quantity):
         """Infer data type from quantity"""
         if quantity == 1:
@@ -5,8 +5,25 @@ Maps extracted addresses to register names, scaling factors, and units
 """
 
 import json
+import sys
+from collections import defaultdict
 from pathlib import Path
 
+try:
+    from src.analysis.compiled_map import compile_file, load_register_map
+    from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+    from src.modbus.register_decoder import MAX_BLOCK_REGISTERS, TYPE_FORMATS, RegisterBlock, RegisterField
+    from src.utils.range_index import REGISTER_CATEGORIES, RangeIndex
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.analysis.compiled_map import compile_file, load_register_map
+    from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+    from src.modbus.register_decoder import MAX_BLOCK_REGISTERS, TYPE_FORMATS, RegisterBlock, RegisterField
+    from src.utils.range_index import REGISTER_CATEGORIES, RangeIndex
+
+# Register groups of undocumented addresses; faults sit at 5000-5099 here
+CATEGORY_RANGES = REGISTER_CATEGORIES[:-1] + ((5000, 5099, 'Faults_Alarms'),)
+
 
 class SungrowDocumentationMapper:
     """Map captured registers to Sungrow official documentation"""
@@ -101,14 +118,99 @@ class SungrowDocumentationMapper:
             'bit_7': 'DSP Ready',
         }
 
+        self.categories = RangeIndex(CATEGORY_RANGES)
+        # Span of every documented register, 32-bit values covering two
+        self.documented = RangeIndex(
+            (addr, addr + TYPE_FORMATS.get(spec['type'].lower(), ('H', 1))[1] - 1, addr)
+            for addr, spec in self.sungrow_registers.items()
+        )
+        # Decode block per (start, count) read shape; None when nothing documented
+        self._read_blocks = {}
+
+    def registers_in_read(self, start, count):
+        """Documented registers touched by a read of count registers from start"""
+        return {addr: self.sungrow_registers[addr]
+                for _, _, addr in self.documented.overlapping(start, count)}
+
+    def read_block(self, start, count):
+        """Compiled block decoding the documented registers lying wholly inside a read"""
+        key = (start, count)
+        if key not in self._read_blocks:
+            fields = []
+            if 0 < count <= MAX_BLOCK_REGISTERS:
+                for _, _, addr in self.documented.within(start, count):
+                    spec = self.sungrow_registers[addr]
+                    data_type = spec['type'].lower()
+                    if data_type in TYPE_FORMATS:
+                        fields.append(RegisterField(f'reg_{addr}', addr, data_type, scale=spec['scale'],
+                                                    unit=spec['unit'], label=spec['name']))
+            self._read_blocks[key] = RegisterBlock(start, count, fields) if fields else None
+        return self._read_blocks[key]
+
+    def build_value_table(self, exchanges):
+        """
+        Decode every documented register inside captured read responses in one pass
+
+        Args:
+            exchanges: (unit_id, function_code, start_address, register bytes)
+                tuples, as returned by ModbusFrameProcessor.pair_read_exchanges
+
+        Returns:
+            Value table keyed by unit key, then register address, with the
+            sample count and last/min/max/mean scaled values
+        """
+        # unit key -> address -> [samples, total, min, max, last]
+        accumulators = defaultdict(dict)
+        for unit_id, _, start, payload in exchanges:
+            block = self.read_block(start, len(payload) // 2)
+            if block is None:
+                continue
+            values, _ = block.decode_with_raw(payload)
+            unit_acc = accumulators[f'Unit_{unit_id}']
+            for fld, value in zip(block.fields, values):
+                acc = unit_acc.get(fld.address)
+                if acc is None:
+                    unit_acc[fld.address] = [1, value, value, value, value]
+                    continue
+                acc[0] += 1
+                acc[1] += value
+                if value < acc[2]:
+                    acc[2] = value
+                elif value > acc[3]:
+                    acc[3] = value
+                acc[4] = value
+
+        table = {}
+        for unit_key in sorted(accumulators, key=lambda k: int(k.split('_')[1])):
+            table[unit_key] = {}
+            for addr, (samples, total, low, high, last) in sorted(accumulators[unit_key].items()):
+                spec = self.sungrow_registers[addr]
+                table[unit_key][str(addr)] = {
+                    'address': addr,
+                    'name': spec['name'],
+                    'type': spec['type'],
+                    'unit': spec['unit'],
+                    'samples': samples,
+                    'last': round(last, 4),
+                    'min': round(low, 4),
+                    'max': round(high, 4),
+                    'mean': round(total / samples, 4),
+                }
+        return table
+
+    def decode_capture(self, capture_file):
+        """Build the value table of a pcap/pcapng capture"""
+        frames = PCAPReader(capture_file).read()
+        return self.build_value_table(ModbusFrameProcessor.pair_read_exchanges(frames))
+
     def map_captured_registers(self, capture_json_file):
         """Map captured registers to Sungrow documentation"""
         if not Path(capture_json_file).exists():
             print(f"Error: {capture_json_file} not found")
             return {}
         
-        with open(capture_json_file, 'r') as f:
-            captured = json.load(f)
+        # Compiled form is used when it matches the JSON
+        captured = load_register_map(capture_json_file)
         
         # Build cross-reference
         cross_ref = {
@@ -128,25 +230,45 @@ class SungrowDocumentationMapper:
             cross_ref['documented_registers'][unit_key] = {}
             cross_ref['undocumented_registers'][unit_key] = {}
             
+            documented = cross_ref['documented_registers'][unit_key]
             for reg_addr_str, reg_data in unit_data.get('registers', {}).items():
                 reg_addr = int(reg_addr_str)
                 cross_ref['mapping_statistics']['total_captured'] += 1
                 
-                if reg_addr in self.sungrow_registers:
-                    doc = self.sungrow_registers[reg_addr].copy()
+                # Start-address maps record read sizes; expand each read over its span
+                count = max(reg_data.get('quantities_read') or [1])
+                # Counted as documented only when a register was actually mapped
+                mapped = False
+                for _, last, doc_addr in self.documented.overlapping(reg_addr, count):
+                    if doc_addr > reg_addr and last >= reg_addr + count:
+                        continue  # cut off by the end of the read
+                    mapped = True
+                    doc = self.sungrow_registers[doc_addr].copy()
+                    if doc_addr < reg_addr:
+                        # Later word of a multi-register value
+                        doc['name'] = f"{doc['name']} (word {reg_addr - doc_addr + 1})"
+                        doc['part_of'] = doc_addr
+                        key = reg_addr
+                    else:
+                        if doc_addr > reg_addr:
+                            doc['read_start'] = reg_addr
+                        key = doc_addr
+                    if str(key) in documented:
+                        continue
                     doc.update({
-                        'address': reg_addr,
+                        'address': key,
                         'access_count': reg_data.get('access_count', 0),
                         'unique_values': reg_data.get('unique_values', []),
                         'most_common_value': reg_data.get('most_common_value'),
                     })
-                    cross_ref['documented_registers'][unit_key][str(reg_addr)] = doc
+                    documented[str(key)] = doc
+                if mapped:
                     cross_ref['mapping_statistics']['documented'] += 1
                 else:
                     # Undocumented - but categorize based on address range
                     doc = {
                         'address': reg_addr,
-                        'category': self._categorize_address(reg_addr),
+                        'category': self.categories.get(reg_addr, 'Other'),
                         'estimated_type': reg_data.get('inferred_type'),
                         'access_count': reg_data.get('access_count', 0),
                         'unique_values': reg_data.get('unique_values', []),
@@ -165,22 +287,6 @@ class SungrowDocumentationMapper:
         
         return cross_ref
 
-    def _categorize_address(self, addr):
-        """Categorize address by range"""
-        if 0 <= addr <= 50:
-            return 'Inverter_Info'
-        elif 100 <= addr <= 199:
-            return 'Grid_AC'
-        elif 200 <= addr <= 299:
-            return 'DC_PV'
-        elif 300 <= addr <= 399:
-            return 'Weather'
-        elif 500 <= addr <= 599:
-            return 'Energy_Counter'
-        elif 5000 <= addr <= 5099:
-            return 'Faults_Alarms'
-        return 'Other'
-
     def generate_detailed_report(self, cross_ref, output_file='sungrow_documentation_mapping.txt'):
         """Generate detailed cross-reference report"""
         with open(output_file, 'w') as f:
@@ -273,6 +379,13 @@ class SungrowDocumentationMapper:
         with open(output_file, 'w') as f:
             json.dump(cross_ref, f, indent=2)
         print(f"✓ Generated {output_file}")
+        print(f"✓ Generated {compile_file(output_file)}")
+
+    def generate_value_table(self, table, output_file='sungrow_register_values.json'):
+        """Write the decoded value table"""
+        with open(output_file, 'w') as f:
+            json.dump(table, f, indent=2)
+        print(f"✓ Generated {output_file}")
 
     def generate_quick_reference(self, cross_ref, output_file='sungrow_quick_reference.txt'):
         """Generate quick reference card"""
@@ -338,6 +451,12 @@ def main():
     mapper.generate_json_mapping(cross_ref, 'sungrow_documented_mapping.json')
     mapper.generate_quick_reference(cross_ref, 'sungrow_quick_reference.txt')
     
+    # Decode register values straight from the capture when it is available
+    capture_file = Path('captures/modbus_test_2min.pcapng')
+    if capture_file.exists():
+        table = mapper.decode_capture(str(capture_file))
+        mapper.generate_value_table(table, 'sungrow_register_values.json')
+    
     print("\n" + "="*80)
     print("CROSS-REFERENCE COMPLETE")
     print("="*80)
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Poll Cycle Analysis
+Reconstruct the logger's polling schedule from capture timestamps.
+
+Every distinct read (unit, function code, start address, quantity) is
+treated as a periodic poll. Its period and phase come from a running
+least-squares fit of request time against poll number, jitter from the
+fit residuals, and intervals spanning several periods count the polls in
+between as missed. Requests of one unit, and of the whole bus, are grouped
+into poll cycles, and request/response sizes give the bandwidth and the
+RS-485 time each device takes.
+
+Packets are consumed one at a time and only per-read state is kept, so
+memory grows with the number of distinct reads, not with capture length.
+"""
+
+import json
+import math
+import struct
+import sys
+from pathlib import Path
+
+try:
+    from src.modbus.pcap_extractor import PCAPReader
+except ImportError:  # run as a script from src/analysis
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.modbus.pcap_extractor import PCAPReader
+
+READ_FUNCTIONS = (1, 2, 3, 4)
+
+# Intervals collected per read before its period is first estimated
+BOOTSTRAP_INTERVALS = 8
+
+# RS-485 link of the logger: 11-bit characters (start, 8 data, parity/stop, stop)
+DEFAULT_BAUD = 9600
+BITS_PER_CHAR = 11
+
+# RTU framing around a PDU (unit ID + CRC) and the silent gap between frames
+RTU_OVERHEAD = 3
+RTU_GAP_CHARS = 3.5
+
+
+def rtu_frame_bytes(pdu_length):
+    """Bytes an RTU frame carrying a PDU takes on the bus, gap included."""
+    return pdu_length + RTU_OVERHEAD + RTU_GAP_CHARS
+
+
+class LinearFit:
+    """Running least-squares line (Welford co-moments)."""
+
+    __slots__ = ('n', 'mean_x', 'mean_y', 'sxx', 'sxy', 'syy')
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.sxx = self.sxy = self.syy = 0.0
+
+    def add(self, x, y):
+        """Add one point."""
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        self.sxx += dx * (x - self.mean_x)
+        self.sxy += dx * (y - self.mean_y)
+        self.syy += dy * (y - self.mean_y)
+
+    @property
+    def slope(self):
+        return self.sxy / self.sxx if self.sxx else None
+
+    @property
+    def intercept(self):
+        slope = self.slope
+        return None if slope is None else self.mean_y - slope * self.mean_x
+
+    @property
+    def residual_std(self):
+        """Standard deviation of the points around the line."""
+        if self.n < 3 or not self.sxx:
+            return None
+        return math.sqrt(max(self.syy - self.sxy * self.sxy / self.sxx, 0.0) / (self.n - 2))
+
+
+class PollSchedule:
+    """Timing and traffic of one periodic read."""
+
+    __slots__ = ('count', 'first', 'last', 'missed', 'repeats', 'answered', 'unanswered',
+                 'exceptions', 'response_time', 'max_response_time', 'tcp_bytes', 'rtu_bytes',
+                 'pending', '_intervals', '_fit', '_index')
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.missed = 0
+        self.repeats = 0
+        self.answered = 0
+        self.unanswered = 0
+        self.exceptions = 0
+        self.response_time = 0.0
+        self.max_response_time = 0.0
+        self.tcp_bytes = 0
+        self.rtu_bytes = 0.0
+        self.pending = None
+        self._intervals = []
+        self._fit = None
+        self._index = 0
+
+    def add_request(self, timestamp):
+        """Record one request of this read."""
+        self.count += 1
+        if self.first is None:
+            self.first = self.last = timestamp
+            return
+        interval = timestamp - self.last
+        self.last = timestamp
+        if self._fit is None:
+            # Collect a few intervals; their median seeds the period estimate
+            self._intervals.append(interval)
+            if len(self._intervals) >= BOOTSTRAP_INTERVALS:
+                self._fit, self._index, self.missed, self.repeats = self._replay()
+                self._intervals = None
+            return
+        self._index, missed, repeated = self._place(self._fit, self._index, timestamp, interval)
+        self.missed += missed
+        self.repeats += repeated
+
+    def _place(self, fit, index, timestamp, interval, period=None):
+        """Assign a request its poll number and add it to the fit."""
+        period = period or fit.slope
+        steps = round(interval / period) if period else 1
+        if steps < 1:
+            # Re-read inside the same poll slot (retry or duplicate)
+            return index, 0, 1
+        index += steps
+        fit.add(index, timestamp - self.first)
+        return index, steps - 1, 0
+
+    def _replay(self):
+        """Fit the buffered intervals against their median period."""
+        intervals = self._intervals
+        period = sorted(intervals)[len(intervals) // 2]
+        fit = LinearFit()
+        fit.add(0, 0.0)
+        index = missed = repeats = 0
+        timestamp = self.first
+        for interval in intervals:
+            timestamp += interval
+            index, skipped, repeated = self._place(fit, index, timestamp, interval, period)
+            missed += skipped
+            repeats += repeated
+        return fit, index, missed, repeats
+
+    def _current_fit(self):
+        """Fit, missed and repeated polls, replaying the buffer if still collecting."""
+        if self._fit is not None:
+            return self._fit, self.missed, self.repeats
+        if not self._intervals:
+            return None, 0, 0
+        fit, _, missed, repeats = self._replay()
+        return fit, missed, repeats
+
+    def add_response(self, timestamp, requested, exception=False):
+        """Record the response to a request sent at the requested time."""
+        elapsed = timestamp - requested
+        self.answered += 1
+        self.exceptions += exception
+        self.response_time += elapsed
+        self.max_response_time = max(self.max_response_time, elapsed)
+
+    def add_traffic(self, tcp_length, pdu_length):
+        """Count one frame of this read (request or response)."""
+        self.tcp_bytes += tcp_length
+        self.rtu_bytes += rtu_frame_bytes(pdu_length)
+
+    def summary(self, origin=None):
+        """
+        Schedule figures of this read.
+
+        Args:
+            origin: Epoch phases are measured from (default: first request)
+        """
+        fit, missed, repeats = self._current_fit()
+        period = fit.slope if fit else None
+        result = {
+            'polls': self.count,
+            'period': period,
+            'jitter': fit.residual_std if fit else None,
+            'phase': None,
+            'missed': missed,
+            'repeats': repeats,
+            'miss_rate': missed / (self.count - repeats + missed) if self.count else 0.0,
+            'answered': self.answered,
+            'unanswered': self.unanswered,
+            'exceptions': self.exceptions,
+            'avg_response_time': self.response_time / self.answered if self.answered else None,
+            'max_response_time': self.max_response_time if self.answered else None,
+            'first': self.first,
+            'last': self.last,
+        }
+        if period and period > 0:
+            start = self.first + fit.intercept
+            result['phase'] = (start - (self.first if origin is None else origin)) % period
+        return result
+
+
+class CycleTracker:
+    """
+    Split a request stream into poll cycles.
+
+    A cycle ends when one of its reads is requested again; its duration runs
+    from the first request to the last request or response inside it.
+    """
+
+    __slots__ = ('seen', 'start', 'last', 'cycles', 'busy', 'min_duration', 'max_duration',
+                 'span')
+
+    def __init__(self):
+        self.seen = set()
+        self.start = None
+        self.last = None
+        self.cycles = 0
+        self.busy = 0.0
+        self.min_duration = None
+        self.max_duration = None
+        self.span = 0.0
+
+    def add(self, key, timestamp):
+        """Record one request."""
+        if key in self.seen:
+            duration = self.last - self.start
+            self.cycles += 1
+            self.busy += duration
+            self.span += timestamp - self.start
+            self.min_duration = duration if self.min_duration is None else min(self.min_duration, duration)
+            self.max_duration = duration if self.max_duration is None else max(self.max_duration, duration)
+            self.seen.clear()
+            self.start = timestamp
+        elif self.start is None:
+            self.start = timestamp
+        self.seen.add(key)
+        self.last = timestamp
+
+    def extend(self, timestamp):
+        """Stretch the current cycle to a response received at timestamp."""
+        if self.last is not None and timestamp > self.last:
+            self.last = timestamp
+
+    def summary(self):
+        """Cycle count, duration and start-to-start period of completed cycles."""
+        return {
+            'cycles': self.cycles,
+            'avg_duration': self.busy / self.cycles if self.cycles else None,
+            'min_duration': self.min_duration,
+            'max_duration': self.max_duration,
+            'avg_period': self.span / self.cycles if self.cycles else None,
+            'duty': self.busy / self.span if self.span else None,
+        }
+
+
+class PollCycleAnalyzer:
+    """Reconstruct per-read poll schedules, poll cycles and bus usage."""
+
+    def __init__(self, baud=DEFAULT_BAUD):
+        """
+        Initialize analyzer.
+
+        Args:
+            baud: RS-485 line speed used to turn frame sizes into bus time
+        """
+        self.baud = baud
+        self.schedules = {}
+        self.unit_cycles = {}
+        self.bus_cycles = CycleTracker()
+        self._pending = {}
+        self.first = None
+        self.last = None
+        self.frames = 0
+
+    def add_request(self, timestamp, unit_id, function_code, start, quantity, transaction_id=None):
+        """
+        Record one read request.
+
+        Args:
+            timestamp: Capture epoch of the request
+            unit_id: Addressed unit
+            function_code: Read function code (1-4)
+            start: Starting address
+            quantity: Registers/bits requested
+            transaction_id: MBAP transaction ID, to match the response
+
+        Returns:
+            The PollSchedule of the read
+        """
+        key = (unit_id, function_code, start, quantity)
+        schedule = self.schedules.get(key)
+        if schedule is None:
+            schedule = self.schedules[key] = PollSchedule()
+            self.unit_cycles.setdefault(unit_id, CycleTracker())
+        if schedule.pending is not None:
+            # Previous request of this read never got an answer
+            entry = self._pending.get(schedule.pending)
+            if entry is not None and entry[0] is schedule:
+                del self._pending[schedule.pending]
+            schedule.unanswered += 1
+            schedule.pending = None
+        if transaction_id is not None:
+            schedule.pending = (transaction_id, unit_id, function_code)
+            self._pending[schedule.pending] = (schedule, timestamp)
+
+        schedule.add_request(timestamp)
+        self.unit_cycles[unit_id].add(key, timestamp)
+        self.bus_cycles.add(key, timestamp)
+        if self.first is None:
+            self.first = timestamp
+        self.last = timestamp
+        return schedule
+
+    def add_response(self, timestamp, transaction_id, unit_id, function_code):
+        """
+        Match a response to its request.
+
+        Returns:
+            The PollSchedule of the answered read, or None if unmatched
+        """
+        exception = bool(function_code & 0x80)
+        entry = self._pending.pop((transaction_id, unit_id, function_code & 0x7F), None)
+        if entry is None:
+            return None
+        schedule, requested = entry
+        schedule.pending = None
+        schedule.add_response(timestamp, requested, exception)
+        self.unit_cycles[unit_id].extend(timestamp)
+        self.bus_cycles.extend(timestamp)
+        self.last = max(self.last, timestamp)
+        return schedule
+
+    def add_frame(self, timestamp, data):
+        """Record one raw Modbus TCP frame (request or response)."""
+        if len(data) < 8:
+            return
+        transaction_id, protocol_id, length, unit_id, function_code = struct.unpack_from('>HHHBB', data)
+        pdu_length = length - 1
+        if protocol_id != 0 or len(data) < 6 + length or (function_code & 0x7F) not in READ_FUNCTIONS:
+            return
+        self.frames += 1
+        # Read requests are 5-byte PDUs; so are 3-byte coil/input responses,
+        # which are told apart by their pending transaction
+        if pdu_length == 5 and not function_code & 0x80 and (
+                function_code in (3, 4) or
+                (transaction_id, unit_id, function_code) not in self._pending):
+            start, quantity = struct.unpack_from('>HH', data, 8)
+            schedule = self.add_request(timestamp, unit_id, function_code, start, quantity,
+                                        transaction_id)
+        else:
+            schedule = self.add_response(timestamp, transaction_id, unit_id, function_code)
+        if schedule is not None:
+            schedule.add_traffic(6 + length, pdu_length)
+
+    def analyze_capture(self, capture_file):
+        """Stream every packet of a pcap/pcapng capture through the analyzer."""
+        for timestamp, frame in PCAPReader(capture_file).packets():
+            self.add_frame(timestamp, frame)
+        return self
+
+    def bus_time(self, rtu_bytes):
+        """Seconds the RS-485 line needs for a number of RTU bytes."""
+        return rtu_bytes * BITS_PER_CHAR / self.baud
+
+    def summary(self):
+        """
+        Poll schedules, cycles and bus usage.
+
+        Returns:
+            Dictionary with per-unit reads (keyed 'FC<fc>_<start>x<quantity>'),
+            per-unit cycle and bandwidth figures and bus-wide totals
+        """
+        duration = (self.last - self.first) if self.first is not None else 0.0
+        units = {}
+        for (unit_id, function_code, start, quantity), schedule in sorted(self.schedules.items()):
+            unit = units.setdefault(unit_id, {'reads': {}, 'polls': 0, 'missed': 0,
+                                              'unanswered': 0, 'tcp_bytes': 0, 'rtu_bytes': 0.0})
+            read = schedule.summary(self.first)
+            read['registers'] = quantity
+            read['tcp_bytes'] = schedule.tcp_bytes
+            read['bus_seconds'] = self.bus_time(schedule.rtu_bytes)
+            unit['reads'][f'FC{function_code}_{start}x{quantity}'] = read
+            unit['polls'] += schedule.count
+            unit['missed'] += read['missed']
+            unit['unanswered'] += schedule.unanswered
+            unit['tcp_bytes'] += schedule.tcp_bytes
+            unit['rtu_bytes'] += schedule.rtu_bytes
+
+        total_bus = self.bus_time(sum(unit['rtu_bytes'] for unit in units.values()))
+        result = {'duration': duration, 'baud': self.baud, 'frames': self.frames,
+                  'distinct_reads': len(self.schedules), 'units': {}}
+        for unit_id, unit in units.items():
+            bus_seconds = self.bus_time(unit.pop('rtu_bytes'))
+            unit['bus_seconds'] = bus_seconds
+            unit['bytes_per_second'] = unit['tcp_bytes'] / duration if duration else 0.0
+            unit['bus_utilization'] = bus_seconds / duration if duration else 0.0
+            unit['bus_share'] = bus_seconds / total_bus if total_bus else 0.0
+            unit['cycle'] = self.unit_cycles[unit_id].summary()
+            result['units'][f'Unit_{unit_id}'] = unit
+        result['bus'] = {
+            'bus_seconds': total_bus,
+            'bus_utilization': total_bus / duration if duration else 0.0,
+            'cycle': self.bus_cycles.summary(),
+        }
+        return result
+
+    def generate_report(self, output_file=None):
+        """Human-readable schedule report; also written to output_file if given."""
+        summary = self.summary()
+
+        def ms(value):
+            return '      -' if value is None else f"{value * 1000:7.1f}"
+
+        report = []
+        report.append("=" * 80)
+        report.append("MODBUS POLL CYCLE ANALYSIS")
+        report.append("=" * 80)
+        report.append(f"Capture span: {summary['duration']:.1f} s, {summary['frames']} frames, "
+                      f"{summary['distinct_reads']} distinct reads")
+        bus = summary['bus']
+        report.append(f"RS-485 time at {summary['baud']} baud: {bus['bus_seconds']:.1f} s "
+                      f"({bus['bus_utilization'] * 100:.1f}% of the capture)")
+        cycle = bus['cycle']
+        if cycle['cycles']:
+            report.append(f"Bus cycle: {cycle['cycles']} cycles, avg {cycle['avg_duration']:.3f} s "
+                          f"every {cycle['avg_period']:.3f} s")
+
+        for unit_key, unit in summary['units'].items():
+            report.append("")
+            report.append(f"{unit_key}: {unit['polls']} polls, {unit['missed']} missed, "
+                          f"{unit['unanswered']} unanswered, {unit['bytes_per_second']:.0f} B/s, "
+                          f"{unit['bus_share'] * 100:.1f}% of bus time")
+            cycle = unit['cycle']
+            if cycle['cycles']:
+                report.append(f"  Cycle: avg {cycle['avg_duration']:.3f} s "
+                              f"(min {cycle['min_duration']:.3f}, max {cycle['max_duration']:.3f}), "
+                              f"period {cycle['avg_period']:.3f} s")
+            report.append("-" * 80)
+            report.append(f"  {'Read':18s} {'Polls':>6s} {'Period ms':>9s} {'Jitter':>7s} "
+                          f"{'Phase':>7s} {'Missed':>6s} {'Resp ms':>7s}")
+            for name, read in unit['reads'].items():
+                report.append(f"  {name:18s} {read['polls']:6d}   {ms(read['period'])} "
+                              f"{ms(read['jitter'])} {ms(read['phase'])} {read['missed']:6d} "
+                              f"{ms(read['avg_response_time'])}")
+
+        text = "\n".join(report)
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            print(f"Report saved to: {output_file}")
+        return text
+
+
+def main():
+    """Analyze the poll schedule of a capture."""
+    capture = sys.argv[1] if len(sys.argv) >= 2 else 'captures/modbus_test_2min.pcapng'
+    baud = int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_BAUD
+    if not Path(capture).exists():
+        print(f"Error: {capture} not found")
+        print("Usage: python poll_cycles.py <pcap_or_pcapng_file> [baud]")
+        return
+
+    analyzer = PollCycleAnalyzer(baud).analyze_capture(capture)
+    print(analyzer.generate_report('poll_cycle_report.txt'))
+    with open('poll_cycles.json', 'w') as f:
+        json.dump(analyzer.summary(), f, indent=2)
+    print("Schedule saved to: poll_cycles.json")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,26 @@ Analyzes captured PCAPNG files and generates register mapping
 import subprocess
 import json
 import re
+import sys
 from collections import defaultdict
 from pathlib import Path
 
+try:
+    from src.utils.range_index import MAX_ADDRESS, RangeIndex, categorize
+except ImportError:  # run as a script from src/modbus
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.range_index import MAX_ADDRESS, RangeIndex, categorize
+
+# Register groups under the names used in the frame analysis reports
+CATEGORIES = RangeIndex([
+    (0, 50, 'Inverter_Info'),
+    (100, 199, 'Grid_AC_Data'),
+    (200, 299, 'DC_PV_Input'),
+    (300, 399, 'Weather_Station'),
+    (500, 599, 'Energy_Counters'),
+    (1000, MAX_ADDRESS, 'Faults_Alarms'),
+])
+
 
 class ModbusFrameAnalyzer:
     """Extract and analyze Modbus frames from PCAPNG using tshark"""
@@ -174,7 +191,7 @@ class ModbusFrameAnalyzer:
                         'quantity': qty,
                         'inferred_type': self._infer_type(qty),
                         'access_count': 1 + mapping['registers_by_unit'][unit]['function_3_reads'].get(addr_key, {}).get('access_count', 0),
-                        'category': self._infer_category(addr),
+                        'category': categorize(addr, CATEGORIES),
                     }
                 elif fc == 4:
                     mapping['registers_by_unit'][unit]['function_4_reads'][addr_key] = {
@@ -182,7 +199,7 @@ class ModbusFrameAnalyzer:
                         'quantity': qty,
                         'inferred_type': self._infer_type(qty),
                         'access_count': 1 + mapping['registers_by_unit'][unit]['function_4_reads'].get(addr_key, {}).get('access_count', 0),
-                        'category': self._infer_category(addr),
+                        'category': categorize(addr, CATEGORIES),
                     }
         
         # Add address patterns
@@ -205,23 +222,6 @@ class ModbusFrameAnalyzer:
             return 'STRING or ARRAY'
         return 'UNKNOWN'
 
-    def _infer_category(self, address):
-        """Infer register category from address"""
-        if 0 <= address <= 50:
-            return 'Inverter_Info'
-        elif 100 <= address <= 199:
-            return 'Grid_AC_Data'
-        elif 200 <= address <= 299:
-            return 'DC_PV_Input'
-        elif 300 <= address <= 399:
-            return 'Weather_Station'
-        elif 500 <= address <= 599:
-            return 'Energy_Counters'
-        elif address >= 1000:
-            return 'Faults_Alarms'
-        else:
-            return 'Other'
-
     def print_summary(self, output_file="sungrow_live_report.txt"):
         """Print human-readable summary"""
         analysis = self.analyze_frames()
@@ -8,6 +8,13 @@ import json
 from collections import defaultdict
 from pathlib import Path
 import struct
+import sys
+
+try:
+    from src.utils.range_index import categorize
+except ImportError:  # run as a script from src/modbus
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.range_index import categorize
 
 
 class ModbusLiveAnalyzer:
@@ -181,7 +188,7 @@ class ModbusLiveAnalyzer:
                     frame['quantity'] = quantity
                     
                     # Infer category
-                    frame['category'] = self._infer_category(start_addr)
+                    frame['category'] = categorize(start_addr)
                     
                     # Track pattern
                     pattern = f"FC{func_code}_Unit{unit_id}_Addr{start_addr}_Qty{quantity}"
@@ -200,23 +207,6 @@ class ModbusLiveAnalyzer:
         except Exception as e:
             return None
 
-    def _infer_category(self, address):
-        """Infer register category"""
-        if 0 <= address <= 50:
-            return 'Inverter_Info'
-        elif 100 <= address <= 199:
-            return 'Grid_AC'
-        elif 200 <= address <= 299:
-            return 'DC_PV'
-        elif 300 <= address <= 399:
-            return 'Weather'
-        elif 500 <= address <= 599:
-            return 'Energy_Counter'
-        elif address >= 1000:
-            return 'Faults_Alarms'
-        else:
-            return 'Other'
-
     def generate_report(self, output_file="modbus_live_report.txt"):
         """Generate analysis report"""
         with open(output_file, 'w') as f:
@@ -234,7 +224,7 @@ class ModbusLiveAnalyzer:
                 f.write(f"Unit {unit}:\n")
                 for addr in sorted(self.unit_registers[unit].keys()):
                     quantities = self.unit_registers[unit][addr]
-                    category = self._infer_category(addr)
+                    category = categorize(addr)
                     f.write(f"  Address {addr} ({category}): Quantities read = {quantities}\n")
                 f.write("\n")
             
@@ -266,7 +256,7 @@ class ModbusLiveAnalyzer:
                     'address': addr,
                     'quantities_read': quantities,
                     'common_quantity': max(set(quantities), key=quantities.count) if quantities else 1,
-                    'category': self._infer_category(addr),
+                    'category': categorize(addr),
                     'inferred_type': 'UINT32' if max(quantities) > 1 else 'UINT16' if max(quantities) == 1 else 'STRING'
                 }
             mapping['registers_by_unit'][f'Unit_{unit}'] = unit_map
@@ -10,14 +10,24 @@ from pathlib import Path
 from modbus_decoder import ModbusDecoder, RegisterType
 from pcap_extractor import PCAPReader, ModbusFrameProcessor
 
+try:
+    from src.utils.range_index import RangeIndex
+    from src.analysis.bus_model import BusUtilizationModel
+except ImportError:  # run as a script from src/modbus
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.range_index import RangeIndex
+    from src.analysis.bus_model import BusUtilizationModel
+
 
 class ModbusAnalysisPipeline:
     """End-to-end pipeline: PCAP -> Frames -> Register Map"""
 
     def __init__(self):
         self.raw_frames = []
+        self.timestamps = []
         self.parsed_frames = []
         self.decoder = ModbusDecoder()
+        self.bus_summary = None
 
     def process_pcap(self, pcap_file: str):
         """Step 1: Extract frames from PCAP"""
@@ -25,6 +35,7 @@ class ModbusAnalysisPipeline:
         
         reader = PCAPReader(pcap_file)
         self.raw_frames = reader.read()
+        self.timestamps = reader.timestamps
         
         print(f"  Found {len(self.raw_frames)} frames")
 
@@ -60,9 +71,27 @@ class ModbusAnalysisPipeline:
         
         print(f"  Saved to {output_json}")
 
+    def analyze_bus(self, output_json: str, gateway: str = "logger"):
+        """Step 5: Model bus load from the paired transactions"""
+        print(f"\n[STEP 5] Modelling bus utilization...")
+        
+        transactions = ModbusFrameProcessor.pair_transactions(self.raw_frames, self.timestamps)
+        model = BusUtilizationModel()
+        model.add_transactions(transactions, gateway)
+        self.bus_summary = model.summary()
+        
+        with open(output_json, 'w') as f:
+            json.dump(self.bus_summary, f, indent=2)
+        
+        entry = self.bus_summary['gateways'].get(gateway)
+        if entry:
+            print(f"  {entry['transactions_per_second']:.1f} tx/s, "
+                  f"{entry['busy_fraction'] * 100:.1f}% busy")
+        print(f"  Saved to {output_json}")
+
     def generate_summary_report(self, output_txt: str):
         """Generate human-readable report"""
-        print(f"\n[STEP 5] Generating analysis report...")
+        print(f"\n[STEP 6] Generating analysis report...")
         
         with open(output_txt, 'w') as f:
             f.write("="*70 + "\n")
@@ -109,20 +138,36 @@ class ModbusAnalysisPipeline:
 
                 # Categorize by known groups
                 f.write("EXPECTED REGISTER GROUPS:\n")
-                groups = {
-                    "Inverter Info": (0, 50),
-                    "Grid/AC Data": (100, 199),
-                    "DC/PV Input": (200, 299),
-                    "Weather Station": (300, 399),
-                    "Energy Counters": (500, 599),
-                    "Faults/Alarms": (1000, 1100),
-                }
-
-                for group_name, (start, end) in groups.items():
-                    matching = [a for a in addresses if start <= a <= end]
+                groups = RangeIndex([
+                    (0, 50, "Inverter Info"),
+                    (100, 199, "Grid/AC Data"),
+                    (200, 299, "DC/PV Input"),
+                    (300, 399, "Weather Station"),
+                    (500, 599, "Energy Counters"),
+                    (1000, 1100, "Faults/Alarms"),
+                ])
+                matches = groups.group(addresses)
+
+                for start, end, group_name in groups:
+                    matching = matches.get(group_name)
                     if matching:
                         f.write(f"  {group_name} ({start}-{end}): {len(matching)} addresses\n")
-                        f.write(f"    Addresses: {sorted(matching)}\n")
+                        f.write(f"    Addresses: {matching}\n")
+
+            if self.bus_summary:
+                f.write("\nBUS UTILIZATION:\n")
+                for gateway, entry in self.bus_summary['gateways'].items():
+                    f.write(f"  {gateway}: {entry['transactions_per_second']:.1f} tx/s, "
+                            f"{entry['bytes_per_second']:.0f} B/s, "
+                            f"{entry['busy_fraction'] * 100:.1f}% busy\n")
+                    for unit_key, unit in entry['units'].items():
+                        best = max(unit['coalescing'], key=lambda w: w['saved_per_second'],
+                                   default=None)
+                        line = f"    {unit_key}: {unit['reads']} reads, {unit['busy_fraction'] * 100:.1f}% busy"
+                        if best and best['reads_after'] < best['reads_before'] and best['saved_per_cycle']:
+                            line += (f"; coalescing into {best['reads_after']} reads saves "
+                                     f"{best['saved_per_cycle'] * 1000:.1f} ms per cycle")
+                        f.write(line + "\n")
 
             f.write("\n" + "="*70 + "\n")
             f.write("RECOMMENDATIONS:\n")
@@ -156,9 +201,11 @@ class ModbusAnalysisPipeline:
             self.analyze_patterns()
             
             json_output = f"{output_prefix}_map.json"
+            bus_output = f"{output_prefix}_bus.json"
             txt_output = f"{output_prefix}_report.txt"
             
             self.generate_mapping(json_output)
+            self.analyze_bus(bus_output)
             self.generate_summary_report(txt_output)
 
             print("\n" + "="*70)
@@ -166,6 +213,7 @@ class ModbusAnalysisPipeline:
             print("="*70)
             print(f"\nOutputs:")
             print(f"  - Register Map: {json_output}")
+            print(f"  - Bus Model: {bus_output}")
             print(f"  - Summary Report: {txt_output}")
             print(f"\nNext steps:")
             print(f"  1. Review the register mapping JSON")
@@ -188,6 +236,7 @@ def main():
         print("  python modbus_pipeline.py captures\\modbus_20251210_1430.pcapng sungrow_logger")
         print("\nThis will generate:")
         print("  - sungrow_logger_map.json (register mapping)")
+        print("  - sungrow_logger_bus.json (bus utilization model)")
         print("  - sungrow_logger_report.txt (analysis report)")
         return
 
@@ -7,44 +7,104 @@ Reads Wireshark captures and extracts raw Modbus TCP frames
 import struct
 import json
 from pathlib import Path
-from typing import List, BinaryIO
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 import sys
 
 
+class Transaction(NamedTuple):
+    """One Modbus request and its response"""
+    request_time: float
+    response_time: Optional[float]  # None if never answered
+    unit_id: int
+    function_code: int
+    start: int
+    quantity: int
+    request_bytes: int
+    response_bytes: int
+    exception: bool = False
+
+
+# pcap link types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+# pcapng block types
+BLOCK_SECTION_HEADER = 0x0A0D0D0A
+BLOCK_INTERFACE = 0x00000001
+BLOCK_SIMPLE_PACKET = 0x00000003
+BLOCK_ENHANCED_PACKET = 0x00000006
+
+
+class TCPSegment(NamedTuple):
+    """TCP payload of one captured packet with its flow"""
+    timestamp: float
+    src: str
+    sport: int
+    dst: str
+    dport: int
+    seq: int
+    payload: bytes
+
+
 class PCAPReader:
     """Reads PCAP/PCAPNG files"""
 
     def __init__(self, filename: str):
         self.filename = filename
         self.frames = []
+        self.timestamps = []
         self.is_pcapng = False
 
     def read(self) -> List[bytes]:
         """Read PCAP or PCAPNG file and return Modbus frames"""
+        self.frames = []
+        self.timestamps = []
+        for timestamp, frame in self.packets():
+            self.timestamps.append(timestamp)
+            self.frames.append(frame)
+        return self.frames
+
+    def packets(self, segments: bool = False) -> Iterator:
+        """
+        Yield the TCP payload of each packet, one packet at a time
+
+        Args:
+            segments: Yield TCPSegment tuples with addresses, ports and
+                sequence number instead of (capture epoch, Modbus frame)
+        """
         with open(self.filename, 'rb') as f:
             magic = f.read(4)
             f.seek(0)
 
             if magic == b'\x0a\x0d\x0d\x0a':  # PCAPNG
                 self.is_pcapng = True
-                return self._read_pcapng(f)
+                frames = self._read_pcapng(f)
             else:
                 self.is_pcapng = False
-                return self._read_pcap(f)
-
-    def _read_pcap(self, f: BinaryIO) -> List[bytes]:
-        """Read standard PCAP format"""
-        frames = []
-        
-        # Read global header
-        magic = struct.unpack('>I', f.read(4))[0]
-        version_major = struct.unpack('>H', f.read(2))[0]
-        version_minor = struct.unpack('>H', f.read(2))[0]
-        
-        f.read(4)  # timezone
-        f.read(4)  # timestamp accuracy
-        snaplen = struct.unpack('>I', f.read(4))[0]
-        network = struct.unpack('>I', f.read(4))[0]
+                frames = self._read_pcap(f)
+
+            for timestamp, linktype, frame in frames:
+                segment = _tcp_segment(linktype, frame)
+                if segment is None or not segment[5]:
+                    continue
+                if segments:
+                    yield TCPSegment(timestamp, *segment)
+                else:
+                    yield timestamp, segment[5]
+
+    def _read_pcap(self, f: BinaryIO) -> Iterator[Tuple[float, int, bytes]]:
+        """Read standard PCAP format as (timestamp, link type, frame)"""
+        # Read global header; the magic gives byte order and timestamp resolution
+        magic = f.read(4)
+        endian = '<' if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1') else '>'
+        resolution = 1e-9 if magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d') else 1e-6
+        header = f.read(20)  # version, timezone, accuracy, snaplen, network
+        if len(header) < 20:
+            return
+        linktype = struct.unpack_from(endian + 'I', header, 16)[0] & 0xFFFF
+        record = struct.Struct(endian + 'IIII')
 
         # Read packet records
         while True:
@@ -52,25 +112,17 @@ class PCAPReader:
             if not header or len(header) < 16:
                 break
 
-            ts_sec = struct.unpack('>I', header[0:4])[0]
-            ts_usec = struct.unpack('>I', header[4:8])[0]
-            incl_len = struct.unpack('>I', header[8:12])[0]
-            orig_len = struct.unpack('>I', header[12:16])[0]
+            ts_sec, ts_frac, incl_len, orig_len = record.unpack(header)
 
             packet_data = f.read(incl_len)
             if len(packet_data) < incl_len:
                 break
+            yield ts_sec + ts_frac * resolution, linktype, packet_data
 
-            # Extract Modbus TCP frame (skip Ethernet, IP, TCP headers)
-            modbus_frame = self._extract_modbus_tcp(packet_data)
-            if modbus_frame:
-                frames.append(modbus_frame)
-
-        return frames
-
-    def _read_pcapng(self, f: BinaryIO) -> List[bytes]:
-        """Read PCAPNG format"""
-        frames = []
+    def _read_pcapng(self, f: BinaryIO) -> Iterator[Tuple[float, int, bytes]]:
+        """Read PCAPNG format as (timestamp, link type, frame)"""
+        endian = '>'
+        interfaces: List[Tuple[int, int]] = []  # (link type, timestamp ticks per second)
 
         while True:
             # Read block type and length
@@ -78,68 +130,91 @@ class PCAPReader:
             if not header or len(header) < 8:
                 break
 
-            block_type = struct.unpack('>I', header[0:4])[0]
-            block_len = struct.unpack('>I', header[4:8])[0]
-
-            if block_type == 0x06:  # Enhanced Packet Block
-                block_data = f.read(block_len - 8)
-                packet_data = self._parse_epb(block_data)
-                
-                if packet_data:
-                    modbus_frame = self._extract_modbus_tcp(packet_data)
-                    if modbus_frame:
-                        frames.append(modbus_frame)
-            else:
-                # Skip other blocks
-                f.read(block_len - 8)
-
-            # Read trailing length
-            f.read(4)
-
-        return frames
-
-    def _parse_epb(self, data: bytes) -> bytes:
-        """Parse Enhanced Packet Block"""
-        try:
-            if_id = struct.unpack('>I', data[0:4])[0]
-            ts_hi = struct.unpack('>I', data[4:8])[0]
-            ts_lo = struct.unpack('>I', data[8:12])[0]
-            incl_len = struct.unpack('>I', data[12:16])[0]
-            orig_len = struct.unpack('>I', data[16:20])[0]
-
-            packet_data = data[20:20+incl_len]
-            return packet_data
-        except:
-            return None
-
-    def _extract_modbus_tcp(self, packet: bytes) -> bytes:
-        """Extract Modbus TCP payload from Ethernet/IP/TCP packet"""
-        try:
-            # Skip Ethernet header (14 bytes) if present
-            offset = 0
-            if len(packet) > 14:
-                eth_type = struct.unpack('>H', packet[12:14])[0]
-                if eth_type == 0x0800:  # IPv4
-                    offset = 14
-
-            # Parse IPv4 header
-            if offset < len(packet):
-                ip_version = (packet[offset] >> 4) & 0x0F
-                if ip_version == 4:
-                    ihl = (packet[offset] & 0x0F) * 4
-                    tcp_offset = offset + ihl
-
-                    # Skip TCP header (minimum 20 bytes)
-                    if tcp_offset + 20 <= len(packet):
-                        tcp_header_len = ((packet[tcp_offset + 12] >> 4) & 0x0F) * 4
-                        modbus_offset = tcp_offset + tcp_header_len
-
-                        if modbus_offset < len(packet):
-                            return packet[modbus_offset:]
+            if header[:4] == b'\x0a\x0d\x0d\x0a':  # Section Header: byte-order magic follows
+                order = f.read(4)
+                endian = '<' if order == b'\x4d\x3c\x2b\x1a' else '>'
+                f.seek(-4, 1)
+                interfaces = []
 
+            block_type, block_len = struct.unpack(endian + 'II', header)
+            if block_len < 12:
+                break
+            # block_len counts the header and the trailing length
+            body = f.read(block_len - 8)[:-4]
+
+            if block_type == BLOCK_INTERFACE and len(body) >= 8:
+                linktype = struct.unpack_from(endian + 'H', body)[0]
+                interfaces.append((linktype, _interface_resolution(body[8:], endian)))
+            elif block_type == BLOCK_ENHANCED_PACKET and interfaces and len(body) >= 20:
+                if_id, ts_hi, ts_lo, incl_len = struct.unpack_from(endian + 'IIII', body)
+                linktype, ticks = interfaces[if_id] if if_id < len(interfaces) else interfaces[0]
+                yield ((ts_hi << 32) | ts_lo) / ticks, linktype, body[20:20 + incl_len]
+            elif block_type == BLOCK_SIMPLE_PACKET and interfaces:
+                yield 0.0, interfaces[0][0], body[4:]
+
+
+def _interface_resolution(options: bytes, endian: str) -> int:
+    """Timestamp ticks per second from Interface Description Block options"""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:  # if_tsresol
+            value = options[offset + 4]
+            return 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+        offset += 4 + ((length + 3) & ~3)
+    return 1000000
+
+
+def _tcp_segment(linktype: int, frame: bytes) -> Optional[Tuple[str, int, str, int, int, bytes]]:
+    """Return (src, sport, dst, dport, seq, payload) for a TCP frame"""
+    if linktype == LINKTYPE_ETHERNET:
+        offset, ethertype = 14, struct.unpack_from('>H', frame, 12)[0] if len(frame) >= 14 else 0
+        while ethertype == 0x8100 and len(frame) >= offset + 4:  # VLAN tags
+            ethertype = struct.unpack_from('>H', frame, offset + 2)[0]
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        offset, ethertype = 16, struct.unpack_from('>H', frame, 14)[0] if len(frame) >= 16 else 0
+    elif linktype == LINKTYPE_NULL:
+        offset, ethertype = 4, 0
+    elif linktype == LINKTYPE_RAW:
+        offset, ethertype = 0, 0
+    else:
+        return None
+
+    if len(frame) < offset + 20:
+        return None
+    version = frame[offset] >> 4
+    if ethertype not in (0, 0x0800, 0x86DD):
+        return None
+
+    if version == 4:
+        header_len = (frame[offset] & 0x0F) * 4
+        total_len = struct.unpack_from('>H', frame, offset + 2)[0]
+        if frame[offset + 9] != 6:
             return None
-        except:
+        src = '.'.join(str(b) for b in frame[offset + 12:offset + 16])
+        dst = '.'.join(str(b) for b in frame[offset + 16:offset + 20])
+        # Stop at the IP length so Ethernet padding is not read as payload
+        end = offset + total_len if total_len else len(frame)
+        offset += header_len
+    elif version == 6:
+        if len(frame) < offset + 40 or frame[offset + 6] != 6:
             return None
+        payload_len = struct.unpack_from('>H', frame, offset + 4)[0]
+        src = frame[offset + 8:offset + 24].hex()
+        dst = frame[offset + 24:offset + 40].hex()
+        end = offset + 40 + payload_len
+        offset += 40
+    else:
+        return None
+
+    if len(frame) < offset + 20:
+        return None
+    sport, dport, seq = struct.unpack_from('>HHI', frame, offset)
+    data_offset = (frame[offset + 12] >> 4) * 4
+    return src, sport, dst, dport, seq, frame[offset + data_offset:min(end, len(frame))]
 
 
 class ModbusFrameProcessor:
@@ -190,6 +265,82 @@ class ModbusFrameProcessor:
         except Exception as e:
             return None
 
+    @staticmethod
+    def pair_read_exchanges(frames: List[bytes]) -> List[Tuple[int, int, int, bytes]]:
+        """
+        Match FC3/FC4 read requests with their responses.
+
+        Requests and responses are paired by transaction ID, unit ID and
+        function code. A read request PDU is always 5 bytes and a response
+        PDU always has an even length, so direction needs no port information.
+
+        Returns:
+            (unit_id, function_code, start_address, register bytes) per answered read
+        """
+        pending = {}
+        exchanges = []
+        for data in frames:
+            if len(data) < 9:
+                continue
+            transaction_id, protocol_id, length, unit_id, function_code = struct.unpack_from('>HHHBB', data)
+            pdu = data[7:6 + length]
+            if protocol_id != 0 or function_code not in (3, 4) or len(pdu) != length - 1:
+                continue
+            key = (transaction_id, unit_id, function_code)
+            if len(pdu) == 5:
+                pending[key] = struct.unpack_from('>HH', pdu, 1)
+                continue
+            request = pending.pop(key, None)
+            byte_count = pdu[1]
+            if request and byte_count == request[1] * 2 and len(pdu) >= 2 + byte_count:
+                exchanges.append((unit_id, function_code, request[0], bytes(pdu[2:2 + byte_count])))
+        return exchanges
+
+    @staticmethod
+    def pair_transactions(frames: Sequence[bytes], timestamps: Sequence[float]) -> List[Transaction]:
+        """
+        Pair every request with its response, keeping capture times.
+
+        The first frame of a (transaction ID, unit ID, function code) is the
+        request and the next one its response. A new FC3/FC4 request (always
+        a 5-byte PDU) on a pending key marks the earlier one as unanswered.
+        Responses whose request is not in the capture are dropped where the
+        PDU size tells them apart (FC3/FC4 reads, FC15/FC16 writes).
+
+        Args:
+            frames: Modbus TCP frames, e.g. PCAPReader.read()
+            timestamps: Capture epoch of each frame (PCAPReader.timestamps)
+
+        Returns:
+            Transactions ordered by request time
+        """
+        pending = {}
+        transactions = []
+        for timestamp, data in zip(timestamps, frames):
+            if len(data) < 8:
+                continue
+            transaction_id, protocol_id, length, unit_id, function_code = struct.unpack_from('>HHHBB', data)
+            if protocol_id != 0 or len(data) < 6 + length:
+                continue
+            base_code = function_code & 0x7F
+            key = (transaction_id, unit_id, base_code)
+            request = pending.pop(key, None)
+            if request is not None and not (base_code in (3, 4) and length == 6):
+                transactions[request] = transactions[request]._replace(
+                    response_time=timestamp, response_bytes=6 + length,
+                    exception=bool(function_code & 0x80))
+                continue
+            if (function_code & 0x80 or length < 6 or (base_code in (3, 4) and length != 6)
+                    or (base_code in (15, 16) and length == 6)):
+                continue  # Response without a request in the capture
+            start, quantity = struct.unpack_from('>HH', data, 8)
+            if base_code in (5, 6):
+                quantity = 1
+            pending[key] = len(transactions)
+            transactions.append(Transaction(timestamp, None, unit_id, base_code, start, quantity,
+                                            6 + length, 0))
+        return transactions
+
     @staticmethod
     def _get_function_name(code: int) -> str:
         functions = {
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Table-driven Modbus register decoder.
+Compiles register blocks into precompiled struct layouts plus scale/offset
+vectors, so a whole read response decodes in one unpack_from and one
+arithmetic pass. Serves the 3S weather station table and the Sungrow
+inverter maps produced by the analysis pipeline.
+"""
+
+import json
+import re
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+
+# struct format character and register width for each supported type
+TYPE_FORMATS = {
+    'uint16': ('H', 1),
+    'int16': ('h', 1),
+    'uint32': ('I', 2),
+    'int32': ('i', 2),
+    'float32': ('f', 2),
+}
+
+# Modbus limit for a single FC3/FC4 read
+MAX_BLOCK_REGISTERS = 125
+
+# Unused registers read through rather than starting a new request
+DEFAULT_MAX_GAP = 16
+
+
+@dataclass(frozen=True)
+class RegisterField:
+    """Single value decoded from a register block."""
+    name: str
+    address: int
+    data_type: str = 'uint16'
+    scale: float = 1.0
+    offset: float = 0.0
+    unit: str = ''
+    label: str = ''
+    decimals: Optional[int] = None
+
+    @property
+    def width(self) -> int:
+        """Number of 16-bit registers occupied by this field."""
+        return TYPE_FORMATS[self.data_type][1]
+
+
+class RegisterBlock:
+    """Contiguous register range decoded with one precompiled struct."""
+
+    def __init__(self, start: int, count: int, fields: Iterable[RegisterField]):
+        """
+        Compile a register block.
+
+        Args:
+            start: First register address of the read
+            count: Number of registers in the read
+            fields: Values to decode; registers not covered are skipped
+
+        Raises:
+            ValueError: If a field is outside the block, overlaps another
+                field or uses an unknown data type
+        """
+        if not 0 < count <= MAX_BLOCK_REGISTERS:
+            raise ValueError(f"Block size must be 1-{MAX_BLOCK_REGISTERS}, got {count}")
+
+        self.start = start
+        self.count = count
+        self.fields: Tuple[RegisterField, ...] = tuple(sorted(fields, key=lambda f: f.address))
+
+        format_parts = ['>']
+        cursor = start
+        for fld in self.fields:
+            if fld.data_type not in TYPE_FORMATS:
+                raise ValueError(f"Unknown data type '{fld.data_type}' for {fld.name}")
+            if fld.address < cursor:
+                raise ValueError(f"Field {fld.name} at {fld.address} overlaps previous field")
+            if fld.address + fld.width > start + count:
+                raise ValueError(f"Field {fld.name} at {fld.address} is outside block "
+                                 f"{start}-{start + count - 1}")
+            gap = fld.address - cursor
+            if gap:
+                format_parts.append(f'{gap * 2}x')
+            format_parts.append(TYPE_FORMATS[fld.data_type][0])
+            cursor = fld.address + fld.width
+
+        self.struct = struct.Struct(''.join(format_parts))
+        self.names = tuple(fld.name for fld in self.fields)
+        self.scales = tuple(fld.scale for fld in self.fields)
+        self.offsets = tuple(fld.offset for fld in self.fields)
+
+    @property
+    def end(self) -> int:
+        """Last register address covered by the block."""
+        return self.start + self.count - 1
+
+    @property
+    def byte_count(self) -> int:
+        """Payload size of a complete read response."""
+        return self.count * 2
+
+    def unpack(self, payload: bytes, offset: int = 0) -> Tuple:
+        """Return raw field values from a response payload."""
+        return self.struct.unpack_from(payload, offset)
+
+    def decode(self, payload: bytes, offset: int = 0) -> Dict[str, float]:
+        """Return engineering values keyed by field name."""
+        raw = self.struct.unpack_from(payload, offset)
+        return dict(zip(self.names, [r * s + o for r, s, o in zip(raw, self.scales, self.offsets)]))
+
+    def decode_with_raw(self, payload: bytes, offset: int = 0) -> Tuple[List[float], Tuple]:
+        """Return engineering values and raw values in field order."""
+        raw = self.struct.unpack_from(payload, offset)
+        return [r * s + o for r, s, o in zip(raw, self.scales, self.offsets)], raw
+
+    def __repr__(self) -> str:
+        return (f"RegisterBlock(start={self.start}, count={self.count}, "
+                f"fields={len(self.fields)}, format='{self.struct.format}')")
+
+
+# 3S-RH&AT&PS weather station sensor table: one 25-register FC4 read (8061-8085)
+WEATHER_3S_BLOCK = RegisterBlock(8061, 25, [
+    # UINT16, 0-65535 = 0-100%
+    RegisterField('humidity', 8061, 'uint16', scale=1 / 655.35,
+                  unit='%', label='Relative Humidity', decimals=1),
+    # UINT16, value/100 - 40
+    RegisterField('temperature', 8063, 'uint16', scale=0.01, offset=-40.0,
+                  unit='°C', label='Air Temperature', decimals=1),
+    # UINT16, 850 + value*0.1
+    RegisterField('pressure', 8073, 'uint16', scale=0.1, offset=850.0,
+                  unit='hPa', label='Atmospheric Pressure', decimals=1),
+    # UINT16, value/1000
+    RegisterField('wind_speed', 8082, 'uint16', scale=0.001,
+                  unit='m/s', label='Wind Speed', decimals=2),
+    # UINT16, value/10
+    RegisterField('solar_radiation', 8085, 'uint16', scale=0.1,
+                  unit='W/m²', label='Solar Irradiance', decimals=1),
+])
+
+
+def compile_blocks(fields: Iterable[RegisterField], max_gap: int = 0,
+                   max_count: int = MAX_BLOCK_REGISTERS) -> List[RegisterBlock]:
+    """
+    Group fields into as few read blocks as possible.
+
+    Args:
+        fields: Fields to cover
+        max_gap: Largest run of unused registers allowed inside one block
+        max_count: Largest block size in registers
+
+    Returns:
+        Register blocks sorted by start address
+    """
+    blocks = []
+    current: List[RegisterField] = []
+    block_start = block_end = 0
+
+    for fld in sorted(fields, key=lambda f: f.address):
+        fld_end = fld.address + fld.width
+        if current and (fld.address - block_end <= max_gap
+                        and fld_end - block_start <= max_count):
+            current.append(fld)
+            block_end = max(block_end, fld_end)
+            continue
+        if current:
+            blocks.append(RegisterBlock(block_start, block_end - block_start, current))
+        current = [fld]
+        block_start, block_end = fld.address, fld_end
+
+    if current:
+        blocks.append(RegisterBlock(block_start, block_end - block_start, current))
+    return blocks
+
+
+def _field_name(label: str, address: int) -> str:
+    """Build a snake_case field name from a documentation label."""
+    name = re.sub(r'[^0-9a-zA-Z]+', '_', label).strip('_').lower()
+    return name or f'reg_{address}'
+
+
+def blocks_from_register_map(mapping: Dict, unit_key: str, max_gap: int = 0) -> List[RegisterBlock]:
+    """
+    Build decode blocks for one unit of a documented register mapping.
+
+    Args:
+        mapping: Parsed sungrow_documented_mapping.json document
+        unit_key: Unit entry to compile, e.g. 'Unit_1'
+        max_gap: Largest run of unused registers allowed inside one block
+
+    Returns:
+        Register blocks for the documented registers of that unit
+    """
+    registers = mapping.get('documented_registers', {}).get(unit_key, {})
+    fields = []
+    for addr_str, reg in registers.items():
+        address = int(addr_str)
+        data_type = str(reg.get('type', 'UINT16')).lower()
+        if data_type not in TYPE_FORMATS:
+            continue
+        label = reg.get('name', '')
+        fields.append(RegisterField(
+            name=_field_name(label, address),
+            address=address,
+            data_type=data_type,
+            scale=float(reg.get('scale', 1) or 1),
+            unit=reg.get('unit', ''),
+            label=label,
+        ))
+    return compile_blocks(fields, max_gap=max_gap)
+
+
+def load_register_map_blocks(json_file: str, max_gap: int = 0) -> Dict[str, List[RegisterBlock]]:
+    """
+    Compile every unit of a documented register mapping file.
+
+    Args:
+        json_file: Path to sungrow_documented_mapping.json
+        max_gap: Largest run of unused registers allowed inside one block
+
+    Returns:
+        Register blocks keyed by unit (e.g. 'Unit_1')
+    """
+    with open(Path(json_file), 'r') as f:
+        mapping = json.load(f)
+
+    return {
+        unit_key: blocks_from_register_map(mapping, unit_key, max_gap)
+        for unit_key in mapping.get('documented_registers', {})
+    }
+
+
+def blocks_from_live_register_map(mapping: Dict, unit_key: str, max_gap: int = 0,
+                                  addresses: Optional[Container[int]] = None) -> List[RegisterBlock]:
+    """
+    Build decode blocks for one unit of a live capture register map.
+
+    Registers have no documented names; fields are named 'reg_<address>'
+    and labelled with the inferred category.
+
+    Args:
+        mapping: Parsed sungrow_live_register_map.json document
+        unit_key: Unit entry to compile, e.g. 'Unit_1'
+        max_gap: Largest run of unused registers allowed inside one block
+        addresses: Only compile these register addresses (default: all)
+
+    Returns:
+        Register blocks for the registers observed on that unit
+    """
+    registers = mapping.get('registers_by_unit', {}).get(unit_key, {}).get('registers', {})
+    fields = []
+    for addr_str, reg in registers.items():
+        address = int(addr_str)
+        if addresses is not None and address not in addresses:
+            continue
+        data_type = str(reg.get('data_type', 'UINT16')).lower()
+        if data_type not in TYPE_FORMATS:
+            continue
+        fields.append(RegisterField(
+            name=f'reg_{address}',
+            address=address,
+            data_type=data_type,
+            label=reg.get('category', ''),
+        ))
+    return compile_blocks(fields, max_gap=max_gap)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Sungrow Modbus TCP Connector
+One gateway connection shared by every inverter unit behind the logger.
+Reads can be pipelined: with max_in_flight above 1, that many requests are
+outstanding at once and responses are matched back by transaction ID, so a
+full plant cycle costs about one round trip per window instead of one per
+read. Pipelining is off by default; enable it only for gateways known to
+queue concurrent requests.
+"""
+
+import socket
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from src.modbus.register_decoder import RegisterBlock
+except ImportError:  # run as a script from src/solar
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.modbus.register_decoder import RegisterBlock
+
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+
+# MBAP header + unit ID + FC3/FC4 request body
+REQUEST = struct.Struct('>HHHBBHH')
+MBAP = struct.Struct('>HHHB')
+
+
+@dataclass(frozen=True)
+class ReadRequest:
+    """One register block read from one unit."""
+    unit_id: int
+    function_code: int
+    block: RegisterBlock
+
+
+class SungrowConnector:
+    """Pipelined Modbus TCP client for the Sungrow Logger gateway."""
+
+    def __init__(self, host: str = '192.168.1.5', port: int = 502, timeout: float = 3.0,
+                 max_in_flight: int = 1):
+        """
+        Initialize connector.
+
+        Args:
+            host: Gateway IP address
+            port: Modbus TCP port
+            timeout: Seconds to wait for a response before the batch is abandoned
+            max_in_flight: Requests outstanding at once (1, the default, sends one
+                request at a time)
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = max(1, max_in_flight)
+        self.socket: Optional[socket.socket] = None
+        self.transaction_id = 0
+        self.lock = threading.Lock()
+        self.last_exceptions: Dict[int, int] = {}
+        self.stats = {
+            'requests': 0,
+            'responses': 0,
+            'exceptions': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'bytes_sent': 0,
+            'bytes_received': 0,
+            'busy_time': 0.0,
+        }
+
+    @property
+    def connected(self) -> bool:
+        """True while the gateway connection is open."""
+        return self.socket is not None
+
+    def connect(self) -> bool:
+        """
+        Open the gateway connection.
+
+        Returns:
+            True if connected
+        """
+        self.disconnect()
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            print(f"[ERROR] Connection to {self.host}:{self.port} failed: {e}")
+            return False
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket = sock
+        return True
+
+    def disconnect(self) -> None:
+        """Close the gateway connection."""
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+            self.socket = None
+
+    def _next_transaction(self) -> int:
+        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+        return self.transaction_id
+
+    def read(self, unit_id: int, function_code: int, block: RegisterBlock) -> Optional[bytes]:
+        """Read one block; returns the register payload or None on error."""
+        return self.execute([ReadRequest(unit_id, function_code, block)])[0]
+
+    def execute(self, requests: Sequence[ReadRequest]) -> List[Optional[bytes]]:
+        """
+        Run a batch of reads over the shared connection.
+
+        Args:
+            requests: Reads to perform, in any unit order
+
+        Returns:
+            Register payload bytes per request, in request order; None for
+            reads answered with a Modbus exception (code kept in
+            last_exceptions by request index) or lost to a timeout
+        """
+        results: List[Optional[bytes]] = [None] * len(requests)
+        with self.lock:
+            self.last_exceptions = {}
+            if not requests or (self.socket is None and not self._reconnect()):
+                return results
+            began = time.perf_counter()
+            try:
+                self._pipeline(requests, results)
+            except socket.timeout:
+                self.stats['timeouts'] += 1
+                # Late answers would arrive with stale transaction IDs
+                self._reconnect()
+            except OSError:
+                self._reconnect()
+            self.stats['busy_time'] += time.perf_counter() - began
+        return results
+
+    def _reconnect(self) -> bool:
+        self.stats['reconnects'] += 1
+        return self.connect()
+
+    def _pipeline(self, requests: Sequence[ReadRequest], results: List[Optional[bytes]]) -> None:
+        """Keep the window full and match responses until every read is answered."""
+        sock = self.socket
+        sock.settimeout(self.timeout)
+        outstanding: Dict[int, int] = {}
+        buffer = bytearray()
+        next_index = 0
+        total = len(requests)
+
+        while next_index < total or outstanding:
+            frames = []
+            while next_index < total and len(outstanding) < self.max_in_flight:
+                request = requests[next_index]
+                transaction = self._next_transaction()
+                frames.append(REQUEST.pack(transaction, 0, 6, request.unit_id,
+                                           request.function_code, request.block.start,
+                                           request.block.count))
+                outstanding[transaction] = next_index
+                next_index += 1
+            if frames:
+                data = b''.join(frames)
+                sock.sendall(data)
+                self.stats['requests'] += len(frames)
+                self.stats['bytes_sent'] += len(data)
+
+            chunk = sock.recv(65536)
+            if not chunk:
+                raise ConnectionResetError('gateway closed the connection')
+            self.stats['bytes_received'] += len(chunk)
+            buffer += chunk
+
+            # Consume every complete ADU in the buffer
+            offset = 0
+            while len(buffer) - offset >= 9:
+                transaction, _, length, _ = MBAP.unpack_from(buffer, offset)
+                end = offset + 6 + length
+                if end > len(buffer):
+                    break
+                index = outstanding.pop(transaction, None)
+                if index is not None:
+                    self._store(requests[index], index, buffer, offset, end, results)
+                offset = end
+            if offset:
+                del buffer[:offset]
+
+    def _store(self, request: ReadRequest, index: int, buffer: bytearray, offset: int,
+               end: int, results: List[Optional[bytes]]) -> None:
+        """Keep the payload of one response ADU, or record its exception code."""
+        function_code = buffer[offset + 7]
+        self.stats['responses'] += 1
+        if function_code & 0x80:
+            self.stats['exceptions'] += 1
+            self.last_exceptions[index] = buffer[offset + 8]
+            return
+        byte_count = buffer[offset + 8]
+        if byte_count == request.block.byte_count and offset + 9 + byte_count <= end:
+            results[index] = bytes(buffer[offset + 9:offset + 9 + byte_count])
+
+    def get_stats(self) -> Dict:
+        """Return request counters and the measured request rate."""
+        with self.lock:
+            stats = dict(self.stats)
+        busy = stats['busy_time']
+        stats['requests_per_second'] = stats['responses'] / busy if busy else 0.0
+        return stats
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Sungrow Inverter Monitor
+Polls every inverter unit behind the logger from the register map the
+capture pipeline produces. Observed registers are coalesced into as few
+FC3/FC4 reads per unit as the Modbus limits allow, all units share one
+gateway connection (optionally pipelined), and each response decodes with
+a single precompiled struct.
+"""
+
+import argparse
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from src.analysis.compiled_map import load_register_map
+    from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+    from src.modbus.register_decoder import DEFAULT_MAX_GAP, blocks_from_live_register_map
+    from src.solar.connector import (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, ReadRequest,
+                                     SungrowConnector)
+except ImportError:  # run as a script from src/solar
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.analysis.compiled_map import load_register_map
+    from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+    from src.modbus.register_decoder import DEFAULT_MAX_GAP, blocks_from_live_register_map
+    from src.solar.connector import (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, ReadRequest,
+                                     SungrowConnector)
+
+DEFAULT_REGISTER_MAP = Path(__file__).parent.parent.parent / 'data' / 'sungrow_live_register_map.json'
+
+# Inverters behind the logger; 247 is the weather station. Unit 6 reads
+# 8189-8218, which matches no known device signature, so it is left out
+DEFAULT_UNITS = (1, 2, 3, 4, 5)
+
+
+def observed_function_codes(exchanges: Iterable[Tuple[int, int, int, bytes]]) -> Dict[Tuple[int, int], Set[int]]:
+    """
+    Collect the function codes each register was read with.
+
+    Args:
+        exchanges: (unit_id, function_code, start_address, register bytes)
+            tuples, as returned by ModbusFrameProcessor.pair_read_exchanges
+
+    Returns:
+        Function codes keyed by (unit ID, register address)
+    """
+    codes = defaultdict(set)
+    for unit_id, function_code, start, payload in exchanges:
+        for address in range(start, start + len(payload) // 2):
+            codes[(unit_id, address)].add(function_code)
+    return dict(codes)
+
+
+def capture_function_codes(capture_file) -> Dict[Tuple[int, int], Set[int]]:
+    """Function codes per (unit ID, register address) read in a pcap/pcapng capture."""
+    frames = PCAPReader(str(capture_file)).read()
+    return observed_function_codes(ModbusFrameProcessor.pair_read_exchanges(frames))
+
+
+def plan_reads(mapping: Dict, units: Iterable[int] = DEFAULT_UNITS,
+               max_gap: int = DEFAULT_MAX_GAP,
+               function_codes: Optional[Dict[Tuple[int, int], Set[int]]] = None) -> List[ReadRequest]:
+    """
+    Build the coalesced reads covering every mapped register of the units.
+
+    Each register is read with the function code the capture read it with:
+    the register's own 'function_codes' entry in the map, else the codes in
+    function_codes. Registers with neither use the unit's function code
+    when the unit was read with only one, and input registers (FC4)
+    otherwise. Registers are only coalesced with registers of the same
+    function code.
+
+    Args:
+        mapping: Parsed sungrow_live_register_map.json document
+        units: Unit IDs to poll
+        max_gap: Largest run of unused registers read inside one request
+        function_codes: Codes per (unit ID, address), e.g. from
+            capture_function_codes()
+
+    Returns:
+        Read requests ordered by unit and start address
+    """
+    plan = []
+    units_map = mapping.get('registers_by_unit', {})
+    function_codes = function_codes or {}
+    read_codes = (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS)
+    for unit_id in units:
+        unit_key = f'Unit_{unit_id}'
+        if unit_key not in units_map:
+            continue
+        unit = units_map[unit_key]
+        unit_codes = [code for code in unit.get('function_codes', []) if code in read_codes]
+        default = unit_codes[0] if len(unit_codes) == 1 else READ_INPUT_REGISTERS
+
+        addresses = defaultdict(set)
+        for addr_str, reg in unit.get('registers', {}).items():
+            address = int(addr_str)
+            codes = (reg.get('function_codes') or function_codes.get((unit_id, address))
+                     or (default,))
+            for code in codes:
+                if code in read_codes:
+                    addresses[code].add(address)
+
+        requests = [ReadRequest(unit_id, code, block)
+                    for code, code_addresses in addresses.items()
+                    for block in blocks_from_live_register_map(mapping, unit_key, max_gap,
+                                                               code_addresses)]
+        requests.sort(key=lambda request: (request.block.start, request.function_code))
+        plan.extend(requests)
+    return plan
+
+
+@dataclass
+class CycleResult:
+    """Values and timing of one full-plant poll."""
+    values: Dict[int, Dict[str, float]]
+    started: float
+    duration: float
+    reads: int
+    failed: int
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.reads / self.duration if self.duration else 0.0
+
+
+class InverterMonitor:
+    """Poll all inverter units on a fixed interval."""
+
+    def __init__(self, connector: SungrowConnector, register_map=DEFAULT_REGISTER_MAP,
+                 units: Iterable[int] = DEFAULT_UNITS, max_gap: int = DEFAULT_MAX_GAP,
+                 interval: float = 1.0,
+                 function_codes: Optional[Dict[Tuple[int, int], Set[int]]] = None):
+        """
+        Initialize monitor.
+
+        Args:
+            connector: Gateway connection shared by all units
+            register_map: Path to sungrow_live_register_map.json (or its compiled
+                .srm form), or the loaded document
+            units: Unit IDs to poll
+            max_gap: Largest run of unused registers read inside one request
+            interval: Seconds between the starts of two poll cycles
+            function_codes: Function codes per (unit ID, address) seen in a
+                capture (see plan_reads)
+        """
+        if isinstance(register_map, (str, Path)):
+            register_map = load_register_map(register_map)
+        self.connector = connector
+        self.units = tuple(units)
+        self.interval = interval
+        self.plan = plan_reads(register_map, self.units, max_gap, function_codes)
+        self.latest: Dict[int, Dict[str, float]] = {}
+        self.last_cycle: Optional[CycleResult] = None
+        self.running = False
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.stats = {'cycles': 0, 'reads': 0, 'failed_reads': 0, 'poll_time': 0.0,
+                      'max_cycle_time': 0.0, 'overruns': 0}
+
+    @property
+    def registers_per_cycle(self) -> int:
+        """Registers transferred by one full-plant poll."""
+        return sum(request.block.count for request in self.plan)
+
+    def poll_once(self) -> CycleResult:
+        """
+        Read and decode every planned block once.
+
+        Returns:
+            CycleResult with values keyed by unit ID, then field name
+        """
+        started = time.time()
+        began = time.perf_counter()
+        payloads = self.connector.execute(self.plan)
+        values: Dict[int, Dict[str, float]] = {unit_id: {} for unit_id in self.units}
+        failed = 0
+        for request, payload in zip(self.plan, payloads):
+            if payload is None:
+                failed += 1
+                continue
+            values[request.unit_id].update(request.block.decode(payload))
+        duration = time.perf_counter() - began
+
+        result = CycleResult(values, started, duration, len(self.plan), failed)
+        # Publish by swapping references; readers never see a partial cycle
+        latest = dict(self.latest)
+        latest.update((unit_id, unit_values) for unit_id, unit_values in values.items() if unit_values)
+        self.latest = latest
+        self.last_cycle = result
+        self.stats['cycles'] += 1
+        self.stats['reads'] += len(self.plan)
+        self.stats['failed_reads'] += failed
+        self.stats['poll_time'] += duration
+        self.stats['max_cycle_time'] = max(self.stats['max_cycle_time'], duration)
+        return result
+
+    def run(self, stop_event: threading.Event,
+            callback: Optional[Callable[[CycleResult], None]] = None) -> None:
+        """
+        Poll until stop_event is set.
+
+        Args:
+            stop_event: Event that ends the loop
+            callback: Called with every CycleResult
+        """
+        next_cycle = time.monotonic()
+        while not stop_event.is_set():
+            result = self.poll_once()
+            if callback:
+                callback(result)
+            next_cycle += self.interval
+            delay = next_cycle - time.monotonic()
+            if delay < 0:
+                # Cycle took longer than the interval; start the next one now
+                self.stats['overruns'] += 1
+                next_cycle = time.monotonic()
+                delay = 0
+            stop_event.wait(delay)
+
+    def start(self, callback: Optional[Callable[[CycleResult], None]] = None) -> None:
+        """Start polling in a background thread."""
+        if self.running:
+            return
+        self.running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, args=(self._stop_event, callback),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the polling thread and close the gateway connection."""
+        self.running = False
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.connector.timeout + self.interval)
+            self._thread = None
+        self.connector.disconnect()
+
+    def get_stats(self) -> Dict:
+        """Return cycle timing and measured request rates."""
+        stats = dict(self.stats)
+        cycles = stats['cycles']
+        stats['reads_per_cycle'] = len(self.plan)
+        stats['registers_per_cycle'] = self.registers_per_cycle
+        stats['avg_cycle_time'] = stats['poll_time'] / cycles if cycles else 0.0
+        stats['requests_per_second'] = stats['reads'] / stats['poll_time'] if stats['poll_time'] else 0.0
+        stats['connector'] = self.connector.get_stats()
+        return stats
+
+
+def main():
+    """Poll the plant and report refresh time and request rate."""
+    parser = argparse.ArgumentParser(description='Sungrow inverter poller')
+    parser.add_argument('--host', default='192.168.1.5', help='Logger gateway address')
+    parser.add_argument('--port', type=int, default=502, help='Modbus TCP port')
+    parser.add_argument('--units', default=','.join(map(str, DEFAULT_UNITS)),
+                        help='Comma-separated unit IDs')
+    parser.add_argument('--map', default=str(DEFAULT_REGISTER_MAP), help='Live register map JSON')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between cycles')
+    parser.add_argument('--cycles', type=int, default=10, help='Cycles to run (0 = forever)')
+    parser.add_argument('--window', type=int, default=1,
+                        help='Requests in flight (default 1 = no pipelining)')
+    parser.add_argument('--max-gap', type=int, default=DEFAULT_MAX_GAP,
+                        help='Unused registers read through when coalescing')
+    parser.add_argument('--capture', help='pcap/pcapng capture giving the function code '
+                                          'each register is read with')
+    args = parser.parse_args()
+
+    connector = SungrowConnector(args.host, args.port, max_in_flight=args.window)
+    function_codes = capture_function_codes(args.capture) if args.capture else None
+    monitor = InverterMonitor(connector, args.map, [int(u) for u in args.units.split(',')],
+                              max_gap=args.max_gap, interval=args.interval,
+                              function_codes=function_codes)
+    print(f"Polling units {args.units} at {args.host}:{args.port}: "
+          f"{len(monitor.plan)} reads, {monitor.registers_per_cycle} registers per cycle")
+    if not connector.connect():
+        return
+
+    stop_event = threading.Event()
+
+    def report(result):
+        print(f"  cycle {monitor.stats['cycles']:4d}: {result.duration * 1000:7.1f} ms, "
+              f"{result.requests_per_second:7.0f} req/s, {result.failed} failed")
+        if args.cycles and monitor.stats['cycles'] >= args.cycles:
+            stop_event.set()
+
+    try:
+        monitor.run(stop_event, report)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connector.disconnect()
+
+    stats = monitor.get_stats()
+    print(f"\nCycles: {stats['cycles']}, avg {stats['avg_cycle_time'] * 1000:.1f} ms, "
+          f"max {stats['max_cycle_time'] * 1000:.1f} ms")
+    print(f"Measured: {stats['requests_per_second']:.0f} req/s, "
+          f"{stats['failed_reads']} failed reads, {stats['connector']['reconnects']} reconnects")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,4 +3,5 @@ Utility Module
 Common functions and helpers for data processing, logging, and configuration
 """
 
-__all__ = ["Logger", "Config", "DataProcessor"]
+__all__ = ["Logger", "Config", "DataProcessor", "AdaptivePollScheduler", "PollTask",
+           "RangeIndex", "SlidingWindowStats", "WindowStatistics"]
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Adaptive poll scheduler.
+Polls sensors and register groups at rates driven by how fast their values change.
+Fast-moving signals are read more often and static ones back off, while
+the total request rate per gateway stays within a fixed budget that also
+shrinks when the gateway answers slowly.
+"""
+
+import heapq
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class PollTask:
+    """One read scheduled by the adaptive scheduler."""
+    name: str
+    read: Callable[[], Optional[Dict[str, float]]]
+    tolerance: Dict[str, float]
+    min_interval: float
+    max_interval: float
+    priority: float = 1.0
+
+    interval: float = 0.0
+    next_due: float = 0.0
+    last_poll: Optional[float] = None
+    last_values: Dict[str, float] = field(default_factory=dict)
+    change_rate: float = 0.0
+    latency: float = 0.0
+    polls: int = 0
+    changes: int = 0
+    errors: int = 0
+
+    @property
+    def demand(self) -> float:
+        """Requested poll rate in reads per second."""
+        if self.change_rate <= 0:
+            return 1.0 / self.max_interval
+        rate = min(self.change_rate * self.priority, 1.0 / self.min_interval)
+        return max(rate, 1.0 / self.max_interval)
+
+
+class AdaptivePollScheduler:
+    """Schedule reads against one gateway within a request budget."""
+
+    def __init__(self, budget: float = 2.0, utilization: float = 0.5,
+                 smoothing: float = 0.3, max_backoff: float = 2.0):
+        """
+        Initialize scheduler.
+
+        Args:
+            budget: Maximum reads per second sent to the gateway
+            utilization: Largest fraction of time the gateway may be busy
+                answering, which caps the rate when responses are slow
+            smoothing: EWMA weight of the newest change-rate and latency sample
+            max_backoff: Largest factor an interval may grow by per poll
+        """
+        if budget <= 0:
+            raise ValueError(f"Request budget must be positive, got {budget}")
+        self.budget = budget
+        self.utilization = utilization
+        self.smoothing = smoothing
+        self.max_backoff = max_backoff
+
+        self.tasks: Dict[str, PollTask] = {}
+        self.latency = 0.0
+        self._queue: List = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def add_task(self, name: str, read: Callable[[], Optional[Dict[str, float]]],
+                 tolerance: Dict[str, float], min_interval: float = 1.0,
+                 max_interval: float = 60.0, priority: float = 1.0) -> PollTask:
+        """
+        Register a read.
+
+        Args:
+            name: Task name, used as key of the results
+            read: Callable returning values keyed by signal, or None on error
+            tolerance: Change per signal that counts as significant
+            min_interval: Shortest allowed time between reads (s)
+            max_interval: Longest allowed time between reads (s)
+            priority: Weight of this task's demand when the budget is short
+
+        Returns:
+            The scheduled task (first read is due immediately)
+        """
+        task = PollTask(name=name, read=read, tolerance=dict(tolerance),
+                        min_interval=min_interval, max_interval=max_interval,
+                        priority=priority, interval=min_interval)
+        with self._lock:
+            self.tasks[name] = task
+            self._push(task, time.monotonic())
+        return task
+
+    def _push(self, task: PollTask, due: float) -> None:
+        """Queue the next read of a task."""
+        task.next_due = due
+        self._sequence += 1
+        heapq.heappush(self._queue, (due, self._sequence, task.name))
+
+    @property
+    def capacity(self) -> float:
+        """Reads per second allowed by the budget and the observed latency."""
+        if self.latency > 0:
+            return min(self.budget, self.utilization / self.latency)
+        return self.budget
+
+    def allocate(self) -> Dict[str, float]:
+        """
+        Split the request budget between tasks.
+
+        Every task keeps at least its max_interval rate where possible;
+        the remaining budget is shared in proportion to the extra rate
+        each task asks for.
+
+        Returns:
+            Poll rate in reads per second keyed by task name
+        """
+        demand = {name: task.demand for name, task in self.tasks.items()}
+        floor = {name: 1.0 / task.max_interval for name, task in self.tasks.items()}
+        capacity = self.capacity
+        total_demand = sum(demand.values())
+        if total_demand <= capacity:
+            return demand
+
+        total_floor = sum(floor.values())
+        if total_floor >= capacity:
+            return {name: rate * capacity / total_floor for name, rate in floor.items()}
+
+        share = (capacity - total_floor) / (total_demand - total_floor)
+        return {name: floor[name] + (demand[name] - floor[name]) * share for name in demand}
+
+    def _observe(self, task: PollTask, values: Dict[str, float], now: float, latency: float) -> None:
+        """Update change-rate and latency estimates from one read."""
+        alpha = self.smoothing
+        self.latency = latency if not self.latency else alpha * latency + (1 - alpha) * self.latency
+        task.latency = latency if not task.latency else alpha * latency + (1 - alpha) * task.latency
+
+        if task.last_poll is not None and task.last_values:
+            elapsed = max(now - task.last_poll, 1e-6)
+            steps = 0.0
+            for name, value in values.items():
+                previous = task.last_values.get(name)
+                tolerance = task.tolerance.get(name)
+                if previous is None or not tolerance:
+                    continue
+                steps = max(steps, abs(value - previous) / tolerance)
+            if steps >= 1.0:
+                task.changes += 1
+            task.change_rate = alpha * (steps / elapsed) + (1 - alpha) * task.change_rate
+
+        task.last_poll = now
+        task.last_values = dict(values)
+
+    def run_pending(self) -> Dict[str, Dict[str, float]]:
+        """
+        Run every read that is due.
+
+        Returns:
+            Values of successful reads keyed by task name
+        """
+        results = {}
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._queue or self._queue[0][0] > now:
+                    break
+                due, _, name = heapq.heappop(self._queue)
+                task = self.tasks.get(name)
+                if task is None or due != task.next_due:
+                    continue  # removed or rescheduled
+
+            began = time.monotonic()
+            try:
+                values = task.read()
+            except Exception as e:
+                print(f"Poll error ({name}): {e}")
+                values = None
+            finished = time.monotonic()
+            task.polls += 1
+
+            with self._lock:
+                if values is None:
+                    task.errors += 1
+                else:
+                    self._observe(task, values, finished, finished - began)
+                    results[name] = values
+
+                # Never exceed what the other tasks' current rates leave free,
+                # dropping to the slowest rate when they leave nothing
+                rate = self.allocate()[name]
+                spare = self.capacity - sum(1.0 / t.interval for n, t in self.tasks.items() if n != name)
+                rate = min(rate, max(spare, 1.0 / task.max_interval))
+                task.interval = min(max(1.0 / rate, task.min_interval),
+                                    task.interval * self.max_backoff)
+                self._push(task, began + task.interval)
+        return results
+
+    def time_until_next(self) -> float:
+        """Seconds until the next read is due."""
+        with self._lock:
+            if not self._queue:
+                return 1.0
+            return max(0.0, self._queue[0][0] - time.monotonic())
+
+    def run(self, stop_event: threading.Event,
+            on_results: Callable[[Dict[str, Dict[str, float]]], None]) -> None:
+        """
+        Poll until stop_event is set.
+
+        Args:
+            stop_event: Event that ends the loop
+            on_results: Called with the values of every batch of reads
+        """
+        while not stop_event.is_set():
+            results = self.run_pending()
+            if results:
+                on_results(results)
+            stop_event.wait(self.time_until_next())
+
+    def get_stats(self) -> Dict:
+        """Return per-task rates and the overall request rate."""
+        with self._lock:
+            tasks = {
+                name: {
+                    'interval': round(task.interval, 3),
+                    'change_rate': round(task.change_rate, 4),
+                    'latency_ms': round(task.latency * 1000, 2),
+                    'polls': task.polls,
+                    'changes': task.changes,
+                    'errors': task.errors,
+                }
+                for name, task in self.tasks.items()
+            }
+            return {
+                'budget': self.budget,
+                'capacity': round(self.capacity, 3),
+                'requests_per_second': round(sum(1.0 / t.interval for t in self.tasks.values()), 3),
+                'latency_ms': round(self.latency * 1000, 2),
+                'tasks': tasks,
+            }
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Register Range Index
+Static interval tree over inclusive register ranges (categories,
+documented registers, multi-register spans). Ranges are kept sorted by
+start (longest first among equal starts) with the largest end of each
+implicit subtree alongside, so point and overlap queries cost
+O(log n + k) and return matches in address order.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Highest Modbus register address; closes open-ended ranges
+MAX_ADDRESS = 65535
+
+# Address ranges of the Sungrow logger register groups
+REGISTER_CATEGORIES = (
+    (0, 50, 'Inverter_Info'),
+    (100, 199, 'Grid_AC'),
+    (200, 299, 'DC_PV'),
+    (300, 399, 'Weather'),
+    (500, 599, 'Energy_Counter'),
+    (1000, MAX_ADDRESS, 'Faults_Alarms'),
+)
+
+# Subtrees this small are scanned linearly
+_LEAF_LEVEL = 3
+
+
+class RangeIndex:
+    """Inclusive address ranges, each carrying a value."""
+
+    def __init__(self, ranges: Iterable[Tuple[int, int, Any]] = ()):
+        """
+        Initialize index.
+
+        Args:
+            ranges: (first, last, value) tuples; first and last are inclusive
+        """
+        self._ranges: List[Tuple[int, int, Any]] = []
+        self._built = False
+        for first, last, value in ranges:
+            self.add(first, last, value)
+
+    def add(self, first: int, last: int, value: Any) -> None:
+        """Add a range; the index is rebuilt on the next query."""
+        if last < first:
+            raise ValueError(f"Range {first}-{last} ends before it starts")
+        self._ranges.append((first, last, value))
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, Any]]:
+        self._build()
+        return iter(self._ranges)
+
+    def _build(self) -> None:
+        if self._built:
+            return
+        self._ranges.sort(key=lambda r: (r[0], -r[1]))
+        self._starts = [first for first, _, _ in self._ranges]
+        self._ends = [last + 1 for _, last, _ in self._ranges]
+
+        # Largest end below each node of the implicit tree: leaves sit at even
+        # indices, the nodes of level k at indices whose k low bits are set
+        n = len(self._ranges)
+        max_end = list(self._ends)
+        last_i, last = 0, 0
+        for i in range(0, n, 2):
+            last_i, last = i, max_end[i]
+        k = 1
+        while 1 << k <= n:
+            half = 1 << (k - 1)
+            for i in range((half << 1) - 1, n, half << 2):
+                right = max_end[i + half] if i + half < n else last
+                max_end[i] = max(self._ends[i], max_end[i - half], right)
+            # Parent of the previous level's last node
+            last_i = last_i - half if last_i >> k & 1 else last_i + half
+            if last_i < n and max_end[last_i] > last:
+                last = max_end[last_i]
+            k += 1
+        self._max_end = max_end
+        self._root_level = k - 1
+        self._built = True
+
+    def _overlapping_indices(self, start: int, end: int) -> List[int]:
+        """Indices of ranges overlapping the half-open span [start, end)."""
+        self._build()
+        n = len(self._ranges)
+        if not n:
+            return []
+        starts, ends, max_end = self._starts, self._ends, self._max_end
+        found = []
+        stack = [((1 << self._root_level) - 1, self._root_level, False)]
+        while stack:
+            node, level, left_done = stack.pop()
+            if level <= _LEAF_LEVEL:
+                i = node >> level << level
+                stop = min(i + (1 << (level + 1)) - 1, n)
+                while i < stop and starts[i] < end:
+                    if start < ends[i]:
+                        found.append(i)
+                    i += 1
+            elif not left_done:
+                left = node - (1 << (level - 1))
+                stack.append((node, level, True))
+                if left >= n or max_end[left] > start:
+                    stack.append((left, level - 1, False))
+            elif node < n and starts[node] < end:
+                if start < ends[node]:
+                    found.append(node)
+                stack.append((node + (1 << (level - 1)), level - 1, False))
+        return found
+
+    def overlapping(self, start: int, count: int = 1) -> List[Tuple[int, int, Any]]:
+        """
+        Ranges touching any of count registers from start.
+
+        Args:
+            start: First register of the span (e.g. of a read request)
+            count: Number of registers in the span
+
+        Returns:
+            (first, last, value) tuples ordered by first address
+        """
+        return [self._ranges[i] for i in self._overlapping_indices(start, start + count)]
+
+    def within(self, start: int, count: int) -> List[Tuple[int, int, Any]]:
+        """Ranges lying entirely inside count registers from start."""
+        end = start + count
+        return [r for r in self.overlapping(start, count) if r[0] >= start and r[1] < end]
+
+    def containing(self, address: int) -> List[Tuple[int, int, Any]]:
+        """Ranges that include an address, ordered by first address."""
+        return self.overlapping(address)
+
+    def get(self, address: int, default: Any = None) -> Any:
+        """
+        Value of the range that includes an address.
+
+        When ranges nest, the innermost one wins: the latest starting, and
+        of ranges starting together the one ending first.
+        """
+        found = self._overlapping_indices(address, address + 1)
+        return self._ranges[found[-1]][2] if found else default
+
+    def group(self, addresses: Iterable[int]) -> Dict[Any, List[int]]:
+        """
+        Sort addresses into the ranges containing them.
+
+        Args:
+            addresses: Register addresses; duplicates are kept
+
+        Returns:
+            Sorted addresses keyed by range value, in range order; ranges
+            without addresses are left out
+        """
+        self._build()
+        ordered: Sequence[int] = sorted(addresses)
+        groups: Dict[Any, List[int]] = {}
+        for first, last, value in self._ranges:
+            lo = bisect_left(ordered, first)
+            hi = bisect_right(ordered, last, lo)
+            if hi > lo:
+                groups.setdefault(value, []).extend(ordered[lo:hi])
+        return groups
+
+
+def category_index(ranges: Iterable[Tuple[int, int, Any]] = REGISTER_CATEGORIES) -> RangeIndex:
+    """Range index answering the register group of an address."""
+    return RangeIndex(ranges)
+
+
+# Shared by the analyzers that use the standard group names
+CATEGORIES = category_index()
+
+
+def categorize(address: int, index: Optional[RangeIndex] = None, default: str = 'Other') -> str:
+    """Register group of an address ('Other' outside every group)."""
+    return (CATEGORIES if index is None else index).get(address, default)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Sliding-Window Statistics
+Running count/sum/mean, variance (Welford) and min/max (monotonic deques)
+over the last N samples of a stream. Each sample is added once and
+evicted once, so statistics cost O(1) amortized per sample regardless of
+the window size.
+"""
+
+import math
+from collections import deque
+from typing import Dict, Optional
+
+
+class SlidingWindowStats:
+    """Statistics of one metric over a window of sample sequence numbers."""
+
+    def __init__(self):
+        self.values = deque()   # (seq, value) inside the window, oldest first
+        self._min = deque()     # (seq, value) with increasing values
+        self._max = deque()     # (seq, value) with decreasing values
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, seq: int, value: float) -> None:
+        """
+        Add one sample.
+
+        Args:
+            seq: Increasing sequence number of the sample
+            value: Sample value
+        """
+        self.values.append((seq, value))
+        self.total += value
+
+        count = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / count
+        self._m2 += delta * (value - self.mean)
+
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((seq, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((seq, value))
+
+    def expire(self, oldest_seq: int) -> None:
+        """Evict samples with a sequence number below oldest_seq."""
+        values = self.values
+        while values and values[0][0] < oldest_seq:
+            _, value = values.popleft()
+            self.total -= value
+            count = len(values)
+            if count:
+                delta = value - self.mean
+                self.mean -= delta / count
+                self._m2 = max(self._m2 - delta * (value - self.mean), 0.0)
+            else:
+                self.total = self.mean = self._m2 = 0.0
+
+        while self._min and self._min[0][0] < oldest_seq:
+            self._min.popleft()
+        while self._max and self._max[0][0] < oldest_seq:
+            self._max.popleft()
+
+    @property
+    def last(self) -> Optional[float]:
+        """Newest value in the window."""
+        return self.values[-1][1] if self.values else None
+
+    @property
+    def minimum(self) -> Optional[float]:
+        """Smallest value in the window."""
+        return self._min[0][1] if self._min else None
+
+    @property
+    def maximum(self) -> Optional[float]:
+        """Largest value in the window."""
+        return self._max[0][1] if self._max else None
+
+    @property
+    def variance(self) -> float:
+        """Sample variance of the window (0 for fewer than two samples)."""
+        count = len(self.values)
+        return self._m2 / (count - 1) if count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        """Sample standard deviation of the window."""
+        return math.sqrt(self.variance)
+
+    def summary(self) -> Dict[str, float]:
+        """Return current, min, max, avg, stdev and count of the window."""
+        return {
+            'current': self.last,
+            'min': self.minimum,
+            'max': self.maximum,
+            'avg': self.total / len(self.values) if self.values else None,
+            'stdev': self.stdev,
+            'count': len(self.values),
+        }
+
+
+class WindowStatistics:
+    """Sliding-window statistics of several metrics over the last N data points."""
+
+    def __init__(self, size: int):
+        """
+        Initialize aggregators.
+
+        Args:
+            size: Number of data points in the window (like a deque maxlen)
+        """
+        self.size = size
+        self.metrics: Dict[str, SlidingWindowStats] = {}
+        self.points = 0
+
+    def add(self, values: Dict[str, float]) -> None:
+        """
+        Add one data point and evict the one that left the window.
+
+        Args:
+            values: Metric values of the data point; missing metrics are skipped
+        """
+        seq = self.points
+        self.points += 1
+        for name, value in values.items():
+            stats = self.metrics.get(name)
+            if stats is None:
+                stats = self.metrics[name] = SlidingWindowStats()
+            stats.add(seq, value)
+
+        oldest = self.points - self.size
+        for stats in self.metrics.values():
+            stats.expire(oldest)
+
+    def __getitem__(self, name: str) -> SlidingWindowStats:
+        return self.metrics[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.metrics and len(self.metrics[name]) > 0
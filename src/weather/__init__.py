@@ -3,4 +3,4 @@ Weather Monitoring Module
 Real-time temperature, humidity, pressure, wind, rain, UV, and light monitoring
 """
 
-__all__ = ["WeatherStation", "WeatherWebServer", "main"]
+__all__ = ["WeatherStation", "WeatherWebServer", "SQLiteStorage", "MemoryStorage", "main"]
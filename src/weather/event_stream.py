@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events broadcaster.
+Pushes compact updates to every subscribed dashboard. Each update is
+encoded once and fanned out by a single thread that owns all subscriber
+sockets and writes without blocking; a subscriber whose unsent backlog
+exceeds its budget is dropped and resyncs with a full snapshot when its
+EventSource reconnects. Idle subscribers cost no work between updates.
+"""
+
+import json
+import queue
+import selectors
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+SSE_HEADERS = (
+    ('Content-Type', 'text/event-stream'),
+    ('Cache-Control', 'no-cache'),
+    ('Connection', 'close'),
+    ('X-Accel-Buffering', 'no'),
+    ('Access-Control-Allow-Origin', '*'),
+)
+
+HEARTBEAT = b': ping\n\n'
+
+
+def format_event(data: Any, event: Optional[str] = None, event_id: Optional[int] = None,
+                 retry: Optional[int] = None) -> bytes:
+    """
+    Encode one SSE message.
+
+    Args:
+        data: JSON-serialisable payload
+        event: Event name (default: 'message')
+        event_id: Sequence number sent as the event id
+        retry: Reconnection delay in milliseconds advertised to the client
+    """
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':'), default=str))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def diff(old: Any, new: Any) -> Dict:
+    """
+    Compute the changes between two nested dictionaries.
+
+    Returns:
+        Changed keys with their new value (recursing into dictionaries);
+        removed keys map to None
+    """
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key, delta) if isinstance(old, dict) else delta
+        if previous is delta:
+            delta[key] = value
+        elif isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff(previous, value)
+            if nested:
+                delta[key] = nested
+        elif value != previous:
+            delta[key] = value
+    if isinstance(old, dict):
+        for key in old:
+            if key not in new:
+                delta[key] = None
+    return delta
+
+
+class _Subscriber:
+    """Socket of one event stream and its unsent bytes."""
+
+    __slots__ = ('sock', 'pending', 'events')
+
+    def __init__(self, sock: socket.socket, initial: bytes):
+        self.sock = sock
+        self.pending = bytearray(initial)
+        self.events = 0
+
+
+class EventBroadcaster:
+    """Fan-out of SSE messages to many subscribers from one thread."""
+
+    def __init__(self, max_subscribers: int = 1000, max_backlog: int = 256 * 1024,
+                 heartbeat: float = 15.0, retry: int = 3000):
+        """
+        Initialize broadcaster.
+
+        Args:
+            max_subscribers: Streams accepted before new ones are refused
+            max_backlog: Unsent bytes after which a slow subscriber is dropped
+            heartbeat: Seconds of silence before a keep-alive comment is sent
+            retry: Reconnection delay advertised to clients (ms)
+        """
+        self.max_subscribers = max_subscribers
+        self.max_backlog = max_backlog
+        self.heartbeat = heartbeat
+        self.retry = retry
+
+        self.stats = {'subscribed': 0, 'published': 0, 'delivered': 0, 'dropped': 0, 'closed': 0}
+        self._sequence = 0
+        self._commands: queue.Queue = queue.Queue()
+        self._subscribers: Dict[socket.socket, _Subscriber] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._wake_read.setblocking(False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ)
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def subscribers(self) -> int:
+        """Number of open event streams."""
+        return self._count
+
+    def subscribe(self, sock: socket.socket, snapshot: Any = None) -> bool:
+        """
+        Take over a socket whose SSE response headers were already sent.
+
+        Args:
+            sock: Client connection
+            snapshot: Full state sent first as a 'snapshot' event, or a callable
+                returning it. A callable runs on the broadcaster thread as the
+                subscriber is added, so every update published after it reaches
+                the subscriber as a delta and none falls in between.
+
+        Returns:
+            False if the subscriber limit is reached (socket left untouched)
+        """
+        with self._lock:
+            if self._count >= self.max_subscribers or self._closing.is_set():
+                return False
+            self._count += 1
+        self._command(('subscribe', sock, snapshot))
+        return True
+
+    def publish(self, data: Any, event: str = 'delta') -> None:
+        """Encode a message once and queue it for every subscriber."""
+        with self._lock:
+            self._sequence += 1
+            message = format_event(data, event, self._sequence)
+            self.stats['published'] += 1
+        self._command(('publish', message))
+
+    def _command(self, command) -> None:
+        self._commands.put(command)
+        try:
+            self._wake_write.send(b'\0')
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        """Own every subscriber socket: queue messages, write, drop and expire."""
+        last_send = time.monotonic()
+        while not self._closing.is_set():
+            while True:
+                try:
+                    command = self._commands.get_nowait()
+                except queue.Empty:
+                    break
+                if command[0] == 'subscribe':
+                    _, sock, snapshot = command
+                    initial = self._snapshot_event(sock, snapshot)
+                    if initial is None:
+                        continue
+                    sock.setblocking(False)
+                    subscriber = _Subscriber(sock, initial)
+                    self._subscribers[sock] = subscriber
+                    self._selector.register(sock, selectors.EVENT_READ, subscriber)
+                    self.stats['subscribed'] += 1
+                    self._flush(subscriber)
+                else:
+                    self._broadcast(command[1])
+                    last_send = time.monotonic()
+
+            if time.monotonic() - last_send >= self.heartbeat:
+                self._broadcast(HEARTBEAT)
+                last_send = time.monotonic()
+
+            for key, mask in self._selector.select(timeout=min(self.heartbeat, 1.0)):
+                if key.fileobj is self._wake_read:
+                    try:
+                        while self._wake_read.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                subscriber = key.data
+                if mask & selectors.EVENT_READ and not self._readable(subscriber):
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    self._flush(subscriber)
+
+        for subscriber in list(self._subscribers.values()):
+            self._remove(subscriber)
+
+    def _snapshot_event(self, sock: socket.socket, snapshot: Any) -> Optional[bytes]:
+        """Encode the first event of a new subscriber; closes its socket on failure."""
+        try:
+            if callable(snapshot):
+                snapshot = snapshot()
+            with self._lock:
+                sequence = self._sequence
+            return format_event(snapshot if snapshot is not None else {}, 'snapshot',
+                                sequence, retry=self.retry)
+        except Exception as e:
+            print(f"Event stream snapshot error: {e}")
+            try:
+                sock.close()
+            except OSError:
+                pass
+            with self._lock:
+                self._count -= 1
+            return None
+
+    def _broadcast(self, message: bytes) -> None:
+        """Append a message to every backlog and write what the sockets accept."""
+        for subscriber in list(self._subscribers.values()):
+            if len(subscriber.pending) + len(message) > self.max_backlog:
+                self.stats['dropped'] += 1
+                self._remove(subscriber)
+                continue
+            subscriber.pending += message
+            subscriber.events += 1
+            self._flush(subscriber)
+
+    def _flush(self, subscriber: _Subscriber) -> None:
+        """Write as much of the backlog as the socket takes without blocking."""
+        try:
+            sent = subscriber.sock.send(subscriber.pending) if subscriber.pending else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._remove(subscriber)
+            return
+        if sent:
+            del subscriber.pending[:sent]
+            self.stats['delivered'] += sent
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.pending else 0)
+        if self._selector.get_key(subscriber.sock).events != events:
+            self._selector.modify(subscriber.sock, events, subscriber)
+
+    def _readable(self, subscriber: _Subscriber) -> bool:
+        """Handle input from a subscriber; EventSource clients only send on close."""
+        try:
+            if subscriber.sock.recv(4096):
+                return True
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            pass
+        self.stats['closed'] += 1
+        self._remove(subscriber)
+        return False
+
+    def _remove(self, subscriber: _Subscriber) -> None:
+        """Forget a subscriber and close its socket."""
+        if self._subscribers.pop(subscriber.sock, None) is None:
+            return
+        try:
+            self._selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            subscriber.sock.close()
+        except OSError:
+            pass
+        with self._lock:
+            self._count -= 1
+
+    def close(self) -> None:
+        """Close every stream and stop the broadcaster thread."""
+        self._closing.set()
+        self._command(('close',))
+        self._thread.join(timeout=2.0)
+        self._selector.close()
+        self._wake_read.close()
+        self._wake_write.close()
+
+    def get_stats(self) -> Dict:
+        """Return subscriber and delivery counters."""
+        with self._lock:
+            return dict(self.stats, subscribers=self._count)
+
+
+def stream_to(handler, broadcaster: Optional[EventBroadcaster],
+              snapshot: Callable[[], Any]) -> None:
+    """
+    Answer an SSE request by handing the connection to a broadcaster.
+
+    Requires a server with detach() (PooledHTTPServer); otherwise, or when
+    the broadcaster is full, the client gets 503 and retries later.
+
+    Args:
+        handler: BaseHTTPRequestHandler serving the request
+        broadcaster: Target broadcaster, or None if push is disabled
+        snapshot: Callable returning the full state sent first (called on the
+            broadcaster thread)
+    """
+    detach = getattr(handler.server, 'detach', None)
+    if broadcaster is None or detach is None or broadcaster.subscribers >= broadcaster.max_subscribers:
+        handler.send_error(503, 'Event stream unavailable')
+        return
+    handler.send_response(200)
+    for name, value in SSE_HEADERS:
+        handler.send_header(name, value)
+    handler.end_headers()
+
+    def take_over(sock: socket.socket) -> None:
+        # The snapshot is taken by the broadcaster thread, in order with publishes
+        if not broadcaster.subscribe(sock, snapshot):
+            sock.close()
+
+    detach(handler, take_over)
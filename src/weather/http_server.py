@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP server.
+Drop-in replacement for http.server.HTTPServer that serves requests on a
+bounded pool of worker threads. Idle keep-alive connections wait in a
+selector instead of holding a worker, so a few threads serve hundreds of
+dashboards. Request headers are collected there too, so a slow or stalled
+client never holds a worker. Connections beyond the limit get an
+immediate 503; requests and idle connections time out. Long-lived
+responses such as event streams detach their connection from the pool.
+"""
+
+import io
+import queue
+import selectors
+import socket
+import threading
+import time
+from http.server import HTTPServer
+from typing import Dict
+
+REJECT_RESPONSE = (b'HTTP/1.1 503 Service Unavailable\r\n'
+                   b'Content-Length: 0\r\nConnection: close\r\nRetry-After: 1\r\n\r\n')
+
+# Requests whose headers exceed this are dispatched for the handler to reject
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class _Connection:
+    """Accepted client socket with bytes received ahead of its handler."""
+
+    __slots__ = ('sock', 'address', 'pending', 'rfile', 'idle_since', 'request_since', 'take_over')
+
+    def __init__(self, sock: socket.socket, address):
+        self.sock = sock
+        self.address = address
+        self.pending = bytearray()
+        self.rfile = io.BufferedReader(_ConnectionReader(self))
+        self.idle_since = time.monotonic()
+        self.request_since = 0.0
+        self.take_over = None
+
+
+class _ConnectionReader(io.RawIOBase):
+    """Raw stream that returns a connection's pending bytes before the socket's."""
+
+    def __init__(self, connection: _Connection):
+        self.connection = connection
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        pending = self.connection.pending
+        if pending:
+            count = min(len(buffer), len(pending))
+            buffer[:count] = pending[:count]
+            del pending[:count]
+            return count
+        return self.connection.sock.recv_into(buffer)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTP/1.1 server with a fixed worker pool and a keep-alive selector."""
+
+    def __init__(self, server_address, handler_class, workers: int = 16,
+                 max_connections: int = 512, request_timeout: float = 10.0,
+                 keep_alive_timeout: float = 15.0, backlog: int = 256):
+        """
+        Initialize server.
+
+        Args:
+            server_address: (host, port) to bind
+            handler_class: BaseHTTPRequestHandler subclass; switched to HTTP/1.1
+            workers: Threads handling requests
+            max_connections: Open connections before new ones are refused with 503
+            request_timeout: Seconds allowed to receive a request and send its response
+            keep_alive_timeout: Seconds an idle keep-alive connection is kept open
+            backlog: Listen queue length
+        """
+        self.request_queue_size = backlog
+        handler_class.protocol_version = 'HTTP/1.1'
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.keep_alive_timeout = keep_alive_timeout
+
+        self.stats = {'connections': 0, 'requests': 0, 'rejected': 0, 'timeouts': 0, 'detached': 0}
+        self._open = 0
+        self._lock = threading.Lock()
+        self._ready: queue.Queue = queue.Queue()
+        self._parking: queue.Queue = queue.Queue()
+        self._selector = selectors.DefaultSelector()
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._wake_read.setblocking(False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ)
+        self._idle: Dict[socket.socket, _Connection] = {}
+        self._closing = threading.Event()
+
+        self._threads = [threading.Thread(target=self._keep_alive_loop, daemon=True)]
+        self._threads += [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def open_connections(self) -> int:
+        """Connections currently open."""
+        return self._open
+
+    def process_request(self, request: socket.socket, client_address) -> None:
+        """Admit a new connection or refuse it when the server is full."""
+        with self._lock:
+            admitted = self._open < self.max_connections
+            if admitted:
+                self._open += 1
+                self.stats['connections'] += 1
+            else:
+                self.stats['rejected'] += 1
+        if not admitted:
+            try:
+                request.sendall(REJECT_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._park(_Connection(request, client_address))
+
+    def _park(self, connection: _Connection) -> None:
+        """Hand a connection to the keep-alive selector until it has data."""
+        connection.idle_since = time.monotonic()
+        self._parking.put(connection)
+        try:
+            self._wake_write.send(b'\0')
+        except OSError:
+            pass
+
+    def _keep_alive_loop(self) -> None:
+        """Collect request headers of idle connections and dispatch complete ones."""
+        while not self._closing.is_set():
+            while True:
+                try:
+                    connection = self._parking.get_nowait()
+                except queue.Empty:
+                    break
+                connection.sock.setblocking(False)
+                self._idle[connection.sock] = connection
+                self._selector.register(connection.sock, selectors.EVENT_READ, connection)
+
+            for key, _ in self._selector.select(timeout=0.5):
+                if key.fileobj is self._wake_read:
+                    try:
+                        while self._wake_read.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                self._receive(key.data)
+
+            now = time.monotonic()
+            for sock, connection in list(self._idle.items()):
+                if connection.pending:
+                    expired = now - connection.request_since >= self.request_timeout
+                else:
+                    expired = now - connection.idle_since >= self.keep_alive_timeout
+                if expired:
+                    if connection.pending:
+                        with self._lock:
+                            self.stats['timeouts'] += 1
+                    self._unpark(connection)
+                    self._close(connection)
+
+    def _receive(self, connection: _Connection) -> None:
+        """Read available bytes; dispatch once the header block is complete."""
+        try:
+            chunk = connection.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            chunk = b''
+        if not chunk:
+            self._unpark(connection)
+            self._close(connection)
+            return
+        if not connection.pending:
+            connection.request_since = time.monotonic()
+        connection.pending += chunk
+        if b'\r\n\r\n' in connection.pending or len(connection.pending) > MAX_HEADER_BYTES:
+            self._unpark(connection)
+            self._ready.put(connection)
+
+    def _unpark(self, connection: _Connection) -> None:
+        """Remove a connection from the keep-alive selector."""
+        self._selector.unregister(connection.sock)
+        del self._idle[connection.sock]
+
+    def _worker(self) -> None:
+        """Serve one request at a time from readable connections."""
+        while True:
+            connection = self._ready.get()
+            if connection is None:
+                return
+            try:
+                keep = self._serve_one(connection)
+            except Exception:
+                self.handle_error(connection.sock, connection.address)
+                keep = False
+            if connection.take_over is not None:
+                self._hand_over(connection)
+            elif keep and not self._closing.is_set():
+                if self._buffered(connection):
+                    self._ready.put(connection)   # pipelined request
+                else:
+                    self._park(connection)
+            else:
+                self._close(connection)
+
+    def _serve_one(self, connection: _Connection) -> bool:
+        """
+        Run the handler for a single request.
+
+        Returns:
+            True if the connection stays open for another request
+        """
+        connection.sock.settimeout(self.request_timeout)
+        handler = self.RequestHandlerClass.__new__(self.RequestHandlerClass)
+        handler.request = connection.sock
+        handler.client_address = connection.address
+        handler.server = self
+        handler.connection = connection.sock
+        handler.rfile = connection.rfile
+        handler.wfile = connection.sock.makefile('wb')
+        handler.close_connection = True
+        handler.pooled_connection = connection
+        try:
+            handler.handle_one_request()
+            handler.wfile.flush()
+        except socket.timeout:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            return False
+        except OSError:
+            return False
+        finally:
+            try:
+                handler.wfile.close()
+            except OSError:
+                pass
+            with self._lock:
+                self.stats['requests'] += 1
+        return not handler.close_connection
+
+    def detach(self, handler, take_over) -> None:
+        """
+        Hand the connection of a request to another owner.
+
+        Called by a handler after writing its response headers; once they
+        are flushed, take_over(sock) receives the socket and the pool
+        forgets the connection.
+
+        Args:
+            handler: Request handler serving the connection
+            take_over: Callable taking ownership of the socket
+        """
+        handler.close_connection = True
+        handler.pooled_connection.take_over = take_over
+
+    def _hand_over(self, connection: _Connection) -> None:
+        """Release a detached connection's slot and pass its socket on."""
+        with self._lock:
+            self._open -= 1
+            self.stats['detached'] += 1
+        try:
+            connection.rfile.close()
+            connection.sock.settimeout(None)
+            connection.take_over(connection.sock)
+        except Exception:
+            self.handle_error(connection.sock, connection.address)
+            self.shutdown_request(connection.sock)
+
+    @staticmethod
+    def _buffered(connection: _Connection) -> bool:
+        """True when a complete pipelined request was already received."""
+        try:
+            connection.sock.setblocking(False)
+            buffered = connection.rfile.peek(1)
+        except (BlockingIOError, OSError, ValueError):
+            return False
+        if b'\r\n\r\n' in buffered:
+            return True
+        # Hand a partial request back to the selector with the pending bytes
+        connection.pending[:0] = connection.rfile.read(len(buffered))
+        connection.request_since = time.monotonic()
+        return False
+
+    def _close(self, connection: _Connection) -> None:
+        """Close a connection and release its slot."""
+        try:
+            connection.rfile.close()
+        except OSError:
+            pass
+        self.shutdown_request(connection.sock)
+        with self._lock:
+            self._open -= 1
+
+    def server_close(self) -> None:
+        """Stop the workers and close every connection."""
+        self._closing.set()
+        super().server_close()
+        for _ in range(self.workers):
+            self._ready.put(None)
+        try:
+            self._wake_write.send(b'\0')
+        except OSError:
+            pass
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        for connection in list(self._idle.values()):
+            self._close(connection)
+        self._idle.clear()
+        self._selector.close()
+        self._wake_read.close()
+        self._wake_write.close()
+
+    def get_stats(self) -> Dict:
+        """Return connection and request counters."""
+        with self._lock:
+            return dict(self.stats, open=self._open, idle=len(self._idle),
+                        queued=self._ready.qsize(), workers=self.workers)
+
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+HTTP Response Cache
+Encoded response bodies keyed by endpoint and data version, with gzip and
+deflate variants compressed once per version, per-encoding ETags for
+conditional GETs and content negotiation helpers for the weather web
+server.
+"""
+
+import gzip
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    from src.weather.snapshot import make_etag
+except ImportError:  # run as a script from src/weather
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.weather.snapshot import make_etag
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+
+COMPRESSORS = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=6, mtime=0),
+    'deflate': lambda body: zlib.compress(body, 6),
+}
+
+# Each encoding is its own representation and gets its own strong ETag
+ETAG_SUFFIXES = {
+    'gzip': '-gz',
+    'deflate': '-df',
+}
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the response encoding from an Accept-Encoding header.
+
+    Returns:
+        'gzip', 'deflate' or None for the identity encoding
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for encoding in ('gzip', 'deflate'):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def encoded_etag(etag, encoding):
+    """ETag of a body in an encoding, derived from the identity ETag."""
+    if encoding is None:
+        return etag
+    return etag[:-1] + ETAG_SUFFIXES[encoding] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True when an If-None-Match header matches the ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class CachedResponse:
+    """Encoded body of one endpoint at one data version."""
+
+    __slots__ = ('body', 'etag', 'content_type', 'version', '_encoded')
+
+    def __init__(self, body, content_type, version, etag=None):
+        self.body = body
+        self.etag = etag or make_etag(body)
+        self.content_type = content_type
+        self.version = version
+        self._encoded = {None: (body, self.etag)}
+
+    def encoded(self, encoding):
+        """
+        Return the body in an encoding, compressing on first use.
+
+        Returns:
+            Tuple of (bytes, encoding actually applied or None, ETag of those bytes)
+        """
+        if len(self.body) < MIN_COMPRESS_SIZE:
+            encoding = None
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = (COMPRESSORS[encoding](self.body),
+                                                 encoded_etag(self.etag, encoding))
+        return encoded[0], encoding, encoded[1]
+
+
+class ResponseCache:
+    """Bounded map of endpoint key to the response of its latest data version."""
+
+    def __init__(self, max_entries=128):
+        """
+        Initialize cache.
+
+        Args:
+            max_entries: Endpoint keys kept before the least recently used is dropped
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key, version, build, content_type='application/json'):
+        """
+        Return the cached response of an endpoint, rebuilding it on a new version.
+
+        Args:
+            key: Endpoint key (path and query)
+            version: Data version the response must reflect
+            build: Callable returning the body bytes, or (body, etag)
+            content_type: Response content type
+
+        Returns:
+            CachedResponse
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.version == version:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+
+        # Built outside the lock; concurrent misses build identical responses
+        built = build()
+        body, etag = built if isinstance(built, tuple) else (built, None)
+        entry = CachedResponse(body, content_type, version, etag)
+        with self.lock:
+            self.stats['misses'] += 1
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        """Drop all cached responses."""
+        with self.lock:
+            self.entries.clear()
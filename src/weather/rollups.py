@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution rollups.
+Incremental min/max/mean/count/last aggregation of raw readings into
+fixed-width time buckets (1 minute, 1 hour, 1 day), so long-range
+history queries read a few hundred pre-aggregated points.
+"""
+
+from collections import namedtuple
+
+
+# Bucket width and retention of one rollup tier (retention 0 = keep forever)
+RollupTier = namedtuple('RollupTier', ['name', 'width', 'retention_days'])
+
+DEFAULT_TIERS = (
+    RollupTier('1min', 60, 30),
+    RollupTier('1h', 3600, 730),
+    RollupTier('1d', 86400, 0),
+)
+
+# Spans up to this many seconds are answered from raw readings
+RAW_SPAN = 6 * 3600
+
+
+def bucket_start(ts, width):
+    """Return the start of the bucket containing ts."""
+    return ts - (ts % width)
+
+
+def choose_tier(span, tiers=DEFAULT_TIERS, max_points=1500):
+    """
+    Pick the resolution for a history query.
+
+    Args:
+        span: Queried time span in seconds
+        tiers: Available rollup tiers, finest first
+        max_points: Largest number of buckets wanted per series
+
+    Returns:
+        The finest tier giving at most max_points buckets (the coarsest
+        tier if none does), or None when raw readings should be used
+    """
+    if span <= RAW_SPAN:
+        return None
+    for tier in tiers:
+        if span / tier.width <= max_points:
+            return tier
+    return tiers[-1]
+
+
+def find_tier(name, tiers=DEFAULT_TIERS):
+    """Return the tier with the given name ('raw' returns None)."""
+    if name == 'raw':
+        return None
+    for tier in tiers:
+        if tier.name == name:
+            return tier
+    raise ValueError(f"Unknown resolution '{name}' (use raw, auto or "
+                     f"{', '.join(t.name for t in tiers)})")
+
+
+class RollupAccumulator:
+    """Collect per-bucket aggregates of new readings between flushes."""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = tuple(tiers)
+        # (width, bucket, series_id) -> [min, max, sum, count, last_ts, last]
+        self.deltas = {}
+
+    def add(self, ts, series_id, value):
+        """Fold one reading into every tier."""
+        deltas = self.deltas
+        for tier in self.tiers:
+            key = (tier.width, ts - (ts % tier.width), series_id)
+            agg = deltas.get(key)
+            if agg is None:
+                deltas[key] = [value, value, value, 1, ts, value]
+                continue
+            if value < agg[0]:
+                agg[0] = value
+            if value > agg[1]:
+                agg[1] = value
+            agg[2] += value
+            agg[3] += 1
+            if ts >= agg[4]:
+                agg[4] = ts
+                agg[5] = value
+
+    def drain(self):
+        """
+        Return and clear the accumulated aggregates.
+
+        Returns:
+            Rows of (width, bucket, series_id, min, max, sum, count, last_ts, last)
+        """
+        rows = [key + tuple(agg) for key, agg in self.deltas.items()]
+        self.deltas = {}
+        return rows
+
+    def __len__(self):
+        return len(self.deltas)
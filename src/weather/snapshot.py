@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Current Data Snapshots
+Immutable, pre-serialized views of the latest weather data point. The
+collector builds one snapshot per sample and publishes it by swapping a
+reference, so readers share it without locking or copying.
+"""
+
+import hashlib
+import json
+
+
+class FrozenDict(dict):
+    """Read-only dictionary; copies and pickles are plain dicts."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('snapshot data is read-only')
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    __ior__ = _read_only
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    def copy(self):
+        return dict(self)
+
+
+def freeze(value):
+    """Return a read-only deep copy of nested dicts and lists."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def encode(value):
+    """Serialize a value to compact JSON bytes."""
+    return json.dumps(value, separators=(',', ':'), default=str).encode()
+
+
+def make_etag(body):
+    """Strong ETag derived from response bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class Snapshot:
+    """One published data point with its JSON encoding and ETag."""
+
+    __slots__ = ('data', 'version', 'body', 'etag', '_parts')
+
+    def __init__(self, data, version=0):
+        """
+        Freeze and serialize a data point.
+
+        Args:
+            data: Current data dictionary (copied, not retained)
+            version: Sequence number of the sample
+        """
+        self.data = freeze(data)
+        self.version = version
+        self.body = encode(self.data)
+        self.etag = make_etag(self.body)
+        self._parts = {}
+
+    def part(self, key, default=None):
+        """
+        Return the encoding and ETag of one top-level entry.
+
+        Encoded on first use and reused by later readers of this snapshot.
+
+        Returns:
+            Tuple of (JSON bytes, ETag)
+        """
+        encoded = self._parts.get(key)
+        if encoded is None:
+            body = encode(self.data.get(key, default))
+            encoded = self._parts[key] = (body, make_etag(body))
+        return encoded
+
+
+EMPTY_SNAPSHOT = Snapshot({})
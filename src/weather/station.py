@@ -6,28 +6,57 @@ Supports multiple sensor types and protocols.
 """
 
 import json
+import sys
 import time
 import threading
 from datetime import datetime
 from pathlib import Path
-from collections import deque
-import statistics
+
+try:
+    from src.utils.poll_scheduler import AdaptivePollScheduler
+    from src.utils.running_stats import WindowStatistics
+    from src.weather.snapshot import EMPTY_SNAPSHOT, Snapshot
+    from src.weather.storage import TimeRingBuffer, downsample, to_epoch
+except ImportError:  # run as a script from src/weather
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.poll_scheduler import AdaptivePollScheduler
+    from src.utils.running_stats import WindowStatistics
+    from src.weather.snapshot import EMPTY_SNAPSHOT, Snapshot
+    from src.weather.storage import TimeRingBuffer, downsample, to_epoch
 
 class WeatherStation:
     """Collect and manage weather data from multiple sensors."""
     
-    def __init__(self, max_history=1440):  # 24 hours at 1-min intervals
+    # Reader method and significant change per value for each sensor type
+    SENSOR_READERS = {
+        'bme280': ('read_bme280', {'temperature': 0.2, 'humidity': 1.0, 'pressure': 0.5}),
+        'dht22': ('read_dht22', {'temperature': 0.2, 'humidity': 1.0}),
+        'wind': ('read_wind_sensor', {'wind_speed': 0.3, 'wind_gust': 0.5}),
+        'rain': ('read_rain_gauge', {'rain_rate': 0.5}),
+        'uv': ('read_uv_sensor', {'uv_index': 0.2}),
+        'light': ('read_light_sensor', {'light_level': 200}),
+    }
+    
+    def __init__(self, max_history=1440, storage=None):  # 24 hours at 1-min intervals
         """
         Initialize weather station.
         
         Args:
             max_history: Maximum number of data points to keep in memory
+            storage: Optional HistoryStorage backend (e.g. SQLiteStorage) that
+                keeps history beyond max_history and serves range queries
         """
         self.max_history = max_history
-        self.data_history = deque(maxlen=max_history)
+        self.storage = storage
+        self.data_history = TimeRingBuffer(max_history)
+        self.window_stats = WindowStatistics(max_history)
         self.current_data = {}
+        self.snapshot = EMPTY_SNAPSHOT
+        self.listeners = []
         self.lock = threading.Lock()
         self.running = False
+        self.scheduler = None
+        self._stop_event = None
         self.sensors = {}
         self.alert_thresholds = {
             'temp_high': 40,      # °C
@@ -141,122 +170,132 @@ class WeatherStation:
             'light_level': base_light + random.uniform(-1000, 1000)
         }
     
+    def read_sensor(self, sensor_id):
+        """
+        Read one configured sensor and update its status.
+        
+        Args:
+            sensor_id: Sensor key (bme280, dht22, wind, rain, uv, light)
+            
+        Returns:
+            Reading dictionary, or None if the read failed
+        """
+        try:
+            reading = getattr(self, self.SENSOR_READERS[sensor_id][0])()
+            self.sensors[sensor_id]['status'] = 'online'
+            return reading
+        except Exception as e:
+            self.sensors[sensor_id]['status'] = f'error: {e}'
+            return None
+    
     def collect_data(self):
         """Collect data from all configured sensors."""
+        readings = {}
+        for sensor_id in self.SENSOR_READERS:
+            if sensor_id in self.sensors:
+                reading = self.read_sensor(sensor_id)
+                if reading is not None:
+                    readings[sensor_id] = reading
+        
+        return self.record_readings(readings)
+    
+    def record_readings(self, readings, merge=False):
+        """
+        Store a set of sensor readings as the current data point.
+        
+        Args:
+            readings: Reading dictionaries keyed by sensor
+            merge: Keep the last reading of sensors not included
+            
+        Returns:
+            The stored data point
+        """
         timestamp = datetime.now()
         
+        if merge and self.current_data:
+            merged = dict(self.current_data.get('sensors', {}))
+            merged.update(readings)
+            readings = merged
+        
         data_point = {
             'timestamp': timestamp.isoformat(),
             'datetime': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'sensors': {}
+            'sensors': readings
         }
         
-        # Read from each configured sensor
-        readings = {}
-        
-        # BME280 (combined sensor)
-        if 'bme280' in self.sensors:
-            try:
-                readings['bme280'] = self.read_bme280()
-                self.sensors['bme280']['status'] = 'online'
-            except Exception as e:
-                self.sensors['bme280']['status'] = f'error: {e}'
-        
-        # DHT22 (temperature/humidity)
-        if 'dht22' in self.sensors:
-            try:
-                readings['dht22'] = self.read_dht22()
-                self.sensors['dht22']['status'] = 'online'
-            except Exception as e:
-                self.sensors['dht22']['status'] = f'error: {e}'
-        
-        # Wind sensor
-        if 'wind' in self.sensors:
-            try:
-                readings['wind'] = self.read_wind_sensor()
-                self.sensors['wind']['status'] = 'online'
-            except Exception as e:
-                self.sensors['wind']['status'] = f'error: {e}'
-        
-        # Rain gauge
-        if 'rain' in self.sensors:
-            try:
-                readings['rain'] = self.read_rain_gauge()
-                self.sensors['rain']['status'] = 'online'
-            except Exception as e:
-                self.sensors['rain']['status'] = f'error: {e}'
-        
-        # UV sensor
-        if 'uv' in self.sensors:
-            try:
-                readings['uv'] = self.read_uv_sensor()
-                self.sensors['uv']['status'] = 'online'
-            except Exception as e:
-                self.sensors['uv']['status'] = f'error: {e}'
-        
-        # Light sensor
-        if 'light' in self.sensors:
-            try:
-                readings['light'] = self.read_light_sensor()
-                self.sensors['light']['status'] = 'online'
-            except Exception as e:
-                self.sensors['light']['status'] = f'error: {e}'
-        
-        data_point['sensors'] = readings
-        
         # Store and update
         with self.lock:
-            self.data_history.append(data_point)
+            self.data_history.append(timestamp.timestamp(), data_point)
+            self.window_stats.add(self._statistic_values(readings))
             self.current_data = data_point
             self.current_data['statistics'] = self.calculate_statistics()
             self.current_data['alerts'] = self.check_alerts()
+            # Readers pick up the new snapshot through a single reference swap
+            previous = self.snapshot
+            self.snapshot = snapshot = Snapshot(data_point, previous.version + 1)
+        
+        if self.storage is not None:
+            self.storage.append({'timestamp': data_point['timestamp'], 'sensors': readings})
+        
+        for listener in list(self.listeners):
+            try:
+                listener(previous, snapshot)
+            except Exception as e:
+                print(f"Listener error: {e}")
         
         return data_point
     
+    @staticmethod
+    def _statistic_values(readings):
+        """Extract the values tracked by calculate_statistics from one data point."""
+        values = {}
+        if 'bme280' in readings:
+            values['temperature'] = readings['bme280'].get('temperature', 0)
+            values['humidity'] = readings['bme280'].get('humidity', 0)
+        elif 'dht22' in readings:
+            values['temperature'] = readings['dht22'].get('temperature', 0)
+            values['humidity'] = readings['dht22'].get('humidity', 0)
+        elif '3s' in readings:
+            values['temperature'] = readings['3s'].get('temperature', 0)
+            values['humidity'] = readings['3s'].get('humidity', 0)
+        
+        if 'wind' in readings:
+            values['wind_speed'] = readings['wind'].get('wind_speed', 0)
+        elif '3s' in readings:
+            values['wind_speed'] = readings['3s'].get('wind_speed', 0)
+        return values
+    
     def calculate_statistics(self):
-        """Calculate statistics from historical data."""
+        """
+        Calculate statistics over the history window.
+        
+        Uses the running aggregators updated by record_readings, so the
+        cost per sample does not depend on max_history.
+        """
         if not self.data_history or len(self.data_history) < 2:
             return {}
         
         stats = {}
-        
-        # Temperature stats (if available)
-        temps = []
-        humidities = []
-        wind_speeds = []
-        
-        for point in self.data_history:
-            if 'bme280' in point['sensors']:
-                temps.append(point['sensors']['bme280'].get('temperature', 0))
-                humidities.append(point['sensors']['bme280'].get('humidity', 0))
-            elif 'dht22' in point['sensors']:
-                temps.append(point['sensors']['dht22'].get('temperature', 0))
-                humidities.append(point['sensors']['dht22'].get('humidity', 0))
-            
-            if 'wind' in point['sensors']:
-                wind_speeds.append(point['sensors']['wind'].get('wind_speed', 0))
-        
-        if temps:
-            stats['temperature'] = {
-                'current': round(temps[-1], 1),
-                'min': round(min(temps), 1),
-                'max': round(max(temps), 1),
-                'avg': round(statistics.mean(temps), 1),
-            }
-        
-        if humidities:
-            stats['humidity'] = {
-                'current': round(humidities[-1], 1),
-                'min': round(min(humidities), 1),
-                'max': round(max(humidities), 1),
-                'avg': round(statistics.mean(humidities), 1),
-            }
-        
-        if wind_speeds:
+        window = self.window_stats
+        
+        for name in ('temperature', 'humidity'):
+            if name in window:
+                summary = window[name].summary()
+                stats[name] = {
+                    'current': round(summary['current'], 1),
+                    'min': round(summary['min'], 1),
+                    'max': round(summary['max'], 1),
+                    'avg': round(summary['avg'], 1),
+                    'stdev': round(summary['stdev'], 2),
+                }
+        
+        if 'wind_speed' in window:
+            summary = window['wind_speed'].summary()
             stats['wind_speed'] = {
-                'current': round(wind_speeds[-1], 2),
-                'avg': round(statistics.mean(wind_speeds), 2),
-                'max': round(max(wind_speeds), 2),
+                'current': round(summary['current'], 2),
+                'avg': round(summary['avg'], 2),
+                'max': round(summary['max'], 2),
+                'stdev': round(summary['stdev'], 2),
             }
         
         return stats
@@ -269,10 +308,12 @@ class WeatherStation:
             return alerts
         
         sensors = self.current_data['sensors']
+        climate = 'bme280' if 'bme280' in sensors else '3s'
+        anemometer = 'wind' if 'wind' in sensors else '3s'
         
         # Temperature checks
-        if 'bme280' in sensors:
-            temp = sensors['bme280'].get('temperature')
+        if climate in sensors:
+            temp = sensors[climate].get('temperature')
             if temp and temp > self.alert_thresholds['temp_high']:
                 alerts.append({
                     'type': 'temp_high',
@@ -287,8 +328,8 @@ class WeatherStation:
                 })
         
         # Humidity checks
-        if 'bme280' in sensors:
-            humidity = sensors['bme280'].get('humidity')
+        if climate in sensors:
+            humidity = sensors[climate].get('humidity')
             if humidity and humidity > self.alert_thresholds['humidity_high']:
                 alerts.append({
                     'type': 'humidity_high',
@@ -297,8 +338,8 @@ class WeatherStation:
                 })
         
         # Wind speed checks
-        if 'wind' in sensors:
-            wind = sensors['wind'].get('wind_speed')
+        if anemometer in sensors:
+            wind = sensors[anemometer].get('wind_speed')
             if wind and wind > self.alert_thresholds['wind_speed_high']:
                 alerts.append({
                     'type': 'wind_high',
@@ -308,10 +349,21 @@ class WeatherStation:
         
         return alerts
     
-    def start_monitoring(self, interval=60):
-        """Start continuous monitoring thread."""
+    def start_monitoring(self, interval=60, adaptive=False, request_budget=None):
+        """
+        Start continuous monitoring thread.
+        
+        Args:
+            interval: Seconds between collections (fastest per-sensor poll when adaptive)
+            adaptive: Poll each sensor at a rate driven by how fast it changes
+            request_budget: Maximum sensor reads per second when adaptive
+                (default: the read rate of fixed-interval polling)
+        """
         self.running = True
         
+        if adaptive:
+            return self._start_adaptive_monitoring(interval, request_budget)
+        
         def monitor_loop():
             while self.running:
                 try:
@@ -325,21 +377,130 @@ class WeatherStation:
         thread.start()
         return thread
     
+    def _start_adaptive_monitoring(self, interval, request_budget):
+        """Start monitoring with per-sensor adaptive poll rates."""
+        sensor_ids = [sid for sid in self.SENSOR_READERS if sid in self.sensors]
+        if request_budget is None:
+            request_budget = max(len(sensor_ids), 1) / interval
+        
+        self.scheduler = AdaptivePollScheduler(budget=request_budget)
+        for sensor_id in sensor_ids:
+            self.scheduler.add_task(
+                sensor_id,
+                lambda sensor_id=sensor_id: self.read_sensor(sensor_id),
+                tolerance=self.SENSOR_READERS[sensor_id][1],
+                min_interval=interval,
+                max_interval=interval * 30,
+            )
+        
+        self._stop_event = threading.Event()
+        
+        def on_results(results):
+            self.record_readings(results, merge=True)
+        
+        thread = threading.Thread(target=self.scheduler.run,
+                                  args=(self._stop_event, on_results), daemon=True)
+        thread.start()
+        return thread
+    
     def stop_monitoring(self):
         """Stop monitoring."""
         self.running = False
+        if self._stop_event:
+            self._stop_event.set()
+        if self.storage is not None:
+            self.storage.flush()
+    
+    def follow_bus(self, bus, pattern='weather/*', sensor_id='3s'):
+        """
+        Record weather samples published by the acquisition daemon.
+        
+        Replaces start_monitoring when the station is read over Modbus: the
+        daemon owns the gateway connection and this station only consumes.
+        
+        Args:
+            bus: DataBus the daemon publishes to
+            pattern: Topic pattern of the weather samples
+            sensor_id: Sensor key the sample values are stored under
+            
+        Returns:
+            Subscription (pass it to bus.unsubscribe to stop)
+        """
+        if sensor_id not in self.sensors:
+            self.add_sensor(sensor_id, '3S-RH&AT&PS', 'outdoor')
+        
+        def on_sample(sample):
+            self.sensors[sensor_id]['status'] = 'online' if sample.complete else 'partial'
+            self.record_readings({sensor_id: dict(sample.values)}, merge=True)
+        
+        return bus.subscribe(pattern, on_sample)
+    
+    def add_listener(self, callback):
+        """
+        Call callback(previous, snapshot) after every new data point.
+        
+        Args:
+            callback: Receives the previous and the new Snapshot
+        """
+        self.listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Stop calling a listener added with add_listener."""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
     
     def get_current_data(self):
-        """Get current data snapshot."""
-        with self.lock:
-            return json.loads(json.dumps(self.current_data, default=str))
+        """
+        Get current data snapshot.
+        
+        Returns:
+            Read-only dictionary shared by all readers (copy it to modify)
+        """
+        return self.snapshot.data
+    
+    def get_snapshot(self):
+        """Get the current Snapshot with its JSON encoding and ETag."""
+        return self.snapshot
     
-    def get_history(self, hours=24):
-        """Get historical data."""
-        cutoff = time.time() - (hours * 3600)
+    def get_history(self, hours=24, start=None, end=None, sensors=None, resolution='auto',
+                    max_points=None):
+        """
+        Get historical data.
+        
+        Args:
+            hours: Time window ending now, used when start is not given
+            start: Range start (epoch seconds, ISO string or datetime)
+            end: Range end (default: now)
+            sensors: Only include these sensor ids
+            resolution: 'auto', 'raw' or a rollup tier ('1min', '1h', '1d');
+                only storage backends with rollups aggregate
+            max_points: Evenly downsample to at most this many points
+            
+        Returns:
+            List of data points, oldest first
+        """
+        if start is None:
+            start = time.time() - (hours * 3600)
+        
+        if self.storage is not None:
+            if hasattr(self.storage, 'query_history'):
+                history = self.storage.query_history(start, end, sensors, resolution)
+            else:
+                history = self.storage.query(start, end, sensors)
+            return downsample(history, max_points)
+        
+        start = to_epoch(start)
+        end = to_epoch(end) if end is not None else None
         
+        # Only the range lookup and reference copy happen under the lock
         with self.lock:
-            return list(self.data_history)
+            history = self.data_history.range(start, end, max_points)
+        if sensors:
+            history = [
+                dict(point, sensors={s: v for s, v in point['sensors'].items() if s in sensors})
+                for point in history
+            ]
+        return history
     
     def save_to_file(self, filename='weather_data.json'):
         """Save current data to JSON file."""
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Weather History Storage
+Pluggable backends for WeatherStation history: a bounded, time-indexed
+in-memory ring buffer and an embedded SQLite time-series store (WAL mode, batched inserts,
+one narrow row per timestamp/sensor/metric, time-clustered index) with
+1-minute/1-hour/1-day rollup tiers maintained on ingest.
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from src.weather.rollups import DEFAULT_TIERS, RollupAccumulator, bucket_start, choose_tier, find_tier
+except ImportError:  # run as a script from src/weather
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.weather.rollups import DEFAULT_TIERS, RollupAccumulator, bucket_start, choose_tier, find_tier
+
+
+def to_epoch(timestamp):
+    """
+    Convert a timestamp to epoch seconds.
+
+    Args:
+        timestamp: Epoch number, numeric string, ISO 8601 string or datetime
+
+    Raises:
+        ValueError: If a string is neither a number nor an ISO timestamp
+    """
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    try:
+        return float(timestamp)
+    except ValueError:
+        return datetime.fromisoformat(timestamp).timestamp()
+
+
+def _data_point(ts, sensors):
+    """Build a history data point in the WeatherStation format."""
+    moment = datetime.fromtimestamp(ts)
+    return {
+        'timestamp': moment.isoformat(),
+        'datetime': moment.strftime('%Y-%m-%d %H:%M:%S'),
+        'sensors': sensors,
+    }
+
+
+def _strided(count, max_points):
+    """Indices of at most max_points evenly spaced items, always including the last."""
+    if not max_points or count <= max_points:
+        return range(count)
+    if max_points == 1:
+        return [count - 1]
+    step = (count - 1) / (max_points - 1)
+    return [round(i * step) for i in range(max_points)]
+
+
+def downsample(points, max_points):
+    """Return at most max_points evenly spaced points, keeping the newest."""
+    return [points[i] for i in _strided(len(points), max_points)]
+
+
+class TimeRingBuffer:
+    """
+    Fixed-capacity ring of items indexed by timestamp.
+
+    Appending evicts the oldest item once full. Items are kept in time
+    order, so a time range is located by binary search and copied without
+    touching the rest of the buffer. An item stamped earlier than the
+    newest one (clock stepped back) is indexed at the newest time to keep
+    the order.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.items = [None] * capacity
+        self.head = 0   # physical index of the oldest item
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.slice(0, self.size))
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('TimeRingBuffer index out of range')
+        return self.items[(self.head + index) % self.capacity]
+
+    def append(self, ts, item):
+        """Add an item stamped ts (epoch seconds), evicting the oldest when full."""
+        if self.size:
+            ts = max(ts, self.times[(self.head + self.size - 1) % self.capacity])
+        if self.size < self.capacity:
+            position = (self.head + self.size) % self.capacity
+            self.size += 1
+        else:
+            position = self.head
+            self.head = (self.head + 1) % self.capacity
+        self.times[position] = ts
+        self.items[position] = item
+
+    def bisect(self, ts):
+        """Logical index of the first item stamped at or after ts."""
+        low, high = 0, self.size
+        times, head, capacity = self.times, self.head, self.capacity
+        while low < high:
+            middle = (low + high) // 2
+            if times[(head + middle) % capacity] < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def slice(self, first, last, max_points=None):
+        """Items with logical index in [first, last), optionally downsampled."""
+        count = max(last - first, 0)
+        if max_points and count > max_points:
+            return [self.items[(self.head + first + i) % self.capacity]
+                    for i in _strided(count, max_points)]
+        begin = (self.head + first) % self.capacity
+        end = begin + count
+        if end <= self.capacity:
+            return self.items[begin:end]
+        return self.items[begin:] + self.items[:end - self.capacity]
+
+    def range(self, start=None, end=None, max_points=None):
+        """
+        Return items stamped in [start, end), oldest first.
+
+        Args:
+            start: Range start in epoch seconds (default: oldest item)
+            end: Range end in epoch seconds (default: newest item)
+            max_points: Evenly downsample to at most this many items
+        """
+        first = self.bisect(start) if start is not None else 0
+        last = self.bisect(end) if end is not None else self.size
+        return self.slice(first, last, max_points)
+
+
+class HistoryStorage(ABC):
+    """Interface of a weather history backend."""
+
+    @abstractmethod
+    def append(self, data_point):
+        """Store one data point."""
+
+    @abstractmethod
+    def query(self, start=None, end=None, sensors=None, limit=None):
+        """
+        Return data points in a time range, oldest first.
+
+        Args:
+            start: Range start (epoch seconds, ISO string or datetime), inclusive
+            end: Range end, exclusive (default: no limit)
+            sensors: Only include these sensor ids
+            limit: Maximum number of data points
+        """
+
+    def flush(self):
+        """Write buffered data points."""
+
+    def close(self):
+        """Release resources."""
+        self.flush()
+
+
+class MemoryStorage(HistoryStorage):
+    """Bounded in-memory history in a time-indexed ring buffer."""
+
+    def __init__(self, max_history=1440):
+        self.points = TimeRingBuffer(max_history)
+        self.lock = threading.Lock()
+
+    def append(self, data_point):
+        with self.lock:
+            self.points.append(to_epoch(data_point['timestamp']), data_point)
+
+    def query(self, start=None, end=None, sensors=None, limit=None):
+        start = to_epoch(start) if start is not None else None
+        end = to_epoch(end) if end is not None else None
+        with self.lock:
+            first = self.points.bisect(start) if start is not None else 0
+            last = self.points.bisect(end) if end is not None else len(self.points)
+            if limit:
+                last = min(last, first + limit)
+            selected = self.points.slice(first, last)
+        if sensors:
+            selected = [
+                dict(point, sensors={s: v for s, v in point['sensors'].items() if s in sensors})
+                for point in selected
+            ]
+        return selected
+
+
+class SQLiteStorage(HistoryStorage):
+    """SQLite time-series store with WAL journaling and batched inserts."""
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS series (
+            id INTEGER PRIMARY KEY,
+            sensor TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            UNIQUE (sensor, metric)
+        );
+        CREATE TABLE IF NOT EXISTS readings (
+            ts REAL NOT NULL,
+            series_id INTEGER NOT NULL REFERENCES series(id),
+            value REAL NOT NULL,
+            PRIMARY KEY (ts, series_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollups (
+            width INTEGER NOT NULL,
+            bucket REAL NOT NULL,
+            series_id INTEGER NOT NULL REFERENCES series(id),
+            min_value REAL NOT NULL,
+            max_value REAL NOT NULL,
+            sum_value REAL NOT NULL,
+            count INTEGER NOT NULL,
+            last_ts REAL NOT NULL,
+            last_value REAL NOT NULL,
+            PRIMARY KEY (width, bucket, series_id)
+        ) WITHOUT ROWID;
+    '''
+    
+    # Keep the first value stored for a timestamp and series
+    INSERT_READING = 'INSERT OR IGNORE INTO readings (ts, series_id, value) VALUES (?, ?, ?)'
+
+    # Merge new aggregates into existing buckets
+    ROLLUP_UPSERT = '''
+        INSERT INTO rollups (width, bucket, series_id, min_value, max_value,
+                             sum_value, count, last_ts, last_value)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (width, bucket, series_id) DO UPDATE SET
+            min_value = MIN(min_value, excluded.min_value),
+            max_value = MAX(max_value, excluded.max_value),
+            sum_value = sum_value + excluded.sum_value,
+            count = count + excluded.count,
+            last_value = CASE WHEN excluded.last_ts >= last_ts
+                              THEN excluded.last_value ELSE last_value END,
+            last_ts = MAX(last_ts, excluded.last_ts)
+    '''
+
+    def __init__(self, db_file='weather_history.db', batch_size=500,
+                 flush_interval=30.0, retention_days=365, tiers=DEFAULT_TIERS):
+        """
+        Open (or create) a history database.
+
+        Args:
+            db_file: SQLite database path
+            batch_size: Buffered rows that trigger a write
+            flush_interval: Maximum seconds a row stays buffered
+            retention_days: Delete raw readings older than this (0 = keep all)
+            tiers: Rollup tiers maintained on ingest (empty = no rollups)
+        """
+        self.db_file = str(db_file)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.tiers = tuple(tiers)
+        self.rollups = RollupAccumulator(self.tiers)
+
+        if self.db_file != ':memory:':
+            Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        self._local = threading.local()
+        self._readers = []
+        self.conn.executescript(self.SCHEMA)
+        self.series = {
+            (sensor, metric): series_id
+            for series_id, sensor, metric in self.conn.execute('SELECT id, sensor, metric FROM series')
+        }
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.last_purge = 0.0
+        self.stats = {'points': 0, 'rows': 0, 'flushes': 0, 'purged': 0}
+
+    def _connect(self):
+        """Open a connection configured for WAL and concurrent readers."""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    @contextmanager
+    def _reading(self):
+        """
+        Yield a connection for queries.
+
+        Each thread reads through its own read-only connection, so queries
+        never hold the write lock; WAL lets them run beside append/flush.
+        An in-memory database has only the writer's connection, which is
+        used under the lock.
+        """
+        if self.db_file == ':memory:':
+            with self.lock:
+                yield self.conn
+            return
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = Path(self.db_file).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+            self._readers.append(conn)
+        yield conn
+
+    def _series_id(self, sensor, metric):
+        """Return the id of a sensor/metric series, creating it if needed."""
+        key = (sensor, metric)
+        series_id = self.series.get(key)
+        if series_id is None:
+            self.conn.execute('INSERT OR IGNORE INTO series (sensor, metric) VALUES (?, ?)', key)
+            series_id = self.conn.execute(
+                'SELECT id FROM series WHERE sensor = ? AND metric = ?', key).fetchone()[0]
+            self.series[key] = series_id
+        return series_id
+
+    def append(self, data_point):
+        """Buffer the numeric values of one data point."""
+        ts = to_epoch(data_point['timestamp'])
+        with self.lock:
+            for sensor, values in data_point.get('sensors', {}).items():
+                if not isinstance(values, dict):
+                    continue
+                for metric, value in values.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        self.pending.append((ts, sensor, metric, float(value)))
+            self.stats['points'] += 1
+            due = (len(self.pending) >= self.batch_size
+                   or time.monotonic() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows in one transaction and apply retention."""
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if self.pending:
+                rows = [(ts, self._series_id(sensor, metric), value)
+                        for ts, sensor, metric, value in self.pending]
+                # Only rows new to the table go into the rollups, so
+                # re-imported readings are not counted twice
+                insert = self.conn.execute
+                add = self.rollups.add
+                inserted = 0
+                self.conn.execute('BEGIN')
+                try:
+                    for row in rows:
+                        if insert(self.INSERT_READING, row).rowcount > 0:
+                            add(*row)
+                            inserted += 1
+                    self.conn.executemany(self.ROLLUP_UPSERT, self.rollups.drain())
+                    self.conn.execute('COMMIT')
+                except Exception:
+                    # Rows stay pending for the next flush; their rollup deltas
+                    # are rebuilt then, so the partial ones are dropped
+                    self.conn.execute('ROLLBACK')
+                    self.rollups.drain()
+                    raise
+                self.stats['rows'] += inserted
+                self.stats['flushes'] += 1
+                self.pending = []
+
+            if time.time() - self.last_purge >= 3600:
+                self.last_purge = time.time()
+                self._purge(self.last_purge)
+
+    def _sync(self):
+        """Write buffered rows before a query, without taking the lock when there are none."""
+        if self.pending:
+            self.flush()
+
+    def _purge(self, now):
+        """Delete raw readings and rollup buckets past their retention."""
+        if self.retention_days:
+            cutoff = now - self.retention_days * 86400
+            purged = self.conn.execute('DELETE FROM readings WHERE ts < ?', (cutoff,)).rowcount
+            self.stats['purged'] += max(purged, 0)
+        for tier in self.tiers:
+            if tier.retention_days:
+                cutoff = bucket_start(now - tier.retention_days * 86400, tier.width)
+                self.conn.execute('DELETE FROM rollups WHERE width = ? AND bucket < ?',
+                                  (tier.width, cutoff))
+
+    def query(self, start=None, end=None, sensors=None, limit=None):
+        """Return data points in a time range, grouped from narrow rows."""
+        self._sync()
+
+        sql = ['SELECT r.ts, s.sensor, s.metric, r.value FROM readings r '
+               'JOIN series s ON s.id = r.series_id WHERE r.ts >= ?']
+        params = [to_epoch(start) if start is not None else 0.0]
+        if end is not None:
+            sql.append('AND r.ts < ?')
+            params.append(to_epoch(end))
+        if sensors:
+            sql.append(f"AND s.sensor IN ({','.join('?' * len(sensors))})")
+            params.extend(sensors)
+        sql.append('ORDER BY r.ts')
+
+        points = []
+        current_ts = None
+        current = None
+        with self._reading() as conn:
+            cursor = conn.execute(' '.join(sql), params)
+            for ts, sensor, metric, value in cursor:
+                if ts != current_ts:
+                    if limit and len(points) >= limit:
+                        break
+                    current_ts = ts
+                    current = {}
+                    points.append(_data_point(ts, current))
+                current.setdefault(sensor, {})[metric] = value
+        return points
+
+    def query_rollup(self, tier, start=None, end=None, sensors=None, limit=None):
+        """
+        Return aggregated data points of one rollup tier, oldest first.
+
+        Each point carries the bucket mean under 'sensors' (so charts can
+        use it like a raw point) and min/max/mean/count/last under 'rollup'.
+
+        Args:
+            tier: RollupTier or tier name
+            start: Range start; the bucket containing it is included
+            end: Range end, exclusive
+            sensors: Only include these sensor ids
+            limit: Maximum number of data points
+        """
+        if isinstance(tier, str):
+            tier = find_tier(tier, self.tiers)
+        self._sync()
+
+        sql = ['SELECT r.bucket, s.sensor, s.metric, r.min_value, r.max_value, r.sum_value, '
+               'r.count, r.last_value FROM rollups r JOIN series s ON s.id = r.series_id '
+               'WHERE r.width = ? AND r.bucket >= ?']
+        params = [tier.width, bucket_start(to_epoch(start), tier.width) if start is not None else 0.0]
+        if end is not None:
+            sql.append('AND r.bucket < ?')
+            params.append(to_epoch(end))
+        if sensors:
+            sql.append(f"AND s.sensor IN ({','.join('?' * len(sensors))})")
+            params.extend(sensors)
+        sql.append('ORDER BY r.bucket')
+
+        points = []
+        current_bucket = None
+        means = aggregates = None
+        with self._reading() as conn:
+            cursor = conn.execute(' '.join(sql), params)
+            for bucket, sensor, metric, low, high, total, count, last in cursor:
+                if bucket != current_bucket:
+                    if limit and len(points) >= limit:
+                        break
+                    current_bucket = bucket
+                    means, aggregates = {}, {}
+                    point = _data_point(bucket, means)
+                    point['resolution'] = tier.name
+                    point['rollup'] = aggregates
+                    points.append(point)
+                mean = total / count
+                means.setdefault(sensor, {})[metric] = mean
+                aggregates.setdefault(sensor, {})[metric] = {
+                    'min': low, 'max': high, 'mean': mean, 'count': count, 'last': last,
+                }
+        return points
+
+    def query_history(self, start=None, end=None, sensors=None, resolution='auto',
+                      max_points=1500):
+        """
+        Return history at the resolution that suits the queried span.
+
+        Args:
+            start: Range start
+            end: Range end, exclusive (default: now)
+            sensors: Only include these sensor ids
+            resolution: 'auto', 'raw' or a tier name such as '1h'
+            max_points: Bucket budget per series used by 'auto'
+
+        Raises:
+            ValueError: If resolution names no known tier
+        """
+        if resolution == 'auto':
+            first = to_epoch(start) if start is not None else 0.0
+            last = to_epoch(end) if end is not None else time.time()
+            tier = choose_tier(last - first, self.tiers, max_points) if self.tiers else None
+        else:
+            tier = find_tier(resolution, self.tiers)
+        if tier is None:
+            return self.query(start, end, sensors)
+        return self.query_rollup(tier, start, end, sensors)
+
+    def rebuild_rollups(self, chunk_size=100000):
+        """
+        Recompute every rollup tier from the raw readings.
+
+        Used for databases written before rollups existed; buckets older
+        than the raw retention are left as they are.
+
+        Returns:
+            Number of raw readings aggregated
+        """
+        self.flush()
+        accumulator = RollupAccumulator(self.tiers)
+        total = 0
+        with self.lock:
+            self.conn.execute('BEGIN')
+            first = self.conn.execute('SELECT MIN(ts) FROM readings').fetchone()[0]
+            if first is not None:
+                for tier in self.tiers:
+                    self.conn.execute('DELETE FROM rollups WHERE width = ? AND bucket >= ?',
+                                      (tier.width, bucket_start(first, tier.width)))
+            reader = self.conn.cursor()
+            reader.execute('SELECT ts, series_id, value FROM readings ORDER BY ts')
+            while True:
+                rows = reader.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    accumulator.add(*row)
+                total += len(rows)
+                self.conn.executemany(self.ROLLUP_UPSERT, accumulator.drain())
+            self._purge(time.time())
+            self.conn.execute('COMMIT')
+        return total
+
+    def count(self):
+        """Return the number of stored readings."""
+        self._sync()
+        with self._reading() as conn:
+            return conn.execute('SELECT COUNT(*) FROM readings').fetchone()[0]
+
+    def import_json(self, filename):
+        """
+        Load the history of a save_to_file() JSON export.
+
+        Args:
+            filename: Path to a weather_data.json file
+
+        Returns:
+            Number of data points imported
+        """
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        history = data.get('history', []) if isinstance(data, dict) else data
+        for point in history:
+            self.append(point)
+        self.flush()
+        return len(history)
+
+    def close(self):
+        """Flush and close the database."""
+        self.flush()
+        with self.lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self.conn.close()
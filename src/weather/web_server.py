@@ -4,85 +4,161 @@ Weather Station Web Server
 Real-time weather data display with REST API.
 """
 
-import json
+import sys
 import threading
 import time
 from datetime import datetime
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
+try:
+    from src.weather.event_stream import EventBroadcaster, diff, stream_to
+    from src.weather.http_server import PooledHTTPServer
+    from src.weather.response_cache import ResponseCache, etag_matches, negotiate_encoding
+    from src.weather.snapshot import encode
+except ImportError:  # run as a script from src/weather
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.weather.event_stream import EventBroadcaster, diff, stream_to
+    from src.weather.http_server import PooledHTTPServer
+    from src.weather.response_cache import ResponseCache, etag_matches, negotiate_encoding
+    from src.weather.snapshot import encode
+
 class WeatherWebHandler(BaseHTTPRequestHandler):
     """HTTP request handler for weather station."""
     
     # Class variables to share instances
     weather_station = None
+    response_cache = ResponseCache()
+    events = None
+    
+    # Seconds a history window relative to now is served from the cache
+    HISTORY_BUCKET = 60
+    
+    # Static pages: path -> page builder
+    PAGES = {
+        '/': 'get_dashboard_html',
+        '/index.html': 'get_dashboard_html',
+        '/history.html': 'get_history_html',
+        '/api.html': 'get_api_html',
+    }
     
     def do_GET(self):
         """Handle GET requests."""
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         query = parse_qs(parsed_path.query)
+        snapshot = self.weather_station.get_snapshot()
+        cache = self.response_cache
         
         # API endpoint: get current data
         if path == '/api/current':
-            self.send_json(self.weather_station.get_current_data())
+            self.send_cached(cache.get(path, snapshot.version, lambda: (snapshot.body, snapshot.etag)))
         
         # API endpoint: get history
         elif path == '/api/history':
-            hours = int(query.get('hours', [24])[0])
-            history = self.weather_station.get_history(hours)
-            self.send_json(history)
+            try:
+                hours = float(query.get('hours', [24])[0])
+                start = query.get('start', [None])[0]
+                end = query.get('end', [None])[0]
+                sensors = query['sensor'][0].split(',') if 'sensor' in query else None
+                resolution = query.get('resolution', ['auto'])[0]
+                max_points = int(query['max_points'][0]) if 'max_points' in query else None
+                if max_points is not None and max_points < 1:
+                    raise ValueError('max_points must be positive')
+                version = snapshot.version
+                if start is None:
+                    # A window relative to now moves without new data; pin it
+                    # to the current bucket so it is rebuilt once per bucket
+                    bucket = int(time.time() // self.HISTORY_BUCKET)
+                    start = bucket * self.HISTORY_BUCKET - hours * 3600
+                    version = (version, bucket)
+                response = cache.get(self.path, version, lambda: encode(
+                    self.weather_station.get_history(hours, start=start, end=end,
+                                                     sensors=sensors, resolution=resolution,
+                                                     max_points=max_points)))
+            except ValueError as e:
+                self.send_error(400, f'Bad history query: {e}')
+                return
+            self.send_cached(response)
         
         # API endpoint: get statistics
         elif path == '/api/stats':
-            data = self.weather_station.get_current_data()
-            self.send_json(data.get('statistics', {}))
+            self.send_cached(cache.get(path, snapshot.version,
+                                       lambda: snapshot.part('statistics', {})))
         
         # API endpoint: get alerts
         elif path == '/api/alerts':
-            data = self.weather_station.get_current_data()
-            self.send_json(data.get('alerts', []))
+            self.send_cached(cache.get(path, snapshot.version,
+                                       lambda: snapshot.part('alerts', [])))
+        
+        # API endpoint: push stream of current data changes
+        elif path == '/api/events':
+            stream_to(self, self.events, self.weather_station.get_current_data)
         
         # API endpoint: get sensors
         elif path == '/api/sensors':
             self.send_json(self.weather_station.sensors)
         
-        # Main dashboard page
-        elif path == '/' or path == '/index.html':
-            self.send_html(self.get_dashboard_html())
-        
-        # Historical data page
-        elif path == '/history.html':
-            self.send_html(self.get_history_html())
-        
-        # API documentation
-        elif path == '/api.html':
-            self.send_html(self.get_api_html())
+        # Dashboard, history and API documentation pages
+        elif path in self.PAGES:
+            self.send_cached(self.get_page(path), cache_control='max-age=300')
         
         else:
             self.send_error(404, 'Not found')
     
-    def send_json(self, data):
-        """Send JSON response."""
+    @classmethod
+    def get_page(cls, path):
+        """Return the cached response of a static page, building it once."""
+        builder = getattr(cls, cls.PAGES[path])
+        return cls.response_cache.get(path, 0, lambda: builder().encode(), 'text/html')
+    
+    def send_cached(self, response, cache_control='no-cache'):
+        """
+        Send a cached response, honouring If-None-Match and Accept-Encoding.
+        
+        Args:
+            response: CachedResponse to send
+            cache_control: Cache-Control header value
+        """
+        body, encoding, etag = response.encoded(
+            negotiate_encoding(self.headers.get('Accept-Encoding')))
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return
+        
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', response.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data, indent=2, default=str).encode())
+        self.wfile.write(body)
     
-    def send_html(self, html):
-        """Send HTML response."""
+    def send_json(self, data):
+        """Send JSON response."""
+        body = encode(data)
         self.send_response(200)
-        self.send_header('Content-type', 'text/html')
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(html.encode())
+        self.wfile.write(body)
     
     def log_message(self, format, *args):
         """Suppress default logging."""
         return
     
-    def get_dashboard_html(self):
+    @staticmethod
+    def get_dashboard_html():
         """Generate main dashboard HTML."""
         return '''<!DOCTYPE html>
 <html lang="en">
@@ -387,30 +463,71 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
             return parseFloat(value).toFixed(decimals);
         }
         
+        // Mark the dashboard online and render the current data
+        function showData(data) {
+            document.getElementById('status-dot').className = 'status-dot';
+            document.getElementById('status-text').textContent = 'Online';
+            
+            const now = new Date();
+            document.getElementById('last-update').textContent = 
+                now.toLocaleTimeString('en-US', { hour12: false });
+            
+            renderDashboard(data);
+            lastUpdate = now;
+        }
+        
+        function showOffline(error) {
+            console.error('Error fetching data:', error);
+            document.getElementById('status-dot').className = 'status-dot offline';
+            document.getElementById('status-text').textContent = 'Offline';
+        }
+        
         // Fetch and display weather data
         async function updateWeatherData() {
             try {
                 const response = await fetch(API_URL + '/current');
-                const data = await response.json();
-                
-                // Update status
-                document.getElementById('status-dot').className = 'status-dot';
-                document.getElementById('status-text').textContent = 'Online';
-                
-                // Update last update time
-                const now = new Date();
-                document.getElementById('last-update').textContent = 
-                    now.toLocaleTimeString('en-US', { hour12: false });
-                
-                // Render dashboard
-                renderDashboard(data);
-                
-                lastUpdate = now;
+                showData(await response.json());
             } catch (error) {
-                console.error('Error fetching data:', error);
-                document.getElementById('status-dot').className = 'status-dot offline';
-                document.getElementById('status-text').textContent = 'Offline';
+                showOffline(error);
+            }
+        }
+        
+        // Merge a pushed delta into the current data; null removes a key
+        function merge(target, delta) {
+            for (const [key, value] of Object.entries(delta)) {
+                if (value === null) {
+                    delete target[key];
+                } else if (typeof value === 'object' && !Array.isArray(value)
+                           && typeof target[key] === 'object' && target[key] !== null) {
+                    merge(target[key], value);
+                } else {
+                    target[key] = value;
+                }
             }
+            return target;
+        }
+        
+        // Subscribe to pushed updates, polling only if the stream is unavailable
+        function subscribe() {
+            if (!window.EventSource) {
+                updateWeatherData();
+                setInterval(updateWeatherData, refreshInterval);
+                return;
+            }
+            let current = {};
+            const source = new EventSource(API_URL + '/events');
+            source.addEventListener('snapshot', event => {
+                current = JSON.parse(event.data);
+                showData(current);
+            });
+            source.addEventListener('delta', event => showData(merge(current, JSON.parse(event.data))));
+            source.onerror = error => {
+                showOffline(error);
+                if (source.readyState === EventSource.CLOSED) {
+                    updateWeatherData();
+                    setInterval(updateWeatherData, refreshInterval);
+                }
+            };
         }
         
         // Render dashboard cards
@@ -626,16 +743,14 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
         updateTime();
         setInterval(updateTime, 1000);
         
-        // Initial load
-        updateWeatherData();
-        
-        // Auto-refresh
-        setInterval(updateWeatherData, refreshInterval);
+        // Live updates
+        subscribe();
     </script>
 </body>
 </html>'''
     
-    def get_history_html(self):
+    @staticmethod
+    def get_history_html():
         """Generate historical data page."""
         return '''<!DOCTYPE html>
 <html lang="en">
@@ -761,6 +876,9 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
                     <option value="6">Last 6 hours</option>
                     <option value="12">Last 12 hours</option>
                     <option value="24" selected>Last 24 hours</option>
+                    <option value="168">Last 7 days</option>
+                    <option value="720">Last 30 days</option>
+                    <option value="8760">Last year</option>
                 </select>
             </label>
             <button onclick="refreshCharts()">Refresh Charts</button>
@@ -792,7 +910,7 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
         
         async function loadHistoryData() {
             const hours = document.getElementById('time-range').value;
-            const response = await fetch('/api/history?hours=' + hours);
+            const response = await fetch('/api/history?hours=' + hours + '&max_points=720');
             return await response.json();
         }
         
@@ -807,7 +925,9 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
             
             data.forEach(point => {
                 const date = new Date(point.timestamp);
-                labels.push(date.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }));
+                labels.push(point.resolution === '1d'
+                    ? date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' })
+                    : date.toLocaleString('en-US', { hour: '2-digit', minute: '2-digit' }));
                 
                 if (point.sensors.bme280) {
                     temperatures.push(point.sensors.bme280.temperature);
@@ -927,7 +1047,8 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
 </body>
 </html>'''
     
-    def get_api_html(self):
+    @staticmethod
+    def get_api_html():
         """Generate API documentation."""
         return '''<!DOCTYPE html>
 <html lang="en">
@@ -1102,9 +1223,14 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
                     <code>/api/history</code>
                 </div>
                 <div class="description">
-                    Get historical weather data. Parameters: <code>hours</code> (1-24, default 24)
+                    Get historical weather data. Parameters: <code>hours</code> (default 24),
+                    or <code>start</code>/<code>end</code> (epoch seconds or ISO 8601),
+                    <code>sensor</code> (comma-separated sensor ids) and <code>resolution</code>
+                    (<code>auto</code>, <code>raw</code>, <code>1min</code>, <code>1h</code> or <code>1d</code>;
+                    rollup points add min/max/mean/count/last under <code>rollup</code>), and
+                    <code>max_points</code> (evenly downsample the result)
                 </div>
-                <p>Example: <code>/api/history?hours=12</code></p>
+                <p>Example: <code>/api/history?hours=12</code>, <code>/api/history?start=2025-12-10T00:00&amp;sensor=bme280,wind</code></p>
             </div>
             
             <div class="api-endpoint">
@@ -1127,6 +1253,18 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
                 </div>
             </div>
             
+            <div class="api-endpoint">
+                <div class="endpoint-title">
+                    <span class="method">GET</span>
+                    <code>/api/events</code>
+                </div>
+                <div class="description">
+                    Server-Sent Events stream. The first <code>snapshot</code> event carries the
+                    full current data; each new data point sends a <code>delta</code> event with
+                    only the changed fields (<code>null</code> marks a removed key).
+                </div>
+            </div>
+            
             <div class="api-endpoint">
                 <div class="endpoint-title">
                     <span class="method">GET</span>
@@ -1188,7 +1326,8 @@ class WeatherWebHandler(BaseHTTPRequestHandler):
 class WeatherWebServer:
     """Weather station web server."""
     
-    def __init__(self, weather_station, host='0.0.0.0', port=8080):
+    def __init__(self, weather_station, host='0.0.0.0', port=8080, workers=16,
+                 max_connections=512, request_timeout=10.0):
         """
         Initialize web server.
         
@@ -1196,19 +1335,39 @@ class WeatherWebServer:
             weather_station: WeatherStation instance
             host: Host to bind to
             port: Port to listen on
+            workers: Request handling threads
+            max_connections: Open connections before new ones get 503
+            request_timeout: Seconds allowed per request
         """
         self.weather_station = weather_station
         self.host = host
         self.port = port
+        self.workers = workers
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
         self.server = None
         self.thread = None
+        self.events = None
     
     def start(self):
         """Start the web server."""
         # Set class variable for request handler
         WeatherWebHandler.weather_station = self.weather_station
         
-        self.server = HTTPServer((self.host, self.port), WeatherWebHandler)
+        # Push each new data point's changes to /api/events subscribers
+        self.events = EventBroadcaster()
+        WeatherWebHandler.events = self.events
+        self.weather_station.add_listener(self._publish)
+        
+        # Render static pages once; requests only pick the encoding
+        for path in WeatherWebHandler.PAGES:
+            WeatherWebHandler.get_page(path)
+        
+        self.server = PooledHTTPServer((self.host, self.port), WeatherWebHandler,
+                                       workers=self.workers,
+                                       max_connections=self.max_connections,
+                                       request_timeout=self.request_timeout)
+        self.port = self.server.server_address[1]
         
         self.thread = threading.Thread(target=self._run_server, daemon=True)
         self.thread.start()
@@ -1219,10 +1378,21 @@ class WeatherWebServer:
         """Run server in thread."""
         self.server.serve_forever()
     
+    def _publish(self, previous, snapshot):
+        """Broadcast what changed between two snapshots."""
+        delta = diff(previous.data, snapshot.data)
+        if delta:
+            self.events.publish(delta)
+    
     def stop(self):
         """Stop the web server."""
         if self.server:
             self.server.shutdown()
+            self.server.server_close()
+        if self.events:
+            self.weather_station.remove_listener(self._publish)
+            self.events.close()
+            WeatherWebHandler.events = None
 
 # Example usage
 if __name__ == '__main__':
@@ -4,8 +4,18 @@ Test data generator - Creates sample Modbus frames for demonstration
 """
 
 import json
+import random
 import struct
 
+# Reads of the synthetic logger capture: unit -> [(function code, start, quantity)]
+POLLED_READS = {
+    1: [(4, 5000, 10), (4, 5010, 40)],
+    2: [(4, 5000, 10), (3, 100, 2)],
+    247: [(4, 8061, 25)],
+}
+POLL_PERIOD = 1.0
+CAPTURE_START = 1700000000.0
+
 
 def generate_sample_modbus_frames():
     """Generate sample Modbus TCP frames for testing"""
@@ -125,5 +135,101 @@ def save_test_frames(filename="test_extracted_frames.json"):
     return filename
 
 
+def _tcp_packet(payload, src_port, dst_port):
+    """Ethernet/IPv4/TCP packet carrying a Modbus TCP payload"""
+    ethernet = b'\0' * 12 + b'\x08\x00'
+    ip = (bytes([0x45, 0]) + struct.pack('>H', 40 + len(payload)) + b'\0' * 4 +
+          bytes([64, 6]) + b'\0' * 2 + bytes([192, 168, 1, 2, 192, 168, 1, 5]))
+    tcp = struct.pack('>HHIIBBHHH', src_port, dst_port, 0, 0, 0x50, 0x18, 0, 0, 0)
+    return ethernet + ip + tcp + payload
+
+
+def generate_poll_capture(cycles=300, seed=3):
+    """
+    Generate the traffic of a logger polling POLLED_READS once per second
+
+    Unit 247 is polled every second cycle, unit 2 skips its cycle when
+    cycle % 50 == 7, and unit 1's FC4 5010x40 read times out when
+    cycle % 100 == 3 and is sent again. Responses take 20 ms plus 0.5 ms
+    per register.
+
+    Returns:
+        (capture epoch, Ethernet packet, Modbus TCP frame) tuples in time order
+    """
+    rng = random.Random(seed)
+    events = []
+    transaction_id = 0
+    for cycle in range(cycles):
+        t = cycle * POLL_PERIOD + 0.05
+        for unit_id, reads in POLLED_READS.items():
+            if unit_id == 247 and cycle % 2:
+                continue
+            for function_code, start, quantity in reads:
+                t += 0.03 + rng.gauss(0, 0.002)
+                if unit_id == 2 and cycle % 50 == 7:
+                    continue
+                if unit_id == 1 and start == 5010 and cycle % 100 == 3:
+                    transaction_id = (transaction_id + 1) & 0xFFFF
+                    request = struct.pack('>HHHBBHH', transaction_id, 0, 6, unit_id,
+                                          function_code, start, quantity)
+                    events.append((t, _tcp_packet(request, 50000, 502), request))
+                    t += 0.1    # timed out; retried at once
+                transaction_id = (transaction_id + 1) & 0xFFFF
+                request = struct.pack('>HHHBBHH', transaction_id, 0, 6, unit_id,
+                                      function_code, start, quantity)
+                events.append((t, _tcp_packet(request, 50000, 502), request))
+                elapsed = 0.02 + quantity * 0.0005
+                pdu = bytes([function_code, 2 * quantity]) + b'\0' * (2 * quantity)
+                response = struct.pack('>HHHB', transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+                events.append((t + elapsed, _tcp_packet(response, 502, 50000), response))
+                t += elapsed
+    events.sort(key=lambda event: event[0])
+    return [(CAPTURE_START + t, packet, frame) for t, packet, frame in events]
+
+
+def write_poll_capture(filename, pcapng=True, endian='<', cycles=300, tsresol=None):
+    """
+    Write generate_poll_capture() traffic as a pcapng or classic pcap file
+
+    Args:
+        filename: Output file
+        pcapng: pcapng (Section Header, Interface, Enhanced Packet blocks)
+            instead of classic pcap
+        endian: '<' or '>' byte order of the file
+        tsresol: pcapng if_tsresol option byte, e.g. 9 for nanoseconds or
+            0x80 | 20 for 2^-20 s (default: no option, microseconds)
+
+    Returns:
+        The events written, as returned by generate_poll_capture()
+    """
+    events = generate_poll_capture(cycles)
+    if pcapng:
+        def block(block_type, body):
+            length = 12 + len(body)
+            return (struct.pack(endian + 'II', block_type, length) + body +
+                    struct.pack(endian + 'I', length))
+
+        options, units = b'', 1e6
+        if tsresol is not None:
+            options = struct.pack(endian + 'HHB3xHH', 9, 1, tsresol, 0, 0)
+            units = 2.0 ** (tsresol & 0x7F) if tsresol & 0x80 else 10.0 ** tsresol
+        data = [block(0x0A0D0D0A, struct.pack(endian + 'IHHq', 0x1A2B3C4D, 1, 0, -1)),
+                block(1, struct.pack(endian + 'HHI', 1, 0, 65535) + options)]
+        for timestamp, packet, _ in events:
+            ticks = round(timestamp * units)
+            data.append(block(6, struct.pack(endian + 'IIIII', 0, ticks >> 32, ticks & 0xFFFFFFFF,
+                                             len(packet), len(packet)) +
+                              packet + b'\0' * (-len(packet) % 4)))
+    else:
+        data = [struct.pack(endian + 'IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)]
+        for timestamp, packet, _ in events:
+            micros = round(timestamp * 1e6)
+            data.append(struct.pack(endian + 'IIII', micros // 1000000, micros % 1000000,
+                                    len(packet), len(packet)) + packet)
+    with open(filename, 'wb') as f:
+        f.write(b''.join(data))
+    return events
+
+
 if __name__ == "__main__":
     save_test_frames()
@@ -3,13 +3,17 @@
 Practical Example: Using the generated register map in your application
 """
 
-import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.analysis.compiled_map import load_register_map as load_compiled
 
 
 def load_register_map(filename="test_register_map.json"):
-    """Load the generated register mapping"""
-    with open(filename, 'r') as f:
-        return json.load(f)
+    """Load the generated register mapping (compiled .srm form when up to date)"""
+    return load_compiled(filename)
 
 
 def example_1_access_by_group():
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Acquisition Tests
+Tests for the acquisition daemon and the in-process data bus
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'SunGrow_Logger' / '3S-RH&AT&PS_WeatherStation'))
+
+from modbus_simulator import DEFAULT_3S_VALUES, ModbusSimulator
+from src.acquisition.bus import DataBus, Sample
+from src.acquisition.daemon import AcquisitionDaemon, Device, weather_station_device
+from src.modbus.register_decoder import WEATHER_3S_BLOCK
+from src.solar.connector import READ_INPUT_REGISTERS, ReadRequest
+
+
+class SlowConnector:
+    """Connector stand-in whose every batch takes a fixed time"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.timeout = 1.0
+        self.connected = True
+
+    def connect(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def execute(self, batch):
+        time.sleep(self.latency)
+        return [bytes(request.block.byte_count) for request in batch]
+
+    def get_stats(self):
+        return {}
+
+
+class TestAcquisitionDaemon:
+    """Test merged polling of the devices behind a gateway"""
+
+    @staticmethod
+    def test_shared_reads():
+        """Test that identical reads of two devices go out once per cycle"""
+        print("\n[TEST] Acquisition Daemon - Shared Reads")
+        simulator = ModbusSimulator(port=0)
+        try:
+            simulator.add_weather_station()
+            port = simulator.start()
+            config = {'gateways': {'logger': {'host': '127.0.0.1', 'port': port, 'timeout': 2.0}},
+                      'devices': [{'type': 'weather_3s', 'unit': 247}]}
+            daemon = AcquisitionDaemon.from_config(config)
+            daemon.add_device(Device('weather_copy', 'weather/copy', 'logger',
+                                     [ReadRequest(247, READ_INPUT_REGISTERS, WEATHER_3S_BLOCK)]))
+            daemon.connectors['logger'].connect()
+            samples = daemon.poll_gateway('logger')
+            daemon.stop()
+
+            assert daemon.stats['reads'] == 1 and daemon.stats['shared_reads'] == 1
+            assert simulator.stats['requests'] == 1
+            assert [s.topic for s in samples] == ['weather/247', 'weather/copy']
+            for name, expected in DEFAULT_3S_VALUES.items():
+                assert abs(samples[0].values[name] - expected) < 0.05, name
+            print("  OK - One read served both devices")
+            return True
+        finally:
+            simulator.stop()
+
+    @staticmethod
+    def test_overrun_scheduling():
+        """Test that a cycle slower than the interval skips missed cycles"""
+        print("\n[TEST] Acquisition Daemon - Overrun Scheduling")
+        bus = DataBus()
+        times = []
+        bus.subscribe('weather/*', lambda sample: times.append(time.monotonic()))
+        daemon = AcquisitionDaemon(bus, {'logger': SlowConnector(0.1)},
+                                   [weather_station_device(interval=0.05)])
+        daemon.start()
+        time.sleep(0.7)
+        daemon.stop()
+
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert len(times) >= 3, times
+        assert min(gaps) >= 0.1 + 0.05 - 0.02, gaps
+        assert daemon.stats['overruns'] >= len(times) - 1
+        print(f"    {len(times)} cycles, {daemon.stats['overruns']} overruns")
+        print("  OK - Overrun cycles were not made up in a burst")
+        return True
+
+
+class TestDataBus:
+    """Test publishing samples to many consumers"""
+
+    @staticmethod
+    def test_fan_out():
+        """Test topic routing, shared samples and retained replay"""
+        print("\n[TEST] Data Bus - Fan-out")
+        bus = DataBus()
+        received = {'all': [], 'weather': [], 'inverter': []}
+        bus.subscribe('*', received['all'].append)
+        bus.subscribe('weather/*', received['weather'].append)
+        bus.subscribe('inverter/*', received['inverter'].append)
+
+        weather = Sample('weather/247', 'weather_3s', {'temperature': 21.5})
+        inverter = Sample('inverter/1', 'inverter_1', {'reg_5002': 7})
+        assert bus.publish(weather) == 2
+        assert bus.publish(inverter) == 2
+        assert received['all'] == [weather, inverter]
+        assert received['weather'][0] is weather and received['inverter'] == [inverter]
+
+        replayed = []
+        bus.subscribe('weather/*', replayed.append, replay=True)
+        assert replayed == [weather]
+        assert bus.get_stats()['deliveries'] == 4
+        bus.close()
+        print("  OK - Samples routed by topic")
+        return True
+
+    @staticmethod
+    def test_queue_dropping():
+        """Test that a slow queued consumer drops the oldest samples"""
+        print("\n[TEST] Data Bus - Queue Dropping")
+        bus = DataBus()
+        release = threading.Event()
+        received = []
+
+        def slow(sample):
+            release.wait(2.0)
+            received.append(sample.cycle)
+
+        subscription = bus.subscribe('*', slow, queue_size=2)
+        began = time.monotonic()
+        for cycle in range(1, 11):
+            bus.publish(Sample('inverter/1', 'inverter_1', {}, cycle=cycle))
+        published_in = time.monotonic() - began
+        release.set()
+        bus.close()
+
+        assert published_in < 0.5, "publisher waited for the slow consumer"
+        assert subscription.delivered + subscription.dropped == 10
+        assert subscription.dropped >= 7
+        assert received[-2:] == [9, 10], received
+        print(f"    Delivered {received}, dropped {subscription.dropped}")
+        print("  OK - Oldest samples dropped")
+        return True
+
+
+def run_all_tests():
+    """Run all tests"""
+    results = [
+        ("Shared Reads", TestAcquisitionDaemon.test_shared_reads()),
+        ("Overrun Scheduling", TestAcquisitionDaemon.test_overrun_scheduling()),
+        ("Fan-out", TestDataBus.test_fan_out()),
+        ("Queue Dropping", TestDataBus.test_queue_dropping()),
+    ]
+    passed = sum(1 for _, result in results if result)
+    print(f"\n{passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
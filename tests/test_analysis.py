@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Analysis Tests
+Tests for the compiled register maps and the capture analysis tools
+"""
+
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_generator import write_poll_capture
+from src.analysis import cross_ref
+from src.analysis.addresses import AddressAnalyzer, AddressStatistics, rollup
+from src.analysis.bus_model import BusUtilizationModel, ServiceModel
+from src.analysis.compiled_map import (CompiledRegisterMap, compile_file, export_json,
+                                       load_register_map, to_document)
+from src.analysis.cross_ref import SungrowCrossReference
+from src.analysis.fingerprint import MATCH_THRESHOLD, DeviceFingerprinter
+from src.analysis.mapper import SungrowDocumentationMapper
+from src.analysis.poll_cycles import PollCycleAnalyzer
+from src.solar.monitor import DEFAULT_UNITS
+from src.utils.range_index import RangeIndex
+
+
+def _register_map():
+    """Live-style register map with a map table and a list table"""
+    return {
+        'metadata': {'source': 'test', 'units': [1, 2]},
+        'registers_by_unit': {
+            'Unit_1': {'function_codes': [4], 'registers': {
+                '5002': {'data_type': 'UINT16', 'category': 'Power', 'unique_values': [7, 8]},
+                '13000': {'data_type': 'INT32', 'note': 'Export power', 'custom': {'a': 1}},
+            }},
+        },
+        'documented_registers': [
+            {'address': 4999, 'name': 'Device type', 'scale': 1},
+            {'address': 5002, 'name': 'Daily yield', 'scale': 0.1, 'unit': 'kWh'},
+        ],
+    }
+
+
+class TestCompiledMap:
+    """Test compiling register maps and detecting stale compiled files"""
+
+    @staticmethod
+    def test_round_trip():
+        """Test that compile, export and lazy loading reproduce the document"""
+        print("\n[TEST] Compiled Map - Round Trip")
+        document = _register_map()
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / 'map.json'
+            source.write_text(json.dumps(document))
+            compiled = compile_file(source)
+            exported = export_json(compiled, Path(tmp) / 'exported.json')
+            assert json.loads(exported.read_text()) == document
+
+            loaded = load_register_map(source)
+            registers = loaded['registers_by_unit']['Unit_1']['registers']
+            assert not isinstance(registers, dict), "compiled map was not used"
+            assert registers['5002']['unique_values'] == [7, 8]
+            assert loaded['documented_registers'][1]['unit'] == 'kWh'
+            assert json.loads(json.dumps(to_document(loaded))) == document
+            with CompiledRegisterMap(compiled) as compiled_map:
+                assert compiled_map.lookup(('registers_by_unit', 'Unit_1', 'registers'),
+                                           13000)['custom'] == {'a': 1}
+        print("  OK - Document reproduced from the compiled map")
+        return True
+
+    @staticmethod
+    def test_stale_digest():
+        """Test that an edited JSON file is read instead of its old compiled map"""
+        print("\n[TEST] Compiled Map - Stale Detection")
+        document = _register_map()
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / 'map.json'
+            source.write_text(json.dumps(document))
+            compiled = compile_file(source)
+            mtime = source.stat().st_mtime_ns
+
+            # Same content with a new modification time: still current
+            os.utime(source, ns=(mtime + 10**9, mtime + 10**9))
+            assert not isinstance(load_register_map(source)['registers_by_unit']['Unit_1']
+                                  ['registers'], dict)
+
+            # Same size, new content and time: the digest catches it
+            text = json.dumps(document).replace('"Power"', '"Yield"')
+            source.write_text(text)
+            os.utime(source, ns=(mtime + 2 * 10**9, mtime + 2 * 10**9))
+            with CompiledRegisterMap(compiled) as compiled_map:
+                assert source.stat().st_size == compiled_map.source_size
+                assert not compiled_map.is_current(source)
+            loaded = load_register_map(source)
+            assert loaded == json.loads(text)
+            assert loaded['registers_by_unit']['Unit_1']['registers']['5002']['category'] == 'Yield'
+        print("  OK - Stale compiled map ignored")
+        return True
+
+
+class TestRangeIndex:
+    """Test the register range index against a linear scan"""
+
+    @staticmethod
+    def test_brute_force():
+        """Test overlap, point and group queries on random nested ranges"""
+        print("\n[TEST] Range Index - Brute Force")
+        rng = random.Random(43)
+        assert RangeIndex([(0, 10, 'outer'), (0, 5, 'inner')]).get(3) == 'inner'
+        for size in (0, 1, 2, 7, 8, 9, 31, 64, 200):
+            ranges = []
+            for value in range(size):
+                first = rng.randrange(0, 500)
+                ranges.append((first, first + rng.choice((0, 1, 3, 20, 120)), value))
+            ranges += [(first, first + 2, f'inner_{value}') for first, _, value in ranges[:size // 4]]
+            index = RangeIndex(ranges)
+            ordered = list(index)
+
+            for _ in range(300):
+                start = rng.randrange(-5, 650)
+                count = rng.randrange(1, 40)
+                expected = [r for r in ordered if r[0] < start + count and start <= r[1]]
+                assert index.overlapping(start, count) == expected, (size, start, count)
+                # Innermost range; among identical ranges the last one added
+                containing = sorted((r for r in ranges if r[0] <= start <= r[1]),
+                                    key=lambda r: (r[0], -r[1]))
+                expected = containing[-1][2] if containing else None
+                assert index.get(start) == expected, (size, start)
+
+            addresses = [rng.randrange(0, 650) for _ in range(100)]
+            groups = {}
+            for first, last, value in ordered:
+                inside = sorted(a for a in addresses if first <= a <= last)
+                if inside:
+                    groups[value] = inside
+            assert index.group(addresses) == groups
+            assert list(index.group(addresses)) == list(groups)
+        print("  OK - Index matched the linear scan")
+        return True
+
+
+class TestDocumentationMapper:
+    """Test mapping captured registers to the Sungrow documentation"""
+
+    @staticmethod
+    def test_cut_off_registers():
+        """Test that a read covering only the first word of a value is undocumented"""
+        print("\n[TEST] Documentation Mapper - Cut-off Registers")
+        captured = {'registers_by_unit': {'Unit_1': {'registers': {
+            '499': {'quantities_read': [2], 'access_count': 3},     # 500 is UINT32
+            '500': {'quantities_read': [2], 'access_count': 5},
+            '503': {'quantities_read': [1], 'access_count': 1},     # second word of 502
+        }}}}
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / 'captured.json'
+            source.write_text(json.dumps(captured))
+            cross_ref = SungrowDocumentationMapper().map_captured_registers(source)
+
+        documented = cross_ref['documented_registers']['Unit_1']
+        undocumented = cross_ref['undocumented_registers']['Unit_1']
+        assert sorted(documented) == ['500', '503'], sorted(documented)
+        assert documented['503']['part_of'] == 502
+        assert sorted(undocumented) == ['499'], sorted(undocumented)
+        stats = cross_ref['mapping_statistics']
+        assert (stats['total_captured'], stats['documented'], stats['undocumented']) == (3, 2, 1)
+        assert stats['coverage_percent'] == 66.7
+        print("  OK - Every captured register listed once")
+        return True
+
+
+class TestCrossReference:
+    """Test batch validation of captured register values"""
+
+    @staticmethod
+    def test_numpy_matches_python():
+        """Test that the NumPy and pure-Python validation paths agree"""
+        print("\n[TEST] Cross Reference - NumPy and Python Paths")
+        if cross_ref.np is None:
+            print("  SKIP - NumPy not installed")
+            return True
+        rng = random.Random(46)
+        exchanges = []
+        timestamps = []
+        for n in range(400):
+            start = rng.choice((0, 2, 5, 9, 14, 20, 4095, 4097))
+            count = rng.randrange(0, 12)
+            words = [rng.choice((0, 1, 7, 230, 2300, 5000, 0x8001, 0xFFFF, rng.randrange(65536)))
+                     for _ in range(count)]
+            exchanges.append((1, 4, start, struct.pack(f'>{count}H', *words)))
+            timestamps.append(1000.0 + n / 4)
+        xref = SungrowCrossReference()
+
+        for batch, times in ((exchanges, timestamps), ([], [])):
+            array_columns = xref.response_columns(batch, times)
+            expected = xref.validate_batch(array_columns)
+            np = cross_ref.np
+            cross_ref.np = None
+            try:
+                list_columns = xref.response_columns(batch, times)
+                result = xref.validate_batch(list_columns)
+            finally:
+                cross_ref.np = np
+            assert {name: list(column) for name, column in array_columns.items()} == list_columns
+            assert result == expected
+        assert expected == {}, "empty batch validated registers"
+        print("  OK - Both paths gave identical results")
+        return True
+
+
+def _tshark_packet(unit_id, address, quantity, timestamp=None):
+    """Read request as exported by tshark -T json"""
+    layers = {'modbus': {'modbus.func_code': '4', 'modbus.unit_id': str(unit_id),
+                         'modbus.starting_address': str(address),
+                         'modbus.quantity_of_registers': str(quantity)},
+              'tcp': {'tcp.srcport': '40000'}}
+    if timestamp is not None:
+        layers['frame'] = {'frame.time_epoch': f'{timestamp:.6f}'}
+    return {'_source': {'layers': layers}}
+
+
+class TestAddressStatistics:
+    """Test mergeable address statistics"""
+
+    @staticmethod
+    def test_merge_round_trip():
+        """Test that hourly statistics saved, loaded and rolled up match one pass"""
+        print("\n[TEST] Address Statistics - Merge Round Trip")
+        day = 1_700_006_400   # midnight UTC
+        packets = [_tshark_packet(unit_id, address, 10, day + 3000 + second + unit_id)
+                   for second in range(0, 3 * 3600, 30)
+                   for unit_id, address in ((1, 5000), (2, 5010), (1, 13000))]
+        packets += [_tshark_packet(3, 5000, 2), _tshark_packet(3, 7000, 1)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            export = Path(tmp) / 'capture.json'
+            export.write_text(json.dumps(packets))
+            whole = AddressAnalyzer()
+            assert whole.analyze_from_json(export)
+            hourly = AddressAnalyzer().statistics_by_period(export)
+            assert sorted(hourly, key=str) == [day, day + 3600, day + 7200, day + 10800, None]
+
+            saved = {}
+            for start, statistics in hourly.items():
+                path = Path(tmp) / f'{start}.json'
+                statistics.save(path)
+                saved[start] = AddressStatistics.load(path)
+                assert saved[start].to_dict() == statistics.to_dict()
+
+        daily = rollup(saved, lambda t: t - t % 86400)
+        assert sorted(daily, key=str) == [day, None]
+        assert sorted(daily[None].addresses) == [5000, 7000]
+        merged = AddressStatistics.combine(daily.values()).to_dict()
+        expected = whole.statistics.to_dict()
+        for address, stats in expected['addresses'].items():
+            intervals = merged['addresses'][address].pop('intervals')
+            # The interval spanning each hour boundary is not counted
+            assert 0 <= sum(stats.pop('intervals')) - sum(intervals) <= 3
+        assert merged == expected
+        print("  OK - Rolled-up statistics matched a single pass")
+        return True
+
+
+class TestPollCycles:
+    """Test poll schedule reconstruction on a capture with known polling"""
+
+    @staticmethod
+    def test_schedule_estimation():
+        """Test period, phase, missed and repeated polls of every read"""
+        print("\n[TEST] Poll Cycles - Schedule Estimation")
+        with tempfile.TemporaryDirectory() as tmp:
+            capture = Path(tmp) / 'capture.pcapng'
+            write_poll_capture(capture, cycles=300)
+            summary = PollCycleAnalyzer().analyze_capture(capture).summary()
+
+        # (unit, read): (polls, period, phase, missed, repeats, unanswered)
+        expected = {
+            ('Unit_1', 'FC4_5000x10'): (300, 1.0, 0.0, 0, 0, 0),
+            ('Unit_1', 'FC4_5010x40'): (303, 1.0, 0.055, 0, 3, 3),
+            ('Unit_2', 'FC4_5000x10'): (294, 1.0, 0.125, 6, 0, 0),
+            ('Unit_2', 'FC3_100x2'): (294, 1.0, 0.18, 6, 0, 0),
+            ('Unit_247', 'FC4_8061x25'): (150, 2.0, 0.231, 0, 0, 0),
+        }
+        assert sum(len(unit['reads']) for unit in summary['units'].values()) == len(expected)
+        for (unit_key, name), (polls, period, phase, missed, repeats, unanswered) in expected.items():
+            read = summary['units'][unit_key]['reads'][name]
+            assert read['polls'] == polls, (name, read)
+            assert abs(read['period'] - period) < 1e-4, (name, read['period'])
+            offset = (read['phase'] - phase) % period
+            assert min(offset, period - offset) < 0.01, (name, read['phase'])
+            assert (read['missed'], read['repeats'], read['unanswered']) == \
+                (missed, repeats, unanswered), (name, read)
+            assert read['jitter'] < 0.02
+        assert summary['units']['Unit_2']['missed'] == 12
+        assert abs(summary['units']['Unit_247']['cycle']['avg_period'] - 2.0) < 0.01
+        print("  OK - Schedules matched the generated polling")
+        return True
+
+
+class TestBusModel:
+    """Test the gateway load model and its coalescing what-ifs"""
+
+    @staticmethod
+    def test_coalescing_whatif():
+        """Test the fitted service cost and the saving of merging adjacent reads"""
+        print("\n[TEST] Bus Model - Coalescing What-if")
+        with tempfile.TemporaryDirectory() as tmp:
+            capture = Path(tmp) / 'capture.pcapng'
+            write_poll_capture(capture, cycles=300)
+            model = BusUtilizationModel()
+            model.add_capture(capture, 'logger')
+        gateway = model.summary()['gateways']['logger']
+
+        # Generated responses take 20 ms + 0.5 ms per register (2 RTU bytes)
+        assert gateway['transactions'] == 1341 and gateway['timeouts'] == 3
+        assert abs(gateway['seconds_per_byte'] - 0.00025) < 1e-6
+        assert abs(gateway['overhead_per_transaction'] - 0.015) < 1e-4
+        assert gateway['max_queue_delay'] == 0.0
+
+        # 9600 baud is slower than the generated bus: the wire share is capped and flagged
+        assert gateway['wire_fraction'] == 1.0 and gateway['wire_time'] > gateway['service_time']
+        assert 'Warning:      wire time exceeds service time' in model.generate_report()
+        fast = BusUtilizationModel(baud=115200)
+        fast.add_transactions(model.gateways['logger'], 'logger')
+        assert 0 < fast.summary()['gateways']['logger']['wire_fraction'] < 1
+        assert 'Warning' not in fast.generate_report()
+
+        # Unit 1 reads 5000x10 and 5010x40: one 5000x50 read saves a 20 ms overhead
+        for whatif in gateway['units']['Unit_1']['coalescing']:
+            assert (whatif['reads_before'], whatif['reads_after']) == (2, 1)
+            assert whatif['registers_read_through'] == 0
+            assert abs(whatif['saved_per_cycle'] - 0.02) < 1e-4, whatif
+        for unit_key in ('Unit_2', 'Unit_247'):
+            for whatif in gateway['units'][unit_key]['coalescing']:
+                assert whatif['reads_after'] == whatif['reads_before']
+                assert whatif['saved_per_second'] == 0.0
+
+        # Without a size effect the mean service time is a flat cost
+        flat = ServiceModel.fit([(20, 0.03), (20, 0.05)])
+        assert (flat.overhead, flat.per_byte) == (0.04, 0.0)
+        falling = ServiceModel.fit([(20, 0.05), (120, 0.03)])
+        assert (falling.overhead, falling.per_byte) == (0.04, 0.0)
+        print("  OK - What-if priced from the fitted service cost")
+        return True
+
+
+class TestDeviceFingerprinter:
+    """Test classifying units by what the logger reads from them"""
+
+    @staticmethod
+    def test_signature_scoring():
+        """Test feature scores of the units of a synthetic capture"""
+        print("\n[TEST] Device Fingerprinter - Signature Scoring")
+        with tempfile.TemporaryDirectory() as tmp:
+            capture = Path(tmp) / 'capture.pcapng'
+            write_poll_capture(capture, cycles=20)
+            fingerprinter = DeviceFingerprinter().analyze_capture(capture)
+
+        # Unit 1: all features match but the grid frequency (5035) reads 0
+        # Unit 2: 10 of its 12 registers per cycle are inverter registers
+        expected = {1: ('Sungrow Solar Inverter', 0.8),
+                    2: ('Sungrow Solar Inverter', (0.5 * 10 / 12 + 0.2 + 0.1) / 0.8),
+                    247: ('3S-RH&AT&PS Weather Station (Seven Sensor)', 1.0)}
+        for unit_id, (name, score) in expected.items():
+            best_score, best = fingerprinter.scores(unit_id)[0]
+            assert best.name == name and abs(best_score - score) < 1e-9, (unit_id, best_score)
+            assert fingerprinter.classify(unit_id)['signature'] is best
+        assert fingerprinter.units[1].probes == {(0, 0): [0, 20]}
+
+        # A plausible grid frequency lifts unit 1 to a full match
+        request = struct.pack('>HHHBBHH', 1, 0, 6, 1, 4, 5030, 10)
+        response = struct.pack('>HHHBBB10H', 1, 0, 23, 1, 4, 20, *([0] * 5 + [500] + [0] * 4))
+        fingerprinter = DeviceFingerprinter()
+        fingerprinter.add_frame(request)
+        fingerprinter.add_frame(response)
+        assert fingerprinter.units[1].requests == 1
+        assert fingerprinter.classify(1)['confidence'] == 1.0
+        print("  OK - Units scored against every signature")
+        return True
+
+    @staticmethod
+    def test_unidentified_unit():
+        """Test that unit 6 of the live register map matches no signature"""
+        print("\n[TEST] Device Fingerprinter - Unidentified Unit")
+        mapping = load_register_map(Path(__file__).resolve().parent.parent / 'data' /
+                                    'sungrow_live_register_map.json')
+        results = DeviceFingerprinter().add_register_map(mapping).classify_all()
+
+        assert sorted(results) == [1, 2, 3, 4, 5, 6, 247]
+        for unit_id in (1, 2, 3, 4, 5):
+            assert results[unit_id]['signature'].category == 'inverters', unit_id
+        assert results[247]['signature'].category == 'weather_station'
+        unit_6 = results[6]
+        assert unit_6['signature'] is None and unit_6['confidence'] < MATCH_THRESHOLD
+        assert unit_6['confidence'] == 0.286 and unit_6['best_match'] == 'Sungrow Solar Inverter'
+        assert 6 not in DEFAULT_UNITS
+        print("  OK - Unit 6 reported as unknown")
+        return True
+
+
+def run_all_tests():
+    """Run all tests"""
+    results = [
+        ("Round Trip", TestCompiledMap.test_round_trip()),
+        ("Stale Detection", TestCompiledMap.test_stale_digest()),
+        ("Range Index", TestRangeIndex.test_brute_force()),
+        ("Cut-off Registers", TestDocumentationMapper.test_cut_off_registers()),
+        ("NumPy and Python Paths", TestCrossReference.test_numpy_matches_python()),
+        ("Merge Round Trip", TestAddressStatistics.test_merge_round_trip()),
+        ("Schedule Estimation", TestPollCycles.test_schedule_estimation()),
+        ("Coalescing What-if", TestBusModel.test_coalescing_whatif()),
+        ("Signature Scoring", TestDeviceFingerprinter.test_signature_scoring()),
+        ("Unidentified Unit", TestDeviceFingerprinter.test_unidentified_unit()),
+    ]
+    passed = sum(1 for _, result in results if result)
+    print(f"\n{passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
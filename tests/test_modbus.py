@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Modbus Protocol Tests
+Tests for reading captures and pairing Modbus TCP requests with responses
+"""
+
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_generator import generate_poll_capture, write_poll_capture
+from src.modbus.pcap_extractor import ModbusFrameProcessor, PCAPReader
+
+
+class TestPCAPReader:
+    """Test reading pcap and pcapng captures"""
+
+    @staticmethod
+    def test_byte_orders():
+        """Test both file formats in both byte orders"""
+        print("\n[TEST] PCAP Reader - Formats and Byte Orders")
+        with tempfile.TemporaryDirectory() as tmp:
+            for pcapng in (True, False):
+                for endian in '<>':
+                    order = 'le' if endian == '<' else 'be'
+                    capture = Path(tmp) / f"capture_{order}.{'pcapng' if pcapng else 'pcap'}"
+                    events = write_poll_capture(capture, pcapng, endian, cycles=20)
+                    reader = PCAPReader(str(capture))
+                    frames = reader.read()
+                    assert reader.is_pcapng == pcapng
+                    assert frames == [frame for _, _, frame in events], (pcapng, endian)
+                    for timestamp, (expected, _, _) in zip(reader.timestamps, events):
+                        assert abs(timestamp - expected) < 2e-6, (pcapng, endian)
+        print("  OK - Every packet read with its timestamp")
+        return True
+
+    @staticmethod
+    def test_timestamp_resolution():
+        """Test that pcapng timestamps follow the interface's if_tsresol"""
+        print("\n[TEST] PCAP Reader - Timestamp Resolution")
+        with tempfile.TemporaryDirectory() as tmp:
+            # Epoch timestamps as floats are only good to about 0.25 us
+            for tsresol, tolerance in ((9, 5e-7), (0x80 | 20, 2e-6), (3, 1e-3)):
+                for endian in '<>':
+                    capture = Path(tmp) / f'capture_{tsresol}.pcapng'
+                    events = write_poll_capture(capture, True, endian, cycles=20, tsresol=tsresol)
+                    reader = PCAPReader(str(capture))
+                    assert reader.read() == [frame for _, _, frame in events]
+                    for timestamp, (expected, _, _) in zip(reader.timestamps, events):
+                        assert abs(timestamp - expected) < tolerance, (tsresol, timestamp, expected)
+        print("  OK - Nanosecond, binary and millisecond resolutions decoded")
+        return True
+
+
+class TestTransactionPairing:
+    """Test pairing requests with responses"""
+
+    @staticmethod
+    def test_responses_without_requests():
+        """Test that responses to requests sent before the capture are dropped"""
+        print("\n[TEST] Transaction Pairing - Responses Without Requests")
+        events = generate_poll_capture(cycles=5)[1:]   # capture starts after a request
+        write_response = struct.pack('>HHHBBHH', 999, 0, 6, 1, 16, 5000, 2)
+        write_request = struct.pack('>HHHBBHHB', 1000, 0, 11, 1, 16, 5000, 2, 4) + b'\0' * 4
+        write_answer = struct.pack('>HHHBBHH', 1000, 0, 6, 1, 16, 5000, 2)
+        frames = [write_response, write_request, write_answer] + [frame for _, _, frame in events]
+        timestamps = [0.0, 0.1, 0.2] + [timestamp for timestamp, _, _ in events]
+
+        transactions = ModbusFrameProcessor.pair_transactions(frames, timestamps)
+        requests = [frame for frame in frames[3:] if struct.unpack_from('>H', frame, 4)[0] == 6]
+        assert len(transactions) == 1 + len(requests)
+        assert transactions[0].function_code == 16 and transactions[0].response_time == 0.2
+        for tx in transactions[1:]:
+            assert (tx.start, tx.quantity) in ((5000, 10), (5010, 40), (100, 2), (8061, 25)), tx
+        # Only the read that times out in cycle 3 goes unanswered
+        unanswered = [tx for tx in transactions if tx.response_time is None]
+        assert [(tx.unit_id, tx.start) for tx in unanswered] == [(1, 5010)]
+        print(f"  OK - {len(transactions)} transactions, no phantom requests")
+        return True
+
+
+def run_all_tests():
+    """Run all tests"""
+    results = [
+        ("Formats and Byte Orders", TestPCAPReader.test_byte_orders()),
+        ("Timestamp Resolution", TestPCAPReader.test_timestamp_resolution()),
+        ("Responses Without Requests", TestTransactionPairing.test_responses_without_requests()),
+    ]
+    passed = sum(1 for _, result in results if result)
+    print(f"\n{passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
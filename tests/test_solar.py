@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Solar Monitoring Tests
+Tests for the Sungrow gateway connector and inverter read planning,
+run against the local Modbus TCP simulator
+"""
+
+import struct
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'SunGrow_Logger' / '3S-RH&AT&PS_WeatherStation'))
+
+from modbus_simulator import GATEWAY_TARGET_FAILED, ILLEGAL_DATA_ADDRESS, ModbusSimulator
+from src.modbus.register_decoder import RegisterBlock, RegisterField
+from src.solar.connector import READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, ReadRequest, SungrowConnector
+from src.solar.monitor import InverterMonitor, observed_function_codes, plan_reads
+
+
+class ReversingSimulator(ModbusSimulator):
+    """Simulator answering each batch of pipelined requests in reverse order"""
+
+    async def _send(self, writer, data):
+        adus = []
+        offset = 0
+        while offset < len(data):
+            end = offset + 6 + struct.unpack_from('>H', data, offset + 4)[0]
+            adus.append(data[offset:end])
+            offset = end
+        await super()._send(writer, b''.join(reversed(adus)))
+
+
+def _block(start, count):
+    """Raw UINT16 block named reg_<address>"""
+    return RegisterBlock(start, count, [RegisterField(f'reg_{a}', a, 'uint16')
+                                        for a in range(start, start + count)])
+
+
+def _live_map():
+    """Live register map with two inverter units"""
+    def registers(addresses):
+        return {str(a): {'data_type': 'UINT16', 'category': 'Power'} for a in addresses}
+    return {'registers_by_unit': {
+        'Unit_1': {'function_codes': [4], 'registers': registers([5002, 5003, 5010, 5040])},
+        'Unit_2': {'function_codes': [3], 'registers': registers([13000, 13001])},
+        'Unit_9': {'function_codes': [4], 'registers': registers([5002])},
+    }}
+
+
+class TestSungrowConnector:
+    """Test the pipelined gateway connection"""
+
+    @staticmethod
+    def test_transaction_matching():
+        """Test that responses arriving out of order reach their own request"""
+        print("\n[TEST] Sungrow Connector - Transaction Matching")
+        simulator = ReversingSimulator(port=0)
+        try:
+            for unit_id in range(1, 5):
+                simulator.add_device(unit_id, {5000 + i: unit_id * 100 + i for i in range(10)})
+            port = simulator.start()
+            connector = SungrowConnector('127.0.0.1', port, timeout=2.0, max_in_flight=8)
+            requests = [ReadRequest(unit_id, READ_INPUT_REGISTERS, _block(5000 + i, 1))
+                        for unit_id in range(1, 5) for i in range(10)]
+            payloads = connector.execute(requests)
+            connector.disconnect()
+
+            for request, payload in zip(requests, payloads):
+                expected = request.unit_id * 100 + request.block.start - 5000
+                assert struct.unpack('>H', payload)[0] == expected, request
+            assert connector.stats['responses'] == 40
+            print("  OK - Every response matched by transaction ID")
+            return True
+        finally:
+            simulator.stop()
+
+    @staticmethod
+    def test_exception_responses():
+        """Test that Modbus exceptions leave None and record their code"""
+        print("\n[TEST] Sungrow Connector - Exception Responses")
+        simulator = ModbusSimulator(port=0, strict=True)
+        try:
+            simulator.add_device(1, {5002: 7})
+            port = simulator.start()
+            connector = SungrowConnector('127.0.0.1', port, timeout=2.0)
+            payloads = connector.execute([
+                ReadRequest(1, READ_INPUT_REGISTERS, _block(5002, 1)),
+                ReadRequest(1, READ_INPUT_REGISTERS, _block(5100, 1)),
+                ReadRequest(42, READ_HOLDING_REGISTERS, _block(5002, 1)),
+            ])
+            connector.disconnect()
+
+            assert payloads == [b'\x00\x07', None, None]
+            assert connector.last_exceptions == {1: ILLEGAL_DATA_ADDRESS, 2: GATEWAY_TARGET_FAILED}
+            assert connector.stats['exceptions'] == 2
+            print("  OK - Exceptions reported per request")
+            return True
+        finally:
+            simulator.stop()
+
+    @staticmethod
+    def test_timeout_reconnect():
+        """Test that a timed-out batch reconnects and late answers are discarded"""
+        print("\n[TEST] Sungrow Connector - Timeout and Reconnect")
+        simulator = ModbusSimulator(port=0, latency=0.5)
+        try:
+            simulator.add_device(1, {5002: 11})
+            port = simulator.start()
+            connector = SungrowConnector('127.0.0.1', port, timeout=0.2)
+            request = ReadRequest(1, READ_INPUT_REGISTERS, _block(5002, 1))
+            assert connector.execute([request]) == [None]
+            assert connector.stats['timeouts'] == 1
+            assert connector.stats['reconnects'] >= 1 and connector.connected
+
+            simulator.latency = 0.0
+            simulator.set_register(1, 5002, 12)
+            assert connector.execute([request]) == [b'\x00\x0c']
+            connector.disconnect()
+            print("  OK - Connection recovered after a timeout")
+            return True
+        finally:
+            simulator.stop()
+
+
+class TestInverterMonitor:
+    """Test read planning and polling of the inverter units"""
+
+    @staticmethod
+    def test_plan_reads():
+        """Test function code choice and coalescing of mapped registers"""
+        print("\n[TEST] Inverter Monitor - Read Planning")
+        plan = plan_reads(_live_map(), units=(2, 1, 3), max_gap=8)
+        spans = [(r.unit_id, r.function_code, r.block.start, r.block.count) for r in plan]
+        assert spans == [
+            (2, READ_HOLDING_REGISTERS, 13000, 2),
+            (1, READ_INPUT_REGISTERS, 5002, 9),
+            (1, READ_INPUT_REGISTERS, 5040, 1),
+        ], spans
+        print("  OK - Reads planned per unit")
+        return True
+
+    @staticmethod
+    def test_plan_mixed_function_codes():
+        """Test that a unit read with FC3 and FC4 keeps each register's code"""
+        print("\n[TEST] Inverter Monitor - Mixed Function Codes")
+        registers = {str(a): {'data_type': 'UINT16'} for a in (5000, 5001, 5002, 5003, 5004)}
+        registers['5004']['function_codes'] = [READ_HOLDING_REGISTERS]
+        mapping = {'registers_by_unit': {'Unit_1': {'function_codes': [3, 4], 'registers': registers}}}
+        exchanges = [
+            (1, READ_INPUT_REGISTERS, 5000, b'\0' * 4),
+            (1, READ_HOLDING_REGISTERS, 5002, b'\0' * 2),
+            (1, READ_INPUT_REGISTERS, 5003, b'\0' * 2),
+        ]
+        plan = plan_reads(mapping, units=(1,), max_gap=8,
+                          function_codes=observed_function_codes(exchanges))
+        spans = [(r.function_code, r.block.start, r.block.count) for r in plan]
+        assert spans == [
+            (READ_INPUT_REGISTERS, 5000, 4),
+            (READ_HOLDING_REGISTERS, 5002, 3),
+        ], spans
+        # Without a capture a unit read with both codes falls back to FC4
+        plan = plan_reads(mapping, units=(1,), max_gap=8)
+        spans = [(r.function_code, r.block.start, r.block.count) for r in plan]
+        assert spans == [(READ_INPUT_REGISTERS, 5000, 4), (READ_HOLDING_REGISTERS, 5004, 1)], spans
+        print("  OK - Blocks planned per function code")
+        return True
+
+    @staticmethod
+    def test_poll_once():
+        """Test one full-plant cycle against the simulator"""
+        print("\n[TEST] Inverter Monitor - Poll Cycle")
+        simulator = ModbusSimulator(port=0)
+        try:
+            simulator.add_device(1, {5002: 1, 5003: 2, 5010: 3, 5040: 4})
+            simulator.add_device(2, {13000: 5, 13001: 6})
+            port = simulator.start()
+            connector = SungrowConnector('127.0.0.1', port, timeout=2.0)
+            monitor = InverterMonitor(connector, _live_map(), units=(1, 2), max_gap=8)
+            result = monitor.poll_once()
+            monitor.stop()
+
+            assert result.failed == 0
+            assert result.values[1]['reg_5010'] == 3 and result.values[1]['reg_5040'] == 4
+            assert result.values[2] == {'reg_13000': 5, 'reg_13001': 6}
+            print("  OK - Cycle decoded every unit")
+            return True
+        finally:
+            simulator.stop()
+
+
+def run_all_tests():
+    """Run all tests"""
+    results = [
+        ("Transaction Matching", TestSungrowConnector.test_transaction_matching()),
+        ("Exception Responses", TestSungrowConnector.test_exception_responses()),
+        ("Timeout and Reconnect", TestSungrowConnector.test_timeout_reconnect()),
+        ("Read Planning", TestInverterMonitor.test_plan_reads()),
+        ("Mixed Function Codes", TestInverterMonitor.test_plan_mixed_function_codes()),
+        ("Poll Cycle", TestInverterMonitor.test_poll_once()),
+    ]
+    passed = sum(1 for _, result in results if result)
+    print(f"\n{passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Weather Station Tests
+Tests for the weather history storage and live data channels
+"""
+
+import gzip
+import http.client
+import json
+import random
+import socket
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.running_stats import WindowStatistics
+from src.weather.event_stream import EventBroadcaster
+from src.weather.response_cache import ResponseCache, etag_matches, negotiate_encoding
+from src.weather.snapshot import EMPTY_SNAPSHOT, Snapshot, make_etag
+from src.weather.station import WeatherStation
+from src.weather.storage import HistoryStorage, SQLiteStorage, TimeRingBuffer
+from src.weather.web_server import WeatherWebHandler, WeatherWebServer
+
+
+def _history(count, start=None):
+    """Build data points one second apart, from the start of a minute an hour ago"""
+    start = time.time() // 60 * 60 - 3600 if start is None else start
+    return [{'timestamp': start + i, 'sensors': {'air_temperature': {'value': 20.0 + i % 7}}}
+            for i in range(count)]
+
+
+class TestSQLiteStorage:
+    """Test the SQLite history store"""
+
+    @staticmethod
+    def test_queries_bypass_write_lock():
+        """Test that queries run while a writer holds the storage lock"""
+        print("\n[TEST] SQLite Storage - Concurrent Queries")
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = SQLiteStorage(Path(tmp) / 'history.db')
+            for point in _history(120):
+                storage.append(point)
+            storage.flush()
+
+            results = []
+            with storage.lock:
+                reader = threading.Thread(target=lambda: results.append(
+                    (len(storage.query()), len(storage.query_rollup('1min')))))
+                reader.start()
+                reader.join(timeout=5)
+                assert not reader.is_alive(), "query waited for the write lock"
+            storage.close()
+        assert results == [(120, 2)], results
+        print("  OK - Queries ran beside the writer")
+        return True
+
+    @staticmethod
+    def test_reimport_keeps_rollups():
+        """Test that importing the same export twice leaves the rollups unchanged"""
+        print("\n[TEST] SQLite Storage - Re-import")
+        with tempfile.TemporaryDirectory() as tmp:
+            export = Path(tmp) / 'weather_data.json'
+            export.write_text(json.dumps({'history': _history(42)}))
+            storage = SQLiteStorage(Path(tmp) / 'history.db')
+
+            storage.import_json(export)
+            first = storage.query_rollup('1h')
+            storage.import_json(export)
+            second = storage.query_rollup('1h')
+            count = storage.count()
+            storage.close()
+        assert count == 42
+        assert first[0]['rollup']['air_temperature']['value']['count'] == 42
+        assert second == first
+        print("  OK - Rollups counted each reading once")
+        return True
+
+    @staticmethod
+    def test_failed_flush_retried():
+        """Test that a failed write rolls back and keeps its rows for the next flush"""
+        print("\n[TEST] SQLite Storage - Failed Flush")
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = SQLiteStorage(Path(tmp) / 'history.db', batch_size=1000)
+            storage.conn.execute("CREATE TRIGGER reject BEFORE INSERT ON readings "
+                                 "WHEN NEW.value = 26 BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+            for point in _history(60):
+                storage.append(point)
+            try:
+                storage.flush()
+                raise AssertionError("flush did not fail")
+            except sqlite3.IntegrityError:
+                pass
+            assert not storage.conn.in_transaction
+            assert len(storage.pending) == 60
+            assert storage.conn.execute('SELECT COUNT(*) FROM readings').fetchone()[0] == 0
+
+            storage.conn.execute('DROP TRIGGER reject')
+            storage.flush()
+            rollup = storage.query_rollup('1h')
+            count = storage.count()
+            storage.close()
+        assert count == 60 and not storage.pending
+        assert rollup[0]['rollup']['air_temperature']['value']['count'] == 60
+        assert getattr(HistoryStorage, '__abstractmethods__') == {'append', 'query'}
+        print("  OK - Rows written once on the retry")
+        return True
+
+
+
+class TestTimeRingBuffer:
+    """Test the in-memory history ring and WeatherStation.get_history"""
+
+    @staticmethod
+    def _check_downsampled(points, expected, max_points):
+        """Check an evenly spaced subset that keeps the newest point"""
+        assert len(points) == min(len(expected), max_points)
+        if not expected:
+            return
+        positions = [expected.index(point) for point in points]
+        assert positions == sorted(set(positions))
+        assert positions[-1] == len(expected) - 1
+        if len(points) > 1:
+            assert positions[0] == 0
+            gaps = [b - a for a, b in zip(positions, positions[1:])]
+            assert max(gaps) - min(gaps) <= 1, gaps
+
+    @staticmethod
+    def test_wrap_and_range():
+        """Test wrap-around, indexing, range slicing and downsampling"""
+        print("\n[TEST] Time Ring Buffer - Wrap and Range")
+        rng = random.Random(11)
+        buffer = TimeRingBuffer(10)
+        stored = []   # (ts, item) as the ring should hold them
+        ts = 1000.0
+        for i in range(57):
+            # Repeated stamps and a clock step back are indexed at the newest time
+            ts += rng.choice([0.0, 1.0, 2.5]) if i != 30 else -20.0
+            buffer.append(ts, i)
+            stored.append((max(ts, stored[-1][0]) if stored else ts, i))
+            stored = stored[-10:]
+            items = [item for _, item in stored]
+
+            assert len(buffer) == len(items)
+            assert list(buffer) == items
+            assert (buffer[0], buffer[-1]) == (items[0], items[-1])
+            for start in (None, stored[0][0] - 1, stored[len(stored) // 2][0], ts, ts + 1):
+                for end in (None, stored[0][0], stored[-1][0], ts + 1):
+                    expected = [item for stamp, item in stored
+                                if (start is None or stamp >= start)
+                                and (end is None or stamp < end)]
+                    assert buffer.range(start, end) == expected, (i, start, end)
+                    for max_points in (1, 3, 7):
+                        TestTimeRingBuffer._check_downsampled(
+                            buffer.range(start, end, max_points), expected, max_points)
+        try:
+            buffer[10]
+        except IndexError:
+            pass
+        else:
+            raise AssertionError("index past the end accepted")
+        print("  OK - Ring matched the last 10 appends")
+        return True
+
+    @staticmethod
+    def test_station_history():
+        """Test get_history windows, sensor filters and max_points on a wrapped ring"""
+        print("\n[TEST] Time Ring Buffer - Station History")
+        station = WeatherStation(max_history=50)
+        now = time.time()
+        for minute in range(120, 0, -1):
+            ts = now - minute * 60
+            station.data_history.append(ts, {
+                'timestamp': ts,
+                'sensors': {'3s': {'temperature': minute}, 'wind': {'wind_speed': 1.0}}})
+
+        assert [p['sensors']['3s']['temperature'] for p in station.get_history(hours=24)] == \
+            list(range(50, 0, -1))
+        # hours counts back from the time of the call, so the point 30 minutes old is out
+        half_hour = station.get_history(hours=0.5)
+        assert [p['timestamp'] for p in half_hour] == [now - m * 60 for m in range(29, 0, -1)]
+        window = station.get_history(start=now - 40.5 * 60, end=now - 9.5 * 60)
+        assert [p['sensors']['3s']['temperature'] for p in window] == list(range(40, 9, -1))
+
+        downsampled = station.get_history(hours=24, max_points=8)
+        TestTimeRingBuffer._check_downsampled(downsampled, station.get_history(hours=24), 8)
+        filtered = station.get_history(hours=0.5, sensors=['wind'], max_points=4)
+        assert len(filtered) == 4 and all(set(p['sensors']) == {'wind'} for p in filtered)
+        assert filtered[-1]['timestamp'] == now - 60
+        assert station.get_history(start=now) == []
+        print("  OK - Windows, filters and max_points served from the ring")
+        return True
+
+
+class TestSnapshot:
+    """Test the immutable current-data snapshots"""
+
+    @staticmethod
+    def test_read_only():
+        """Test that frozen data rejects every mutation and is a copy of the source"""
+        print("\n[TEST] Snapshot - Read Only")
+        source = {'sensors': {'3s': {'temperature': 21.5}}, 'alerts': [{'type': 'temp_high'}]}
+        snapshot = Snapshot(source, 1)
+        source['sensors']['3s']['temperature'] = 99.0
+        source['alerts'].append({'type': 'temp_low'})
+
+        data = snapshot.data
+        assert data['sensors']['3s']['temperature'] == 21.5
+        assert data['alerts'] == ({'type': 'temp_high'},)
+        for target in (data, data['sensors'], data['sensors']['3s'], data['alerts'][0]):
+            for mutate in (lambda d: d.__setitem__('x', 1), lambda d: d.__delitem__('x'),
+                           lambda d: d.update(x=1), lambda d: d.setdefault('x', 1),
+                           lambda d: d.pop('x', None), lambda d: d.popitem(),
+                           lambda d: d.clear()):
+                try:
+                    mutate(target)
+                except TypeError:
+                    continue
+                raise AssertionError("frozen dict accepted a mutation")
+        try:
+            data['alerts'].append({})
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("frozen list accepted a mutation")
+
+        # Copies are ordinary dicts again
+        copy = data.copy()
+        copy['x'] = 1
+        assert type(copy) is dict and 'x' not in data
+        assert json.loads(snapshot.body) == {'sensors': {'3s': {'temperature': 21.5}},
+                                             'alerts': [{'type': 'temp_high'}]}
+        print("  OK - Snapshot data is read-only")
+        return True
+
+    @staticmethod
+    def test_version_and_etag():
+        """Test that version and ETag change exactly when a new data point is recorded"""
+        print("\n[TEST] Snapshot - Version and ETag")
+        data = {'sensors': {'3s': {'temperature': 20.0}}}
+        assert Snapshot(data, 1).etag == Snapshot(dict(data), 7).etag
+        assert Snapshot(data).etag != Snapshot({'sensors': {'3s': {'temperature': 20.1}}}).etag
+        assert Snapshot(data).part('sensors') == (b'{"3s":{"temperature":20.0}}',
+                                                 make_etag(b'{"3s":{"temperature":20.0}}'))
+
+        station = WeatherStation(max_history=10)
+        assert station.get_snapshot() is EMPTY_SNAPSHOT and EMPTY_SNAPSHOT.version == 0
+        etags = set()
+        for i in range(1, 6):
+            station.record_readings({'3s': {'temperature': 20.0 + i}})
+            snapshot = station.get_snapshot()
+            # Reading the station leaves the published snapshot alone
+            station.get_current_data()
+            station.get_history(hours=1)
+            station.calculate_statistics()
+            assert station.get_snapshot() is snapshot
+            assert snapshot.version == i
+            assert snapshot.etag == make_etag(snapshot.body)
+            assert snapshot.data['sensors']['3s']['temperature'] == 20.0 + i
+            etags.add(snapshot.etag)
+        assert len(etags) == 5
+        print("  OK - One version and ETag per data point")
+        return True
+
+    @staticmethod
+    def test_listeners_consistent():
+        """Test that listeners get consecutive, self-consistent snapshots under concurrent writers"""
+        print("\n[TEST] Snapshot - Listeners")
+        station = WeatherStation(max_history=100)
+        seen = []
+
+        def listener(previous, snapshot):
+            assert snapshot.version == previous.version + 1
+            assert snapshot.etag == make_etag(snapshot.body)
+            body = json.loads(snapshot.body)
+            assert body['sensors'] == snapshot.data['sensors']
+            assert body['timestamp'] == snapshot.data['timestamp']
+            seen.append(snapshot.version)   # a failed check leaves a version out
+
+        def writer(offset):
+            for i in range(100):
+                station.record_readings({'3s': {'temperature': offset + i}})
+
+        station.add_listener(listener)
+        threads = [threading.Thread(target=writer, args=(n * 1000,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(seen) == list(range(1, 401))
+        assert station.get_snapshot().version == 400
+        station.remove_listener(listener)
+        station.record_readings({'3s': {'temperature': 0.0}})
+        assert len(seen) == 400
+        print("  OK - 400 consistent snapshots delivered once each")
+        return True
+
+
+class TestWindowStatistics:
+    """Test the sliding-window aggregators against a brute-force recomputation"""
+
+    @staticmethod
+    def _expected(points, name):
+        """Mean, stdev, min and max of one metric over a list of data points"""
+        values = [point[name] for point in points if name in point]
+        if not values:
+            return None
+        stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+        return statistics.fmean(values), stdev, min(values), max(values)
+
+    @staticmethod
+    def test_matches_brute_force():
+        """Test mean, stdev, min and max as samples expire, with gaps in a metric"""
+        print("\n[TEST] Window Statistics - Brute Force")
+        rng = random.Random(7)
+        size = 25
+        window = WindowStatistics(size)
+        points = []
+        for i in range(600):
+            # Long runs without humidity empty its window completely
+            point = {'temperature': round(rng.gauss(20, 5), 1)}
+            if i % 200 < 120 and rng.random() < 0.7:
+                point['humidity'] = rng.choice([40.0, 55.5, rng.uniform(0, 100)])
+            window.add(point)
+            points.append(point)
+
+            for name in ('temperature', 'humidity'):
+                expected = TestWindowStatistics._expected(points[-size:], name)
+                if expected is None:
+                    assert name not in window, (i, name)
+                    continue
+                stats = window[name]
+                mean, stdev, low, high = expected
+                assert abs(stats.summary()['avg'] - mean) < 1e-9, (i, name)
+                assert abs(stats.stdev - stdev) < 1e-6, (i, name)
+                assert (stats.minimum, stats.maximum) == (low, high), (i, name)
+        print(f"  OK - {len(points)} samples matched")
+        return True
+
+    @staticmethod
+    def test_station_statistics():
+        """Test WeatherStation statistics for the 3s sensor and after a source switch"""
+        print("\n[TEST] Window Statistics - Station")
+        rng = random.Random(3)
+        station = WeatherStation(max_history=30)
+        points = []
+        for i in range(200):
+            source = '3s' if i < 120 else 'bme280'
+            reading = {'temperature': rng.uniform(-5, 35), 'humidity': rng.uniform(20, 90)}
+            readings = {source: reading}
+            if source == '3s':
+                reading['wind_speed'] = rng.uniform(0, 20)
+            station.record_readings(readings)
+            points.append(WeatherStation._statistic_values(readings))
+
+            stats = station.current_data['statistics']
+            if i == 0:
+                assert stats == {}
+                continue
+            for name in ('temperature', 'humidity', 'wind_speed'):
+                expected = TestWindowStatistics._expected(points[-30:], name)
+                if expected is None:
+                    assert name not in stats, (i, name)
+                    continue
+                mean, stdev, low, high = expected
+                digits = 2 if name == 'wind_speed' else 1
+                assert abs(stats[name]['avg'] - mean) <= 0.5 * 10 ** -digits + 1e-9, (i, name)
+                assert abs(stats[name]['stdev'] - stdev) <= 0.005 + 1e-9, (i, name)
+                assert stats[name]['max'] == round(high, digits), (i, name)
+                if name != 'wind_speed':
+                    assert stats[name]['min'] == round(low, digits), (i, name)
+        print("  OK - Station statistics follow the window")
+        return True
+
+
+class TestResponseCache:
+    """Test the encoded response cache and the conditional GETs served from it"""
+
+    @staticmethod
+    def test_negotiation_and_etags():
+        """Test Accept-Encoding negotiation and If-None-Match matching"""
+        print("\n[TEST] Response Cache - Negotiation")
+        for header, expected in ((None, None), ('', None), ('gzip', 'gzip'),
+                                 ('deflate, gzip;q=0.5', 'gzip'), ('gzip;q=0, deflate', 'deflate'),
+                                 ('GZIP', 'gzip'), ('identity', None), ('*', 'gzip'),
+                                 ('*;q=0', None), ('gzip;q=bad, br', None)):
+            assert negotiate_encoding(header) == expected, header
+        for header, expected in ((None, False), ('"a"', True), ('"b", W/"a"', True),
+                                 ('*', True), ('"a-gz"', False), ('a', False)):
+            assert etag_matches(header, '"a"') == expected, header
+        print("  OK - Encodings and ETags matched")
+        return True
+
+    @staticmethod
+    def test_versions_and_encodings():
+        """Test rebuilds per version, LRU eviction and one ETag per encoding"""
+        print("\n[TEST] Response Cache - Versions and Encodings")
+        cache = ResponseCache(max_entries=2)
+        builds = []
+
+        def build(body):
+            return lambda: builds.append(body) or body
+
+        body = json.dumps({'values': list(range(200))}).encode()
+        first = cache.get('/a', 1, build(body))
+        assert cache.get('/a', 1, build(b'other')) is first
+        assert cache.get('/a', 2, build(body)) is not first
+        cache.get('/b', 1, build(b'{}'))
+        cache.get('/c', 1, build(b'{}'))
+        assert '/a' not in cache.entries and len(builds) == 4
+        assert cache.stats == {'hits': 1, 'misses': 4}
+
+        response = cache.get('/c', 2, build(body))
+        identity = response.encoded(None)
+        zipped = response.encoded('gzip')
+        deflated = response.encoded('deflate')
+        assert identity == (body, None, response.etag)
+        assert gzip.decompress(zipped[0]) == body and zipped[1] == 'gzip'
+        assert len({response.etag, zipped[2], deflated[2]}) == 3
+        assert zipped[2] == response.etag[:-1] + '-gz"'
+        assert response.encoded('gzip')[0] is zipped[0]
+        small = cache.get('/small', 1, build(b'{}'))
+        assert small.encoded('gzip') == (b'{}', None, small.etag)
+        print("  OK - Rebuilt per version, compressed once per encoding")
+        return True
+
+    @staticmethod
+    def _get(port, path, headers=None):
+        """GET a path and return (status, headers, body)"""
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            connection.request('GET', path, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.headers, response.read()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def test_conditional_and_gzip():
+        """Test 304 and gzip responses and a relative history window going stale"""
+        print("\n[TEST] Response Cache - Web Server")
+        get = TestResponseCache._get
+        station = WeatherStation(max_history=100)
+        station.record_readings({'3s': {'temperature': 21.0, 'humidity': 50.0, 'notes': 'x' * 300}})
+        server = WeatherWebServer(station, host='127.0.0.1', port=0, workers=2)
+        bucket = WeatherWebHandler.HISTORY_BUCKET
+        WeatherWebHandler.HISTORY_BUCKET = 0.25
+        server.start()
+        try:
+            status, headers, body = get(server.port, '/api/current')
+            assert status == 200 and body == station.get_snapshot().body
+            etag = headers['ETag']
+            assert headers['Vary'] == 'Accept-Encoding' and 'Content-Encoding' not in headers
+
+            status, headers, zipped = get(server.port, '/api/current', {'Accept-Encoding': 'gzip'})
+            assert status == 200 and headers['Content-Encoding'] == 'gzip'
+            assert gzip.decompress(zipped) == body
+            gz_etag = headers['ETag']
+            assert gz_etag != etag and headers['Vary'] == 'Accept-Encoding'
+
+            # Each validator only matches its own representation
+            for accept, tag, expected in ((None, etag, 304), ('gzip', gz_etag, 304),
+                                          ('gzip', etag, 200), (None, gz_etag, 200)):
+                request = {'If-None-Match': tag}
+                if accept:
+                    request['Accept-Encoding'] = accept
+                status, headers, body = get(server.port, '/api/current', request)
+                assert status == expected, (accept, tag, status)
+                if status == 304:
+                    assert body == b'' and headers['ETag'] == tag
+                    assert headers['Vary'] == 'Accept-Encoding'
+
+            # A new data point invalidates the validator
+            station.record_readings({'3s': {'temperature': 22.0}})
+            status, _, _ = get(server.port, '/api/current', {'If-None-Match': etag})
+            assert status == 200
+
+            # With no new data, points still leave a window that ends now
+            station.data_history = TimeRingBuffer(100)
+            now = time.time()
+            for age in (2.0, 0.1):
+                station.data_history.append(now - age, {'timestamp': now - age, 'sensors': {}})
+            window = '/api/history?hours=' + str(3.0 / 3600)
+            first = json.loads(get(server.port, window)[2])
+            time.sleep(1.5)
+            second = json.loads(get(server.port, window)[2])
+            assert (len(first), len(second)) == (2, 1), (len(first), len(second))
+        finally:
+            server.stop()
+            WeatherWebHandler.HISTORY_BUCKET = bucket
+            WeatherWebHandler.response_cache.clear()
+        print("  OK - 304, gzip and relative history windows served correctly")
+        return True
+
+
+class TestEventStream:
+    """Test the SSE broadcaster"""
+
+    @staticmethod
+    def test_snapshot_in_order():
+        """Test that snapshot plus deltas never skip an update published meanwhile"""
+        print("\n[TEST] Event Stream - Snapshot Ordering")
+        events = EventBroadcaster()
+        state = {'n': 0}
+        threads = []
+        clients = []
+
+        def snapshot():
+            threads.append(threading.current_thread())
+            return dict(state)
+
+        def publish():
+            for n in range(1, 301):
+                state['n'] = n
+                events.publish({'n': n})
+                time.sleep(0.0005)
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        while publisher.is_alive() and len(clients) < 20:
+            client, server_side = socket.socketpair()
+            clients.append(client)
+            assert events.subscribe(server_side, snapshot)
+            time.sleep(0.005)
+        publisher.join()
+
+        try:
+            for client in clients:
+                client.settimeout(2.0)
+                data = b''
+                values = []
+                while not values or values[-1] < 300:
+                    data += client.recv(65536)
+                    values = [json.loads(line[6:])['n'] for line in data.split(b'\n')
+                              if line.startswith(b'data: ')]
+                seen = values[0]
+                for n in values[1:]:
+                    assert n <= seen + 1, f"update {seen + 1} lost"
+                    seen = max(seen, n)
+        finally:
+            events.close()
+            for client in clients:
+                client.close()
+        assert threads and all(thread is events._thread for thread in threads)
+        print(f"  OK - {len(clients)} subscribers saw every update")
+        return True
+
+
+def run_all_tests():
+    """Run all tests"""
+    results = [
+        ("Concurrent Queries", TestSQLiteStorage.test_queries_bypass_write_lock()),
+        ("Re-import", TestSQLiteStorage.test_reimport_keeps_rollups()),
+        ("Failed Flush", TestSQLiteStorage.test_failed_flush_retried()),
+        ("Ring Wrap and Range", TestTimeRingBuffer.test_wrap_and_range()),
+        ("Station History", TestTimeRingBuffer.test_station_history()),
+        ("Snapshot Read Only", TestSnapshot.test_read_only()),
+        ("Snapshot Version and ETag", TestSnapshot.test_version_and_etag()),
+        ("Snapshot Listeners", TestSnapshot.test_listeners_consistent()),
+        ("Window Brute Force", TestWindowStatistics.test_matches_brute_force()),
+        ("Station Statistics", TestWindowStatistics.test_station_statistics()),
+        ("Cache Negotiation", TestResponseCache.test_negotiation_and_etags()),
+        ("Cache Versions and Encodings", TestResponseCache.test_versions_and_encodings()),
+        ("Cache Web Server", TestResponseCache.test_conditional_and_gzip()),
+        ("Snapshot Ordering", TestEventStream.test_snapshot_in_order()),
+    ]
+    passed = sum(1 for _, result in results if result)
+    print(f"\n{passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run_all_tests() else 1)